@@ -31,18 +31,27 @@ class Argument:
     os_version: str = ""
     model: str = ""
     save_to_db: bool = False
+    save_to_db_incremental: bool = False
+    save_to_lake: bool = False
     scale_factor: float = 0.5
     survey_comment: str = ""
     time_scan_probe: int = 90
+    use_cache: bool = True
+    live: bool = False # enregistrement en cours (corelte.live) : fichiers pas encore complets
 
     def __post_init__(self):
         """Initialize paths and load configuration."""
         self.exclusions = self.exclusions or []
         self._setup_survey_paths()
         self._setup_file_paths()
-        self._validate_required_files()
+        if self.live:
+            # le screencast et la trace s'écrivent encore : ni contrôle, ni métadonnées
+            self.mp4_create_date = datetime.now()
+        else:
+            self._validate_required_files()
         self._load_yaml_config()
-        self._extract_mp4_create_date()
+        if not self.live:
+            self._extract_mp4_create_date()
 
     def _setup_survey_paths(self):
         """Set up the survey directory structure."""
@@ -67,11 +76,19 @@ class Argument:
         self.mp4_filename = self.survey_dir / f'{base_name}.mp4'
         self.gps_filename = self.survey_dir / f'{base_name}.gpx'
         self.csv_filename = self.survey_dir / f'{base_name}.csv'
+        self.gpkg_filename = self.survey_dir / f'{base_name}.gpkg'
         self.arg_filename = self.survey_dir / 'args.yaml'
 
         # Temporary files
         self.tmp_mp4_filename = self.survey_tmp_dir / f'{base_name}_mp4.csv'
         self.tmp_gps_filename = self.survey_tmp_dir / f'{base_name}_gps.csv'
+        self.tmp_mp4_gpkg_filename = self.survey_tmp_dir / f'{base_name}_mp4.gpkg'
+        self.tmp_gps_gpkg_filename = self.survey_tmp_dir / f'{base_name}_gps.gpkg'
+
+        # Intermediate caches (corelte.cache)
+        self.tmp_gps_cache_filename = self.survey_tmp_dir / f'{base_name}_gps.npz'
+        self.tmp_mp4_cache_filename = self.survey_tmp_dir / f'{base_name}_mp4.npz'
+        self.tmp_fusion_cache_filename = self.survey_tmp_dir / f'{base_name}_fusion.npz'
 
         # OCR files
         self.tmp_frames_to_ocr_filename_txt = self.survey_tmp_dir / f'{base_name}_ocr_frames.txt'
@@ -0,0 +1,199 @@
+"""Typed on-disk intermediates of the pipeline (.npz), reloaded instead of recomputed.
+
+Each file holds numpy columns and a JSON header with the parameters that
+produced it: cache version, size and modification time of the source
+files, and the settings of the step. A cache is only used when its
+parameters are exactly the current ones, otherwise the step runs again
+and overwrites it.
+
+    Track       tmp/<base>_gps.npz     GPS track resampled to one point per second, speed and azimuth
+    Screencast  tmp/<base>_mp4.npz     OCR intervals, clock probe times and synchronised clock
+    Fusion      tmp/<base>_fusion.npz  fused readings before clarify
+"""
+
+import copy
+from datetime import datetime
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import zipfile
+
+import numpy as np
+
+from corelte.lake import MISSING_INT, SCHEMA, Columns, columns_to_readings, readings_to_columns
+
+# A incrémenter quand le contenu d'un cache change : les anciens fichiers sont ignorés
+CACHE_VERSION = 1
+
+# Tous les champs de Reading, en pleine précision (le lac stocke les flottants en float32)
+READING_SCHEMA = {
+    **{name: (attr, np.float64 if np.dtype(dtype).kind == 'f' else dtype) for name, (attr, dtype) in SCHEMA.items()},
+    'reading_time': ('reading_time', np.dtype('datetime64[us]')),
+    'fwd_distance': ('fwd_distance', np.float64),
+    'earfcn': ('earfcn', np.dtype('U16')),
+    'rsrp': ('rsrp', np.dtype('U16')),
+}
+
+META_KEY = '_meta'
+
+
+def file_signature(*paths) -> Dict[str, Optional[Tuple[int, int]]]:
+    """Size and modification time (ns) of source files, None for a missing file."""
+    signature = {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+            signature[str(path)] = (st.st_size, st.st_mtime_ns)
+        except OSError:
+            signature[str(path)] = None
+    return signature
+
+
+def files_signature(directory, suffix: str) -> Optional[Tuple[int, int, int]]:
+    """Number, total size and latest modification time (ns) of the files of a directory with a suffix.
+
+    Used for outputs made of many files (one OCR .txt per frame). None for a missing directory.
+    """
+    count = size = mtime = 0
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(suffix) and entry.is_file():
+                    st = entry.stat()
+                    count += 1
+                    size += st.st_size
+                    mtime = max(mtime, st.st_mtime_ns)
+    except OSError:
+        return None
+    return count, size, mtime
+
+
+def cache_tag(params: Dict[str, Any]) -> str:
+    """Digest of the producing parameters (stable JSON)."""
+    text = json.dumps({'version': CACHE_VERSION, **params}, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def save_npz(filename: Path, columns: Columns, params: Dict[str, Any], extra: Optional[Dict[str, Any]] = None) -> None:
+    """Write a cache file atomically.
+
+    Args:
+        filename: .npz file
+        columns: Numpy arrays to store
+        params: Producing parameters (see cache_tag)
+        extra: Small JSON values stored with the parameters (cursor, clock...)
+    """
+    meta = {'tag': cache_tag(params), 'params': params, 'extra': extra or {}}
+    filename = Path(filename)
+    tmp = filename.with_name(filename.name + '.tmp')
+    with open(tmp, 'wb') as f:
+        np.savez(f, **columns, **{META_KEY: np.array(json.dumps(meta, default=str))})
+    os.replace(tmp, filename)
+
+
+def load_npz(filename: Path, params: Dict[str, Any]) -> Optional[Tuple[Columns, Dict[str, Any]]]:
+    """Read a cache file if it was produced with these parameters.
+
+    Returns:
+        (columns, extra), None if the file is missing, stale or unreadable
+    """
+    try:
+        with np.load(filename, allow_pickle=False) as data:
+            meta = json.loads(data[META_KEY].item())
+            if meta.get('tag') != cache_tag(params):
+                return None
+            columns = {name: data[name] for name in data.files if name != META_KEY}
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        return None
+    return columns, meta['extra']
+
+
+def encode_readings(lines: Iterable) -> Columns:
+    return readings_to_columns(lines, READING_SCHEMA)
+
+
+def decode_readings(columns: Columns, survey_id: Optional[int] = None) -> List:
+    return columns_to_readings(columns, survey_id, READING_SCHEMA)
+
+
+def lake_columns(columns: Columns) -> Columns:
+    """Columns of the lake (SCHEMA, float32) from encoded readings, as readings_to_columns gives them."""
+    return {name: columns[name].astype(dtype) for name, (_, dtype) in SCHEMA.items()}
+
+
+def iter_decode_readings(columns: Columns, survey_id: Optional[int] = None, chunk_size: int = 2000) -> Iterator:
+    """decode_readings() as a stream, chunk_size readings at a time."""
+    n = len(columns['cell_id'])
+    for start in range(0, n, chunk_size):
+        yield from decode_readings({name: values[start:start + chunk_size] for name, values in columns.items()}, survey_id)
+
+
+class ReadingsCacheWriter:
+    """Builds the cache of a stream of readings while the stream is consumed.
+
+    The readings are copied as they pass (the next steps modify them) and
+    encoded chunk by chunk; the encoded columns take a fraction of the
+    memory of the Reading objects. save() writes the file once the stream
+    has been read to its end.
+
+    Example:
+        cache = ReadingsCacheWriter(argument.tmp_gps_cache_filename, track.cache_params())
+        for r in cache.tee(track.iter_lines_gps()): ...
+        cache.save(extra)
+    """
+
+    def __init__(self, filename: Path, params: Dict[str, Any], chunk_size: int = 2000) -> None:
+        self.filename = filename
+        self.params = params
+        self.chunk_size = chunk_size
+        self.chunks: List[Columns] = []
+        self._buffer: List = []
+        self._source: Optional[Iterator] = None
+        self.complete = False
+
+    def tee(self, lines: Iterable) -> Iterator:
+        """Yield the readings of a stream, keeping an encoded copy."""
+        self._source = iter(lines)
+        for r in self._source:
+            self._buffer.append(copy.copy(r))
+            if len(self._buffer) >= self.chunk_size:
+                self._encode()
+            yield r
+        self.complete = True
+
+    def _encode(self) -> None:
+        if self._buffer:
+            self.chunks.append(encode_readings(self._buffer))
+            self._buffer = []
+
+    def save(self, extra: Optional[Dict[str, Any]] = None) -> None:
+        """Read what the consumer left of the stream, then write the cache."""
+        if self._source is None:
+            return
+        if not self.complete:
+            for r in self._source:
+                self._buffer.append(r)
+            self.complete = True
+        self._encode()
+        columns = {name: np.concatenate([c[name] for c in self.chunks]) for name in READING_SCHEMA} \
+            if self.chunks else encode_readings([])
+        save_npz(self.filename, columns, self.params, extra)
+
+
+def encode_time(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def decode_time(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value is not None else None
+
+
+def encode_optional_ints(values: Iterable[Optional[int]]) -> np.ndarray:
+    return np.array([MISSING_INT if v is None else int(v) for v in values], dtype=np.int64)
+
+
+def decode_optional_int(value) -> Optional[int]:
+    value = int(value)
+    return None if value == MISSING_INT else value
@@ -0,0 +1,156 @@
+"""Cell-history index: all the readings of a cell, an eNodeB or a sector across surveys.
+
+The index is a copy of a lake dataset sorted by (network_id, cell_id), stored
+as memory-mapped .npy columns, with the sorted list of distinct cells and the
+offset of their first row. A lookup is a binary search on that list and
+returns a contiguous slice of the columns.
+"""
+
+import json
+import shutil
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from corelte.lake import Columns, SCHEMA, SurveyLake
+from corelte.orm.sectors import ENODEB_SHIFT
+
+LOCAL_CELL_MASK = (1 << ENODEB_SHIFT) - 1
+
+
+def enodeb_of(cell_id):
+    """eNodeB identifier of a cell (works on ints and numpy arrays)."""
+    return cell_id >> ENODEB_SHIFT
+
+
+def local_cell_of(cell_id):
+    """Local cell identifier within its eNodeB (works on ints and numpy arrays)."""
+    return cell_id & LOCAL_CELL_MASK
+
+
+def sector_of(cell_id, sector_split: int):
+    """Sector of a cell, as used by the QGIS filter: cell_id modulo the number of sectors."""
+    return cell_id % sector_split
+
+
+def cell_key(network_id, cell_id):
+    """Sort key of a (network_id, cell_id) pair."""
+    return (np.asarray(network_id, dtype=np.int64) << 32) | np.asarray(cell_id, dtype=np.int64)
+
+
+class CellIndex:
+    """Index of a lake dataset by (network_id, cell_id).
+
+    Example:
+        index = CellIndex(SurveyLake())
+        if index.is_stale():
+            index.build()
+        rows = index.enodeb(1, 890639)   # every reading of eNodeB 890639
+        rows['latitude'], rows['reading_time']
+    """
+
+    def __init__(self, lake: SurveyLake, dataset: str = 'fusion') -> None:
+        """Initialize the index (call open() or build() before querying).
+
+        Args:
+            lake: Lake holding the readings
+            dataset: Lake dataset to index
+        """
+        self.lake = lake
+        self.dataset = dataset
+        self.directory = lake.root / '_cell_index' / dataset
+        self.keys: Optional[np.ndarray] = None
+        self.offsets: Optional[np.ndarray] = None
+        self.columns: Columns = {}
+
+    def _manifest(self) -> List[List]:
+        """Partitions of the dataset with their modification time."""
+        return [[n, s, (d / '_stats.json').stat().st_mtime_ns] for n, s, d in self.lake.partitions(self.dataset)]
+
+    def is_stale(self) -> bool:
+        """True when the index is missing or a partition was written since it was built."""
+        try:
+            with open(self.directory / '_manifest.json') as f:
+                return json.load(f) != self._manifest()
+        except FileNotFoundError:
+            return True
+
+    def build(self) -> int:
+        """Rebuild the index from the lake.
+
+        Returns:
+            Number of rows indexed
+        """
+        manifest = self._manifest()
+        data = self.lake.scan(self.dataset)
+        known = data['cell_id'] >= 0 # lectures OCR sans cellule
+        data = {name: values[known] for name, values in data.items()}
+        keys = cell_key(data['network_id'], data['cell_id'])
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+
+        tmp = self.directory.with_name(self.directory.name + '.tmp')
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        for name, values in data.items():
+            np.save(tmp / f'{name}.npy', values[order], allow_pickle=False)
+
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.empty(0, dtype=np.int64)
+        np.save(tmp / '_keys.npy', keys[starts])
+        np.save(tmp / '_offsets.npy', np.r_[starts, len(keys)].astype(np.int64))
+        with open(tmp / '_manifest.json', 'w') as f:
+            json.dump(manifest, f)
+
+        shutil.rmtree(self.directory, ignore_errors=True)
+        tmp.rename(self.directory)
+        self.open()
+        return len(keys)
+
+    def open(self) -> None:
+        """Memory-map an existing index."""
+        self.keys = np.load(self.directory / '_keys.npy', mmap_mode='r')
+        self.offsets = np.load(self.directory / '_offsets.npy', mmap_mode='r')
+        names = list(SCHEMA.keys()) + ['network_id']
+        self.columns = {name: np.load(self.directory / f'{name}.npy', mmap_mode='r') for name in names}
+
+    def _rows(self, first: int, last: int, columns: Optional[Sequence[str]] = None) -> Columns:
+        """Rows of the cells first (included) to last (excluded) of the key list."""
+        start, end = int(self.offsets[first]), int(self.offsets[last])
+        names = columns if columns is not None else self.columns.keys()
+        return {name: self.columns[name][start:end] for name in names}
+
+    def _key_range(self, lo: int, hi: int) -> range:
+        """Positions in the key list of the keys in [lo, hi)."""
+        return range(int(np.searchsorted(self.keys, lo, 'left')), int(np.searchsorted(self.keys, hi, 'left')))
+
+    def cell(self, network_id: int, cell_id: int, columns: Optional[Sequence[str]] = None) -> Columns:
+        """All the readings of a cell (views on the memory-mapped columns)."""
+        key = int(cell_key(network_id, cell_id))
+        r = self._key_range(key, key + 1)
+        return self._rows(r.start, r.stop, columns)
+
+    def enodeb(self, network_id: int, enodeb_id: int, columns: Optional[Sequence[str]] = None) -> Columns:
+        """All the readings of the cells of an eNodeB."""
+        lo = int(cell_key(network_id, enodeb_id << ENODEB_SHIFT))
+        r = self._key_range(lo, lo + (1 << ENODEB_SHIFT))
+        return self._rows(r.start, r.stop, columns)
+
+    def sector(self, network_id: int, enodeb_id: int, sector: int, sector_split: int,
+               columns: Optional[Sequence[str]] = None) -> Columns:
+        """All the readings of one sector of an eNodeB (cells with cell_id % sector_split == sector)."""
+        lo = int(cell_key(network_id, enodeb_id << ENODEB_SHIFT))
+        r = self._key_range(lo, lo + (1 << ENODEB_SHIFT))
+        parts: Dict[str, list] = {}
+        for i in r:
+            if sector_of(int(self.keys[i]) & 0xFFFFFFFF, sector_split) != sector:
+                continue
+            for name, values in self._rows(i, i + 1, columns).items():
+                parts.setdefault(name, []).append(values)
+        names = columns if columns is not None else self.columns.keys()
+        return {name: np.concatenate(parts[name]) if name in parts else self.columns[name][:0] for name in names}
+
+    def cells_of_enodeb(self, network_id: int, enodeb_id: int) -> List[int]:
+        """Cells of an eNodeB having readings."""
+        lo = int(cell_key(network_id, enodeb_id << ENODEB_SHIFT))
+        r = self._key_range(lo, lo + (1 << ENODEB_SHIFT))
+        return [int(k) & 0xFFFFFFFF for k in self.keys[r.start:r.stop]]
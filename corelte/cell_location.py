@@ -0,0 +1,235 @@
+"""Estimation of the location of each cell from its readings (Cell_orm.geom)."""
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from enum import Enum
+from typing import Iterable, List, Optional, Tuple
+
+from geoalchemy2.shape import from_shape
+import numpy as np
+from pyproj import Transformer
+from shapely.geometry import Point
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.orm import Session
+
+from corelte.orm.models import Cell_orm, Reading_orm, Station
+
+# Transformations WGS84 <-> LV95 (coordonnées métriques pour les calculs)
+TO_LV95 = Transformer.from_crs(4326, 2056, always_xy=True)
+TO_WGS84 = Transformer.from_crs(2056, 4326, always_xy=True)
+
+
+class LocationMethod(Enum):
+    CENTROID = 1 # barycentre pondéré par la vitesse
+    WLS = 2      # moindres carrés pondérés attirés par la station la plus proche
+
+
+@dataclass
+class CellEstimate:
+    """Estimated location of a cell.
+
+    Attributes:
+        cell_id: Cell identifier
+        x: LV95 east coordinate in meters
+        y: LV95 north coordinate in meters
+        nb_readings: Number of readings used
+        station_name: Name of the station the estimate was pulled toward, if any
+    """
+    cell_id: int
+    x: float
+    y: float
+    nb_readings: int
+    station_name: Optional[str] = None
+
+    def to_wgs84(self) -> Tuple[float, float]:
+        """Return (longitude, latitude)."""
+        return TO_WGS84.transform(self.x, self.y)
+
+
+# Données d'une cellule pour les workers : cell_id, x, y, speed
+CellReadings = Tuple[int, np.ndarray, np.ndarray, np.ndarray]
+
+
+def speed_weights(speed: np.ndarray) -> np.ndarray:
+    """Weight of each reading: the faster the car, the larger the position error.
+
+    The reaction time of the phone (about 3 s) shifts a reading by roughly 3 m
+    per m/s, so a reading at speed v gets the weight 1 / (1 + v).
+    """
+    speed = np.nan_to_num(speed.astype(float), nan=0.0)
+    return 1.0 / (1.0 + np.clip(speed, 0.0, None))
+
+
+def speed_weighted_centroid(x: np.ndarray, y: np.ndarray, speed: np.ndarray) -> Tuple[float, float]:
+    """Speed-weighted centroid of the readings."""
+    w = speed_weights(speed)
+    return float(np.average(x, weights=w)), float(np.average(y, weights=w))
+
+
+def weighted_least_squares(x: np.ndarray, y: np.ndarray, speed: np.ndarray,
+                           station: Optional[Tuple[float, float]], prior: float = 0.5) -> Tuple[float, float]:
+    """Weighted least squares estimate pulled toward a station.
+
+    Minimises sum(w_i * |p - r_i|^2) + lambda * |p - s|^2, whose solution is
+    p = (sum(w_i * r_i) + lambda * s) / (sum(w_i) + lambda), with
+    lambda = prior * sum(w_i).
+
+    Args:
+        x, y: LV95 coordinates of the readings
+        speed: Speeds of the readings in m/s
+        station: LV95 coordinates of the station, None for the plain centroid
+        prior: Relative weight of the station compared to all the readings
+    """
+    w = speed_weights(speed)
+    sw = w.sum()
+    if station is None or prior <= 0:
+        return float((w * x).sum() / sw), float((w * y).sum() / sw)
+    lam = prior * sw
+    return float(((w * x).sum() + lam * station[0]) / (sw + lam)), \
+        float(((w * y).sum() + lam * station[1]) / (sw + lam))
+
+
+@dataclass
+class _Job:
+    method: LocationMethod
+    cells: List[CellReadings]
+    stations_x: np.ndarray
+    stations_y: np.ndarray
+    stations_name: np.ndarray
+    max_station_distance: float
+    prior: float
+
+
+def _estimate_chunk(job: _Job) -> List[CellEstimate]:
+    results = []
+    for cell_id, x, y, speed in job.cells:
+        cx, cy = speed_weighted_centroid(x, y, speed)
+        station_name = None
+
+        if job.method == LocationMethod.WLS and len(job.stations_x) > 0:
+            d2 = (job.stations_x - cx) ** 2 + (job.stations_y - cy) ** 2
+            i = int(np.argmin(d2))
+            if d2[i] <= job.max_station_distance ** 2:
+                station_name = str(job.stations_name[i])
+                cx, cy = weighted_least_squares(x, y, speed, (job.stations_x[i], job.stations_y[i]), job.prior)
+
+        results.append(CellEstimate(cell_id, cx, cy, len(x), station_name))
+    return results
+
+
+class CellLocator:
+    """Computes Cell_orm.geom for the cells of a network from all their readings.
+
+    Example:
+        locator = CellLocator(network_id=1, method=LocationMethod.WLS)
+        with get_db_session() as session:
+            locator.update(session, survey_ids=[202])  # cells touched by survey 202 only
+    """
+
+    def __init__(self, network_id: int, method: LocationMethod = LocationMethod.CENTROID,
+                 workers: Optional[int] = None, chunk_size: int = 500,
+                 max_station_distance: float = 3000.0, prior: float = 0.5) -> None:
+        """Initialize the locator.
+
+        Args:
+            network_id: Network identifier
+            method: Estimation method
+            workers: Number of worker processes, None for one per CPU, 0 to compute in-process
+            chunk_size: Number of cells per worker task
+            max_station_distance: Maximum distance in meters to the station pulling the estimate
+            prior: Relative weight of the station in the WLS method
+        """
+        self.network_id = network_id
+        self.method = method
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.max_station_distance = max_station_distance
+        self.prior = prior
+
+    def cells_touched_by_surveys(self, session: Session, survey_ids: Iterable[int]) -> List[int]:
+        """Return the cells having readings in the given surveys."""
+        stmt = select(Reading_orm.cell_id).distinct() \
+            .where(Reading_orm.network_id == self.network_id) \
+            .where(Reading_orm.survey_id.in_(list(survey_ids)))
+        return list(session.execute(stmt).scalars())
+
+    def load_readings(self, session: Session, cell_ids: Optional[List[int]] = None) -> List[CellReadings]:
+        """Load the readings of the cells (all cells of the network if cell_ids is None)."""
+        stmt = select(Reading_orm.cell_id, func.ST_X(Reading_orm.geom), func.ST_Y(Reading_orm.geom), Reading_orm.speed) \
+            .where(Reading_orm.network_id == self.network_id) \
+            .order_by(Reading_orm.cell_id)
+        if cell_ids is not None:
+            stmt = stmt.where(Reading_orm.cell_id.in_(cell_ids))
+
+        rows = session.execute(stmt).all()
+        if not rows:
+            return []
+
+        cell = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        lon = np.fromiter((r[1] for r in rows), dtype=float, count=len(rows))
+        lat = np.fromiter((r[2] for r in rows), dtype=float, count=len(rows))
+        speed = np.fromiter((r[3] if r[3] is not None else np.nan for r in rows), dtype=float, count=len(rows))
+        x, y = TO_LV95.transform(lon, lat)
+
+        # Découpe les tableaux triés par cellule
+        starts = np.flatnonzero(np.r_[True, cell[1:] != cell[:-1]])
+        ends = np.r_[starts[1:], len(cell)]
+        return [(int(cell[s]), x[s:e], y[s:e], speed[s:e]) for s, e in zip(starts, ends)]
+
+    def load_stations(self, session: Session) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Load the LV95 coordinates and names of the active stations of the network."""
+        stmt = select(Station.name, func.ST_X(Station.geom), func.ST_Y(Station.geom)) \
+            .where(Station.network_id == self.network_id) \
+            .where(Station.deleted.is_(None))
+        rows = session.execute(stmt).all()
+        names = np.array([r[0] for r in rows], dtype=object)
+        x, y = TO_LV95.transform(np.array([r[1] for r in rows], dtype=float), np.array([r[2] for r in rows], dtype=float))
+        return np.asarray(x), np.asarray(y), names
+
+    def estimate(self, cells: List[CellReadings], stations: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None) -> List[CellEstimate]:
+        """Estimate the location of the cells, in parallel over chunks of cells."""
+        if stations is None:
+            stations = (np.empty(0), np.empty(0), np.empty(0, dtype=object))
+        jobs = [_Job(self.method, cells[i:i + self.chunk_size], *stations, self.max_station_distance, self.prior)
+                for i in range(0, len(cells), self.chunk_size)]
+
+        if self.workers == 0 or len(jobs) <= 1:
+            chunks = map(_estimate_chunk, jobs)
+            return [e for chunk in chunks for e in chunk]
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            return [e for chunk in pool.map(_estimate_chunk, jobs) for e in chunk]
+
+    def save(self, session: Session, estimates: List[CellEstimate]) -> None:
+        """Write the estimates into Cell_orm.geom in one bulk update."""
+        if not estimates:
+            return
+        cell = Cell_orm.__table__
+        stmt = update(cell) \
+            .where(cell.c.network_id == bindparam('b_network_id')) \
+            .where(cell.c.cell_id == bindparam('b_cell_id'))
+        rows = [{'b_network_id': self.network_id, 'b_cell_id': e.cell_id,
+                 'geom': from_shape(Point(*e.to_wgs84()), srid=4326)} for e in estimates]
+        session.execute(stmt, rows)
+        session.commit()
+
+    def update(self, session: Session, survey_ids: Optional[Iterable[int]] = None) -> int:
+        """Recompute and store the location of the cells.
+
+        Args:
+            session: Database session
+            survey_ids: Only recompute the cells touched by these surveys, None for all cells
+
+        Returns:
+            Number of cells updated
+        """
+        cell_ids = None if survey_ids is None else self.cells_touched_by_surveys(session, survey_ids)
+        if cell_ids is not None and not cell_ids:
+            return 0
+
+        cells = self.load_readings(session, cell_ids)
+        stations = self.load_stations(session) if self.method == LocationMethod.WLS else None
+        estimates = self.estimate(cells, stations)
+        self.save(session, estimates)
+        print(f"Position estimée de {len(estimates)} cellules (réseau {self.network_id})")
+        return len(estimates)
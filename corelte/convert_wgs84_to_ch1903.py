@@ -34,6 +34,18 @@
 
 import math
 
+import numpy as np
+
+# Décalage entre les coordonnées LV95 (MN95) et LV03 (MN03)
+LV95_EAST_OFFSET = 2000000
+LV95_NORTH_OFFSET = 1000000
+
+# Codes EPSG du mode exact (pyproj)
+EPSG_WGS84 = 4326
+EPSG_LV03 = 21781
+EPSG_LV95 = 2056
+
+
 class GPSConverter(object):
     '''
     GPS Converter class which is able to perform convertions between the
@@ -179,6 +191,98 @@ class GPSConverter(object):
         d.append(self.WGStoCHh(latitude, longitude, ellHeight))
         return d
 
+    # --- Conversion de tableaux numpy ---
+    #
+    # Les fonctions *_array appliquent les mêmes formules approchées swisstopo
+    # (précision ~1 m) que les méthodes scalaires, sur des tableaux entiers. Avec
+    # exact=True, la transformation rigoureuse de pyproj est utilisée à la place.
+
+    _transformers = {}
+
+    @classmethod
+    def _transformer(cls, source: int, target: int):
+        key = (source, target)
+        if key not in cls._transformers:
+            from pyproj import Transformer
+            cls._transformers[key] = Transformer.from_crs(source, target, always_xy=True)
+        return cls._transformers[key]
+
+    @staticmethod
+    def _dec_to_seconds_array(dec: np.ndarray) -> np.ndarray:
+        # même aller-retour sexagésimal que DecToSexAngle puis SexAngleToSeconds
+        degree = np.floor(dec)
+        minute = np.floor((dec - degree) * 60)
+        second = (((dec - degree) * 60) - minute) * 60
+        dms = degree + (minute / 100) + (second / 10000)
+        degree = np.floor(dms)
+        minute = np.floor((dms - degree) * 100)
+        second = (((dms - degree) * 100) - minute) * 100
+        return second + (minute * 60) + (degree * 3600)
+
+    def LV03toWGS84_array(self, east, north, exact: bool = False) -> tuple[np.ndarray, np.ndarray]:
+        '''
+        Convert arrays of LV03 coordinates (y=east, x=north) to WGS84.
+        Return the arrays (latitude, longitude) in decimal degrees.
+        '''
+        east = np.asarray(east, dtype=float)
+        north = np.asarray(north, dtype=float)
+        if exact:
+            lng, lat = self._transformer(EPSG_LV03, EPSG_WGS84).transform(east, north)
+            return np.asarray(lat), np.asarray(lng)
+        y_aux = (east - 600000) / 1000000
+        x_aux = (north - 200000) / 1000000
+        y2 = y_aux ** 2
+        x2 = x_aux ** 2
+        lat = (16.9023892 + (3.238272 * x_aux)) - (0.270978 * y2) - (0.002528 * x2) \
+            - (0.0447 * y2 * x_aux) - (0.0140 * x2 * x_aux)
+        lng = (2.6779094 + (4.728982 * y_aux) + (0.791484 * y_aux * x_aux) + (0.1306 * y_aux * x2)) \
+            - (0.0436 * y2 * y_aux)
+        return (lat * 100) / 36, (lng * 100) / 36
+
+    def LV95toWGS84_array(self, east, north, exact: bool = False) -> tuple[np.ndarray, np.ndarray]:
+        '''
+        Convert arrays of LV95 coordinates (E, N) to WGS84.
+        Return the arrays (latitude, longitude) in decimal degrees.
+        '''
+        east = np.asarray(east, dtype=float)
+        north = np.asarray(north, dtype=float)
+        if exact:
+            lng, lat = self._transformer(EPSG_LV95, EPSG_WGS84).transform(east, north)
+            return np.asarray(lat), np.asarray(lng)
+        return self.LV03toWGS84_array(east - LV95_EAST_OFFSET, north - LV95_NORTH_OFFSET)
+
+    def WGS84toLV03_array(self, latitude, longitude, exact: bool = False) -> tuple[np.ndarray, np.ndarray]:
+        '''
+        Convert arrays of WGS84 coordinates (decimal degrees) to LV03.
+        Return the arrays (east, north), i.e. (y, x) in the CH1903 convention.
+        '''
+        latitude = np.asarray(latitude, dtype=float)
+        longitude = np.asarray(longitude, dtype=float)
+        if exact:
+            east, north = self._transformer(EPSG_WGS84, EPSG_LV03).transform(longitude, latitude)
+            return np.asarray(east), np.asarray(north)
+        lat_aux = (self._dec_to_seconds_array(latitude) - 169028.66) / 10000
+        lng_aux = (self._dec_to_seconds_array(longitude) - 26782.5) / 10000
+        lat2 = lat_aux ** 2
+        lng2 = lng_aux ** 2
+        north = ((200147.07 + (308807.95 * lat_aux) + (3745.25 * lng2) + (76.63 * lat2)) - (194.56 * lng2 * lat_aux)) \
+            + (119.79 * lat2 * lat_aux)
+        east = (600072.37 + (211455.93 * lng_aux)) - (10938.51 * lng_aux * lat_aux) - (0.36 * lng_aux * lat2) \
+            - (44.54 * lng2 * lng_aux)
+        return east, north
+
+    def WGS84toLV95_array(self, latitude, longitude, exact: bool = False) -> tuple[np.ndarray, np.ndarray]:
+        '''
+        Convert arrays of WGS84 coordinates (decimal degrees) to LV95.
+        Return the arrays (east, north).
+        '''
+        if exact:
+            east, north = self._transformer(EPSG_WGS84, EPSG_LV95).transform(
+                np.asarray(longitude, dtype=float), np.asarray(latitude, dtype=float))
+            return np.asarray(east), np.asarray(north)
+        east, north = self.WGS84toLV03_array(latitude, longitude)
+        return east + LV95_EAST_OFFSET, north + LV95_NORTH_OFFSET
+
 if __name__ == "__main__":
     ''' Example usage for the GPSConverter class.'''
 
@@ -0,0 +1,182 @@
+"""Incremental coverage aggregation of the readings on a LV95 square grid."""
+
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import case, delete, func, select
+from sqlalchemy.orm import Session
+
+from corelte.cell_location import TO_LV95
+from corelte.orm.backend import dialect_insert
+from corelte.orm.models import CoverageBin, Reading_orm
+
+# Tailles de maille en mètres
+DEFAULT_LEVELS = (50, 100, 250)
+
+# PCI inconnu (la colonne fait partie de la clé primaire)
+NO_PCI = -1
+
+KEY_COLUMNS = ['network_id', 'level', 'ix', 'iy', 'cell_id', 'band', 'pci']
+
+
+def bin_readings(x: np.ndarray, y: np.ndarray, cell_id: np.ndarray, band: np.ndarray, pci: np.ndarray,
+                 reading_time: np.ndarray, levels: Sequence[int]) -> List[Tuple[int, int, int, int, int, int, int, np.datetime64]]:
+    """Aggregate readings per grid bin, cell, band and PCI.
+
+    Readings without a position (NaN, e.g. a point outside the LV95
+    projection) are left out.
+
+    Args:
+        x, y: LV95 coordinates in meters
+        cell_id, band, pci: Cell attributes of the readings
+        reading_time: datetime64 timestamps
+        levels: Grid sizes in meters
+
+    Returns:
+        List of (level, ix, iy, cell_id, band, pci, count, last_seen)
+    """
+    rows = []
+    # floor(NaN) converti en int64 donnerait une maille arbitraire
+    finite = np.isfinite(x) & np.isfinite(y)
+    if not finite.all():
+        x, y, cell_id, band, pci, reading_time = (a[finite] for a in (x, y, cell_id, band, pci, reading_time))
+    for level in levels:
+        keys = np.column_stack((np.floor(x / level), np.floor(y / level), cell_id, band, pci)).astype(np.int64)
+        unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        counts = np.bincount(inverse, minlength=len(unique))
+        last_seen = np.full(len(unique), np.datetime64('1970-01-01'), dtype=reading_time.dtype)
+        np.maximum.at(last_seen, inverse, reading_time)
+        for k, n, t in zip(unique, counts, last_seen):
+            rows.append((level, int(k[0]), int(k[1]), int(k[2]), int(k[3]), int(k[4]), int(n), t))
+    return rows
+
+
+class CoverageAggregator:
+    """Maintains the coverage_bin table survey by survey.
+
+    Adding a survey increments the bins of its readings, removing it decrements
+    them (and deletes the bins left empty), so a full rebuild is never needed.
+    last_seen only grows: removing a survey does not move it back.
+
+    The aggregator is a SurveyHook: passed to the import, it keeps the table in
+    step with the readings inside the import transaction.
+
+    Example:
+        coverage = CoverageAggregator(network_id=1)
+        fusion.save_linesFusion_to_database(survey_date, hooks=[coverage])
+    """
+
+    def __init__(self, network_id: int, levels: Sequence[int] = DEFAULT_LEVELS, batch_size: int = 5000) -> None:
+        """Initialize the aggregator.
+
+        Args:
+            network_id: Network identifier
+            levels: Grid sizes in meters
+            batch_size: Number of bins per upsert statement
+        """
+        self.network_id = network_id
+        self.levels = tuple(levels)
+        self.batch_size = batch_size
+
+    def survey_bins(self, session: Session, survey_id: int) -> List[Tuple]:
+        """Compute the bins of the stored readings of a survey."""
+        stmt = select(func.ST_X(Reading_orm.geom), func.ST_Y(Reading_orm.geom),
+                      Reading_orm.cell_id, Reading_orm.band, Reading_orm.pci, Reading_orm.reading_time) \
+            .where(Reading_orm.network_id == self.network_id) \
+            .where(Reading_orm.survey_id == survey_id)
+        rows = session.execute(stmt).all()
+        if not rows:
+            return []
+
+        lon = np.array([r[0] for r in rows], dtype=float)
+        lat = np.array([r[1] for r in rows], dtype=float)
+        x, y = TO_LV95.transform(lon, lat)
+        cell_id = np.array([r[2] for r in rows], dtype=np.int64)
+        band = np.array([r[3] for r in rows], dtype=np.int64)
+        pci = np.array([r[4] if r[4] is not None else NO_PCI for r in rows], dtype=np.int64)
+        reading_time = np.array([r[5] for r in rows], dtype='datetime64[s]')
+        return bin_readings(np.asarray(x), np.asarray(y), cell_id, band, pci, reading_time, self.levels)
+
+    def _upsert(self, session: Session, bins: List[Tuple], sign: int) -> None:
+        for i in range(0, len(bins), self.batch_size):
+            values = [{'network_id': self.network_id, 'level': level, 'ix': ix, 'iy': iy,
+                       'cell_id': cell_id, 'band': band, 'pci': pci,
+                       'count': sign * count, 'last_seen': last_seen.astype('datetime64[us]').item()}
+                      for level, ix, iy, cell_id, band, pci, count, last_seen in bins[i:i + self.batch_size]]
+            stmt = dialect_insert(session, CoverageBin).values(values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=KEY_COLUMNS,
+                set_={
+                    'count': CoverageBin.count + stmt.excluded.count,
+                    'last_seen': case((stmt.excluded.last_seen > CoverageBin.last_seen, stmt.excluded.last_seen),
+                                      else_=CoverageBin.last_seen) if sign > 0 else CoverageBin.last_seen,
+                })
+            session.execute(stmt)
+
+    def apply_bins(self, session: Session, bins: List[Tuple], sign: int) -> None:
+        """Add (sign=+1) or subtract (sign=-1) the counts of bins, deleting the bins left empty."""
+        if not bins:
+            return
+        self._upsert(session, bins, sign)
+        if sign < 0:
+            session.execute(delete(CoverageBin)
+                            .where(CoverageBin.network_id == self.network_id)
+                            .where(CoverageBin.count <= 0))
+
+    def add_survey(self, session: Session, survey_id: int) -> int:
+        """Add the readings of a survey to the aggregate (caller commits).
+
+        Returns:
+            Number of bins touched
+        """
+        bins = self.survey_bins(session, survey_id)
+        self.apply_bins(session, bins, +1)
+        return len(bins)
+
+    def remove_survey(self, session: Session, survey_id: int) -> int:
+        """Remove the readings of a survey from the aggregate (caller commits).
+
+        Returns:
+            Number of bins touched
+        """
+        bins = self.survey_bins(session, survey_id)
+        self.apply_bins(session, bins, -1)
+        return len(bins)
+
+    # --- SurveyHook ---
+
+    def before_survey_write(self, session: Session, network_id: int, survey_id: int) -> None:
+        if network_id == self.network_id:
+            self.remove_survey(session, survey_id)
+
+    def after_survey_write(self, session: Session, network_id: int, survey_id: int) -> None:
+        if network_id == self.network_id:
+            self.add_survey(session, survey_id)
+
+    # --- Requêtes ---
+
+    def dominant_cells(self, session: Session, level: int, bbox: Tuple[float, float, float, float]) -> Dict[Tuple[int, int], Tuple[int, int]]:
+        """Dominant cell (largest count) of each bin in a LV95 bounding box.
+
+        Args:
+            session: Database session
+            level: Grid size in meters
+            bbox: (xmin, ymin, xmax, ymax) in LV95
+
+        Returns:
+            Dictionary (ix, iy) -> (cell_id, count)
+        """
+        xmin, ymin, xmax, ymax = bbox
+        rank = func.row_number().over(partition_by=(CoverageBin.ix, CoverageBin.iy),
+                                      order_by=func.sum(CoverageBin.count).desc()).label('rank')
+        per_cell = select(CoverageBin.ix, CoverageBin.iy, CoverageBin.cell_id,
+                          func.sum(CoverageBin.count).label('count'), rank) \
+            .where(CoverageBin.network_id == self.network_id) \
+            .where(CoverageBin.level == level) \
+            .where(CoverageBin.ix.between(int(xmin // level), int(xmax // level))) \
+            .where(CoverageBin.iy.between(int(ymin // level), int(ymax // level))) \
+            .group_by(CoverageBin.ix, CoverageBin.iy, CoverageBin.cell_id) \
+            .subquery()
+        stmt = select(per_cell.c.ix, per_cell.c.iy, per_cell.c.cell_id, per_cell.c.count).where(per_cell.c.rank == 1)
+        return {(ix, iy): (cell_id, count) for ix, iy, cell_id, count in session.execute(stmt)}
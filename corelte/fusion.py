@@ -1,26 +1,105 @@
+import copy
+from dataclasses import dataclass
 from geopy.distance import distance # type: ignore
-from geoalchemy2.shape import from_shape
+import itertools
+import numpy as np
 import os, os.path
+from typing import Iterable, Iterator, List, Optional
 import psycopg2 
-from shapely.geometry import Point
-from sqlalchemy import delete, insert, select
+from sqlalchemy import delete, insert
 from sqlalchemy.exc import SQLAlchemyError
+from corelte.cache import ReadingsCacheWriter, cache_tag, encode_readings, iter_decode_readings, load_npz, save_npz
 from corelte.cursor import Cursor
+from corelte.handover import CHANGE_BITS, change_indexes, handovers_of_readings
+from corelte.lake import Columns
 from corelte.orm.db import get_db_session
 from corelte.reading import Reading
-from corelte.orm.models import Cell_orm, Network, Reading_orm, Sector, Survey
-
+from corelte.reading_interval import ReadingInterval, TimeOf, clip_intervals, nb_frames
+from corelte.orm.models import Network, Reading_orm, Sector, Survey
+from corelte.orm.cells import cells_of, register_cells
+from corelte.orm.sync import SurveyHook, SyncReport, reading_values, sync_survey_readings, to_reading_row
+from corelte.orm.writer import BackgroundWriter
+
+
+
+@dataclass(frozen=True)
+class ClarifyParams:
+    """Parameters of clarify and of the speed compensation.
+
+    Attributes:
+        dist_min: Minimum distance between two kept points, in meters
+        dist_per_speed: Distance added per m/s of speed, in meters
+        turn_angle: Heading change in degrees that keeps a point whatever its distance
+        turn_min_speed: Speed in m/s above which turns are kept
+        reaction_time: Reaction time of the phone in seconds (speed compensation)
+    """
+    dist_min: float = 50
+    dist_per_speed: float = 10
+    turn_angle: float = 45
+    turn_min_speed: float = 3
+    reaction_time: float = 3
+
+
+DEFAULT_CLARIFY = ClarifyParams()
+
+# Attributs de Reading comparés pour les handovers (colonnes de corelte.handover.CHANGE_BITS)
+_HANDOVER_ATTRS = tuple('cellid' if name == 'cell_id' else name for name in CHANGE_BITS)
+
+
+class StreamingClarify:
+    """
+    clarify_with_minimum_distance2 sur un flux de mesures fusionnées arrivant dans l'ordre des frames (corelte.live).
+    Le dernier point d'une cellule est émis quand la cellule change, les autres dès qu'ils sont assez loin
+    du dernier point émis : un point attend au plus la mesure suivante.
+    """
+
+    def __init__(self, params: ClarifyParams = DEFAULT_CLARIFY):
+        self.params = params
+        self._kept: Optional[Reading] = None # dernier point émis
+        self._prev: Optional[Reading] = None # dernière mesure valide
+        self._prev_emitted = False
+
+    def push(self, r: Reading) -> List[Reading]:
+        """Ajoute une mesure, retourne les points à garder."""
+        if not r.is_valid():
+            return []
+        out = []
+        if self._prev is None or r.cellid != self._prev.cellid:
+            # changement de cellule : les deux côtés du handover
+            if self._prev is not None and not self._prev_emitted:
+                out.append(self._prev)
+            out.append(r)
+        elif Fusion.is_far_enough(self._kept, r, self.params):
+            out.append(r)
+        if out:
+            # copie : les points émis sont compensés (position déplacée) avant la mesure suivante
+            self._kept = copy.copy(r)
+        self._prev, self._prev_emitted = r, bool(out)
+        return out
+
+    def flush(self) -> List[Reading]:
+        """Fin du flux : le dernier point de la dernière cellule."""
+        out = [self._prev] if self._prev is not None and not self._prev_emitted else []
+        self._prev = self._kept = None
+        return out
 
 
 class Fusion:
 
-    def __init__(self, argument):
+    def __init__(self, argument, params: ClarifyParams = DEFAULT_CLARIFY):
 
         self.argument = argument
+        self.params = params
 
         # Initialise la liste de points de mesure fusionnée
         self.linesFusion : list[Reading] = []
 
+        # Fusion par intervalles (fusion_intervals) : frames MP4 regroupées et trace GPS, développées à la demande
+        self.intervalsFusion: List[ReadingInterval] = []
+        self.linesGps: list[Reading] = []
+        self.gps_offset = 0 # index GPS = file_idx + gps_offset
+        self.time_of: Optional[TimeOf] = None
+
 
     def fusion_data(self, cursorGps: Cursor, linesGps: list[Reading], cursorMp4: Cursor, linesMp4: list[Reading]):
         
@@ -71,33 +150,152 @@ class Fusion:
         print(f"Nb de lignes fusionnées={len(self.linesFusion)}")
 
 
-    def clarify_with_minimum_distance2(self):
+    def fusion_intervals(self, cursorGps: Cursor, linesGps: list[Reading], cursorMp4: Cursor,
+                         intervalsMp4: List[ReadingInterval], time_of: TimeOf):
         """
-        Supprime les points qui se trouvent trop près les uns des autres. 
-        En fonction de la distance et des virages ou demi-tours éventuels
+        Même alignement que fusion_data, mais sur les intervalles du screencast (Screencast.intervalsMp4) :
+        seule la correspondance frame -> point GPS est calculée, les mesures fusionnées ne sont
+        créées que par clarify_intervals() ou iter_linesFusion().
+        time_of donne l'heure d'une frame (Screencast.time_of_frame).
         """
-        
-        def is_far_enough(r1: Reading, r2: Reading) -> bool:
-            """
-            Retourne vrai si les deux points sont suffisament distant en fonction de la vitesse et de l'angle de déplacement.
-            """
+        self.intervalsFusion = []
+        self.linesGps = linesGps
+        self.time_of = time_of
+        if not intervalsMp4:
+            return
+
+        last_frame = intervalsMp4[-1].end_idx
+
+        # Première frame MP4 à fusionner (file_idx = index + 1)
+        first_frame = cursorMp4.first_non_null_idx + 1
+
+        # Traite le cas rare ou le gps démarre après le screencast. 
+        if cursorGps.first_non_null_reading_time > cursorMp4.first_non_null_reading_time:
+            while (first_frame <= last_frame) and (time_of(first_frame) < cursorGps.first_non_null_reading_time):
+                first_frame += 1
 
-            # Vérifie la validité de la valeur speed: elle est none dans de rare cas (as in Survey 0295)    
-            if not (r1.speed):
-                return False
+        # Le Gps démarre avant le screencast dans le mode d'utilisation habituel.
+        first_index_gps = 0
+        while (first_index_gps < len(linesGps)-1) & (linesGps[first_index_gps].reading_time < cursorMp4.first_non_null_reading_time):
+            first_index_gps += 1
 
-            dist = distance((r1.latitude, r1.longitude), (r2.latitude, r2.longitude)).m
+        # Une frame par point GPS, tant que le GPS enregistre
+        nb = min(last_frame - first_frame + 1, len(linesGps) - first_index_gps)
+        self.gps_offset = first_index_gps - first_frame
+        if nb > 0:
+            self.intervalsFusion = clip_intervals(intervalsMp4, first_frame, first_frame + nb - 1)
 
-            # formule empirique pour disperser les points à grande vitesse
-            dist_min = 50 + r1.speed * 10
+        print(f"Nb de lignes fusionnées={nb_frames(self.intervalsFusion)} en {len(self.intervalsFusion)} intervalles")
 
-            # calcul de l'angle quand la trajectoire tourne
-            beta = abs(r1.fwd_azimuth - r2.fwd_azimuth)
-            alpha = min(beta, 360 - beta)
+    def iter_fusion(self, cursorGps: Cursor, gps: Iterable[Reading], cursorMp4: Cursor,
+                    intervals: Iterable[ReadingInterval], time_of: TimeOf) -> Iterator[Reading]:
+        """
+        Version flux de fusion_intervals + iter_linesFusion : même alignement, mais la trace GPS
+        (Track.iter_lines_gps) et les intervalles (Screencast.iter_synced_intervalsMp4) sont lus au fur
+        et à mesure. Les curseurs sont lus après le premier élément de chaque flux, qui les initialise.
+        """
+        gps = iter(gps)
+        intervals = iter(intervals)
+        g = next(gps, None)
+        first_interval = next(intervals, None)
+        if g is None or first_interval is None:
+            return
 
-            # en vitesse de marche (<3 m/s), on filtre les points gps qui font des zig-zags.
-            result = dist > dist_min or (alpha > 45 and r1.speed > 3)
-            return result
+        # Première frame MP4 à fusionner (file_idx = index + 1)
+        first_frame = cursorMp4.first_non_null_idx + 1
+
+        # Traite le cas rare ou le gps démarre après le screencast : on saute les frames plus anciennes.
+        gps_start = cursorGps.first_non_null_reading_time \
+            if cursorGps.first_non_null_reading_time > cursorMp4.first_non_null_reading_time else None
+
+        # Le Gps démarre avant le screencast dans le mode d'utilisation habituel (on garde au moins le dernier point).
+        while g.reading_time < cursorMp4.first_non_null_reading_time:
+            next_g = next(gps, None)
+            if next_g is None:
+                break
+            g = next_g
+
+        # Une frame par point GPS, tant que le GPS enregistre
+        for interval in itertools.chain([first_interval], intervals):
+            for file_idx in range(max(interval.start_idx, first_frame), interval.end_idx + 1):
+                reading_time = time_of(file_idx)
+                if gps_start is not None:
+                    if reading_time < gps_start:
+                        continue
+                    gps_start = None
+                if g is None:
+                    return # cas où l'enregistrement du GPS se serait arrêté avant le screencast.
+                yield self.fuse_frame(self.argument.survey_id, interval, file_idx, reading_time, g)
+                g = next(gps, None)
+
+    def gps_of(self, file_idx: int) -> Reading:
+        return self.linesGps[file_idx + self.gps_offset]
+
+    def fused_reading(self, interval: ReadingInterval, file_idx: int) -> Reading:
+        """
+        Mesure fusionnée d'une frame d'un intervalle, comme dans fusion_data.
+        """
+        return self.fuse_frame(self.argument.survey_id, interval, file_idx, self.time_of(file_idx), self.gps_of(file_idx))
+
+    @staticmethod
+    def fuse_frame(survey_id: int, interval: ReadingInterval, file_idx: int, reading_time, g: Reading) -> Reading:
+        """
+        Mesure fusionnée : valeurs LTE de la frame et position GPS de la même seconde.
+        """
+        r = interval.copy_to(Reading(survey_id))
+        r.reading_time = reading_time
+        r.file_idx = file_idx
+
+        r.bwd_azimuth = g.bwd_azimuth
+        r.calculated = g.calculated
+        r.fwd_azimuth = g.fwd_azimuth
+        r.fwd_distance = g.fwd_distance
+        r.latitude = g.latitude
+        r.longitude = g.longitude
+        r.speed = g.speed 
+        return r
+
+    def iter_linesFusion(self) -> Iterator[Reading]:
+        """
+        Développe la fusion par intervalles en une mesure par seconde.
+        """
+        for interval in self.intervalsFusion:
+            for file_idx in range(interval.start_idx, interval.end_idx + 1):
+                yield self.fused_reading(interval, file_idx)
+
+    def expand_linesFusion(self):
+        self.linesFusion = list(self.iter_linesFusion())
+
+    @staticmethod
+    def is_far_enough(r1: Reading, r2: Reading, params: ClarifyParams = DEFAULT_CLARIFY) -> bool:
+        """
+        Retourne vrai si les deux points sont suffisament distant en fonction de la vitesse et de l'angle de déplacement.
+        """
+
+        # Vérifie la validité de la valeur speed: elle est none dans de rare cas (as in Survey 0295)    
+        if not (r1.speed):
+            return False
+
+        dist = distance((r1.latitude, r1.longitude), (r2.latitude, r2.longitude)).m
+
+        # formule empirique pour disperser les points à grande vitesse
+        dist_min = params.dist_min + r1.speed * params.dist_per_speed
+
+        # calcul de l'angle quand la trajectoire tourne
+        beta = abs(r1.fwd_azimuth - r2.fwd_azimuth)
+        alpha = min(beta, 360 - beta)
+
+        # en vitesse de marche (<3 m/s), on filtre les points gps qui font des zig-zags.
+        result = dist > dist_min or (alpha > params.turn_angle and r1.speed > params.turn_min_speed)
+        return result
+
+    def clarify_with_minimum_distance2(self):
+        """
+        Supprime les points qui se trouvent trop près les uns des autres. 
+        En fonction de la distance et des virages ou demi-tours éventuels
+        """
+        def is_far_enough(r1: Reading, r2: Reading) -> bool:
+            return self.is_far_enough(r1, r2, self.params)
 
         # 0. Si la liste est déjà vide on sort de suite.
         if len(self.linesFusion) < 2:
@@ -105,13 +303,16 @@ class Fusion:
 
         # 1. On ne garde que les mesures valides
         rows = [r for r in self.linesFusion if r.is_valid()]
+        if not rows:
+            self.linesFusion = []
+            return
 
-        # 2. On ne garde que les points qui marquent un changement de cellid
-        keep = [0] # premier row
-        for i, reading in enumerate(rows[1:]):
-            if reading.cellid != rows[keep[-1]].cellid:
-                keep.append(i)
-        keep.append(len(rows) -1) # dernier row
+        # 2. On ne garde que les points de part et d'autre d'un changement de cellid (handover), le premier et le dernier row.
+        # L'ancienne boucle ajoutait l'index dans rows[1:] (i au lieu de i+1) : elle gardait le point avant le changement,
+        # celui d'après au tour suivant, et doublait les rows des cellules d'un seul point.
+        cell_id = np.array([r.cellid for r in rows], dtype=np.int64)
+        changes = change_indexes({'cell_id': cell_id}, ('cell_id',))
+        keep = np.unique(np.concatenate(([0, len(rows) - 1], changes - 1, changes))).tolist()
 
         # 3. Entre deux point 'keep', on ajoute un point tous les 50m ou plus selon la vitesse de déplacement.
         newrows = []
@@ -130,25 +331,208 @@ class Fusion:
         # 4. On assigne la nouvelle liste fusion
         self.linesFusion = newrows
 
+    def clarify_intervals(self):
+        """
+        clarify_with_minimum_distance2 sur la fusion par intervalles : seules les mesures gardées sont créées.
+        Une suite d'intervalles valides de même cellid garde sa première et sa dernière frame
+        (les deux côtés de chaque handover de cellid), et entre les deux un point tous les 50m
+        ou plus selon la vitesse. La distance est calculée directement sur les points GPS.
+        """
+        # 0. Trop peu de frames: rien à éclaircir
+        if nb_frames(self.intervalsFusion) < 2:
+            self.expand_linesFusion()
+            return
+
+        # 1. On ne garde que les intervalles valides, regroupés par cellid successifs
+        groups: List[List[ReadingInterval]] = []
+        for interval in self.intervalsFusion:
+            if not interval.is_valid():
+                continue
+            if groups and groups[-1][-1].cellid == interval.cellid:
+                groups[-1].append(interval)
+            else:
+                groups.append([interval])
+
+        # 2. Premier et dernier point de chaque groupe, et entre les deux les points assez distants
+        newrows = []
+        for group in groups:
+            first, last = group[0].start_idx, group[-1].end_idx
+            newrows.append(self.fused_reading(group[0], first))
+            gk = self.gps_of(first)
+            for interval in group:
+                for file_idx in range(max(interval.start_idx, first + 1), min(interval.end_idx, last - 1) + 1):
+                    gt = self.gps_of(file_idx)
+                    if self.is_far_enough(gk, gt, self.params):
+                        newrows.append(self.fused_reading(interval, file_idx))
+                        gk = gt
+            if last != first:
+                newrows.append(self.fused_reading(group[-1], last))
+
+        # 3. On assigne la nouvelle liste fusion
+        self.linesFusion = newrows
+
+
+    def iter_clarified(self, lines: Iterable[Reading]) -> Iterator[Reading]:
+        """
+        clarify_with_minimum_distance2 sur un flux de mesures fusionnées (StreamingClarify) :
+        une mesure attend au plus la suivante.
+        """
+        clarify = StreamingClarify(self.params)
+        for r in lines:
+            yield from clarify.push(r)
+        yield from clarify.flush()
+
+    def extract_handovers(self) -> Columns:
+        """
+        Evénements de handover de la fusion (corelte.handover.find_handovers), à extraire avant clarify.
+        Sur la fusion par intervalles, seules les frames aux bords des intervalles sont comparées.
+        """
+        if not self.intervalsFusion:
+            return handovers_of_readings(self.linesFusion)
+
+        lines = []
+        for interval in self.intervalsFusion:
+            lines.append(self.fused_reading(interval, interval.start_idx))
+            if interval.end_idx != interval.start_idx:
+                lines.append(self.fused_reading(interval, interval.end_idx))
+        return handovers_of_readings(lines)
+
+    @staticmethod
+    def iter_handover_edges(lines: Iterable[Reading], edges: List[Reading]) -> Iterator[Reading]:
+        """
+        Laisse passer le flux de mesures fusionnées en copiant dans edges les mesures valides
+        de part et d'autre de chaque handover. handovers_of_readings(edges) donne les mêmes événements
+        que extract_handovers(), sans garder toute la fusion.
+        """
+        prev = None
+        for r in lines:
+            if r.is_valid():
+                if prev is not None and any(getattr(r, attr) != getattr(prev, attr) for attr in _HANDOVER_ATTRS):
+                    if not edges or edges[-1].file_idx != prev.file_idx:
+                        edges.append(prev)
+                    edges.append(copy.copy(r))
+                    prev = edges[-1]
+                else:
+                    prev = copy.copy(r)
+            yield r
+
+    def cache_params(self, track, screencast) -> dict:
+        """
+        Paramètres de la fusion : ceux de la trace GPS et du screencast fusionnés (voir corelte.cache).
+        """
+        return {'step': 'fusion', 'survey_id': self.argument.survey_id,
+                'track': cache_tag(track.cache_params()), 'mp4': cache_tag(screencast.cache_params())}
+
+    def save_cache(self, track, screencast):
+        """
+        Sauve les mesures fusionnées, avant clarify, dans tmp_fusion_cache_filename.
+        """
+        lines = self.linesFusion if self.linesFusion or not self.intervalsFusion else self.iter_linesFusion()
+        save_npz(self.argument.tmp_fusion_cache_filename, encode_readings(lines), self.cache_params(track, screencast))
+
+    def cache_writer(self, track, screencast) -> ReadingsCacheWriter:
+        """
+        Cache de la fusion en flux (iter_fusion), écrit par save() une fois le flux lu.
+        """
+        return ReadingsCacheWriter(self.argument.tmp_fusion_cache_filename, self.cache_params(track, screencast))
+
+    def open_cache(self, track, screencast) -> Optional[Iterator[Reading]]:
+        """
+        Flux des mesures fusionnées en cache, None si la trace GPS ou le screencast ont changé.
+        """
+        if not self.argument.use_cache:
+            return None
+        cached = load_npz(self.argument.tmp_fusion_cache_filename, self.cache_params(track, screencast))
+        if cached is None:
+            return None
+        columns, _ = cached
+        print(f"Fusion chargée depuis le cache: {len(columns['cell_id'])} lignes")
+        return iter_decode_readings(columns, self.argument.survey_id)
+
+    def load_cache(self, track, screencast) -> bool:
+        """
+        Recharge les mesures fusionnées si la trace GPS et le screencast sont ceux de la fusion en cache.
+        """
+        lines = self.open_cache(track, screencast)
+        if lines is None:
+            return False
+        self.linesFusion = list(lines)
+        return True
 
     def apply_exclusions(self):
         if len(self.argument.exclusions) == 0:
             return
         print(f"Nb de lignes avant l'exclusion={len(self.linesFusion)}")
-        oldlines = self.linesFusion.copy()
-        newlines = oldlines
-        for intervalle in self.argument.exclusions:
-            lo, hi = intervalle
-            newlines = [r for r in oldlines if (r.file_idx < lo) or (r.file_idx > hi)]    
-            oldlines = newlines.copy()
-        self.linesFusion = newlines.copy()
+        self.linesFusion = list(self.iter_exclusions(self.linesFusion))
         print(f"Nb de lignes après les exclusions={len(self.linesFusion)}")
 
+    def iter_exclusions(self, lines: Iterable[Reading]) -> Iterator[Reading]:
+        """
+        Ote du flux les mesures dont le file_idx tombe dans un des intervalles d'exclusion.
+        """
+        for r in lines:
+            if not any(lo <= r.file_idx <= hi for lo, hi in self.argument.exclusions):
+                yield r
+
     def apply_speed_compensation_to_linesFusion(self):
-        for key, r in enumerate(self.linesFusion):
-            r.apply_time_compensation()
+        for _ in self.iter_speed_compensation(self.linesFusion):
+            pass
+
+    def iter_speed_compensation(self, lines: Iterable[Reading]) -> Iterator[Reading]:
+        for r in lines:
+            r.apply_time_compensation(self.params.reaction_time)
+            yield r
+
+    def _new_survey(self, survey_date) -> Survey:
+        return Survey(survey_id=self.argument.survey_id, 
+                      network_id=self.argument.network_id, 
+                      survey_date=survey_date, 
+                      comment=self.argument.survey_comment, 
+                      device=self.argument.device, 
+                      model=self.argument.model,
+                      os_version=self.argument.os_version
+                      )
+
+    def sync_linesFusion_to_database(self, survey_date, hooks: Iterable[SurveyHook] = ()) -> SyncReport:
+        """
+        Import incrémental : compare les mesures fusionnées avec celles déjà stockées,
+        clé (network_id, survey_id, file_idx), et n'applique que les insertions, mises à jour et suppressions.
+        Si rien n'a changé, aucune écriture n'est faite.
+        """
+        with get_db_session() as session:
+            try:
+                report = sync_survey_readings(session, self._new_survey(survey_date), self.linesFusion, hooks)
+                if report.has_changes:
+                    print(f"Survey {self.argument.survey_id} synchronisé: {report}")
+                else:
+                    print(f"Survey {self.argument.survey_id} inchangé, base de données non modifiée")
+                return report
 
-    def save_linesFusion_to_database(self, survey_date):
+            except SQLAlchemyError as e:
+                session.rollback()
+                print(e)
+                return SyncReport()
+
+    def save_linesFusion_in_background(self, writer: BackgroundWriter, survey_date, batch_size: int = 2000):
+        """
+        Envoie les mesures fusionnées par lots au writer en arrière-plan et rend la main tout de suite.
+        Le pipeline peut continuer avec le survey suivant; writer.flush(network_id, survey_id) attend le commit.
+        """
+        net_id = self.argument.network_id
+        survey_id = self.argument.survey_id
+
+        writer.begin_survey(self._new_survey(survey_date))
+        for i in range(0, len(self.linesFusion), batch_size):
+            writer.put(net_id, survey_id, self.linesFusion[i:i + batch_size])
+
+    def save_linesFusion_to_database(self, survey_date, incremental: bool = False, hooks: Iterable[SurveyHook] = ()):
+        """
+        Sauve les mesures fusionnées. Les hooks (ex. CoverageAggregator) mettent à jour
+        les données dérivées dans la même transaction : before_survey_write avant l'effacement
+        de l'ancienne version, after_survey_write après l'écriture des mesures.
+        """
+        if incremental or self.argument.save_to_db_incremental:
+            return self.sync_linesFusion_to_database(survey_date, hooks)
 
         with get_db_session() as session:
 
@@ -157,6 +541,10 @@ class Fusion:
                 net_id = self.argument.network_id
                 survey_id = self.argument.survey_id
 
+                # Les données dérivées (coverage_bin, handover...) retirent d'abord l'ancienne version du survey
+                for hook in hooks:
+                    hook.before_survey_write(session, net_id, survey_id)
+
                 # Efface la version précédente de ce survey et tous les éléments de Reading en cascade
                 stmt = delete(Survey) \
                     .where(Survey.network_id == net_id) \
@@ -167,37 +555,21 @@ class Fusion:
                 #    session.commit()
 
                 # Ajoute le Survey
-                survey = Survey(survey_id=survey_id, 
-                                network_id=net_id, 
-                                survey_date=survey_date, 
-                                comment=self.argument.survey_comment, 
-                                device=self.argument.device, 
-                                model=self.argument.model,
-                                os_version=self.argument.os_version
-                                )
+                survey = self._new_survey(survey_date)
                 session.add(survey) 
                 
-                for r in self.linesFusion:
-
-                    # Check if the cell exists, if not, add it
-                    stmt = select(Cell_orm).where(Cell_orm.network_id == net_id).where(Cell_orm.cell_id == r.cellid)
-                    cell = session.execute(stmt).scalars().first()
-                    if cell is None:
-                        cell = Cell_orm(network_id=net_id, cell_id=r.cellid, tac=r.tac, geom=None)
-                        session.add(cell)
-                        session.flush()  # Sans le flush, le prochain passage esseyerait de l'ajouter à nouveau
-                            
-                    geom = from_shape(Point(r.longitude, r.latitude), srid=4326) 
-
-                    reading = Reading_orm(
-                        network_id=net_id, cell_id=r.cellid, survey_id=r.survey_id, 
-                        pci=r.pci, band=r.band, tac=r.tac, file_idx=r.file_idx, 
-                        fwd_azimuth=r.fwd_azimuth, speed=r.speed, reading_time=r.reading_time,
-                        survey=survey,
-                        cell=cell,
-                        geom=geom
-                    )
-                    session.add(reading)
+                session.flush()
+
+                rows = [to_reading_row(net_id, survey_id, {'file_idx': r.file_idx, **reading_values(r)}) for r in self.linesFusion]
+
+                # Enregistre les cellules manquantes (idempotent, sans conflit entre imports parallèles)
+                register_cells(session, net_id, cells_of(rows))
+
+                if rows:
+                    session.execute(insert(Reading_orm), rows)
+
+                for hook in hooks:
+                    hook.after_survey_write(session, net_id, survey_id)
                 
                 session.commit()
             
@@ -0,0 +1,213 @@
+"""Handover events: changes of cell, PCI, band or TAC between successive readings.
+
+The events are found in one vectorised pass over the fused readings of a
+survey and stored in the handover table, with the position (midpoint of the
+two readings), time and speed of each change, so clarify, exports and map
+layers reuse them without rescanning the readings.
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from geoalchemy2.shape import from_shape
+from shapely.geometry import Point
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from corelte.lake import MISSING_INT, Columns, readings_to_columns
+from corelte.orm.models import Handover, Reading_orm
+
+# Bits de Handover.changed
+HANDOVER_CELL = 1 << 0
+HANDOVER_PCI = 1 << 1
+HANDOVER_BAND = 1 << 2
+HANDOVER_TAC = 1 << 3
+
+# Colonne comparée -> bit
+CHANGE_BITS = {'cell_id': HANDOVER_CELL, 'pci': HANDOVER_PCI, 'band': HANDOVER_BAND, 'tac': HANDOVER_TAC}
+
+# Même règle que Reading.is_valid
+MIN_VALID_CELL_ID = 99999
+
+
+def valid_mask(columns: Columns) -> np.ndarray:
+    return columns['cell_id'] >= MIN_VALID_CELL_ID
+
+
+def change_indexes(columns: Columns, fields=tuple(CHANGE_BITS)) -> np.ndarray:
+    """Indexes i > 0 where one of the fields differs from row i - 1.
+
+    Args:
+        columns: Readings ordered by file_idx (see corelte.lake.readings_to_columns)
+        fields: Columns compared
+    """
+    n = len(columns['cell_id'])
+    if n < 2:
+        return np.empty(0, dtype=np.int64)
+    changed = np.zeros(n - 1, dtype=bool)
+    for name in fields:
+        changed |= columns[name][1:] != columns[name][:-1]
+    return np.flatnonzero(changed) + 1
+
+
+def find_handovers(columns: Columns) -> Columns:
+    """Handover events of a survey, in one pass over its readings.
+
+    Only the valid readings are compared, so a burst of unreadable frames
+    between two readings of the same cell is not a handover.
+
+    Args:
+        columns: Readings ordered by file_idx
+
+    Returns:
+        Columns of the events: file_idx, prev_file_idx, reading_time, changed,
+        from_/to_ cell_id, pci, band, tac, speed, latitude, longitude
+    """
+    valid = {name: a[valid_mask(columns)] for name, a in columns.items()}
+    idx = change_indexes(valid)
+    prev = idx - 1
+
+    changed = np.zeros(len(idx), dtype=np.int16)
+    for name, bit in CHANGE_BITS.items():
+        changed |= np.where(valid[name][idx] != valid[name][prev], bit, 0).astype(np.int16)
+
+    events = {
+        'file_idx': valid['file_idx'][idx],
+        'prev_file_idx': valid['file_idx'][prev],
+        'reading_time': valid['reading_time'][idx],
+        'changed': changed,
+        'speed': valid['speed'][idx],
+        # milieu des deux mesures : le changement a eu lieu entre les deux
+        'latitude': (valid['latitude'][idx] + valid['latitude'][prev]) / 2,
+        'longitude': (valid['longitude'][idx] + valid['longitude'][prev]) / 2,
+    }
+    for name in CHANGE_BITS:
+        events[f'from_{name}'] = valid[name][prev]
+        events[f'to_{name}'] = valid[name][idx]
+    return events
+
+
+def handovers_of_readings(lines: Iterable) -> Columns:
+    """find_handovers() on fused Reading objects."""
+    return find_handovers(readings_to_columns(lines))
+
+
+def _int_or_none(value) -> Optional[int]:
+    value = int(value)
+    return None if value == MISSING_INT else value
+
+
+def handover_rows(network_id: int, survey_id: int, events: Columns) -> List[dict]:
+    """Convert event columns into Handover column values."""
+    rows = []
+    for i in range(len(events['file_idx'])):
+        row = {'network_id': network_id, 'survey_id': survey_id,
+               'file_idx': int(events['file_idx'][i]), 'prev_file_idx': int(events['prev_file_idx'][i]),
+               'reading_time': events['reading_time'][i].astype('datetime64[us]').item(),
+               'changed': int(events['changed'][i]),
+               'speed': None if np.isnan(events['speed'][i]) else float(events['speed'][i]),
+               'geom': from_shape(Point(float(events['longitude'][i]), float(events['latitude'][i])), srid=4326)}
+        for name in CHANGE_BITS:
+            row[f'from_{name}'] = _int_or_none(events[f'from_{name}'][i])
+            row[f'to_{name}'] = _int_or_none(events[f'to_{name}'][i])
+        rows.append(row)
+    return rows
+
+
+def stored_readings_columns(session: Session, network_id: int, survey_id: int) -> Columns:
+    """Columns of the stored readings of a survey, ordered by file_idx."""
+    stmt = select(Reading_orm.file_idx, Reading_orm.cell_id, Reading_orm.pci, Reading_orm.band, Reading_orm.tac,
+                  Reading_orm.reading_time, Reading_orm.speed,
+                  func.ST_Y(Reading_orm.geom), func.ST_X(Reading_orm.geom)) \
+        .where(Reading_orm.network_id == network_id) \
+        .where(Reading_orm.survey_id == survey_id) \
+        .order_by(Reading_orm.file_idx)
+    rows = session.execute(stmt).all()
+    names = ('file_idx', 'cell_id', 'pci', 'band', 'tac', 'reading_time', 'speed', 'latitude', 'longitude')
+    dtypes = (np.int32, np.int64, np.int32, np.int32, np.int32, 'datetime64[ms]', np.float32, np.float64, np.float64)
+    columns = {}
+    for k, (name, dtype) in enumerate(zip(names, dtypes)):
+        values = [r[k] for r in rows]
+        if np.dtype(dtype).kind == 'i':
+            values = [MISSING_INT if v is None else v for v in values]
+        elif np.dtype(dtype).kind == 'f':
+            values = [np.nan if v is None else v for v in values]
+        columns[name] = np.array(values, dtype=dtype)
+    return columns
+
+
+class HandoverIndexer:
+    """Maintains the handover table survey by survey.
+
+    The events are given by the pipeline (put(), computed on the fused readings
+    before clarify) or, failing that, found again in the stored readings.
+    The indexer is a SurveyHook: passed to the import, it replaces the events
+    of the survey inside the import transaction.
+
+    Example:
+        handovers = HandoverIndexer(network_id=1)
+        handovers.put(survey_id, fusion.extract_handovers())
+        fusion.clarify_intervals()
+        fusion.save_linesFusion_to_database(survey_date, hooks=[handovers])
+    """
+
+    def __init__(self, network_id: int) -> None:
+        self.network_id = network_id
+        self._pending: Dict[int, Columns] = {}
+
+    def put(self, survey_id: int, events: Columns) -> None:
+        """Events of a survey to write at its next import."""
+        self._pending[survey_id] = events
+
+    def remove_survey(self, session: Session, survey_id: int) -> int:
+        """Delete the events of a survey (caller commits)."""
+        return session.execute(delete(Handover)
+                               .where(Handover.network_id == self.network_id)
+                               .where(Handover.survey_id == survey_id)).rowcount
+
+    def add_survey(self, session: Session, survey_id: int) -> int:
+        """Write the events of a survey (caller commits).
+
+        Returns:
+            Number of events written
+        """
+        events = self._pending.pop(survey_id, None)
+        if events is None:
+            events = find_handovers(stored_readings_columns(session, self.network_id, survey_id))
+        rows = handover_rows(self.network_id, survey_id, events)
+        if rows:
+            session.execute(insert(Handover), rows)
+        return len(rows)
+
+    def rebuild_survey(self, session: Session, survey_id: int) -> int:
+        """Recompute the events of an already stored survey (caller commits)."""
+        self.remove_survey(session, survey_id)
+        return self.add_survey(session, survey_id)
+
+    # --- SurveyHook ---
+
+    def before_survey_write(self, session: Session, network_id: int, survey_id: int) -> None:
+        if network_id == self.network_id:
+            self.remove_survey(session, survey_id)
+
+    def after_survey_write(self, session: Session, network_id: int, survey_id: int) -> None:
+        if network_id == self.network_id:
+            self.add_survey(session, survey_id)
+
+
+def survey_handovers(session: Session, network_id: int, survey_id: int) -> List[Handover]:
+    """Handover events of a survey, in file order."""
+    stmt = select(Handover) \
+        .where(Handover.network_id == network_id) \
+        .where(Handover.survey_id == survey_id) \
+        .order_by(Handover.file_idx)
+    return list(session.execute(stmt).scalars())
+
+
+def cell_handovers(session: Session, network_id: int, cell_id: int) -> List[Handover]:
+    """Handover events into or out of a cell, all surveys."""
+    stmt = select(Handover) \
+        .where(Handover.network_id == network_id) \
+        .where((Handover.from_cell_id == cell_id) | (Handover.to_cell_id == cell_id)) \
+        .order_by(Handover.survey_id, Handover.file_idx)
+    return list(session.execute(stmt).scalars())
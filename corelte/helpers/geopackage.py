@@ -0,0 +1,200 @@
+"""Streaming GeoPackage export of readings with an R-tree spatial index."""
+
+from datetime import datetime, timezone
+from pathlib import Path
+import sqlite3
+import struct
+from typing import Iterable, Optional, Tuple
+
+# Identifiants GeoPackage 1.3 (en-tête du fichier SQLite)
+GPKG_APPLICATION_ID = 0x47504B47 # 'GPKG'
+GPKG_USER_VERSION = 10300
+SRS_ID = 4326
+
+WGS84_WKT = ('GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS 84",6378137,298.257223563,'
+             'AUTHORITY["EPSG","7030"]],AUTHORITY["EPSG","6326"]],PRIMEM["Greenwich",0,'
+             'AUTHORITY["EPSG","8901"]],UNIT["degree",0.0174532925199433,AUTHORITY["EPSG","9122"]],'
+             'AUTHORITY["EPSG","4326"]]')
+
+# Colonnes attributaires (mêmes noms que Reading.fields())
+COLUMNS = [
+    ('survey_id', 'INTEGER'), ('carrier', 'TEXT'),
+    ('cell_id', 'INTEGER'), ('pci', 'INTEGER'), ('tac', 'INTEGER'), ('band', 'INTEGER'),
+    ('reading_timestamp', 'DATETIME'),
+    ('fwd_azimuth', 'REAL'), ('bwd_azimuth', 'REAL'), ('speed', 'REAL'),
+    ('file_idx', 'INTEGER'), ('calculated', 'BOOLEAN'),
+    ('latitude', 'REAL'), ('longitude', 'REAL'),
+]
+
+# En-tête binaire GeoPackage : 'GP', version 0, drapeaux (little-endian, sans enveloppe), srs_id
+_GP_HEADER = struct.pack('<2sBBi', b'GP', 0, 0x01, SRS_ID)
+
+
+def point_blob(longitude: float, latitude: float) -> bytes:
+    """Encode a point as a GeoPackage geometry blob (header + little-endian WKB)."""
+    return _GP_HEADER + struct.pack('<BIdd', 1, 1, longitude, latitude)
+
+
+def reading_values(r) -> Tuple:
+    """Attribute values of a Reading, in the order of COLUMNS."""
+    dt = r.reading_time.isoformat() if r.reading_time is not None else None
+    return (r.survey_id, r.carrier, r.cellid, r.pci, r.tac, r.band, dt,
+            r.fwd_azimuth, r.bwd_azimuth, r.speed, r.file_idx, r.calculated,
+            r.latitude, r.longitude)
+
+
+class GeoPackageWriter:
+    """Writes readings as a point layer of a GeoPackage, batch by batch.
+
+    Rows are inserted with executemany and the R-tree is filled directly from
+    the coordinates, so no spatial SQL function is needed while writing. The
+    standard gpkg_rtree_index triggers are created on close, so the index stays
+    in step when the layer is later edited in QGIS.
+
+    Example:
+        with GeoPackageWriter(argument.gpkg_filename, 'readings') as gpkg:
+            for batch in batches:
+                gpkg.write(batch)
+    """
+
+    def __init__(self, filename: Path, table_name: str = 'readings', batch_size: int = 5000) -> None:
+        """Create the GeoPackage (an existing file is replaced).
+
+        Args:
+            filename: GeoPackage file
+            table_name: Name of the feature table
+            batch_size: Number of rows per insert
+        """
+        self.filename = Path(filename)
+        self.table_name = table_name
+        self.batch_size = batch_size
+        self.rtree_name = f'rtree_{table_name}_geom'
+        self.extent: Optional[list] = None
+        self.count = 0
+
+        self.filename.unlink(missing_ok=True)
+        self.conn = sqlite3.connect(str(self.filename))
+        self.conn.execute(f'PRAGMA application_id = {GPKG_APPLICATION_ID}')
+        self.conn.execute(f'PRAGMA user_version = {GPKG_USER_VERSION}')
+        self.conn.execute('PRAGMA journal_mode = OFF')
+        self.conn.execute('PRAGMA synchronous = OFF')
+        self._create_metadata()
+        self._create_layer()
+
+    def _create_metadata(self) -> None:
+        c = self.conn
+        c.execute("""CREATE TABLE gpkg_spatial_ref_sys (
+            srs_name TEXT NOT NULL, srs_id INTEGER PRIMARY KEY, organization TEXT NOT NULL,
+            organization_coordsys_id INTEGER NOT NULL, definition TEXT NOT NULL, description TEXT)""")
+        c.executemany("INSERT INTO gpkg_spatial_ref_sys VALUES (?, ?, ?, ?, ?, ?)", [
+            ('Undefined cartesian SRS', -1, 'NONE', -1, 'undefined', None),
+            ('Undefined geographic SRS', 0, 'NONE', 0, 'undefined', None),
+            ('WGS 84 geodetic', SRS_ID, 'EPSG', SRS_ID, WGS84_WKT, None),
+        ])
+        c.execute("""CREATE TABLE gpkg_contents (
+            table_name TEXT NOT NULL PRIMARY KEY, data_type TEXT NOT NULL, identifier TEXT UNIQUE,
+            description TEXT DEFAULT '', last_change DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ','now')),
+            min_x DOUBLE, min_y DOUBLE, max_x DOUBLE, max_y DOUBLE,
+            srs_id INTEGER REFERENCES gpkg_spatial_ref_sys(srs_id))""")
+        c.execute("""CREATE TABLE gpkg_geometry_columns (
+            table_name TEXT NOT NULL, column_name TEXT NOT NULL, geometry_type_name TEXT NOT NULL,
+            srs_id INTEGER NOT NULL, z TINYINT NOT NULL, m TINYINT NOT NULL,
+            CONSTRAINT pk_geom_cols PRIMARY KEY (table_name, column_name))""")
+        c.execute("""CREATE TABLE gpkg_extensions (
+            table_name TEXT, column_name TEXT, extension_name TEXT NOT NULL,
+            definition TEXT NOT NULL, scope TEXT NOT NULL,
+            CONSTRAINT ge_tce UNIQUE (table_name, column_name, extension_name))""")
+
+    def _create_layer(self) -> None:
+        c = self.conn
+        columns = ', '.join(f'{name} {sql_type}' for name, sql_type in COLUMNS)
+        c.execute(f'CREATE TABLE "{self.table_name}" (fid INTEGER PRIMARY KEY AUTOINCREMENT, geom POINT, {columns})')
+        c.execute("INSERT INTO gpkg_contents (table_name, data_type, identifier, srs_id) VALUES (?, 'features', ?, ?)",
+                  (self.table_name, self.table_name, SRS_ID))
+        c.execute("INSERT INTO gpkg_geometry_columns VALUES (?, 'geom', 'POINT', ?, 0, 0)", (self.table_name, SRS_ID))
+        c.execute(f'CREATE VIRTUAL TABLE "{self.rtree_name}" USING rtree(id, minx, maxx, miny, maxy)')
+        c.execute("INSERT INTO gpkg_extensions VALUES (?, 'geom', 'gpkg_rtree_index', "
+                  "'http://www.geopackage.org/spec120/#extension_rtree', 'write-only')", (self.table_name,))
+        self._insert_sql = (f'INSERT INTO "{self.table_name}" (fid, geom, {", ".join(n for n, _ in COLUMNS)}) '
+                            f'VALUES ({", ".join("?" * (len(COLUMNS) + 2))})')
+
+    def write(self, lines: Iterable) -> int:
+        """Append readings to the layer.
+
+        Args:
+            lines: Iterable of Reading objects (can be a generator)
+
+        Returns:
+            Number of rows written
+        """
+        rows, boxes = [], []
+        nb = 0
+        for r in lines:
+            self.count += 1
+            has_point = r.longitude is not None and r.latitude is not None
+            rows.append((self.count, point_blob(r.longitude, r.latitude) if has_point else None) + reading_values(r))
+            if has_point:
+                boxes.append((self.count, r.longitude, r.longitude, r.latitude, r.latitude))
+                self._extend(r.longitude, r.latitude)
+            if len(rows) >= self.batch_size:
+                nb += self._flush(rows, boxes)
+                rows, boxes = [], []
+        if rows:
+            nb += self._flush(rows, boxes)
+        return nb
+
+    def _flush(self, rows: list, boxes: list) -> int:
+        self.conn.executemany(self._insert_sql, rows)
+        self.conn.executemany(f'INSERT INTO "{self.rtree_name}" VALUES (?, ?, ?, ?, ?)', boxes)
+        self.conn.commit()
+        return len(rows)
+
+    def _extend(self, x: float, y: float) -> None:
+        if self.extent is None:
+            self.extent = [x, y, x, y]
+        else:
+            e = self.extent
+            e[0], e[1], e[2], e[3] = min(e[0], x), min(e[1], y), max(e[2], x), max(e[3], y)
+
+    def _create_rtree_triggers(self) -> None:
+        """Standard triggers of the gpkg_rtree_index extension (executed by GDAL/QGIS, not here)."""
+        t, r = self.table_name, self.rtree_name
+        triggers = {
+            'insert': f"""AFTER INSERT ON "{t}" WHEN (new.geom NOT NULL AND NOT ST_IsEmpty(NEW.geom))
+                BEGIN INSERT OR REPLACE INTO "{r}" VALUES (NEW.fid, ST_MinX(NEW.geom), ST_MaxX(NEW.geom),
+                ST_MinY(NEW.geom), ST_MaxY(NEW.geom)); END""",
+            'update1': f"""AFTER UPDATE OF geom ON "{t}" WHEN OLD.fid = NEW.fid AND (NEW.geom NOTNULL AND NOT ST_IsEmpty(NEW.geom))
+                BEGIN INSERT OR REPLACE INTO "{r}" VALUES (NEW.fid, ST_MinX(NEW.geom), ST_MaxX(NEW.geom),
+                ST_MinY(NEW.geom), ST_MaxY(NEW.geom)); END""",
+            'update2': f"""AFTER UPDATE OF geom ON "{t}" WHEN OLD.fid = NEW.fid AND (NEW.geom ISNULL OR ST_IsEmpty(NEW.geom))
+                BEGIN DELETE FROM "{r}" WHERE id = OLD.fid; END""",
+            'update3': f"""AFTER UPDATE ON "{t}" WHEN OLD.fid != NEW.fid AND (NEW.geom NOTNULL AND NOT ST_IsEmpty(NEW.geom))
+                BEGIN DELETE FROM "{r}" WHERE id = OLD.fid; INSERT OR REPLACE INTO "{r}" VALUES (NEW.fid,
+                ST_MinX(NEW.geom), ST_MaxX(NEW.geom), ST_MinY(NEW.geom), ST_MaxY(NEW.geom)); END""",
+            'update4': f"""AFTER UPDATE ON "{t}" WHEN OLD.fid != NEW.fid AND (NEW.geom ISNULL OR ST_IsEmpty(NEW.geom))
+                BEGIN DELETE FROM "{r}" WHERE id IN (OLD.fid, NEW.fid); END""",
+            'delete': f"""AFTER DELETE ON "{t}" WHEN old.geom NOT NULL
+                BEGIN DELETE FROM "{r}" WHERE id = OLD.fid; END""",
+        }
+        for name, body in triggers.items():
+            self.conn.execute(f'CREATE TRIGGER "{r}_{name}" {body}')
+
+    def close(self) -> None:
+        """Write the extent, create the index triggers and close the file."""
+        if self.conn is None:
+            return
+        if self.extent is not None:
+            self.conn.execute("UPDATE gpkg_contents SET min_x = ?, min_y = ?, max_x = ?, max_y = ?, last_change = ? "
+                              "WHERE table_name = ?",
+                              (*self.extent, datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')[:-4] + 'Z',
+                               self.table_name))
+        self._create_rtree_triggers()
+        self.conn.commit()
+        self.conn.close()
+        self.conn = None
+
+    def __enter__(self) -> 'GeoPackageWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -1,5 +1,8 @@
 import csv
 
+from corelte.helpers.geopackage import GeoPackageWriter
+from corelte.lake import SurveyLake
+
 class Helper:
 
     
@@ -22,3 +25,34 @@ class Helper:
                 for r in lines:
                     csvwriter.writerow(r.csv_row())
 
+    def save_gpkg_file(self, lines, filename, table_name='readings', batch_size=5000):
+        # écriture en flux d'une couche GeoPackage indexée (R-tree)
+        if lines is None:
+            return
+        with GeoPackageWriter(filename, table_name, batch_size) as gpkg:
+            gpkg.write(lines)
+
+    def save_tmp_gps_files(self, lines, argument):
+        self.save_csv_file(lines, argument.tmp_gps_filename)
+        self.save_gpkg_file(lines, argument.tmp_gps_gpkg_filename, 'gps')
+        self.save_lake_partition(lines, argument, 'gps')
+
+    def save_tmp_mp4_files(self, lines, argument):
+        self.save_csv_file(lines, argument.tmp_mp4_filename)
+        self.save_gpkg_file(lines, argument.tmp_mp4_gpkg_filename, 'mp4')
+        self.save_lake_partition(lines, argument, 'mp4')
+
+    def save_fusion_files(self, lines, argument):
+        self.save_csv_file(lines, argument.csv_filename)
+        self.save_gpkg_file(lines, argument.gpkg_filename, 'readings')
+        self.save_lake_partition(lines, argument, 'fusion')
+
+    def save_fused_cache(self, lines, argument):
+        # fusion avant clarify, relue par le balayage de paramètres (corelte.sweep)
+        self.save_lake_partition(lines, argument, 'fused')
+
+    def save_lake_partition(self, lines, argument, dataset):
+        # copie colonnaire pour l'analyse hors ligne (si demandée)
+        if lines is None or not argument.save_to_lake:
+            return
+        SurveyLake().write(argument.network_id, argument.survey_id, dataset, lines)
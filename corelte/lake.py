@@ -0,0 +1,309 @@
+"""Local columnar store of the processed surveys (offline analysis without PostGIS).
+
+Layout, one directory per partition and one memory-mappable .npy file per column:
+
+    <root>/<dataset>/network=01/survey=0202/cell_id.npy
+                                           latitude.npy
+                                           ...
+                                           _stats.json
+
+The datasets are 'fusion' (fused readings), 'fused' (fused readings before
+clarify, input of the parameter sweep), 'gps' (GPS track) and 'mp4'
+(readings parsed from the screencast). _stats.json holds the min/max of the
+filtered columns, so a query skips whole partitions before reading any data.
+"""
+
+from dataclasses import dataclass
+import json
+import os
+from pathlib import Path
+import shutil
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_ROOT = Path('/Volumes/HOME/kDrive/DATA/LTE/LAKE')
+
+DATASETS = ('fusion', 'fused', 'gps', 'mp4')
+
+# Valeur des entiers manquants (les tableaux numpy n'ont pas de NULL)
+MISSING_INT = -1
+
+# Colonnes : nom -> (attribut de Reading, type numpy)
+SCHEMA = {
+    'survey_id': ('survey_id', np.int32),
+    'carrier': ('carrier', np.dtype('U16')),
+    'cell_id': ('cellid', np.int64),
+    'pci': ('pci', np.int32),
+    'tac': ('tac', np.int32),
+    'band': ('band', np.int32),
+    'reading_time': ('reading_time', np.dtype('datetime64[ms]')),
+    'fwd_azimuth': ('fwd_azimuth', np.float32),
+    'bwd_azimuth': ('bwd_azimuth', np.float32),
+    'speed': ('speed', np.float32),
+    'file_idx': ('file_idx', np.int32),
+    'calculated': ('calculated', np.bool_),
+    'latitude': ('latitude', np.float64),
+    'longitude': ('longitude', np.float64),
+}
+
+Columns = Dict[str, np.ndarray]
+
+
+def lake_root() -> Path:
+    """Root of the lake (environment variable LTE_LAKE_DIR or DEFAULT_ROOT)."""
+    return Path(os.environ.get('LTE_LAKE_DIR', DEFAULT_ROOT))
+
+
+def _int_or_missing(value) -> int:
+    # les champs OCR peuvent contenir du texte non numérique
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return MISSING_INT
+
+
+def readings_to_columns(lines: Iterable, schema: Dict[str, tuple] = SCHEMA) -> Columns:
+    """Convert Reading objects to typed numpy columns."""
+    lines = list(lines)
+    columns = {}
+    for name, (attr, dtype) in schema.items():
+        dtype = np.dtype(dtype)
+        values = [getattr(r, attr) for r in lines]
+        if dtype.kind == 'i':
+            columns[name] = np.fromiter((_int_or_missing(v) for v in values), dtype=dtype, count=len(values))
+        elif dtype.kind == 'f':
+            columns[name] = np.fromiter((np.nan if v is None else v for v in values), dtype=dtype, count=len(values))
+        elif dtype.kind == 'M':
+            columns[name] = np.array(['NaT' if v is None else v for v in values], dtype=dtype)
+        elif dtype.kind == 'b':
+            columns[name] = np.fromiter((bool(v) for v in values), dtype=dtype, count=len(values))
+        else:
+            columns[name] = np.array(['' if v is None else str(v) for v in values], dtype=dtype)
+    return columns
+
+
+def columns_to_readings(columns: Columns, survey_id: Optional[int] = None, schema: Dict[str, tuple] = SCHEMA) -> List:
+    """Convert numpy columns back to Reading objects (inverse of readings_to_columns)."""
+    from corelte.reading import Reading
+
+    n = len(columns['cell_id'])
+    lines = [Reading(survey_id) for _ in range(n)]
+    for name, (attr, dtype) in schema.items():
+        if name not in columns or (name == 'survey_id' and survey_id is not None):
+            continue
+        kind = np.dtype(dtype).kind
+        for r, v in zip(lines, columns[name].tolist() if kind != 'M' else columns[name].astype('datetime64[us]').tolist()):
+            if kind == 'i' and v == MISSING_INT:
+                v = None
+            elif kind == 'f' and v != v: # NaN
+                v = None
+            setattr(r, attr, v)
+    return lines
+
+
+def column_stats(columns: Columns) -> dict:
+    """Min/max of the columns used for partition pruning."""
+    def bounds(a: np.ndarray, missing=None):
+        if a.dtype.kind == 'f':
+            a = a[~np.isnan(a)]
+        elif a.dtype.kind == 'M':
+            a = a[~np.isnat(a)]
+        elif missing is not None:
+            a = a[a != missing]
+        if len(a) == 0:
+            return None
+        lo, hi = a.min(), a.max()
+        if a.dtype.kind == 'M':
+            return [str(lo), str(hi)]
+        return [lo.item(), hi.item()]
+
+    return {
+        'rows': int(len(columns['cell_id'])),
+        'cell_id': bounds(columns['cell_id'], MISSING_INT),
+        'reading_time': bounds(columns['reading_time']),
+        'longitude': bounds(columns['longitude']),
+        'latitude': bounds(columns['latitude']),
+    }
+
+
+@dataclass
+class Filter:
+    """Predicates of a lake query (None means no restriction).
+
+    Attributes:
+        network_id: Network identifier
+        survey_ids: Surveys to read
+        cell_range: Inclusive (min, max) cell identifiers
+        time_range: Inclusive (start, end) datetimes
+        bbox: WGS84 (lon_min, lat_min, lon_max, lat_max)
+    """
+    network_id: Optional[int] = None
+    survey_ids: Optional[Sequence[int]] = None
+    cell_range: Optional[Tuple[int, int]] = None
+    time_range: Optional[Tuple] = None
+    bbox: Optional[Tuple[float, float, float, float]] = None
+
+    def skips(self, stats: dict) -> bool:
+        """True when the statistics of a partition exclude every row."""
+        if stats['rows'] == 0:
+            return True
+        if self.cell_range is not None:
+            if stats['cell_id'] is None or stats['cell_id'][1] < self.cell_range[0] or stats['cell_id'][0] > self.cell_range[1]:
+                return True
+        if self.time_range is not None:
+            if stats['reading_time'] is None:
+                return True
+            lo, hi = (np.datetime64(t, 'ms') for t in stats['reading_time'])
+            start, end = (np.datetime64(t, 'ms') for t in self.time_range)
+            if hi < start or lo > end:
+                return True
+        if self.bbox is not None:
+            if stats['longitude'] is None or stats['latitude'] is None:
+                return True
+            lon_min, lat_min, lon_max, lat_max = self.bbox
+            if stats['longitude'][1] < lon_min or stats['longitude'][0] > lon_max \
+                    or stats['latitude'][1] < lat_min or stats['latitude'][0] > lat_max:
+                return True
+        return False
+
+    def mask(self, data: Columns) -> Optional[np.ndarray]:
+        """Row mask of a partition, None when every row matches."""
+        mask = None
+
+        def both(m):
+            return m if mask is None else mask & m
+
+        if self.cell_range is not None:
+            c = data['cell_id']
+            mask = both((c >= self.cell_range[0]) & (c <= self.cell_range[1]))
+        if self.time_range is not None:
+            t = data['reading_time']
+            start, end = (np.datetime64(v, 'ms') for v in self.time_range)
+            mask = both((t >= start) & (t <= end))
+        if self.bbox is not None:
+            lon, lat = data['longitude'], data['latitude']
+            lon_min, lat_min, lon_max, lat_max = self.bbox
+            mask = both((lon >= lon_min) & (lon <= lon_max) & (lat >= lat_min) & (lat <= lat_max))
+        return mask
+
+
+class SurveyLake:
+    """Partitioned columnar store of the surveys.
+
+    Example:
+        lake = SurveyLake()
+        lake.write(1, 202, 'fusion', fusion.linesFusion)
+        data = lake.scan('fusion', Filter(network_id=1, cell_range=(228001000, 228001999)))
+        pandas.DataFrame(data)  # if a DataFrame is needed
+    """
+
+    def __init__(self, root: Optional[Path] = None) -> None:
+        """Initialize the lake.
+
+        Args:
+            root: Root directory, default lake_root()
+        """
+        self.root = Path(root) if root is not None else lake_root()
+
+    def partition_dir(self, dataset: str, network_id: int, survey_id: int) -> Path:
+        return self.root / dataset / f'network={network_id:02}' / f'survey={survey_id:04}'
+
+    def write(self, network_id: int, survey_id: int, dataset: str, lines: Iterable) -> int:
+        """Write (or replace) the partition of a survey.
+
+        The columns are written to a temporary directory which is then renamed,
+        so readers never see a partially written partition.
+
+        Returns:
+            Number of rows written
+        """
+        return self.write_columns(network_id, survey_id, dataset, readings_to_columns(lines))
+
+    def write_columns(self, network_id: int, survey_id: int, dataset: str, columns: Columns) -> int:
+        """Write (or replace) a partition from numpy columns."""
+        if dataset not in DATASETS:
+            raise ValueError(f"Unknown dataset: {dataset}")
+        target = self.partition_dir(dataset, network_id, survey_id)
+        tmp = target.with_name(target.name + '.tmp')
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        for name, values in columns.items():
+            np.save(tmp / f'{name}.npy', values, allow_pickle=False)
+        with open(tmp / '_stats.json', 'w') as f:
+            json.dump(column_stats(columns), f)
+
+        old = target.with_name(target.name + '.old')
+        if target.exists():
+            target.rename(old)
+        tmp.rename(target)
+        shutil.rmtree(old, ignore_errors=True)
+        return len(columns['cell_id'])
+
+    def partitions(self, dataset: str, network_id: Optional[int] = None,
+                   survey_ids: Optional[Sequence[int]] = None) -> Iterator[Tuple[int, int, Path]]:
+        """Enumerate the partitions (network_id, survey_id, directory) of a dataset."""
+        networks = [self.root / dataset / f'network={network_id:02}'] if network_id is not None \
+            else sorted((self.root / dataset).glob('network=*'))
+        wanted = None if survey_ids is None else set(survey_ids)
+        for net_dir in networks:
+            for survey_dir in sorted(net_dir.glob('survey=*')):
+                if survey_dir.suffix:
+                    continue # .tmp / .old en cours d'écriture
+                survey_id = int(survey_dir.name.split('=')[1])
+                if wanted is None or survey_id in wanted:
+                    yield int(net_dir.name.split('=')[1]), survey_id, survey_dir
+
+    def read_partition(self, directory: Path, columns: Optional[Sequence[str]] = None) -> Columns:
+        """Memory-map the columns of a partition."""
+        names = columns if columns is not None else SCHEMA.keys()
+        return {name: np.load(directory / f'{name}.npy', mmap_mode='r') for name in names}
+
+    def scan(self, dataset: str, where: Optional[Filter] = None, columns: Optional[Sequence[str]] = None) -> Columns:
+        """Read the rows matching a filter across all the partitions.
+
+        Partitions are pruned with their statistics, then only the filtered and
+        requested columns are memory-mapped and masked.
+
+        Args:
+            dataset: One of DATASETS
+            where: Predicates, None to read everything
+            columns: Columns to return, None for all
+
+        Returns:
+            Dictionary column -> array, with a 'network_id' column added
+        """
+        where = where or Filter()
+        names = list(columns) if columns is not None else list(SCHEMA.keys())
+        needed = set(names)
+        if where.cell_range is not None:
+            needed.add('cell_id')
+        if where.time_range is not None:
+            needed.add('reading_time')
+        if where.bbox is not None:
+            needed.update(('longitude', 'latitude'))
+
+        parts: Dict[str, List[np.ndarray]] = {name: [] for name in names + ['network_id']}
+        for network_id, _, directory in self.partitions(dataset, where.network_id, where.survey_ids):
+            with open(directory / '_stats.json') as f:
+                if where.skips(json.load(f)):
+                    continue
+            data = self.read_partition(directory, sorted(needed))
+            mask = where.mask(data)
+            nb = len(next(iter(data.values()))) if mask is None else int(mask.sum())
+            if nb == 0:
+                continue
+            for name in names:
+                parts[name].append(np.asarray(data[name] if mask is None else data[name][mask]))
+            parts['network_id'].append(np.full(nb, network_id, dtype=np.int32))
+
+        result = {}
+        for name, chunks in parts.items():
+            dtype = np.int32 if name == 'network_id' else SCHEMA[name][1]
+            result[name] = np.concatenate(chunks) if chunks else np.empty(0, dtype=dtype)
+        return result
+
+    def drop(self, network_id: int, survey_id: int) -> None:
+        """Remove a survey from every dataset."""
+        for dataset in DATASETS:
+            shutil.rmtree(self.partition_dir(dataset, network_id, survey_id), ignore_errors=True)
@@ -0,0 +1,356 @@
+"""Live processing of a survey while it is being recorded.
+
+The screencast is read as it grows (ffmpeg -follow) or from a pipe of raw
+frames, the GPS track from a growing GPX or NMEA file. Each new frame goes
+through change detection and OCR, the clock is synchronised on the first
+frames, every frame with its GPS point is fused, clarified on the fly and
+appended to the CSV and, through BackgroundWriter, to the database.
+
+Memory stays bounded whatever the length of the session: only the current
+cell interval, a window of GPS points and the readings waiting for output
+are kept.
+
+Usage:
+    python -m corelte.live --network 1 --survey 250            # suit Survey_01_0250.mp4 et .gpx
+    ffmpeg -i ... -vf fps=1,scale=886:1920,format=gray -f rawvideo -pix_fmt gray - | python -m corelte.live --network 1 --survey 250 --pipe
+"""
+
+import argparse
+import csv
+from pathlib import Path
+import queue
+import subprocess
+import sys
+import threading
+import time
+from typing import BinaryIO, List, Optional, Union
+
+import cv2
+import numpy as np
+from skimage.metrics import structural_similarity as compare_ssim
+
+from corelte.argument import Argument, MYOCR_SWIFT_PRG
+from corelte.fusion import DEFAULT_CLARIFY, ClarifyParams, Fusion, StreamingClarify
+from corelte.live_track import GpxFeed, LiveTrack, NmeaFeed
+from corelte.orm.writer import BackgroundWriter
+from corelte.reading import Reading
+from corelte.reading_interval import MP4Clock, ReadingInterval, append_frame
+from corelte.screencast import CROP_LTE, CROP_TIME, SCORE_MIN_LTE, SCORE_MIN_TIME, Screencast
+
+# Taille des frames du screencast (voir split_video_into_frames)
+FRAME_WIDTH = 886
+FRAME_HEIGHT = 1920
+
+_END = object()
+
+
+class FrameStream(threading.Thread):
+    """Gray frames at one per second, read in the background into a bounded queue.
+
+    The frames come from ffmpeg reading the recording as it grows (-follow 1),
+    or from a pipe of raw gray frames of FRAME_WIDTH x FRAME_HEIGHT. Both are
+    negated (white text on black), as the frames OCR-ised by Screencast.
+    """
+
+    def __init__(self, source: Optional[Path] = None, pipe: Optional[BinaryIO] = None,
+                 width: int = FRAME_WIDTH, height: int = FRAME_HEIGHT, max_frames: int = 30) -> None:
+        super().__init__(name='FrameStream', daemon=True)
+        self.source = source
+        self.pipe = pipe
+        self.width, self.height = width, height
+        self.frames: queue.Queue = queue.Queue(maxsize=max_frames)
+        self.process: Optional[subprocess.Popen] = None
+
+    def run(self) -> None:
+        stream = self.pipe
+        if stream is None:
+            cmd = ['ffmpeg', '-loglevel', 'error', '-follow', '1', '-i', f'file:{self.source}',
+                   '-vf', f'fps=1,scale={self.width}:{self.height},format=gray,negate',
+                   '-f', 'rawvideo', '-pix_fmt', 'gray', 'pipe:1']
+            self.process = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+            stream = self.process.stdout
+        size = self.width * self.height
+        try:
+            while True:
+                data = stream.read(size)
+                if data is None or len(data) < size:
+                    break
+                frame = np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width)
+                # ffmpeg négative déjà les frames (filtre negate), pas celles du pipe
+                self.frames.put(frame if self.pipe is None else np.invert(frame))
+        finally:
+            # la session attend _END, même si la lecture échoue
+            self.frames.put(_END)
+
+    def stop(self) -> None:
+        if self.process is not None:
+            self.process.terminate()
+
+
+def crop(frame: np.ndarray, region) -> np.ndarray:
+    width, height, x, y = region
+    return frame[y:y + height, x:x + width]
+
+
+class LiveScreencast(Screencast):
+    """Screencast fed frame by frame: change detection, OCR and clock synchronisation.
+
+    Only the interval of the current cell and the frames not yet fused are kept.
+    """
+
+    def __post_init__(self):
+        # pas de métadonnées sur un enregistrement en cours
+        self.mp4CreateDate = self.argument.mp4_create_date
+        self.nb_frames = 0
+        self.work_dir = self.argument.survey_tmp_dir / 'live'
+        self.work_dir.mkdir(exist_ok=True)
+        self._prev_lte: Optional[np.ndarray] = None
+        self._prev_time: Optional[np.ndarray] = None
+        self._first_idx = -1 # première heure lisible (index dans frame_times)
+
+    def ocr(self, image: np.ndarray, name: str) -> List[str]:
+        """Words of an image read by myocr (the temporary files are removed)."""
+        png = self.work_dir / f'{name}.png'
+        txt = png.with_suffix('.txt')
+        cv2.imwrite(str(png), image)
+        subprocess.call([str(MYOCR_SWIFT_PRG), str(png), str(png.with_suffix(''))])
+        words = self.convert_text_to_list_of_words(txt)
+        for f in (png, txt):
+            f.unlink(missing_ok=True)
+        return words
+
+    def add_frame(self, frame: np.ndarray) -> int:
+        """Process the next frame.
+
+        Returns:
+            file_idx of the frame
+        """
+        self.nb_frames += 1
+        file_idx = self.nb_frames
+
+        # Paramètres LTE, OCR-isés seulement quand la zone change
+        lte = crop(frame, CROP_LTE)
+        if self.argument.scale_factor != 1:
+            lte = cv2.resize(lte, None, fx=self.argument.scale_factor, fy=self.argument.scale_factor, interpolation=cv2.INTER_AREA)
+        r = self.hold_frame_reading
+        if self._prev_lte is None or compare_ssim(lte, self._prev_lte) < SCORE_MIN_LTE:
+            r, success = self.extract_reading_from_words(Reading(self.argument.survey_id), self.ocr(lte, 'lte'))
+            if success:
+                self.hold_frame_reading.__dict__ = r.__dict__.copy()
+        self._prev_lte = lte
+        append_frame(self.intervalsMp4, file_idx, r.band, r.cellid, r.pci, r.tac)
+
+        # Horloge : lue sur les premières frames jusqu'à la synchronisation
+        if self.clock is None:
+            self._probe_time(crop(frame, CROP_TIME))
+        return file_idx
+
+    def _probe_time(self, image: np.ndarray) -> None:
+        changed = self._prev_time is None or compare_ssim(image, self._prev_time) < SCORE_MIN_TIME
+        self._prev_time = image
+        if changed:
+            reading_time = self.time_from_words(self.ocr(image, 'tim'))
+            if reading_time is not None:
+                self.hold_frame_time = reading_time
+            self.frame_times.append(self.hold_frame_time)
+            self._first_idx, self.clock = self.find_clock(self.frame_times)
+        else:
+            self.frame_times.append(self.hold_frame_time)
+
+        if self.clock is None and self.nb_frames >= self.argument.time_scan_probe and self._first_idx >= 0:
+            # la minute n'a pas avancé pendant la sonde : précision à la minute
+            print("Horloge non synchronisée à la seconde, heure de la première frame lisible")
+            self.clock = MP4Clock(self._first_idx + 1, self.frame_times[self._first_idx])
+
+        if self.clock is not None:
+            self.cursor.first_non_null_idx = self.clock.first_idx - 1
+            self.cursor.first_non_null_reading_time = self.clock.first_time
+            self.frame_times = [] # plus utile une fois l'horloge connue
+
+    def interval_of(self, file_idx: int) -> Optional[ReadingInterval]:
+        """Interval of a frame; the intervals before it are dropped."""
+        while self.intervalsMp4 and self.intervalsMp4[0].end_idx < file_idx:
+            self.intervalsMp4.pop(0)
+        if self.intervalsMp4 and self.intervalsMp4[0].start_idx <= file_idx:
+            return self.intervalsMp4[0]
+        return None
+
+
+class LiveSession:
+    """Follows a recording in progress and writes its fused readings as they come.
+
+    Frames are fused as soon as the GPS point of their second is known; the
+    kept readings are written every flush_interval seconds, so the delay
+    between a frame and its reading in the database is a few seconds.
+
+    Example:
+        argument = Argument(1, 250, live=True)
+        writer = BackgroundWriter(db_engines.main)
+        writer.start()
+        LiveSession(argument, FrameStream(argument.mp4_filename), GpxFeed(argument.gps_filename, 250), writer).run()
+        writer.close()
+    """
+
+    def __init__(self, argument: Argument, frames: FrameStream, gps: Union[GpxFeed, NmeaFeed],
+                 writer: Optional[BackgroundWriter] = None, params: ClarifyParams = DEFAULT_CLARIFY,
+                 flush_interval: float = 2.0, poll_interval: float = 0.5, gps_wait: float = 10.0) -> None:
+        """Initialize the session.
+
+        Args:
+            argument: Survey configuration (live=True)
+            frames: Source of the screencast frames
+            gps: Source of the GPS points
+            writer: Database writer, None to write the CSV only
+            params: Clarify and compensation parameters
+            flush_interval: Seconds between two writes
+            poll_interval: Seconds between two reads of the GPS file
+            gps_wait: Seconds to wait for the GPS once the screencast has ended
+        """
+        self.argument = argument
+        self.frames = frames
+        self.gps = gps
+        self.writer = writer
+        self.params = params
+        self.flush_interval = flush_interval
+        self.poll_interval = poll_interval
+        self.gps_wait = gps_wait
+
+        self.screencast = LiveScreencast(argument)
+        self.track = LiveTrack(argument.survey_id)
+        self.clarify = StreamingClarify(params)
+        self.next_frame: Optional[int] = None # prochaine frame à fusionner
+        self.pending: List[Reading] = [] # mesures gardées, pas encore écrites
+        self.nb_written = 0
+        self._csv_file = None
+        self._csv = None
+
+    def fuse_ready(self, final: bool = False) -> None:
+        """Fuse the frames whose GPS point is known.
+
+        A frame without GPS point is skipped once the track has gone past its
+        second (or at the end of the session), otherwise it waits.
+        """
+        clock = self.screencast.clock
+        if clock is None:
+            return
+        if self.next_frame is None:
+            self.next_frame = clock.first_idx
+        latest = self.track.latest_time
+        while self.next_frame <= self.screencast.nb_frames:
+            file_idx = self.next_frame
+            reading_time = clock.time(file_idx)
+            g = self.track.at(reading_time)
+            if g is None and not (final or (latest is not None and latest > reading_time)):
+                break # attend le GPS
+            interval = self.screencast.interval_of(file_idx)
+            if g is not None and interval is not None:
+                r = Fusion.fuse_frame(self.argument.survey_id, interval, file_idx, reading_time, g)
+                self._keep(self.clarify.push(r))
+            self.next_frame += 1
+
+    def _keep(self, readings: List[Reading]) -> None:
+        for r in readings:
+            r.apply_time_compensation(self.params.reaction_time)
+            self.pending.append(r)
+
+    def flush_output(self) -> None:
+        """Append the kept readings to the CSV and send them to the writer."""
+        if not self.pending:
+            return
+        if self._csv is None:
+            # ajoute au CSV d'une session relancée, l'en-tête seulement dans un fichier vide
+            self._csv_file = open(self.argument.csv_filename, 'a', newline='')
+            self._csv = csv.writer(self._csv_file)
+            if self._csv_file.tell() == 0:
+                self._csv.writerow(self.pending[0].fields())
+        for r in self.pending:
+            self._csv.writerow(r.csv_row())
+        self._csv_file.flush()
+        if self.writer is not None:
+            self.writer.put(self.argument.network_id, self.argument.survey_id, self.pending)
+        self.nb_written += len(self.pending)
+        self.pending = []
+
+    def _frames_waiting(self) -> bool:
+        return self.next_frame is not None and self.next_frame <= self.screencast.nb_frames
+
+    def run(self) -> int:
+        """Process the recording until it ends (or Ctrl-C).
+
+        Returns:
+            Number of readings written
+        """
+        if self.writer is not None:
+            self.writer.begin_survey(Fusion(self.argument)._new_survey(self.argument.mp4_create_date))
+        self.frames.start()
+        last_poll = last_flush = time.monotonic()
+        try:
+            while True:
+                try:
+                    frame = self.frames.frames.get(timeout=self.poll_interval)
+                except queue.Empty:
+                    frame = None
+                if frame is _END:
+                    break
+                if frame is not None:
+                    self.screencast.add_frame(frame)
+
+                now = time.monotonic()
+                if frame is None or now - last_poll >= self.poll_interval:
+                    self.track.extend(self.gps.poll())
+                    last_poll = now
+                self.fuse_ready()
+                if now - last_flush >= self.flush_interval:
+                    self.flush_output()
+                    last_flush = now
+        except KeyboardInterrupt:
+            print("Arrêt demandé, écriture des dernières mesures")
+        finally:
+            self.frames.stop()
+
+        # Le GPS peut avoir quelques secondes de retard sur le screencast
+        deadline = time.monotonic() + self.gps_wait
+        while self._frames_waiting() and time.monotonic() < deadline:
+            self.track.extend(self.gps.poll())
+            self.fuse_ready()
+            time.sleep(self.poll_interval)
+        self.track.extend(self.gps.poll())
+        self.track.close()
+        self.fuse_ready(final=True)
+        self._keep(self.clarify.flush())
+        self.flush_output()
+
+        if self._csv_file is not None:
+            self._csv_file.close()
+        if self.writer is not None:
+            self.writer.flush(self.argument.network_id, self.argument.survey_id)
+        print(f"Session terminée: {self.screencast.nb_frames} frames, {self.nb_written} mesures écrites")
+        return self.nb_written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Traitement en direct d'un survey en cours d'enregistrement")
+    parser.add_argument('--network', type=int, required=True)
+    parser.add_argument('--survey', type=int, required=True)
+    parser.add_argument('--pipe', action='store_true', help="frames brutes (gray, 886x1920, 1 fps, non négativées) sur l'entrée standard")
+    parser.add_argument('--nmea', default=None, help="journal NMEA à suivre au lieu du fichier GPX")
+    parser.add_argument('--no-db', action='store_true', help="n'écrit que le fichier CSV")
+    parser.add_argument('--flush-interval', type=float, default=2.0)
+    args = parser.parse_args()
+
+    argument = Argument(args.network, args.survey, live=True)
+    frames = FrameStream(pipe=sys.stdin.buffer) if args.pipe else FrameStream(argument.mp4_filename)
+    gps = NmeaFeed(Path(args.nmea), args.survey) if args.nmea else GpxFeed(argument.gps_filename, args.survey)
+
+    writer = None
+    if not args.no_db:
+        from corelte.orm.db import db_engines
+        writer = BackgroundWriter(db_engines.main)
+        writer.start()
+    LiveSession(argument, frames, gps, writer, flush_interval=args.flush_interval).run()
+    if writer is not None:
+        writer.close()
+
+
+if __name__ == "__main__":
+    main()
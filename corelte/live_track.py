@@ -0,0 +1,172 @@
+"""GPS side of the live processing (corelte.live): growing GPX and NMEA files, track resampled as it arrives.
+
+Kept apart from corelte.live, which needs OpenCV for the frames.
+"""
+
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+import re
+from typing import List, Optional
+
+from corelte.datetime_local import convert_utc_to_local
+from corelte.reading import Reading
+
+GPX_POINT_RE = re.compile(r'<trkpt\b([^>]*)>(.*?)</trkpt>', re.S)
+GPX_LAT_RE = re.compile(r'\blat="([^"]+)"')
+GPX_LON_RE = re.compile(r'\blon="([^"]+)"')
+GPX_TIME_RE = re.compile(r'<time>([^<]+)</time>')
+
+
+class FileTail:
+    """Text appended to a growing file since the previous read."""
+
+    def __init__(self, filename: Path) -> None:
+        self.filename = Path(filename)
+        self.offset = 0
+
+    def read(self) -> str:
+        try:
+            with open(self.filename, 'rb') as f:
+                f.seek(self.offset)
+                data = f.read()
+        except FileNotFoundError:
+            return ''
+        # ne garde que des caractères UTF-8 complets
+        end = len(data)
+        while end > 0 and end > len(data) - 4 and (data[end - 1] & 0xC0) == 0x80:
+            end -= 1
+        if end > 0 and data[end - 1] >= 0xC0:
+            end -= 1
+        self.offset += end
+        return data[:end].decode('utf-8', errors='replace')
+
+
+class GpxFeed:
+    """Track points of a growing GPX file."""
+
+    def __init__(self, filename: Path, survey_id: int) -> None:
+        self.tail = FileTail(filename)
+        self.survey_id = survey_id
+        self.buffer = ''
+
+    def poll(self) -> List[Reading]:
+        """Points completed since the previous call."""
+        self.buffer += self.tail.read()
+        points = []
+        end = 0
+        for match in GPX_POINT_RE.finditer(self.buffer):
+            end = match.end()
+            r = self._reading(match.group(1), match.group(2))
+            if r is not None:
+                points.append(r)
+        # garde le point incomplet (ou rien de l'en-tête)
+        rest = self.buffer[end:]
+        start = rest.find('<trkpt')
+        self.buffer = rest[start:] if start >= 0 else rest[-6:]
+        return points
+
+    def _reading(self, attributes: str, body: str) -> Optional[Reading]:
+        lat, lon, time_ = GPX_LAT_RE.search(attributes), GPX_LON_RE.search(attributes), GPX_TIME_RE.search(body)
+        if not (lat and lon and time_):
+            return None
+        r = Reading(self.survey_id)
+        r.set_datetime_naive_from_str(time_.group(1))
+        if r.reading_time is None:
+            return None
+        r.reading_time = convert_utc_to_local(r.reading_time)
+        r.set_latitude_from_str(lat.group(1))
+        r.set_longitude_from_str(lon.group(1))
+        return r if r.latitude and r.longitude else None
+
+
+class NmeaFeed:
+    """Positions of the RMC sentences of a growing NMEA log."""
+
+    def __init__(self, filename: Path, survey_id: int) -> None:
+        self.tail = FileTail(filename)
+        self.survey_id = survey_id
+        self.buffer = ''
+
+    def poll(self) -> List[Reading]:
+        """Points completed since the previous call."""
+        self.buffer += self.tail.read()
+        *lines, self.buffer = self.buffer.split('\n')
+        points = []
+        for line in lines:
+            r = parse_rmc(line.strip(), self.survey_id)
+            if r is not None:
+                points.append(r)
+        return points
+
+
+def _nmea_degrees(value: str, hemisphere: str) -> float:
+    degrees_len = value.index('.') - 2
+    degrees = float(value[:degrees_len]) + float(value[degrees_len:]) / 60
+    return -degrees if hemisphere in ('S', 'W') else degrees
+
+
+def parse_rmc(line: str, survey_id: int) -> Optional[Reading]:
+    """Reading of a valid $..RMC sentence, None for any other line."""
+    fields = line.split('*')[0].split(',')
+    if len(fields) < 10 or not fields[0].endswith('RMC') or fields[2] != 'A':
+        return None
+    try:
+        utc = datetime.strptime(fields[9] + fields[1].split('.')[0], '%d%m%y%H%M%S')
+        r = Reading(survey_id)
+        r.reading_time = convert_utc_to_local(utc)
+        r.latitude = _nmea_degrees(fields[3], fields[4])
+        r.longitude = _nmea_degrees(fields[5], fields[6])
+    except ValueError:
+        return None
+    return r
+
+
+class LiveTrack:
+    """GPS points resampled to one per second, with speed and azimuth, as they arrive.
+
+    Same processing as Track.extend_gps_records_to_every_second and
+    calculate_speed_and_direction; a point is available once the next one
+    has arrived. Only the last keep_seconds points are kept.
+    """
+
+    def __init__(self, survey_id: int, keep_seconds: int = 600) -> None:
+        self.survey_id = survey_id
+        self.keep_seconds = keep_seconds
+        self.points: 'OrderedDict[datetime, Reading]' = OrderedDict()
+        self.last: Optional[Reading] = None # dernier point reçu, vitesse pas encore calculée
+
+    def extend(self, readings: List[Reading]) -> None:
+        for r in readings:
+            self.add(r)
+
+    def add(self, r: Reading) -> None:
+        last = self.last
+        if last is not None:
+            if r.reading_time <= last.reading_time:
+                return # doublon ou point en arrière
+            seq = [last]
+            time_diff = (r.reading_time - last.reading_time).seconds
+            for i in range(1, time_diff):
+                p = Reading(self.survey_id)
+                p.init_ratio(last, r, i / time_diff)
+                seq.append(p)
+            seq.append(r)
+            for p, q in zip(seq, seq[1:]):
+                p.calculate_azimuth_and_speed(q)
+                self.points[p.reading_time] = p
+            while len(self.points) > self.keep_seconds:
+                self.points.popitem(last=False)
+        self.last = r
+
+    def at(self, t: datetime) -> Optional[Reading]:
+        return self.points.get(t)
+
+    @property
+    def latest_time(self) -> Optional[datetime]:
+        return next(reversed(self.points)) if self.points else None
+
+    def close(self) -> None:
+        """End of the track: the last point is kept without speed, as in Track."""
+        if self.last is not None:
+            self.points[self.last.reading_time] = self.last
@@ -0,0 +1,151 @@
+"""Database backend detection: PostgreSQL/PostGIS or SQLite/SpatiaLite."""
+
+from dataclasses import dataclass
+import os
+import threading
+from typing import Optional, Union
+import weakref
+
+from sqlalchemy import event, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+
+# Version PostgreSQL minimale pour corelte.orm.partition : LIKE ... INCLUDING GENERATED (12),
+# clés primaire/étrangères sur la table partitionnée et partition DEFAULT (11)
+PARTITIONING_MIN_SERVER = (12,)
+
+# SRID chargés dans une base SpatiaLite en plus de WGS84 : LV03 et LV95
+SPATIALITE_EXTRA_SRIDS = (21781, 2056)
+
+
+@dataclass(frozen=True)
+class Capabilities:
+    """Features available on a database backend.
+
+    Attributes:
+        dialect: SQLAlchemy dialect name ('postgresql' or 'sqlite')
+        spatial_version: PostGIS or SpatiaLite version, None without spatial extension
+        partitioning: Declarative partitioning as used by corelte.orm.partition (PostgreSQL >= 12:
+            LIKE ... INCLUDING GENERATED, keys on the partitioned table and DEFAULT partition)
+        brin: BRIN indexes (PostgreSQL)
+        mvt: ST_AsMVT vector tiles (PostGIS >= 2.4)
+        notify: LISTEN/NOTIFY (PostgreSQL)
+    """
+    dialect: str
+    spatial_version: Optional[str] = None
+    partitioning: bool = False
+    brin: bool = False
+    mvt: bool = False
+    notify: bool = False
+
+    @property
+    def is_postgis(self) -> bool:
+        return self.dialect == 'postgresql' and self.spatial_version is not None
+
+    @property
+    def is_spatialite(self) -> bool:
+        return self.dialect == 'sqlite' and self.spatial_version is not None
+
+
+_capabilities: 'weakref.WeakKeyDictionary[Engine, Capabilities]' = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def _scalar(engine: Engine, sql: str) -> Optional[str]:
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text(sql)).scalar()
+    except DBAPIError:
+        return None
+
+
+def capabilities(engine: Engine) -> Capabilities:
+    """Detect (once per engine) the features of the database backend.
+
+    Args:
+        engine: SQLAlchemy engine
+
+    Returns:
+        Capabilities of the backend
+    """
+    caps = _capabilities.get(engine)
+    if caps is not None:
+        return caps
+
+    dialect = engine.dialect.name
+    if dialect == 'postgresql':
+        version = _scalar(engine, 'SELECT PostGIS_Lib_Version()')
+        server = engine.dialect.server_version_info or (0,) # renseigné par la première connexion
+        mvt = version is not None and tuple(int(v) for v in version.split('.')[:2]) >= (2, 4)
+        caps = Capabilities(dialect, version, partitioning=server >= PARTITIONING_MIN_SERVER, brin=True, mvt=mvt, notify=True)
+    elif dialect == 'sqlite':
+        caps = Capabilities(dialect, _scalar(engine, 'SELECT spatialite_version()'))
+    else:
+        caps = Capabilities(dialect)
+
+    with _lock:
+        _capabilities[engine] = caps
+    return caps
+
+
+def session_capabilities(session: Session) -> Capabilities:
+    """Capabilities of the engine a session is bound to."""
+    return capabilities(session.get_bind().engine)
+
+
+def dialect_insert(session: Union[Session, Connection], entity):
+    """Return the INSERT construct of the session's dialect (supports ON CONFLICT).
+
+    Args:
+        session: Database session, or a connection
+        entity: Mapped class or table
+
+    Returns:
+        PostgreSQL or SQLite Insert object
+    """
+    bind = session.get_bind() if isinstance(session, Session) else session
+    if bind.dialect.name == 'sqlite':
+        return sqlite.insert(entity)
+    return postgresql.insert(entity)
+
+
+def _on_sqlite_connect(dbapi_conn, connection_record) -> None:
+    """Enable foreign keys (ON DELETE CASCADE) and load SpatiaLite when available."""
+    dbapi_conn.execute('PRAGMA foreign_keys = ON')
+    os.environ.setdefault('SPATIALITE_LIBRARY_PATH', 'mod_spatialite')
+    try:
+        from geoalchemy2 import load_spatialite
+        load_spatialite(dbapi_conn, connection_record, init_mode='WGS84')
+        for srid in SPATIALITE_EXTRA_SRIDS:
+            dbapi_conn.execute(f'SELECT InsertEpsgSrid({srid})')
+    except Exception as e:
+        # Sans SpatiaLite, seules les tables sans géométrie sont utilisables
+        print(f"SpatiaLite indisponible: {e}")
+
+
+def configure_sqlite_engine(engine: Engine) -> Engine:
+    """Register the SQLite connection hooks on an engine.
+
+    Args:
+        engine: Engine created with a sqlite:// URL
+
+    Returns:
+        The same engine
+    """
+    event.listen(engine, 'connect', _on_sqlite_connect)
+    return engine
+
+
+def sqlite_engine_options(url: str) -> dict:
+    """Keyword arguments for create_engine with a SQLite URL.
+
+    An in-memory database ('sqlite://' or 'sqlite:///:memory:') lives in a single
+    connection shared by every session and thread.
+    """
+    if url in ('sqlite://', 'sqlite:///:memory:'):
+        return {'poolclass': StaticPool, 'connect_args': {'check_same_thread': False}}
+    return {'connect_args': {'check_same_thread': False}}
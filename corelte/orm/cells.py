@@ -0,0 +1,117 @@
+"""Idempotent, concurrency-safe registration of cells."""
+
+import threading
+from typing import Dict, Iterable, Mapping, Optional, Set, Tuple, Union
+
+from sqlalchemy import Connection, Engine, event
+from sqlalchemy.orm import Session
+
+from .backend import dialect_insert
+from .models import Cell_orm
+
+
+# Base de données d'un cache : URL de l'engine (et engine pour une base SQLite en mémoire)
+BindKey = str
+
+
+def bind_key(bind: Union[Engine, Connection]) -> BindKey:
+    """Identify the database of an engine or connection (URL without password)."""
+    engine = getattr(bind, 'engine', bind)
+    url = engine.url
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        # chaque engine en mémoire est une base distincte
+        return f'{url.render_as_string()}#{id(engine)}'
+    return url.render_as_string(hide_password=True)
+
+
+class CellCache:
+    """Process-wide cache of the cells known to exist, per database and network.
+
+    A cell is only added to the cache once the transaction which registered it
+    is committed, so a rollback never leaves the cache ahead of the database.
+    Cells deleted or restored outside register_cells() must be invalidated
+    with clear().
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._known: Dict[Tuple[BindKey, int], Set[int]] = {}
+
+    def missing(self, bind: BindKey, network_id: int, cell_ids: Iterable[int]) -> Set[int]:
+        """Return the cell ids not known to exist yet in a database."""
+        with self._lock:
+            known = self._known.get((bind, network_id), set())
+            return {c for c in cell_ids if c not in known}
+
+    def add(self, bind: BindKey, network_id: int, cell_ids: Iterable[int]) -> None:
+        """Mark cells as existing in a database."""
+        with self._lock:
+            self._known.setdefault((bind, network_id), set()).update(cell_ids)
+
+    def clear(self, network_id: Optional[int] = None, bind: Optional[Union[BindKey, Engine, Connection]] = None) -> None:
+        """Forget the cells of a network and/or a database, or every cell.
+
+        Args:
+            network_id: Network to forget, None for every network
+            bind: Database to forget (bind key, engine or connection), None for every database
+        """
+        if bind is not None and not isinstance(bind, str):
+            bind = bind_key(bind)
+        with self._lock:
+            for key in list(self._known):
+                if (network_id is None or key[1] == network_id) and (bind is None or key[0] == bind):
+                    del self._known[key]
+
+
+# Cache partagé par tous les imports du processus
+cell_cache = CellCache()
+
+_PENDING_KEY = 'corelte_pending_cells'
+
+
+@event.listens_for(Session, 'after_commit')
+def _promote_pending_cells(session: Session) -> None:
+    for (bind, network_id), cell_ids in session.info.pop(_PENDING_KEY, {}).items():
+        cell_cache.add(bind, network_id, cell_ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_cells(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def register_cells(session: Session, network_id: int, cells: Mapping[int, Optional[int]]) -> int:
+    """Make sure the cells exist, without failing if another import inserts them concurrently.
+
+    Cells already in the process cache of the session's database are skipped; the
+    others are inserted with ON CONFLICT DO NOTHING, in cell_id order to avoid
+    deadlocks between imports.
+
+    Args:
+        session: Database session, committed by the caller
+        network_id: Network identifier
+        cells: Mapping cell_id -> tac
+
+    Returns:
+        Number of cells sent to the database
+    """
+    bind = bind_key(session.get_bind(Cell_orm))
+    missing = sorted(cell_cache.missing(bind, network_id, (c for c in cells if c is not None)))
+    if not missing:
+        return 0
+
+    rows = [{'network_id': network_id, 'cell_id': cell_id, 'tac': cells[cell_id], 'geom': None} for cell_id in missing]
+    stmt = dialect_insert(session, Cell_orm).values(rows) \
+        .on_conflict_do_nothing(index_elements=['network_id', 'cell_id'])
+    session.execute(stmt)
+
+    session.info.setdefault(_PENDING_KEY, {}).setdefault((bind, network_id), set()).update(missing)
+    return len(missing)
+
+
+def cells_of(rows: Iterable[Mapping]) -> Dict[int, Optional[int]]:
+    """Collect cell_id -> tac from reading rows (first tac seen wins)."""
+    tacs: Dict[int, Optional[int]] = {}
+    for row in rows:
+        tacs.setdefault(row['cell_id'], row['tac'])
+    return tacs
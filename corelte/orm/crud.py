@@ -1,9 +1,9 @@
 """Database CRUD operations for the ORM layer."""
 
 from typing import Optional
-from sqlalchemy import create_engine, inspect
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy import MetaData, Table
-from sqlalchemy.schema import DropTable
+from sqlalchemy.schema import CreateColumn, DropTable
 from sqlalchemy.engine import Engine
 from sqlalchemy.exc import SQLAlchemyError
 
@@ -102,3 +102,35 @@ def table_exists(
     return inspect(engine).has_table(table_name, schema=schema_name)
 
 
+
+def add_missing_columns(
+    engine: Engine,
+    model: type[Base]
+) -> list[str]:
+    """Add to an existing table the columns of its model that are missing.
+
+    create_all() never alters existing tables; this lets a database created
+    with an older version of the models pick up new columns.
+
+    Args:
+        engine: SQLAlchemy engine instance
+        model: Mapped class whose table is checked
+
+    Returns:
+        list[str]: Names of the columns added
+    """
+    table = model.__table__
+    if not inspect(engine).has_table(table.name, schema=table.schema):
+        return []
+
+    existing = {c['name'] for c in inspect(engine).get_columns(table.name, schema=table.schema)}
+    preparer = engine.dialect.identifier_preparer
+    added = []
+    with engine.begin() as conn:
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = CreateColumn(column).compile(dialect=engine.dialect)
+            conn.execute(text(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {ddl}"))
+            added.append(column.name)
+    return added
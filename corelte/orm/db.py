@@ -1,12 +1,26 @@
 """Database connection and session management module."""
 
 from contextlib import contextmanager
-from typing import Generator
+import os
+import threading
+from typing import Any, Callable, Dict, Generator, List, Optional
 from sqlalchemy import create_engine, Engine
 from sqlalchemy.orm import sessionmaker, scoped_session, Session
 
+from .backend import configure_sqlite_engine, sqlite_engine_options
+
 class DatabaseConfig:
-    """Database configuration constants."""
+    """Database configuration.
+
+    Every value can be overridden with an environment variable (LTE_DB_HOST,
+    LTE_DB_PORT, LTE_DB_USER, LTE_DB_PASSWORD, LTE_DB_NAME, LTE_DB_TEST_NAME,
+    LTE_DB_ECHO, LTE_DB_POOL_SIZE, LTE_DB_MAX_OVERFLOW, LTE_DB_POOL_PRE_PING)
+    or with configure(). Values are read when the engines are first created.
+
+    LTE_DB_URL and LTE_DB_TEST_URL replace the PostgreSQL URL altogether, e.g.
+    'sqlite:///survey.db' for a SpatiaLite file or 'sqlite://' for an in-memory
+    database (offline runs, fast test suites).
+    """
     
     # Database names
     ADMIN_DB = "postgres"
@@ -18,6 +32,64 @@ class DatabaseConfig:
     PORT = "5432"
     USER = "gis"
     PASSWORD = "password"
+
+    # Full URLs (override the PostgreSQL parameters above when set)
+    MAIN_URL = None
+    TEST_URL = None
+
+    # Engine parameters
+    ECHO = False
+    POOL_SIZE = 5
+    MAX_OVERFLOW = 10
+    POOL_PRE_PING = True
+
+    _ENV = {
+        'ADMIN_DB': 'LTE_DB_ADMIN_NAME',
+        'MAIN_DB': 'LTE_DB_NAME',
+        'TEST_DB': 'LTE_DB_TEST_NAME',
+        'HOST': 'LTE_DB_HOST',
+        'PORT': 'LTE_DB_PORT',
+        'USER': 'LTE_DB_USER',
+        'PASSWORD': 'LTE_DB_PASSWORD',
+        'MAIN_URL': 'LTE_DB_URL',
+        'TEST_URL': 'LTE_DB_TEST_URL',
+        'ECHO': 'LTE_DB_ECHO',
+        'POOL_SIZE': 'LTE_DB_POOL_SIZE',
+        'MAX_OVERFLOW': 'LTE_DB_MAX_OVERFLOW',
+        'POOL_PRE_PING': 'LTE_DB_POOL_PRE_PING',
+    }
+
+    @classmethod
+    def configure(cls, **values: Any) -> None:
+        """Override configuration values, e.g. configure(HOST='db', POOL_SIZE=2).
+
+        Must be called before the engines are created, or followed by db_engines.dispose()
+        (which also resets the session factories).
+        """
+        for name, value in values.items():
+            if name not in cls._ENV:
+                raise ValueError(f"Unknown database setting: {name}")
+            setattr(cls, name, value)
+
+    @classmethod
+    def get(cls, name: str) -> Any:
+        """Get a configuration value, the environment taking precedence.
+
+        Args:
+            name: Name of the setting (class attribute name)
+
+        Returns:
+            Value converted to the type of the default value
+        """
+        default = getattr(cls, name)
+        value = os.environ.get(cls._ENV[name])
+        if value is None:
+            return default
+        if isinstance(default, bool):
+            return value.strip().lower() in ('1', 'true', 'yes', 'on')
+        if isinstance(default, int):
+            return int(value)
+        return value
     
     @classmethod
     def get_url(cls, database: str) -> str:
@@ -29,31 +101,110 @@ class DatabaseConfig:
         Returns:
             Database connection URL string
         """
-        return f"postgresql://{cls.USER}:{cls.PASSWORD}@{cls.HOST}:{cls.PORT}/{database}"
+        return f"postgresql://{cls.get('USER')}:{cls.get('PASSWORD')}@{cls.get('HOST')}:{cls.get('PORT')}/{database}"
+
+    @classmethod
+    def engine_options(cls) -> Dict[str, Any]:
+        """Keyword arguments passed to create_engine for pooled engines."""
+        return {
+            'echo': cls.get('ECHO'),
+            'pool_size': cls.get('POOL_SIZE'),
+            'max_overflow': cls.get('MAX_OVERFLOW'),
+            'pool_pre_ping': cls.get('POOL_PRE_PING'),
+        }
+
+def create_database_engine(url: str) -> Engine:
+    """Create an engine for a PostgreSQL/PostGIS or SQLite/SpatiaLite URL.
+
+    Args:
+        url: Database URL
+
+    Returns:
+        Configured SQLAlchemy engine
+    """
+    if url.startswith('sqlite'):
+        engine = create_engine(url, echo=DatabaseConfig.get('ECHO'), **sqlite_engine_options(url))
+        return configure_sqlite_engine(engine)
+    return create_engine(url, **DatabaseConfig.engine_options())
 
 class DatabaseEngine:
-    """Database engine management."""
+    """Database engine management.
+
+    Engines are created lazily on first access, so importing this module does
+    not open any connection. In a forked worker process, reset_after_fork()
+    drops the engines inherited from the parent without closing the parent's
+    connections; it is registered automatically with os.register_at_fork.
+    """
     
     def __init__(self) -> None:
-        """Initialize database engines."""
-        # Admin connection (requires AUTOCOMMIT for database creation)
-        self.admin = create_engine(
-            DatabaseConfig.get_url(DatabaseConfig.ADMIN_DB),
-            echo=True,
-            isolation_level="AUTOCOMMIT"
-        )
-        
-        # Main application connection
-        self.main = create_engine(
-            DatabaseConfig.get_url(DatabaseConfig.MAIN_DB),
-            echo=True
-        )
-        
-        # Test database connection
-        self.test = create_engine(
-            DatabaseConfig.get_url(DatabaseConfig.TEST_DB),
-            echo=True
-        )
+        """Initialize the (empty) engine registry."""
+        self._engines: Dict[str, Engine] = {}
+        self._lock = threading.Lock()
+        # Rappelés quand les engines sont oubliés (SessionFactory.reset)
+        self._on_reset: List[Callable[[], None]] = []
+
+    def _get(self, name: str) -> Engine:
+        engine = self._engines.get(name)
+        if engine is None:
+            with self._lock:
+                engine = self._engines.get(name)
+                if engine is None:
+                    engine = self._create(name)
+                    self._engines[name] = engine
+        return engine
+
+    def _create(self, name: str) -> Engine:
+        if name == 'admin':
+            # Admin connection (requires AUTOCOMMIT for database creation)
+            return create_engine(
+                DatabaseConfig.get_url(DatabaseConfig.get('ADMIN_DB')),
+                echo=DatabaseConfig.get('ECHO'),
+                isolation_level="AUTOCOMMIT"
+            )
+        if name == 'main':
+            url = DatabaseConfig.get('MAIN_URL') or DatabaseConfig.get_url(DatabaseConfig.get('MAIN_DB'))
+        else:
+            url = DatabaseConfig.get('TEST_URL') or DatabaseConfig.get_url(DatabaseConfig.get('TEST_DB'))
+        return create_database_engine(url)
+
+    @property
+    def admin(self) -> Engine:
+        """Admin connection to the postgres database."""
+        return self._get('admin')
+
+    @property
+    def main(self) -> Engine:
+        """Main application connection."""
+        return self._get('main')
+
+    @property
+    def test(self) -> Engine:
+        """Test database connection."""
+        return self._get('test')
+
+    def dispose(self) -> None:
+        """Close all pooled connections and forget the engines and the session factories bound to them."""
+        with self._lock:
+            for engine in self._engines.values():
+                engine.dispose()
+            self._engines.clear()
+        self._notify_reset()
+
+    def reset_after_fork(self) -> None:
+        """Forget the engines inherited from the parent process.
+
+        The pooled connections belong to the parent: they are dropped without
+        being closed, and new engines are created on first use in the child.
+        """
+        self._lock = threading.Lock()
+        for engine in self._engines.values():
+            engine.dispose(close=False)
+        self._engines.clear()
+        self._notify_reset()
+
+    def _notify_reset(self) -> None:
+        for callback in self._on_reset:
+            callback()
 
 class SessionFactory:
     """Database session factory management."""
@@ -64,26 +215,50 @@ class SessionFactory:
         Args:
             engines: DatabaseEngine instance containing engine configurations
         """
-        self.main = scoped_session(
-            sessionmaker(
-                autocommit=False,
-                autoflush=False,
-                bind=engines.main
-            )
-        )
-        
-        self.test = scoped_session(
+        self.engines = engines
+        self._main: Optional[scoped_session] = None
+        self._test: Optional[scoped_session] = None
+        engines._on_reset.append(self.reset)
+
+    def _scoped(self, engine: Engine) -> scoped_session:
+        return scoped_session(
             sessionmaker(
                 autocommit=False,
                 autoflush=False,
-                bind=engines.test
+                bind=engine
             )
         )
 
-# Global instances
+    @property
+    def main(self) -> scoped_session:
+        """Scoped session factory bound to the main database."""
+        if self._main is None:
+            self._main = self._scoped(self.engines.main)
+        return self._main
+
+    @property
+    def test(self) -> scoped_session:
+        """Scoped session factory bound to the test database."""
+        if self._test is None:
+            self._test = self._scoped(self.engines.test)
+        return self._test
+
+    def reset(self) -> None:
+        """Forget the session factories, e.g. after the engines were reset."""
+        self._main = None
+        self._test = None
+
+# Global instances (aucune connexion n'est ouverte avant la première utilisation)
 db_engines = DatabaseEngine()
 session_factory = SessionFactory(db_engines)
 
+def reset_engines_after_fork() -> None:
+    """Reset engines and sessions in a freshly forked worker process."""
+    db_engines.reset_after_fork() # remet aussi session_factory à zéro
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_engines_after_fork)
+
 @contextmanager
 def get_db_session() -> Generator[Session, None, None]:
     """Get a database session for the main database.
@@ -1,7 +1,7 @@
 from datetime import datetime
 from geoalchemy2 import Geometry
 from geoalchemy2.shape import from_shape
-from sqlalchemy import ForeignKeyConstraint, func, Identity, Index, Integer, REAL, SmallInteger, String, TIMESTAMP
+from sqlalchemy import Computed, ForeignKeyConstraint, func, Identity, Index, Integer, REAL, SmallInteger, String, TIMESTAMP
 from sqlalchemy.orm import DeclarativeBase, MappedAsDataclass, Mapped
 from sqlalchemy.orm import mapped_column, relationship
 from shapely.geometry import Point
@@ -12,18 +12,77 @@ class Base(MappedAsDataclass, DeclarativeBase):
     pass
 
 
+# Découpage LTE de l'identifiant de cellule (ECI) : eNodeB id sur 20 bits, identifiant local sur 8 bits
+ENODEB_SHIFT = 8 # cell_id = enodeb_id * 256 + local_cell_id
+ENODEB_ID_SQL = f'cell_id / {1 << ENODEB_SHIFT}'
+LOCAL_CELL_ID_SQL = f'cell_id % {1 << ENODEB_SHIFT}'
+
+
 class Cell_orm(Base):
     __tablename__ = 'cell'
+    __table_args__ = (
+        Index('ix_cell_network_id_enodeb_id', 'network_id', 'enodeb_id'),
+    )
 
     network_id: Mapped[int] = mapped_column(Integer, primary_key=True)
     cell_id: Mapped[int] = mapped_column(Integer, primary_key=True)
     tac: Mapped[int] = mapped_column(nullable=True)
     geom: Mapped[None] = mapped_column(Geometry(geometry_type='POINT', srid=4326), nullable=True)
+    enodeb_id: Mapped[int] = mapped_column(Integer, Computed(ENODEB_ID_SQL, persisted=True), init=False)
+    local_cell_id: Mapped[int] = mapped_column(SmallInteger, Computed(LOCAL_CELL_ID_SQL, persisted=True), init=False)
 
     # le default_factory = list est important pour initialiser 
     readings: Mapped[list['Reading_orm']] = relationship('Reading_orm', back_populates='cell', default_factory=list, overlaps='cell,readings')
 
 
+class CoverageBin(Base):
+    """Nombre de mesures par maille d'une grille LV95, par cellule, bande et PCI."""
+    __tablename__ = 'coverage_bin'
+    __table_args__ = (
+        Index('ix_coverage_bin_network_id_level_ix_iy', 'network_id', 'level', 'ix', 'iy'),
+    )
+
+    network_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    level: Mapped[int] = mapped_column(SmallInteger, primary_key=True) # taille de la maille en mètres
+    ix: Mapped[int] = mapped_column(Integer, primary_key=True) # floor(E / level), E en LV95
+    iy: Mapped[int] = mapped_column(Integer, primary_key=True) # floor(N / level)
+    cell_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    band: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    pci: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, nullable=False)
+    last_seen: Mapped[None] = mapped_column(TIMESTAMP, nullable=False)
+
+
+class Handover(Base):
+    """Changement de cellule, PCI, bande ou TAC entre deux mesures valides successives d'un survey."""
+    __tablename__ = 'handover'
+    __table_args__ = (
+        ForeignKeyConstraint(['network_id', 'survey_id'],
+                             ['survey.network_id', 'survey.survey_id'], ondelete='CASCADE'),
+        Index('ux_handover_network_id_survey_id_file_idx', 'network_id', 'survey_id', 'file_idx', unique=True),
+        Index('ix_handover_network_id_from_cell_id', 'network_id', 'from_cell_id'),
+        Index('ix_handover_network_id_to_cell_id', 'network_id', 'to_cell_id'),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, Identity(always=True), primary_key=True, init=False)
+    network_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    survey_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    file_idx: Mapped[int] = mapped_column(SmallInteger, nullable=False) # première mesure sur la nouvelle cellule
+    prev_file_idx: Mapped[int] = mapped_column(SmallInteger, nullable=False) # dernière mesure sur l'ancienne cellule
+    reading_time: Mapped[None] = mapped_column(TIMESTAMP, nullable=False)
+    changed: Mapped[int] = mapped_column(SmallInteger, nullable=False) # bits HANDOVER_* (corelte.handover)
+    from_cell_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    to_cell_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    from_pci: Mapped[int] = mapped_column(SmallInteger, nullable=True)
+    to_pci: Mapped[int] = mapped_column(SmallInteger, nullable=True)
+    from_band: Mapped[int] = mapped_column(SmallInteger, nullable=True)
+    to_band: Mapped[int] = mapped_column(SmallInteger, nullable=True)
+    from_tac: Mapped[int] = mapped_column(Integer, nullable=True)
+    to_tac: Mapped[int] = mapped_column(Integer, nullable=True)
+    speed: Mapped[float] = mapped_column(REAL, nullable=True)
+    geom: Mapped[None] = mapped_column(Geometry(geometry_type='POINT', srid=4326), nullable=False) # milieu des deux mesures
+
+
 class Network(Base):
     __tablename__ = "network"
 
@@ -43,7 +102,9 @@ class Reading_orm(Base):
         ForeignKeyConstraint(['network_id', 'survey_id'], # relation SQL Many-to-One to Table 'survey'
                              ['survey.network_id','survey.survey_id'], ondelete='CASCADE'),
         Index('ix_network_id_cell_id', 'network_id', 'cell_id'),
-        Index('ix_network_id_survey_id', 'network_id', 'survey_id')
+        Index('ix_network_id_survey_id', 'network_id', 'survey_id'),
+        Index('ux_network_id_survey_id_file_idx', 'network_id', 'survey_id', 'file_idx', unique=True), # clé de l'import incrémental
+        Index('ix_reading_network_id_enodeb_id', 'network_id', 'enodeb_id'),
     ) 
     
     id: Mapped[int] = mapped_column(Integer, Identity(always=True), primary_key=True, init=False)
@@ -58,6 +119,8 @@ class Reading_orm(Base):
     speed: Mapped[float] = mapped_column(REAL, nullable=False)
     reading_time: Mapped[None] = mapped_column(TIMESTAMP, nullable=False) # Without timezone by default
     geom: Mapped[None] = mapped_column(Geometry(geometry_type='POINT', srid=4326), nullable=False)
+    enodeb_id: Mapped[int] = mapped_column(Integer, Computed(ENODEB_ID_SQL, persisted=True), init=False)
+    local_cell_id: Mapped[int] = mapped_column(SmallInteger, Computed(LOCAL_CELL_ID_SQL, persisted=True), init=False)
     
     cell: Mapped['Cell_orm'] = relationship('Cell_orm', back_populates='readings', default=None, overlaps='readings,cell') # relation Python class Cell_orm
     survey: Mapped['Survey'] = relationship('Survey', back_populates='readings', default=None, overlaps='readings,survey') # relation Python class Survey
@@ -78,6 +141,8 @@ class Sector(Base):
     cell_id: Mapped[int] = mapped_column(Integer, primary_key=True)
     station_name: Mapped[str] = mapped_column(String(20), index=True)
     geom: Mapped[None] = mapped_column(Geometry(geometry_type="MultiPolygon", srid=4326), nullable=True)
+    geom_updated: Mapped[None] = mapped_column(TIMESTAMP, nullable=True, default=None) # date du dernier calcul de geom
+    sector_split: Mapped[int] = mapped_column(SmallInteger, nullable=True, default=None) # nombre de secteurs du site (eNodeB)
 
 
 class Station(Base):
@@ -90,6 +155,28 @@ class Station(Base):
     date_fiche: Mapped[None] = mapped_column(TIMESTAMP, nullable=False)
     uploaded: Mapped[None] = mapped_column(TIMESTAMP, nullable=False, server_default=func.now())
     geom: Mapped[None] = mapped_column(Geometry(geometry_type='POINT', srid=4326), nullable=False)
+    attr_hash: Mapped[str] = mapped_column(String(32), nullable=True, default=None) # empreinte des attributs BAKOM
+    first_seen: Mapped[None] = mapped_column(TIMESTAMP, nullable=True, init=False, server_default=func.now())
+    deleted: Mapped[None] = mapped_column(TIMESTAMP, nullable=True, default=None) # date de disparition du fichier BAKOM
+
+
+class StationChange(Base):
+    """Journal des changements des stations lors des mises à jour BAKOM."""
+    __tablename__ = 'station_change'
+    __table_args__ = (
+        Index('ix_station_change_changed', 'changed'),
+        Index('ix_station_change_network_id_name', 'network_id', 'name'),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, Identity(always=True), primary_key=True, init=False)
+    network_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    name: Mapped[str] = mapped_column(String(20), nullable=False)
+    change: Mapped[str] = mapped_column(String(10), nullable=False) # insert, update, delete, restore
+    changed: Mapped[None] = mapped_column(TIMESTAMP, nullable=False)
+    old_technos: Mapped[int] = mapped_column(SmallInteger, nullable=True, default=None)
+    new_technos: Mapped[int] = mapped_column(SmallInteger, nullable=True, default=None)
+    old_power_id: Mapped[int] = mapped_column(SmallInteger, nullable=True, default=None)
+    new_power_id: Mapped[int] = mapped_column(SmallInteger, nullable=True, default=None)
 
 
 class Survey(Base):
@@ -0,0 +1,208 @@
+"""Partitioned storage of the reading table (PostgreSQL/PostGIS only).
+
+The reading table is list-partitioned by network_id, with a BRIN index on
+reading_time and a GiST index on geom. The migration copies the existing
+readings into the partitioned table inside a single transaction and only
+drops the old table once the row counts match.
+
+Usage:
+    python -m corelte.orm.partition migrate
+    python -m corelte.orm.partition cluster --network 1
+"""
+
+import argparse
+from typing import Iterable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from .backend import capabilities
+from .models import Base, Reading_orm
+
+TABLE = Reading_orm.__tablename__
+
+# Index de la table partitionnée : nom -> définition (le nom de la table est ajouté)
+PARTITIONED_INDEXES = {
+    'ix_network_id_cell_id': 'USING btree (network_id, cell_id)',
+    'ix_network_id_survey_id': 'USING btree (network_id, survey_id)',
+    'ix_reading_tac': 'USING btree (tac)',
+    'ix_reading_network_id_enodeb_id': 'USING btree (network_id, enodeb_id)',
+    'ix_reading_reading_time_brin': 'USING brin (reading_time) WITH (pages_per_range = 32)',
+    'idx_reading_geom': 'USING gist (geom)',
+}
+
+
+def is_partitioned(conn: Connection, table: str = TABLE) -> bool:
+    """Return True if the table is a partitioned table."""
+    stmt = text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p "
+                "JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = :table)")
+    return bool(conn.execute(stmt, {'table': table}).scalar())
+
+
+def partition_name(network_id: Optional[int]) -> str:
+    """Name of the partition of a network, None for the default partition."""
+    return f'{TABLE}_default' if network_id is None else f'{TABLE}_net_{network_id:02}'
+
+
+def ensure_network_partitions(conn: Connection, network_ids: Iterable[int], table: str = TABLE) -> List[str]:
+    """Create the missing partitions of the given networks.
+
+    Readings of a network without partition go to the default partition.
+
+    Returns:
+        Names of the partitions created
+    """
+    created = []
+    for network_id in sorted(set(network_ids)):
+        name = partition_name(network_id)
+        exists = conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {'name': name}).scalar()
+        if not exists:
+            conn.execute(text(f'CREATE TABLE {name} PARTITION OF {table} FOR VALUES IN ({int(network_id)})'))
+            created.append(name)
+    return created
+
+
+def _network_ids(conn: Connection) -> List[int]:
+    stmt = text(f"SELECT id FROM network UNION SELECT DISTINCT network_id FROM {TABLE}")
+    return [row[0] for row in conn.execute(stmt)]
+
+
+def partition_reading_table(engine: Engine, drop_old: bool = True) -> bool:
+    """Migrate the reading table to a table list-partitioned by network_id.
+
+    Existing readings (and their ids) are copied; the old table is renamed
+    and dropped only after the copy is verified.
+
+    Args:
+        engine: Engine of a PostgreSQL/PostGIS database
+        drop_old: Drop the old table after the copy, otherwise keep it as reading_unpartitioned
+
+    Returns:
+        False if the table was already partitioned, True after the migration
+
+    Raises:
+        RuntimeError: If the backend does not support partitioning or the copy is incomplete
+    """
+    if not capabilities(engine).partitioning:
+        raise RuntimeError(f"Table partitioning is not supported by the {engine.dialect.name} backend")
+
+    with engine.begin() as conn:
+        if is_partitioned(conn):
+            ensure_network_partitions(conn, _network_ids(conn))
+            return False
+
+        network_ids = _network_ids(conn)
+        max_id = conn.execute(text(f'SELECT coalesce(max(id), 0) FROM {TABLE}')).scalar()
+
+        # 1. Table partitionnée avec les mêmes colonnes; l'identité devient une séquence
+        #    (les colonnes IDENTITY ne sont pas supportées sur une table partitionnée avant PostgreSQL 17)
+        conn.execute(text(f'CREATE SEQUENCE IF NOT EXISTS {TABLE}_id_part_seq AS integer'))
+        conn.execute(text(f"SELECT setval('{TABLE}_id_part_seq', :v, true)"), {'v': max(max_id, 1)})
+        conn.execute(text(
+            f'CREATE TABLE {TABLE}_part (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING GENERATED) '
+            f'PARTITION BY LIST (network_id)'))
+        conn.execute(text(f"ALTER TABLE {TABLE}_part ALTER COLUMN id SET DEFAULT nextval('{TABLE}_id_part_seq')"))
+        conn.execute(text(f'ALTER TABLE {TABLE}_part ADD PRIMARY KEY (network_id, id)'))
+        conn.execute(text(f'ALTER TABLE {TABLE}_part ADD UNIQUE (network_id, survey_id, file_idx)'))
+        conn.execute(text(f'ALTER TABLE {TABLE}_part ADD FOREIGN KEY (network_id, cell_id) '
+                          f'REFERENCES cell (network_id, cell_id)'))
+        conn.execute(text(f'ALTER TABLE {TABLE}_part ADD FOREIGN KEY (network_id, survey_id) '
+                          f'REFERENCES survey (network_id, survey_id) ON DELETE CASCADE'))
+
+        ensure_network_partitions(conn, network_ids, table=f'{TABLE}_part')
+        conn.execute(text(f'CREATE TABLE {partition_name(None)} PARTITION OF {TABLE}_part DEFAULT'))
+
+        # 2. Copie des mesures existantes
+        columns = ', '.join(c.name for c in Reading_orm.__table__.columns if c.computed is None)
+        conn.execute(text(f'INSERT INTO {TABLE}_part ({columns}) SELECT {columns} FROM {TABLE}'))
+        nb_old = conn.execute(text(f'SELECT count(*) FROM {TABLE}')).scalar()
+        nb_new = conn.execute(text(f'SELECT count(*) FROM {TABLE}_part')).scalar()
+        if nb_old != nb_new:
+            raise RuntimeError(f"Reading copy incomplete: {nb_new} of {nb_old} rows")
+
+        # 3. Bascule : l'ancienne table et ses index libèrent les noms
+        conn.execute(text(f'ALTER TABLE {TABLE} RENAME TO {TABLE}_unpartitioned'))
+        for name in PARTITIONED_INDEXES:
+            conn.execute(text(f'ALTER INDEX IF EXISTS {name} RENAME TO {name}_unpartitioned'))
+        conn.execute(text(f'ALTER TABLE {TABLE}_part RENAME TO {TABLE}'))
+        conn.execute(text(f'ALTER SEQUENCE {TABLE}_id_part_seq OWNED BY {TABLE}.id'))
+        if drop_old:
+            conn.execute(text(f'DROP TABLE {TABLE}_unpartitioned'))
+
+        # 4. Index (créés sur chaque partition)
+        for name, definition in PARTITIONED_INDEXES.items():
+            conn.execute(text(f'CREATE INDEX {name} ON {TABLE} {definition}'))
+
+    with engine.connect() as conn:
+        conn.execute(text(f'ANALYZE {TABLE}'))
+    return True
+
+
+def create_schema(engine: Engine, partitioned: bool = False) -> None:
+    """Create the tables, optionally with a partitioned reading table.
+
+    Args:
+        engine: SQLAlchemy engine
+        partitioned: List-partition the reading table by network_id (PostgreSQL only)
+    """
+    Base.metadata.create_all(engine)
+    if partitioned:
+        partition_reading_table(engine)
+
+
+def cluster_reading_partitions(engine: Engine, network_id: Optional[int] = None) -> List[str]:
+    """Physically reorder the partitions along their GiST index on geom.
+
+    Readings close in space end up in the same pages, which speeds up map layer
+    loads and bounding box queries. CLUSTER takes an exclusive lock on the
+    partition being rewritten; partitions are processed one at a time.
+
+    Args:
+        engine: Engine of a PostgreSQL/PostGIS database
+        network_id: Only cluster the partition of this network
+
+    Returns:
+        Names of the partitions clustered
+    """
+    stmt = text("SELECT t.relname, ci.relname FROM pg_inherits ii "
+                "JOIN pg_class ci ON ci.oid = ii.inhrelid "
+                "JOIN pg_index x ON x.indexrelid = ci.oid "
+                "JOIN pg_class t ON t.oid = x.indrelid "
+                "WHERE ii.inhparent = 'idx_reading_geom'::regclass ORDER BY t.relname")
+
+    with engine.connect() as conn:
+        if not is_partitioned(conn):
+            raise RuntimeError(f"Table {TABLE} is not partitioned, run the migration first")
+        partitions = conn.execute(stmt).all()
+
+    if network_id is not None:
+        partitions = [p for p in partitions if p[0] == partition_name(network_id)]
+
+    clustered = []
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        for partition, index in partitions:
+            print(f"CLUSTER {partition} USING {index}")
+            conn.execute(text(f'CLUSTER {partition} USING {index}'))
+            conn.execute(text(f'ANALYZE {partition}'))
+            clustered.append(partition)
+    return clustered
+
+
+def main():
+    from .db import db_engines
+
+    parser = argparse.ArgumentParser(description="Maintenance de la table reading partitionnée")
+    parser.add_argument('command', choices=['migrate', 'cluster'])
+    parser.add_argument('--network', type=int, default=None, help="network_id de la partition à réordonner")
+    parser.add_argument('--keep-old', action='store_true', help="conserve l'ancienne table reading_unpartitioned")
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        done = partition_reading_table(db_engines.main, drop_old=not args.keep_old)
+        print("Migration effectuée" if done else "Table déjà partitionnée, partitions mises à jour")
+    else:
+        print(f"Partitions réordonnées: {cluster_reading_partitions(db_engines.main, args.network)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""eNodeB decomposition of the cells and number of sectors per site.
+
+cell_id is the LTE E-UTRAN cell identifier: eNodeB id * 256 + local cell id.
+Both parts are generated, indexed columns of cell and reading (enodeb_id,
+local_cell_id), so site filters are equality queries. The number of sectors
+of a site is stored in Sector.sector_split and read through SectorSplitCache.
+
+Usage (adds the columns, indexes and notification trigger to an existing database):
+    python -m corelte.orm.sectors
+"""
+
+import select as select_fd
+import threading
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, select, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from .backend import capabilities
+from .crud import add_missing_columns
+from .models import ENODEB_SHIFT, Cell_orm, Reading_orm, Sector
+
+NB_SECTORS_DEFAULT = 3
+
+NOTIFY_CHANNEL = 'sector_split_changed'
+
+# Notification (payload : network_id) à chaque modification d'un secteur
+SECTOR_SPLIT_TRIGGER = [
+    f"""CREATE OR REPLACE FUNCTION notify_sector_split() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        PERFORM pg_notify('{NOTIFY_CHANNEL}', COALESCE(NEW.network_id, OLD.network_id)::text);
+        RETURN NULL;
+    END $$""",
+    "DROP TRIGGER IF EXISTS sector_split_notify ON sector",
+    """CREATE TRIGGER sector_split_notify AFTER INSERT OR DELETE OR UPDATE OF sector_split, cell_id ON sector
+    FOR EACH ROW EXECUTE FUNCTION notify_sector_split()""",
+]
+
+
+def upgrade_enodeb_columns(engine: Engine) -> Dict[str, List[str]]:
+    """Add enodeb_id / local_cell_id, Sector.sector_split and their indexes to existing tables.
+
+    On a large reading table the generated columns are computed for every row
+    while the table is locked; run it outside of imports.
+
+    Returns:
+        Dictionary table -> columns added
+    """
+    added = {}
+    for model in (Cell_orm, Reading_orm, Sector):
+        added[model.__tablename__] = add_missing_columns(engine, model)
+        for index in model.__table__.indexes:
+            index.create(engine, checkfirst=True)
+    return added
+
+
+class SectorSplitCache:
+    """Number of sectors of each eNodeB, loaded from Sector once per network.
+
+    Each eNodeB stands for the interval of cell ids [enodeb_id * 256,
+    enodeb_id * 256 + 255], so a lookup is a shift and a dictionary access,
+    without any query once the network is loaded. A site without sector_split
+    falls back to the given default.
+
+    The cache is refreshed on demand (refresh()), by set_sector_split(), or
+    by the database: listen() starts a thread waiting for the notifications
+    of the sector trigger (create_sector_split_trigger) and reloads the
+    networks concerned.
+
+    Example:
+        with get_db_session() as session:
+            sector_splits.load(session, network_id=1)
+        sector_splits.listen(db_engines.main)
+        split = sector_splits.get(None, 1, cell_id >> ENODEB_SHIFT)
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._splits: Dict[int, Dict[int, int]] = {}
+        self._listener: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def load(self, session: Session, network_id: int) -> Dict[int, int]:
+        """(Re)load the map enodeb_id -> sector_split of a network."""
+        stmt = select(Sector.cell_id.op('/')(1 << ENODEB_SHIFT).label('enodeb_id'), func.max(Sector.sector_split)) \
+            .where(Sector.network_id == network_id) \
+            .where(Sector.sector_split.is_not(None)) \
+            .group_by('enodeb_id')
+        splits = {int(enodeb_id): int(split) for enodeb_id, split in session.execute(stmt)}
+        with self._lock:
+            self._splits[network_id] = splits
+        return splits
+
+    def loaded(self, network_id: int) -> bool:
+        with self._lock:
+            return network_id in self._splits
+
+    def get(self, session: Optional[Session], network_id: int, enodeb_id: int, default: int = NB_SECTORS_DEFAULT) -> int:
+        """Number of sectors of an eNodeB (the network is loaded on first use if a session is given)."""
+        splits = self._splits.get(network_id) # lecture atomique du dictionnaire, sans verrou
+        if splits is None:
+            if session is None:
+                return default
+            splits = self.load(session, network_id)
+        return splits.get(enodeb_id, default)
+
+    def refresh(self, session: Session) -> None:
+        """Reload every network already loaded."""
+        with self._lock:
+            network_ids = list(self._splits)
+        for network_id in network_ids:
+            self.load(session, network_id)
+
+    def invalidate(self, network_id: Optional[int] = None) -> None:
+        with self._lock:
+            if network_id is None:
+                self._splits.clear()
+            else:
+                self._splits.pop(network_id, None)
+
+    def listen(self, engine: Engine, timeout: float = 5.0) -> None:
+        """Reload the networks concerned by the notifications of the sector trigger (background thread).
+
+        Args:
+            engine: Engine of a PostgreSQL database where create_sector_split_trigger() was run
+            timeout: Seconds between checks of the stop request
+        """
+        if not capabilities(engine).notify:
+            raise RuntimeError(f"LISTEN/NOTIFY is not supported by the {engine.dialect.name} backend")
+        if self._listener is not None and self._listener.is_alive():
+            return
+        self._stop.clear()
+        self._listener = threading.Thread(target=self._listen, args=(engine, timeout),
+                                          name='sector-split-listener', daemon=True)
+        self._listener.start()
+
+    def _listen(self, engine: Engine, timeout: float) -> None:
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            conn.execute(text(f'LISTEN {NOTIFY_CHANNEL}'))
+            dbapi = conn.connection.driver_connection
+            while not self._stop.is_set():
+                if select_fd.select([dbapi], [], [], timeout) == ([], [], []):
+                    continue
+                dbapi.poll()
+                network_ids = set()
+                while dbapi.notifies:
+                    payload = dbapi.notifies.pop(0).payload
+                    network_ids.add(int(payload) if payload.isdigit() else None)
+                for network_id in network_ids:
+                    if network_id is None or not self.loaded(network_id):
+                        self.invalidate(network_id)
+                        continue
+                    with Session(engine) as session:
+                        self.load(session, network_id)
+            conn.execute(text(f'UNLISTEN {NOTIFY_CHANNEL}'))
+
+    def stop_listening(self) -> None:
+        self._stop.set()
+        if self._listener is not None:
+            self._listener.join()
+            self._listener = None
+
+
+sector_splits = SectorSplitCache()
+
+
+def set_sector_split(session: Session, network_id: int, enodeb_id: int, sector_split: int) -> int:
+    """Store the number of sectors of a site on all its Sector rows (caller commits).
+
+    Returns:
+        Number of Sector rows updated
+    """
+    first = enodeb_id << ENODEB_SHIFT
+    stmt = update(Sector) \
+        .where(Sector.network_id == network_id) \
+        .where(Sector.cell_id.between(first, first + (1 << ENODEB_SHIFT) - 1)) \
+        .values(sector_split=sector_split)
+    nb = session.execute(stmt).rowcount
+    sector_splits.invalidate(network_id)
+    return nb
+
+
+def create_sector_split_trigger(engine: Engine) -> None:
+    """Create the trigger notifying the changes of Sector (PostgreSQL only)."""
+    if not capabilities(engine).notify:
+        raise RuntimeError(f"LISTEN/NOTIFY is not supported by the {engine.dialect.name} backend")
+    with engine.begin() as conn:
+        for ddl in SECTOR_SPLIT_TRIGGER:
+            conn.execute(text(ddl))
+
+
+def main():
+    from .db import db_engines
+
+    for table, columns in upgrade_enodeb_columns(db_engines.main).items():
+        print(f"{table}: {', '.join(columns) if columns else 'à jour'}")
+    if capabilities(db_engines.main).notify:
+        create_sector_split_trigger(db_engines.main)
+        print(f"Trigger de notification {NOTIFY_CHANNEL} créé")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Queries on the history of the BAKOM stations (station_change log)."""
+
+from datetime import datetime
+from typing import List, Optional, Sequence
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+
+from .models import StationChange
+
+# Bits de Station.technos (voir convert_bakom_file_to_csv)
+TECHNO_2G = 1 << 0
+TECHNO_3G = 1 << 1
+TECHNO_4G = 1 << 2
+TECHNO_5G = 1 << 3
+
+
+def stations_changed_since(session: Session, since: datetime, network_id: Optional[int] = None,
+                           changes: Optional[Sequence[str]] = None) -> List[StationChange]:
+    """Changes of the stations since a date, oldest first.
+
+    Args:
+        session: Database session
+        since: Start date (included)
+        network_id: Only this network, None for all
+        changes: Only these kinds of change ('insert', 'update', 'delete', 'restore')
+
+    Returns:
+        List of StationChange
+    """
+    stmt = select(StationChange).where(StationChange.changed >= since)
+    if network_id is not None:
+        stmt = stmt.where(StationChange.network_id == network_id)
+    if changes is not None:
+        stmt = stmt.where(StationChange.change.in_(list(changes)))
+    return list(session.execute(stmt.order_by(StationChange.changed, StationChange.id)).scalars())
+
+
+def sites_gaining_techno_since(session: Session, since: datetime, techno: int = TECHNO_5G,
+                               network_id: Optional[int] = None) -> List[StationChange]:
+    """Stations that appeared with a technology, or gained it, since a date.
+
+    Example:
+        new_5g = sites_gaining_techno_since(session, datetime.now() - timedelta(days=30), TECHNO_5G)
+    """
+    has_new = StationChange.new_technos.op('&')(techno) != 0
+    had_old = StationChange.old_technos.op('&')(techno) != 0
+    stmt = select(StationChange) \
+        .where(StationChange.changed >= since) \
+        .where(has_new) \
+        .where(or_(StationChange.change.in_(['insert', 'restore']),
+                   and_(StationChange.change == 'update', or_(StationChange.old_technos.is_(None), ~had_old))))
+    if network_id is not None:
+        stmt = stmt.where(StationChange.network_id == network_id)
+    return list(session.execute(stmt.order_by(StationChange.changed, StationChange.id)).scalars())
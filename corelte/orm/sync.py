@@ -0,0 +1,300 @@
+"""Incremental synchronisation of fused readings with the stored survey."""
+
+from dataclasses import dataclass, field
+import math
+from typing import Any, Dict, Iterable, List, Optional, Protocol, Tuple
+
+from geoalchemy2.shape import from_shape
+from shapely.geometry import Point
+from sqlalchemy import bindparam, delete, func, insert, inspect, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from corelte.reading import Reading
+from .cells import cells_of, register_cells
+from .models import Reading_orm, Survey
+
+# Colonnes comparées entre la version stockée et la nouvelle version d'une mesure
+READING_FIELDS = ('cell_id', 'pci', 'band', 'tac', 'fwd_azimuth', 'speed', 'reading_time', 'longitude', 'latitude')
+
+# Colonnes REAL (float4) : la comparaison tolère la perte de précision du stockage
+FLOAT_FIELDS = ('fwd_azimuth', 'speed', 'longitude', 'latitude')
+
+SURVEY_FIELDS = ('survey_date', 'comment', 'device', 'model', 'os_version')
+
+# Index unique de la clé de l'import incrémental (Reading_orm.__table_args__)
+READING_KEY_INDEX = 'ux_network_id_survey_id_file_idx'
+
+ReadingValues = Dict[str, Any]
+
+
+class SurveyHook(Protocol):
+    """Keeps derived data (aggregates, events) in step with the readings of a survey.
+
+    Both methods run inside the import transaction, only when the survey changes:
+    before_survey_write still sees the old readings, after_survey_write the new ones.
+    """
+
+    def before_survey_write(self, session: Session, network_id: int, survey_id: int) -> None: ...
+
+    def after_survey_write(self, session: Session, network_id: int, survey_id: int) -> None: ...
+
+
+@dataclass
+class SyncReport:
+    """Summary of the changes applied by an incremental survey import.
+
+    Attributes:
+        inserted: Number of readings inserted
+        updated: Number of readings updated in place
+        deleted: Number of readings deleted
+        unchanged: Number of readings left untouched
+        survey_created: Whether the Survey row did not exist yet
+        survey_updated: Whether the Survey metadata changed
+    """
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+    survey_created: bool = False
+    survey_updated: bool = False
+
+    @property
+    def has_changes(self) -> bool:
+        """Return True if anything has to be written to the database."""
+        return bool(self.inserted or self.updated or self.deleted
+                    or self.survey_created or self.survey_updated)
+
+    def __str__(self) -> str:
+        return (f"inserted={self.inserted} updated={self.updated} deleted={self.deleted} "
+                f"unchanged={self.unchanged} survey_created={self.survey_created} "
+                f"survey_updated={self.survey_updated}")
+
+
+@dataclass
+class ReadingDiff:
+    """Readings to insert, update and delete, keyed on file_idx."""
+    inserts: List[ReadingValues] = field(default_factory=list)
+    updates: List[ReadingValues] = field(default_factory=list)
+    deletes: List[int] = field(default_factory=list)
+    unchanged: int = 0
+
+
+def reading_values(r: Reading) -> ReadingValues:
+    """Extract the stored columns of a fused reading.
+
+    Args:
+        r: Fused reading
+
+    Returns:
+        Dictionary of the values compared by the diff
+    """
+    return {
+        'cell_id': r.cellid,
+        'pci': r.pci,
+        'band': r.band,
+        'tac': r.tac,
+        'fwd_azimuth': r.fwd_azimuth,
+        'speed': r.speed,
+        'reading_time': r.reading_time,
+        'longitude': r.longitude,
+        'latitude': r.latitude,
+    }
+
+
+def _same_value(name: str, old: Any, new: Any) -> bool:
+    if old is None or new is None:
+        return old is new
+    if name in FLOAT_FIELDS:
+        return math.isclose(float(old), float(new), rel_tol=1e-6, abs_tol=1e-7)
+    return old == new
+
+
+def same_reading(old: ReadingValues, new: ReadingValues) -> bool:
+    """Return True if the stored and the new reading hold the same values."""
+    return all(_same_value(name, old.get(name), new.get(name)) for name in READING_FIELDS)
+
+
+def diff_readings(stored: Dict[int, Tuple[int, ReadingValues]], new: Dict[int, ReadingValues]) -> ReadingDiff:
+    """Compare stored readings with new fused readings.
+
+    Args:
+        stored: Stored readings, file_idx -> (reading id, values)
+        new: New fused readings, file_idx -> values
+
+    Returns:
+        ReadingDiff holding the rows to insert, update (with their id) and the ids to delete
+    """
+    diff = ReadingDiff()
+
+    for file_idx, values in new.items():
+        old = stored.get(file_idx)
+        if old is None:
+            diff.inserts.append({'file_idx': file_idx, **values})
+            continue
+        reading_id, old_values = old
+        if same_reading(old_values, values):
+            diff.unchanged += 1
+        else:
+            diff.updates.append({'id': reading_id, 'file_idx': file_idx, **values})
+
+    diff.deletes = [reading_id for file_idx, (reading_id, _) in stored.items() if file_idx not in new]
+    return diff
+
+
+def load_stored_readings(session: Session, network_id: int, survey_id: int) -> Dict[int, Tuple[int, ReadingValues]]:
+    """Load the readings of a survey, keyed on file_idx.
+
+    Args:
+        session: Database session
+        network_id: Network identifier
+        survey_id: Survey identifier
+
+    Returns:
+        Dictionary file_idx -> (reading id, values)
+    """
+    stmt = select(Reading_orm.id, Reading_orm.file_idx,
+                  Reading_orm.cell_id, Reading_orm.pci, Reading_orm.band, Reading_orm.tac,
+                  Reading_orm.fwd_azimuth, Reading_orm.speed, Reading_orm.reading_time,
+                  func.ST_X(Reading_orm.geom).label('longitude'),
+                  func.ST_Y(Reading_orm.geom).label('latitude')) \
+        .where(Reading_orm.network_id == network_id) \
+        .where(Reading_orm.survey_id == survey_id)
+
+    stored = {}
+    for row in session.execute(stmt).mappings():
+        stored[row['file_idx']] = (row['id'], {name: row[name] for name in READING_FIELDS})
+    return stored
+
+
+def to_reading_row(network_id: int, survey_id: int, values: ReadingValues) -> ReadingValues:
+    """Convert diff values into Reading_orm column values."""
+    row = {k: v for k, v in values.items() if k not in ('longitude', 'latitude')}
+    row['network_id'] = network_id
+    row['survey_id'] = survey_id
+    row['geom'] = from_shape(Point(values['longitude'], values['latitude']), srid=4326)
+    return row
+
+
+def sync_survey_readings(session: Session, survey: Survey, lines: Iterable[Reading],
+                         hooks: Iterable[SurveyHook] = ()) -> SyncReport:
+    """Apply only the differences between the fused readings and the stored survey.
+
+    The readings are keyed on (network_id, survey_id, file_idx). Nothing is written
+    and the transaction is rolled back when no change is detected.
+
+    Args:
+        session: Database session
+        survey: Survey row holding the metadata to store (not attached to the session)
+        lines: Fused readings of the survey
+        hooks: Derived data to update in the same transaction
+
+    Returns:
+        SyncReport with the change counts
+    """
+    net_id = survey.network_id
+    survey_id = survey.survey_id
+    report = SyncReport()
+
+    # 1. Métadonnées du survey
+    stored_survey: Optional[Survey] = session.get(Survey, (net_id, survey_id))
+    if stored_survey is None:
+        report.survey_created = True
+    else:
+        report.survey_updated = any(getattr(stored_survey, name) != getattr(survey, name) for name in SURVEY_FIELDS)
+
+    # 2. Différences sur les mesures
+    new = {r.file_idx: reading_values(r) for r in lines}
+    stored = {} if report.survey_created else load_stored_readings(session, net_id, survey_id)
+    diff = diff_readings(stored, new)
+
+    report.inserted = len(diff.inserts)
+    report.updated = len(diff.updates)
+    report.deleted = len(diff.deletes)
+    report.unchanged = diff.unchanged
+
+    # 3. Rien n'a changé : on ne touche pas à la base
+    if not report.has_changes:
+        session.rollback()
+        return report
+
+    # 4. Applique les changements dans une seule transaction
+    for hook in hooks:
+        hook.before_survey_write(session, net_id, survey_id)
+
+    if report.survey_created:
+        session.add(survey)
+        session.flush()
+    else:
+        values = {name: getattr(survey, name) for name in SURVEY_FIELDS}
+        stmt = update(Survey) \
+            .where(Survey.network_id == net_id) \
+            .where(Survey.survey_id == survey_id) \
+            .values(uploaded=func.now(), **values)
+        session.execute(stmt)
+
+    register_cells(session, net_id, cells_of(diff.inserts + diff.updates))
+
+    # network_id fait partie des critères pour que la table partitionnée n'explore qu'une partition
+    if diff.deletes:
+        session.execute(delete(Reading_orm)
+                        .where(Reading_orm.network_id == net_id)
+                        .where(Reading_orm.id.in_(diff.deletes)))
+    if diff.updates:
+        reading = Reading_orm.__table__
+        stmt = update(reading) \
+            .where(reading.c.network_id == bindparam('b_network_id')) \
+            .where(reading.c.id == bindparam('b_id'))
+        rows = [{'b_network_id': net_id, 'b_id': v['id'], **to_reading_row(net_id, survey_id, v)} for v in diff.updates]
+        session.execute(stmt, [{k: v for k, v in row.items() if k != 'id'} for row in rows])
+    if diff.inserts:
+        session.execute(insert(Reading_orm), [to_reading_row(net_id, survey_id, v) for v in diff.inserts])
+
+    for hook in hooks:
+        hook.after_survey_write(session, net_id, survey_id)
+
+    session.commit()
+    return report
+
+
+def upgrade_reading_key(engine: Engine) -> bool:
+    """Create the unique index on (network_id, survey_id, file_idx) of an existing reading table.
+
+    create_all() only creates it with the table. Readings stored twice with the
+    same key (possible before the incremental import) prevent its creation and
+    must be removed first, e.g. by re-importing the surveys listed in the error.
+
+    Returns:
+        True if the index was created, False if it was already there
+
+    Raises:
+        ValueError: If some keys are duplicated
+    """
+    reading = Reading_orm.__table__
+    if not inspect(engine).has_table(reading.name, schema=reading.schema):
+        return False
+    if any(ix['name'] == READING_KEY_INDEX for ix in inspect(engine).get_indexes(reading.name, schema=reading.schema)):
+        return False
+
+    with engine.connect() as conn:
+        duplicates = conn.execute(select(reading.c.network_id, reading.c.survey_id)
+                                  .group_by(reading.c.network_id, reading.c.survey_id, reading.c.file_idx)
+                                  .having(func.count() > 1)
+                                  .distinct()).all()
+    if duplicates:
+        surveys = ', '.join(f'{net_id}/{survey_id}' for net_id, survey_id in sorted(set(duplicates)))
+        raise ValueError(f"Mesures en double (network_id/survey_id): {surveys}")
+
+    next(ix for ix in reading.indexes if ix.name == READING_KEY_INDEX).create(engine)
+    return True
+
+
+def main():
+    from .db import db_engines
+
+    created = upgrade_reading_key(db_engines.main)
+    print(f"Index {READING_KEY_INDEX}: {'créé' if created else 'à jour'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""SQL functions and views over the reading table for QGIS (PostgreSQL/PostGIS only).
+
+The functions select the readings of a cell, an eNodeB or a sector with
+equality predicates on (network_id, cell_id) or (network_id, enodeb_id), so
+they are answered by the btree indexes instead of a scan. In QGIS they are used
+as query layers, e.g. SELECT * FROM enodeb_readings(1, 890639).
+
+Usage:
+    python -m corelte.orm.views
+"""
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from .backend import capabilities
+
+# enodeb_id et local_cell_id sont des colonnes générées (voir corelte.orm.sectors)
+CELL_FUNCTIONS = [
+    """CREATE OR REPLACE FUNCTION cell_readings(p_network_id integer, p_cell_id integer)
+    RETURNS SETOF reading LANGUAGE sql STABLE AS $$
+        SELECT * FROM reading WHERE network_id = p_network_id AND cell_id = p_cell_id
+    $$""",
+    """CREATE OR REPLACE FUNCTION enodeb_readings(p_network_id integer, p_enodeb_id integer)
+    RETURNS SETOF reading LANGUAGE sql STABLE AS $$
+        SELECT * FROM reading WHERE network_id = p_network_id
+            AND enodeb_id = p_enodeb_id
+    $$""",
+    """CREATE OR REPLACE FUNCTION sector_readings(p_network_id integer, p_enodeb_id integer,
+                                                p_sector integer, p_sector_split integer)
+    RETURNS SETOF reading LANGUAGE sql STABLE AS $$
+        SELECT * FROM reading WHERE network_id = p_network_id
+            AND enodeb_id = p_enodeb_id
+            AND cell_id % p_sector_split = p_sector
+    $$""",
+    """CREATE OR REPLACE VIEW cell_history AS
+        SELECT network_id, cell_id, enodeb_id, local_cell_id,
+               count(*) AS nb_readings, count(DISTINCT survey_id) AS nb_surveys,
+               min(reading_time) AS first_seen, max(reading_time) AS last_seen
+        FROM reading GROUP BY network_id, cell_id, enodeb_id, local_cell_id""",
+]
+
+
+def create_cell_functions(engine: Engine) -> None:
+    """Create (or replace) the cell functions and views."""
+    if not capabilities(engine).is_postgis:
+        raise RuntimeError("The cell functions require PostgreSQL/PostGIS")
+    with engine.begin() as conn:
+        for ddl in CELL_FUNCTIONS:
+            conn.execute(text(ddl))
+
+
+def main():
+    from .db import db_engines
+
+    create_cell_functions(db_engines.main)
+    print("Fonctions cell_readings, enodeb_readings, sector_readings et vue cell_history créées")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""Background batched database writer for fused readings."""
+
+from dataclasses import dataclass, field
+import queue
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlalchemy.orm import Session
+
+from corelte.reading import Reading
+from .cells import cells_of, register_cells
+from .models import Reading_orm, Survey
+from .sync import SurveyHook, reading_values, to_reading_row
+
+# Codes PostgreSQL des erreurs qui peuvent réussir en recommençant la transaction
+TRANSIENT_PGCODES = ('40001', '40P01', '55P03', '57P01')
+
+# Messages SQLite des erreurs de verrou (SQLITE_BUSY, SQLITE_LOCKED), levées sans code
+SQLITE_TRANSIENT_MESSAGES = ('database is locked', 'database table is locked', 'database is busy')
+
+SurveyKey = Tuple[int, int] # network_id, survey_id
+
+
+def is_transient_error(error: Exception) -> bool:
+    """Return True if the transaction can be retried after this error.
+
+    Args:
+        error: Exception raised while writing
+
+    Returns:
+        True for lost connections, serialization failures, deadlocks and locked
+        SQLite databases; False for permanent errors (missing table, bad DSN...)
+    """
+    if not isinstance(error, DBAPIError):
+        return False
+    if error.connection_invalidated:
+        return True
+    if getattr(error.orig, 'pgcode', None) in TRANSIENT_PGCODES:
+        return True
+    message = str(error.orig).lower()
+    return isinstance(error, OperationalError) and any(m in message for m in SQLITE_TRANSIENT_MESSAGES)
+
+
+@dataclass
+class _Begin:
+    survey: Survey
+
+
+@dataclass
+class _Batch:
+    key: SurveyKey
+    lines: List[Reading]
+
+
+@dataclass
+class _Barrier:
+    key: SurveyKey
+    done: threading.Event = field(default_factory=threading.Event)
+
+
+_STOP = object()
+
+# Attente maximale (s) entre deux vérifications que le thread d'écriture tourne encore
+_POLL_INTERVAL = 0.5
+
+
+class BackgroundWriter(threading.Thread):
+    """Writes fused readings to the database from a background thread.
+
+    The pipeline pushes batches of readings into a bounded queue and continues
+    with the next survey; the writer thread, with its own session and connection,
+    coalesces the batches into large transactions. When the queue is full, put()
+    blocks until the writer catches up (backpressure).
+
+    Example:
+        writer = BackgroundWriter(db_engines.main)
+        writer.start()
+        writer.begin_survey(survey)
+        writer.put(network_id, survey_id, fusion.linesFusion)
+        writer.flush(network_id, survey_id)  # barrier: everything committed
+        writer.close()
+    """
+
+    def __init__(self, engine: Engine, max_batches: int = 8, transaction_size: int = 20000,
+                 max_retries: int = 5, retry_delay: float = 1.0, hooks: Iterable[SurveyHook] = ()) -> None:
+        """Initialize the writer.
+
+        Args:
+            engine: SQLAlchemy engine used by the writer thread
+            max_batches: Maximum number of batches waiting in the queue
+            transaction_size: Number of readings written per transaction
+            max_retries: Number of retries of a transaction on transient errors
+            retry_delay: Initial delay in seconds between retries, doubled at each retry
+            hooks: Derived data updated when a survey begins (old readings) and at its flush (new readings)
+        """
+        super().__init__(name='BackgroundWriter', daemon=True)
+        self.engine = engine
+        self.transaction_size = transaction_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.hooks = list(hooks)
+        self.queue: queue.Queue = queue.Queue(maxsize=max_batches)
+        self.errors: Dict[SurveyKey, Exception] = {}
+        self.written: Dict[SurveyKey, int] = {}
+
+    # --- API côté pipeline ---
+
+    def begin_survey(self, survey: Survey) -> None:
+        """Replace the stored version of a survey by a new, empty one.
+
+        Args:
+            survey: Survey row to insert (not attached to a session)
+        """
+        self._put(_Begin(survey))
+
+    def put(self, network_id: int, survey_id: int, lines: List[Reading]) -> None:
+        """Queue a batch of fused readings, blocking while the queue is full.
+
+        Args:
+            network_id: Network identifier
+            survey_id: Survey identifier
+            lines: Fused readings to write
+        """
+        if lines:
+            self._put(_Batch((network_id, survey_id), list(lines)))
+
+    def flush(self, network_id: int, survey_id: int, timeout: Optional[float] = None) -> int:
+        """Wait until every batch of a survey queued so far is committed.
+
+        The hooks' after_survey_write runs at the barrier: flush once per survey.
+
+        Args:
+            network_id: Network identifier
+            survey_id: Survey identifier
+            timeout: Maximum time to wait in seconds, None to wait forever
+
+        Returns:
+            Number of readings written for this survey
+
+        Raises:
+            TimeoutError: If the barrier is not reached in time
+            RuntimeError: If the writer thread is not running
+            Exception: The error that made writing the survey fail (SQLAlchemyError, hook error...)
+        """
+        key = (network_id, survey_id)
+        barrier = _Barrier(key)
+        self._put(barrier)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not barrier.done.wait(_POLL_INTERVAL):
+            self._check_alive()
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"Survey {survey_id} not flushed after {timeout}s")
+        if key in self.errors:
+            raise self.errors.pop(key)
+        return self.written.pop(key, 0)
+
+    def close(self) -> None:
+        """Write the remaining batches and stop the thread."""
+        if self.is_alive():
+            self.queue.put(_STOP)
+        self.join()
+
+    def _check_alive(self) -> None:
+        if not self.is_alive():
+            raise RuntimeError("BackgroundWriter thread is not running")
+
+    def _put(self, item) -> None:
+        # bloque tant que la file est pleine, mais pas indéfiniment si le thread s'est arrêté
+        while True:
+            self._check_alive()
+            try:
+                self.queue.put(item, timeout=_POLL_INTERVAL)
+                return
+            except queue.Full:
+                continue
+
+    # --- Thread d'écriture ---
+
+    def run(self) -> None:
+        with Session(self.engine) as session:
+            pending: List[_Batch] = []
+            while True:
+                item = self.queue.get()
+
+                if isinstance(item, _Batch):
+                    pending.append(item)
+                    # Regroupe les lots déjà en attente dans une grande transaction
+                    while sum(len(b.lines) for b in pending) < self.transaction_size:
+                        try:
+                            item = self.queue.get_nowait()
+                        except queue.Empty:
+                            item = None
+                            break
+                        if not isinstance(item, _Batch):
+                            break
+                        pending.append(item)
+                    self._write_batches(session, pending)
+                    pending = []
+                    if item is None or isinstance(item, _Batch):
+                        continue
+
+                if isinstance(item, _Begin):
+                    key = (item.survey.network_id, item.survey.survey_id)
+                    self._guard(session, key, lambda: self._write_begin(session, item.survey))
+                elif isinstance(item, _Barrier):
+                    try:
+                        self._guard(session, item.key, lambda: self._write_barrier(session, item.key))
+                    finally:
+                        item.done.set()
+                elif item is _STOP:
+                    break
+
+    def _guard(self, session: Session, key: SurveyKey, action) -> None:
+        """Run action, recording any error for the flush of the survey instead of stopping the thread."""
+        try:
+            action()
+        except Exception as e:
+            session.rollback()
+            print(e)
+            self.errors[key] = e
+
+    def _with_retry(self, session: Session, key: SurveyKey, work) -> bool:
+        """Run work(session) and commit, retrying on transient errors."""
+        delay = self.retry_delay
+        for attempt in range(self.max_retries + 1):
+            try:
+                work(session)
+                session.commit()
+                return True
+            except Exception as e:
+                session.rollback()
+                if attempt < self.max_retries and is_transient_error(e):
+                    print(f"Erreur transitoire, nouvel essai dans {delay}s: {e}")
+                    time.sleep(delay)
+                    delay *= 2
+                    continue
+                print(e)
+                self.errors[key] = e
+                return False
+        return False
+
+    def _write_begin(self, session: Session, survey: Survey) -> None:
+        key = (survey.network_id, survey.survey_id)
+        self.errors.pop(key, None)
+        self.written[key] = 0
+
+        def work(s: Session):
+            for hook in self.hooks:
+                hook.before_survey_write(s, *key)
+            # Efface la version précédente de ce survey et tous les éléments de Reading en cascade
+            s.execute(delete(Survey)
+                      .where(Survey.network_id == survey.network_id)
+                      .where(Survey.survey_id == survey.survey_id))
+            s.merge(survey)
+
+        self._with_retry(session, key, work)
+
+    def _write_barrier(self, session: Session, key: SurveyKey) -> None:
+        if not self.hooks or key in self.errors:
+            return
+
+        def work(s: Session):
+            for hook in self.hooks:
+                hook.after_survey_write(s, *key)
+
+        self._with_retry(session, key, work)
+
+    def _write_batches(self, session: Session, batches: List[_Batch]) -> None:
+        by_survey: Dict[SurveyKey, List[Reading]] = {}
+        for b in batches:
+            by_survey.setdefault(b.key, []).extend(b.lines)
+
+        for key, lines in by_survey.items():
+            if key in self.errors:
+                continue # le survey a déjà échoué, on attend le flush pour le signaler
+            net_id, survey_id = key
+            try:
+                rows = [to_reading_row(net_id, survey_id, {'file_idx': r.file_idx, **reading_values(r)}) for r in lines]
+            except Exception as e: # mesure invalide : le survey échoue, pas le thread
+                print(e)
+                self.errors[key] = e
+                continue
+
+            def work(s: Session):
+                register_cells(s, net_id, cells_of(rows))
+                s.execute(insert(Reading_orm), rows)
+
+            if self._with_retry(session, key, work):
+                self.written[key] = self.written.get(key, 0) + len(rows)
@@ -0,0 +1,258 @@
+"""Streaming import of a survey: Track -> Screencast -> Fusion as chained generators.
+
+Each stage reads its input one element at a time and yields as soon as it
+can, so memory stays the same whatever the length of the survey:
+
+    Track.iter_lines_gps                GPX points, resampled to every second, speed and azimuth
+    Screencast.iter_synced_intervalsMp4 OCR intervals, clock synchronised on the first frames
+    Fusion.iter_fusion                  one fused reading per frame
+    Fusion.iter_exclusions              excluded file_idx removed
+    Fusion.iter_handover_edges          copies the readings around handovers (few)
+    Fusion.iter_clarified               clarify_with_minimum_distance2, streamed
+    Fusion.iter_speed_compensation      reaction time compensation
+
+Only two steps buffer: the clock sync holds the intervals of the first
+time_scan_probe frames, and clarify holds one reading. The output is written
+in chunks of chunk_size readings (CSV, GeoPackage, BackgroundWriter). The
+handover events found on the way are given to the HandoverIndexer of the
+run, written by the writer at the flush of the survey.
+
+The track, the synchronised intervals and the fused readings are read from
+their caches (corelte.cache) when these are valid, otherwise the streams are
+encoded as they pass and the caches written at the end of the run; a second
+run of the same survey only reads the fusion cache. With save_to_lake, the
+fusion cache is copied to the lake partition 'fused' read by corelte.sweep,
+and the output chunks, encoded as they are written, make the partition
+'fusion' (clarified readings, as the batch import writes it, read by
+corelte.cell_index); a partition is written in one piece at the end.
+
+The frames must be extracted and OCR-ised in MYOCR_PLUS mode (prepare_frames()
+does it, and skips the steps already done).
+
+Usage:
+    python -m corelte.pipeline --network 1 --survey 313 --chunk-size 2000
+"""
+
+import argparse
+import csv
+import itertools
+from typing import Callable, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from corelte.argument import Argument
+from corelte.cache import ReadingsCacheWriter, lake_columns, load_npz
+from corelte.fusion import DEFAULT_CLARIFY, ClarifyParams, Fusion
+from corelte.handover import HandoverIndexer, handovers_of_readings
+from corelte.helpers.geopackage import GeoPackageWriter
+from corelte.lake import Columns, SurveyLake, readings_to_columns
+from corelte.orm.writer import BackgroundWriter
+from corelte.reading import Reading
+from corelte.reading_interval import ReadingInterval
+from corelte.screencast import Screencast
+from corelte.track import Track
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def chunked(lines: Iterable, size: int) -> Iterator[List]:
+    """Group a stream into lists of at most size elements."""
+    lines = iter(lines)
+    while True:
+        chunk = list(itertools.islice(lines, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class StreamingPipeline:
+    """Processes a survey from the GPX file and the OCR-ised frames to the outputs, in bounded memory.
+
+    Example:
+        handovers = HandoverIndexer(network_id=1)
+        writer = BackgroundWriter(db_engines.main, hooks=[handovers])
+        writer.start()
+        pipeline = StreamingPipeline(Argument(1, 313), chunk_size=2000)
+        pipeline.prepare_frames()
+        nb = pipeline.run(writer, handovers=handovers)
+        writer.close()
+    """
+
+    def __init__(self, argument: Argument, params: ClarifyParams = DEFAULT_CLARIFY,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+        """Initialize the pipeline.
+
+        Args:
+            argument: Survey configuration
+            params: Clarify and compensation parameters
+            chunk_size: Number of readings written at once
+        """
+        self.argument = argument
+        self.params = params
+        self.chunk_size = chunk_size
+        self.track = Track(argument)
+        self.screencast = Screencast(argument)
+        self.fusion = Fusion(argument, params)
+        self.handover_edges: List[Reading] = []
+        self.nb_written = 0
+        self._cached_streams: List[Iterator] = [] # flux dont le cache est écrit à la fin
+
+    def prepare_frames(self) -> None:
+        """Extract, filter and OCR the frames of the screencast (steps already done are skipped)."""
+        self.screencast.split_video_into_frames()
+        self.screencast.create_list_of_frames_to_ocr()
+        self.screencast.process_myocr_on_frames()
+
+    @staticmethod
+    def _cached(lines: Iterable, cache: ReadingsCacheWriter, extra: Callable[[], dict] = dict) -> Iterator:
+        for r in cache.tee(lines):
+            yield r
+        cache.save(extra())
+
+    def _intervals(self) -> Iterator[ReadingInterval]:
+        """Synchronised intervals of the screencast, from its cache or from the OCR files."""
+        if self.screencast.load_cache(expand=False) and self.screencast.intervalsMp4:
+            yield from self.screencast.intervalsMp4
+            return
+        # une entrée par changement des valeurs lues : gardée pour le cache
+        self.screencast.intervalsMp4 = []
+        for interval in self.screencast.iter_synced_intervalsMp4():
+            self.screencast.intervalsMp4.append(interval)
+            yield interval
+        self.screencast.save_cache()
+
+    def fused(self) -> Iterator[Reading]:
+        """Stream of the fused readings, before exclusions and clarify."""
+        self._cached_streams = []
+        gps = self.track.open_cache()
+        if gps is not None:
+            # la fusion en cache suppose la trace en cache (curseur et date du survey)
+            lines = self.fusion.open_cache(self.track, self.screencast)
+            if lines is not None:
+                return lines
+        else:
+            gps = self._cached(self.track.iter_lines_gps(), self.track.cache_writer(), self.track.cache_extra)
+            self._cached_streams.append(gps)
+        intervals = self._intervals()
+        self._cached_streams.append(intervals)
+        lines = self.fusion.iter_fusion(self.track.cursor, gps, self.screencast.cursor, intervals,
+                                        self.screencast.time_of_frame)
+        return self._cached(lines, self.fusion.cache_writer(self.track, self.screencast))
+
+    def save_caches(self) -> None:
+        """Read the end of the streams the fusion stopped before (GPS or screencast longer), writing their caches."""
+        for stream in self._cached_streams:
+            for _ in stream:
+                pass
+        self._cached_streams = []
+
+    def readings(self) -> Iterator[Reading]:
+        """Stream of the readings to store: fused, clarified and compensated."""
+        self.handover_edges = []
+        lines = self.fusion.iter_exclusions(self.fused())
+        lines = self.fusion.iter_handover_edges(lines, self.handover_edges)
+        lines = self.fusion.iter_clarified(lines)
+        return self.fusion.iter_speed_compensation(lines)
+
+    def save_fused_to_lake(self) -> None:
+        """Copy the fusion cache to the lake partition read by corelte.sweep (if save_to_lake)."""
+        if not self.argument.save_to_lake:
+            return
+        cached = load_npz(self.argument.tmp_fusion_cache_filename, self.fusion.cache_params(self.track, self.screencast))
+        if cached is None:
+            return
+        columns, _ = cached
+        SurveyLake().write_columns(self.argument.network_id, self.argument.survey_id, 'fused', lake_columns(columns))
+
+    def save_readings_to_lake(self, chunks: List[Columns]) -> None:
+        """Write the lake partition 'fusion' from the encoded output chunks."""
+        columns = {name: np.concatenate([c[name] for c in chunks]) for name in chunks[0]} \
+            if chunks else readings_to_columns([])
+        SurveyLake().write_columns(self.argument.network_id, self.argument.survey_id, 'fusion', columns)
+
+    def handover_events(self) -> Columns:
+        """Handover events of the last run (see corelte.handover.HandoverIndexer.put)."""
+        return handovers_of_readings(self.handover_edges)
+
+    def run(self, writer: Optional[BackgroundWriter] = None, gpkg: bool = True,
+            handovers: Optional[HandoverIndexer] = None) -> int:
+        """Run the pipeline and write the readings chunk by chunk.
+
+        Args:
+            writer: Database writer, None to write the files only
+            gpkg: Also write the GeoPackage layer
+            handovers: Receives the handover events of the survey, before the flush
+                of the writer (whose hooks should include it)
+
+        Returns:
+            Number of readings written
+        """
+        net_id = self.argument.network_id
+        survey_id = self.argument.survey_id
+        self.nb_written = 0
+        begun = False
+        # sorties encodées au fil de l'écriture : quelques octets par mesure au lieu des objets Reading
+        lake_chunks: Optional[List[Columns]] = [] if self.argument.save_to_lake else None
+
+        gpkg_writer = GeoPackageWriter(self.argument.gpkg_filename, 'readings', self.chunk_size) if gpkg else None
+        try:
+            with open(self.argument.csv_filename, 'w', newline='') as csvfile:
+                csvwriter = csv.writer(csvfile)
+                for chunk in chunked(self.readings(), self.chunk_size):
+                    if self.nb_written == 0:
+                        csvwriter.writerow(chunk[0].fields())
+                    csvwriter.writerows(r.csv_row() for r in chunk)
+                    if gpkg_writer is not None:
+                        gpkg_writer.write(chunk)
+                    if lake_chunks is not None:
+                        lake_chunks.append(readings_to_columns(chunk))
+                    if writer is not None:
+                        # la date du survey est connue dès le premier point GPS lu
+                        if not begun:
+                            writer.begin_survey(self.fusion._new_survey(self.track.cursor.first_non_null_reading_time))
+                            begun = True
+                        writer.put(net_id, survey_id, chunk)
+                    self.nb_written += len(chunk)
+        finally:
+            if gpkg_writer is not None:
+                gpkg_writer.close()
+        self.save_caches()
+        self.save_fused_to_lake()
+        if lake_chunks is not None:
+            self.save_readings_to_lake(lake_chunks)
+        if handovers is not None:
+            handovers.put(survey_id, self.handover_events())
+
+        if writer is not None:
+            if not begun:
+                writer.begin_survey(self.fusion._new_survey(self.track.cursor.first_non_null_reading_time))
+            writer.flush(net_id, survey_id)
+        print(f"Survey {survey_id}: {self.nb_written} mesures écrites par lots de {self.chunk_size}")
+        return self.nb_written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import d'un survey en flux, en mémoire bornée")
+    parser.add_argument('--network', type=int, required=True)
+    parser.add_argument('--survey', type=int, required=True)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--no-db', action='store_true', help="n'écrit que les fichiers CSV et GeoPackage")
+    args = parser.parse_args()
+
+    argument = Argument(args.network, args.survey)
+    pipeline = StreamingPipeline(argument, chunk_size=args.chunk_size)
+    pipeline.prepare_frames()
+
+    writer = handovers = None
+    if not args.no_db:
+        from corelte.orm.db import db_engines
+        handovers = HandoverIndexer(args.network)
+        writer = BackgroundWriter(db_engines.main, hooks=[handovers])
+        writer.start()
+    pipeline.run(writer, handovers=handovers)
+    if writer is not None:
+        writer.close()
+
+
+if __name__ == "__main__":
+    main()
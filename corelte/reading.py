@@ -120,12 +120,16 @@ class Reading:
         """Check if reading has valid coordinates."""
         return self.latitude is not None and self.longitude is not None
 
-    def apply_time_compensation(self) -> None:
-        """Compensate for measurement reaction time based on speed (3m per m/s)."""
+    def apply_time_compensation(self, reaction_time: float = 3.0) -> None:
+        """Compensate for measurement reaction time based on speed (3m per m/s).
+
+        Args:
+            reaction_time: Reaction time of the phone in seconds
+        """
         if not self.speed or not self._has_valid_coordinates():
             return
 
-        distance = self.speed * 3
+        distance = self.speed * reaction_time
         geod = Geod(ellps="WGS84")
         compensated_coords = geod.fwd(
             lons=self.longitude,
@@ -0,0 +1,116 @@
+"""Run-length encoded screencast readings.
+
+Between two cell changes every frame of the screencast repeats the same band,
+cell_id, PCI and TAC. A ReadingInterval stores such a run once, as the range of
+frames (file_idx) it covers; per-second Reading objects are only built when a
+consumer asks for them.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Iterator, List, Optional
+
+from corelte.reading import Reading
+
+TimeOf = Callable[[int], Optional[datetime]] # file_idx -> heure de la frame
+
+
+@dataclass
+class ReadingInterval:
+    """Frames start_idx to end_idx (inclusive) showing the same cell values.
+
+    Attributes:
+        start_idx: file_idx of the first frame
+        end_idx: file_idx of the last frame
+        band: Network band
+        cellid: Cell identifier
+        pci: Physical Cell ID
+        tac: Tracking Area Code
+        carrier: Network carrier name
+    """
+    start_idx: int
+    end_idx: int
+    band: Optional[int] = None
+    cellid: Optional[int] = None
+    pci: Optional[int] = None
+    tac: Optional[int] = None
+    carrier: str = ""
+
+    def __len__(self) -> int:
+        return self.end_idx - self.start_idx + 1
+
+    def values(self) -> tuple:
+        return self.band, self.cellid, self.pci, self.tac, self.carrier
+
+    def is_valid(self) -> bool:
+        """Same rule as Reading.is_valid."""
+        return bool(self.cellid and self.cellid >= 99999)
+
+    def copy_to(self, r: Reading) -> Reading:
+        """Copy the cell values into a reading."""
+        r.band, r.cellid, r.pci, r.tac, r.carrier = self.band, self.cellid, self.pci, self.tac, self.carrier
+        return r
+
+
+@dataclass
+class MP4Clock:
+    """Clock of the screencast: one frame per second from a synchronised frame.
+
+    Attributes:
+        first_idx: file_idx of the synchronised frame
+        first_time: Time of that frame, to the second
+    """
+    first_idx: int
+    first_time: datetime
+
+    def time(self, file_idx: int) -> datetime:
+        return self.first_time + timedelta(seconds=file_idx - self.first_idx)
+
+
+def append_frame(intervals: List[ReadingInterval], file_idx: int, band, cellid, pci, tac, carrier: str = "") -> None:
+    """Extend the last interval with a frame, or start a new one if the values changed."""
+    if intervals:
+        last = intervals[-1]
+        if last.end_idx == file_idx - 1 and last.values() == (band, cellid, pci, tac, carrier):
+            last.end_idx = file_idx
+            return
+    intervals.append(ReadingInterval(file_idx, file_idx, band, cellid, pci, tac, carrier))
+
+
+def encode_intervals(lines: Iterable[Reading]) -> List[ReadingInterval]:
+    """Run-length encode readings ordered by file_idx."""
+    intervals: List[ReadingInterval] = []
+    for r in lines:
+        append_frame(intervals, r.file_idx, r.band, r.cellid, r.pci, r.tac, r.carrier)
+    return intervals
+
+
+def expand_intervals(intervals: Iterable[ReadingInterval], survey_id: int,
+                     time_of: Optional[TimeOf] = None) -> Iterator[Reading]:
+    """Yield one Reading per frame of the intervals.
+
+    Args:
+        intervals: Intervals ordered by file_idx
+        survey_id: Survey identifier of the readings
+        time_of: Time of a frame, None to leave reading_time empty
+    """
+    for interval in intervals:
+        for file_idx in range(interval.start_idx, interval.end_idx + 1):
+            r = interval.copy_to(Reading(survey_id))
+            r.file_idx = file_idx
+            r.reading_time = time_of(file_idx) if time_of is not None else None
+            yield r
+
+
+def clip_intervals(intervals: Iterable[ReadingInterval], first_idx: int, last_idx: int) -> List[ReadingInterval]:
+    """Restrict intervals to the frames first_idx to last_idx (inclusive)."""
+    clipped = []
+    for interval in intervals:
+        start, end = max(interval.start_idx, first_idx), min(interval.end_idx, last_idx)
+        if start <= end:
+            clipped.append(ReadingInterval(start, end, *interval.values()))
+    return clipped
+
+
+def nb_frames(intervals: Iterable[ReadingInterval]) -> int:
+    return sum(len(interval) for interval in intervals)
@@ -1,11 +1,15 @@
+from corelte.cache import decode_optional_int, decode_readings, decode_time, encode_optional_ints, encode_readings, \
+    encode_time, file_signature, files_signature, load_npz, save_npz
 from corelte.dict_list_handler import DictListHandler
 from corelte.argument import Argument, OCRMode, MYOCR_SWIFT_PRG
 from corelte.cursor import Cursor
 from corelte.datetime_local import convert_local_to_utc, convert_utc_to_local
 from corelte.reading import Reading
+from corelte.reading_interval import MP4Clock, ReadingInterval, append_frame, expand_intervals
 import cv2 
-from datetime import datetime, timedelta
+from datetime import datetime
 import glob
+import numpy as np
 import os, os.path
 from pathlib import Path
 from PIL import Image, ImageEnhance
@@ -16,6 +20,14 @@ from tqdm import tqdm
 from typing import Tuple, List, Optional
 from dataclasses import dataclass, field
 
+# Zones extraites des frames du screencast (886x1920) : largeur, hauteur, x, y
+CROP_TIME = (105, 40, 64, 25) # horloge
+CROP_LTE = (340, 840, 540, 190) # paramètres LTE
+
+# Score SSIM en dessous duquel une frame est différente de la précédente
+SCORE_MIN_LTE = 0.999
+SCORE_MIN_TIME = 0.95 # fine tuning 😀
+
 # types listes de fichiers avec l'index de frame et un nom de fichier
 File_to_ocr = list[(int, str)] # index, filename
 Files_to_ocr = list[File_to_ocr]
@@ -26,6 +38,9 @@ class Screencast:
     argument: Argument
     
     linesMp4: List[Reading] = field(default_factory=list)
+    intervalsMp4: List[ReadingInterval] = field(default_factory=list) # frames identiques regroupées
+    frame_times: List[Optional[datetime]] = field(default_factory=list) # heure lue sur les premières frames
+    clock: Optional[MP4Clock] = None
     frames_to_ocr: Files_to_ocr = field(default_factory=list) 
     times_to_ocr: Files_to_ocr = field(default_factory=list)
     cursor: Cursor = field(default_factory=Cursor)
@@ -73,9 +88,8 @@ class Screencast:
                 # crop_lte = 'crop=250:400:560:600'
                 
                 # dimension de la fenêtre sur les valeurs de l'horloge
-                width_tim = 105
-                height_tim = 40
-                crop_tim = f'crop={width_tim}:{height_tim}:64:25'
+                width_tim, height_tim, x_tim, y_tim = CROP_TIME
+                crop_tim = f'crop={width_tim}:{height_tim}:{x_tim}:{y_tim}'
                 """new_width_tim = int(width_tim * self.argument.scale_factor)
                 new_height_tim = int(height_tim * self.argument.scale_factor)
                 scale_filter_tim = f'scale={new_width_tim}:{new_height_tim}' """
@@ -88,9 +102,8 @@ class Screencast:
                                 {self.argument.survey_img_dir}/tim_%06d.png', shell=True)
                 
                 # dimension de la fenêtre sur les valeurs LTE
-                width_lte = 340
-                height_lte = 840
-                crop_lte = f'crop={width_lte}:{height_lte}:540:190'
+                width_lte, height_lte, x_lte, y_lte = CROP_LTE
+                crop_lte = f'crop={width_lte}:{height_lte}:{x_lte}:{y_lte}'
                 new_width_lte = int(width_lte * self.argument.scale_factor)
                 new_height_lte = int(height_lte * self.argument.scale_factor)
                 scale_filter_lte = f'scale={new_width_lte}:{new_height_lte}'
@@ -122,6 +135,33 @@ class Screencast:
         return score
 
 
+    def iter_changed_frames(self, filter, score_min):
+        """
+        Parcourt les frames du filtre une à une et retourne (file_idx, fname) de celles qui diffèrent
+        de la précédente. Seule la frame précédente est gardée en mémoire.
+        """
+        files = glob.glob(str(filter))
+        files.sort() 
+
+        img_prev = None
+        for i, fname in tqdm(enumerate(files)):
+            file_idx = i+1
+            img = cv2.cvtColor(cv2.imread(fname), cv2.COLOR_BGR2GRAY)
+            if i == 0: 
+                yield (file_idx, fname)
+                img_prev = img
+                continue
+
+            # Compute SSIM between two images
+            score = compare_ssim(img, img_prev, full=False)
+
+            # si le score est moins que 1 - une petite marge, on l'ajoute à la liste car l'image est différente de la précédente.
+            print(f"file_idx={file_idx} score={score}")
+            if score < score_min:
+                yield (file_idx, fname)
+
+            img_prev = img
+
     def create_list_of_frames_to_ocr(self):
         """
         On crée une liste de fichiers frame à OCRiser qu'on sauve dans un fichier .txt
@@ -130,33 +170,7 @@ class Screencast:
 
 #        def create_list(list: list[Frame_to_ocr], filter, score_min) -> None:
         def create_list(list: Files_to_ocr, filter, score_min) -> None:
-
-            files = glob.glob(str(filter))
-            files.sort() 
-            
-
-            img_prev = None
-            for i, fname in tqdm(enumerate(files)):
-                file_idx = i+1
-                img = cv2.cvtColor(cv2.imread(fname), cv2.COLOR_BGR2GRAY)
-                if i == 0: 
-                    list.append((file_idx, fname))
-                    #list[file_idx] = fname
-                    #frame = Frame_to_ocr(key=file_idx, fname=fname)
-                    #list.append(frame)
-                    img_prev = img
-                    continue
-
-                # Compute SSIM between two images
-                score = compare_ssim(img, img_prev, full=False)
-
-                # si le score est moins que 1 - une petite marge, on l'ajoute à la liste car l'image est différente de la précédente.
-                print(f"file_idx={file_idx} score={score}")
-                if score < score_min:  # or i <= 30: #0.999: # Debug, on scanne les 30 premières secondes
-                    list.append((file_idx, fname))
-                    # list.append({'key':file_idx, 'fname':fname})
-
-                img_prev = img
+            list.extend(self.iter_changed_frames(filter, score_min))
 
         
         #def save_to_txt(list : list[Frame_to_ocr], fname: Path):
@@ -174,7 +188,7 @@ class Screencast:
         if self.argument.tmp_frames_to_ocr_filename_json.exists():
             self.frames_to_ocr = h.read_from_json(self.argument.tmp_frames_to_ocr_filename_json)
         else:
-            create_list(self.frames_to_ocr, self.argument.survey_img_dir / 'lte_*.png', score_min=0.999)
+            create_list(self.frames_to_ocr, self.argument.survey_img_dir / 'lte_*.png', score_min=SCORE_MIN_LTE)
             save_to_txt(self.frames_to_ocr, self.argument.tmp_frames_to_ocr_filename_txt)
             h.save_to_json(self.frames_to_ocr, self.argument.tmp_frames_to_ocr_filename_json)
 
@@ -182,7 +196,7 @@ class Screencast:
         if self.argument.tmp_times_to_ocr_filename_json.exists():
             self.times_to_ocr = h.read_from_json(self.argument.tmp_times_to_ocr_filename_json)
         else:
-            create_list(self.times_to_ocr, self.argument.survey_img_dir / 'tim_*.png', score_min=0.95) # fine tuning 😀
+            create_list(self.times_to_ocr, self.argument.survey_img_dir / 'tim_*.png', score_min=SCORE_MIN_TIME)
             save_to_txt(self.times_to_ocr, self.argument.tmp_times_to_ocr_filename_txt)
             h.save_to_json(self.times_to_ocr, self.argument.tmp_times_to_ocr_filename_json)
 
@@ -333,7 +347,9 @@ class Screencast:
     def extract_reading_from_frame(self, r: Reading, frame_fname: str) -> Tuple[Reading, bool]:
 
         # extrait la liste des mots du résultat de l'OCR    
-        words = self.convert_text_to_list_of_words(frame_fname)
+        return self.extract_reading_from_words(r, self.convert_text_to_list_of_words(frame_fname))
+
+    def extract_reading_from_words(self, r: Reading, words: List[str]) -> Tuple[Reading, bool]:
 
         # si liste trop petite c'est du garbage  
         if len(words) < 5: return r, False  
@@ -357,6 +373,20 @@ class Screencast:
         
         return r, True
 
+    def time_from_words(self, words) -> Optional[datetime]:
+        """
+        Heure affichée (HH:MM) sur la frame, à la date du screencast. None si illisible.
+        """
+        if len(words) == 0:
+            return None
+        # l'heure est le premier élément de la liste
+        time_str = self.filtrer_caracteres(words[0])
+        try:
+            return datetime.strptime(time_str, '%H:%M').replace(year=self.mp4CreateDate.year, month=self.mp4CreateDate.month, day=self.mp4CreateDate.day)
+        except ValueError:
+            print(f'Heure illisible: {words[0]}')
+            return None
+
     def extract_reading_from_hold(self, r: Reading) -> Reading:
 
         # Les données n'ont pas changé depuis la dernière frame.
@@ -367,32 +397,35 @@ class Screencast:
         return r
 
 
-    def read_filtred_frames_files_into_linesMp4(self):
+    def read_filtred_frames_files_into_intervalsMp4(self):
+        """
+        Lit les frames OCR-isées en intervalles : une frame qui n'a pas été OCR-isée
+        prolonge l'intervalle courant au lieu de créer une mesure.
+        L'heure n'est lue que sur les time_scan_probe premières frames (frame_times).
+        """
+        self.intervalsMp4.extend(self.iter_intervalsMp4())
 
+    def iter_intervalsMp4(self):
+        """
+        Version flux de read_filtred_frames_files_into_intervalsMp4 : un intervalle est retourné
+        dès que la frame suivante en commence un autre. Les frames sont lues une à une.
+        """
         if self.argument.ocr_mode != OCRMode.MYOCR_PLUS:
             raise Exception("Seul le mode OCR_PLUS peut passer par là.")
 
-        # On parcours les frames png
-        filter = self.argument.survey_img_dir / 'lte_*.png'
-        lst = glob.glob(str(filter))
-        lst.sort()
-        
         frame_to_ocr_idx = 0
         time_to_ocr_idx = 0
 
-        for i in range(len(lst)):
-            
-            file_idx = i+1 # décalage entre les listes python et les indexes de fichier
+        # intervalle en cours, pas encore terminé
+        pending: List[ReadingInterval] = []
 
-            r = Reading(self.argument.survey_id)
-            r.file_idx = file_idx
+        # On parcours les frames png (lte_000001.png, lte_000002.png, ...)
+        file_idx = 1 # décalage entre les listes python et les indexes de fichier
+        while (self.argument.survey_img_dir / f'lte_{file_idx:06d}.png').exists():
+            i = file_idx - 1
 
             # Est-ce que cette frame a été OCR-isée?    
-            #file_entry = self.frames_to_ocr[frame_to_ocr_idx]
-            #file_entry = self.frames_to_ocr[frame_to_ocr_idx]
-            
             file_entry, fname = self.frames_to_ocr[frame_to_ocr_idx]
-            #if file_entry['key'] == file_idx:
 
             if file_entry == file_idx:
 
@@ -400,51 +433,93 @@ class Screencast:
                 frame_to_ocr_idx += (frame_to_ocr_idx < len(self.frames_to_ocr) - 1) 
 
                 # Lit les données LTE depuis le fichier txt
-                #r, success = self.extract_reading_from_frame(r, Path(file_entry['fname']).with_suffix('.txt'))
-                r, success = self.extract_reading_from_frame(r, Path(fname).with_suffix('.txt'))
+                r, success = self.extract_reading_from_frame(Reading(self.argument.survey_id), Path(fname).with_suffix('.txt'))
                 
-                # Si les données ne sont pas valides, on abandonne cette mesure
-                # if r == None:continue
                 if success:
                     # On retient cette mesure pour les suivantes qui seraient identiques
                     self.hold_frame_reading.__dict__ = r.__dict__.copy()
 
             else:
                 # Les données n'ont pas changé depuis la dernière frame.
-                r = self.extract_reading_from_hold(r)
+                r = self.hold_frame_reading
 
+            # Même en cas d'erreur, on garde la frame (intervalle invalide)
+            append_frame(pending, file_idx, r.band, r.cellid, r.pci, r.tac)
 
             # Lit les données de temps depuis le fichier txt sur les 90 premières secondes
             if file_idx <= self.argument.time_scan_probe:
 
                 # Est-ce que cette frame a été ocr-isée?
-                # BUG l'index time_to_ocr_idx reste toujours à zéro
-                #file_entry = self.times_to_ocr[time_to_ocr_idx]
                 file_entry, fname = self.times_to_ocr[time_to_ocr_idx]    
-                #if file_entry['key'] == file_idx:    
+                reading_time = self.hold_frame_time
                 if file_entry == file_idx:    
 
                     # On incrémente l'index des frames ocr-isées    
                     time_to_ocr_idx += (time_to_ocr_idx < len(self.times_to_ocr) - 1) 
 
-                    #filename = self.argument.survey_img_dir / f'tim_{str(file_idx).zfill(6)}.txt'
                     words = self.convert_text_to_list_of_words(Path(fname).with_suffix('.txt'))
                     if len(words)>0 :
                         # l'heure est le premier élément de la liste            
                         time_str = self.filtrer_caracteres(words[0])
                         print(f' i={i} words[0]={words[0]} time_str={time_str}')
                         try:
-                            r.reading_time = datetime.strptime(time_str, '%H:%M').replace(year=self.mp4CreateDate.year, month=self.mp4CreateDate.month, day=self.mp4CreateDate.day)    
-                            self.hold_frame_time = r.reading_time
+                            reading_time = datetime.strptime(time_str, '%H:%M').replace(year=self.mp4CreateDate.year, month=self.mp4CreateDate.month, day=self.mp4CreateDate.day)    
+                            self.hold_frame_time = reading_time
                         except:
-                            # On debug... 
-                            #r.reading_time = None
-                            r.reading_time = self.hold_frame_time # debug
                             print(f'Planté en i={i} time_str={time_str}')
-                else:
-                    r.reading_time = self.hold_frame_time
+                    else:
+                        reading_time = None
+
+                self.frame_times.append(reading_time)
+
+            # L'intervalle précédent est terminé
+            if len(pending) > 1:
+                yield pending.pop(0)
+            file_idx += 1
+
+        yield from pending
+
+    def iter_synced_intervalsMp4(self, intervals=None):
+        """
+        Intervalles avec l'horloge synchronisée (set_precise_time_in_intervalsMp4) :
+        seuls les intervalles des time_scan_probe premières frames sont retenus le temps de lire l'heure,
+        les suivants passent directement.
 
-            self.linesMp4.append(r) # Même en cas d'erreur, on ajoute la ligne
+        Args:
+        - intervals: Flux d'intervalles, par défaut iter_intervalsMp4()
+        """
+        intervals = iter(self.iter_intervalsMp4() if intervals is None else intervals)
+        probe: List[ReadingInterval] = []
+        for interval in intervals:
+            probe.append(interval)
+            if interval.end_idx >= self.argument.time_scan_probe:
+                break
+        self.set_precise_time_in_intervalsMp4()
+        yield from probe
+        yield from intervals
+
+    def time_of_frame(self, file_idx: int) -> Optional[datetime]:
+        """
+        Heure d'une frame : celle de l'horloge synchronisée si elle est connue, sinon l'heure lue sur la frame.
+        """
+        if self.clock is not None and file_idx >= self.clock.first_idx:
+            return self.clock.time(file_idx)
+        if 0 < file_idx <= len(self.frame_times):
+            return self.frame_times[file_idx - 1]
+        return None
+
+    def iter_linesMp4(self):
+        """
+        Développe les intervalles en une mesure par frame (seconde), à la demande.
+        """
+        return expand_intervals(self.intervalsMp4, self.argument.survey_id, self.time_of_frame)
+
+    def read_filtred_frames_files_into_linesMp4(self):
+        """
+        Version liste de read_filtred_frames_files_into_intervalsMp4, une mesure par frame.
+        """
+        self.read_filtred_frames_files_into_intervalsMp4()
+        self.linesMp4 = list(self.iter_linesMp4())
 
 
     def read_frame_files_into_linesMp4(self):
@@ -497,9 +572,14 @@ class Screencast:
             finally:
                 self.linesMp4.append(r) # Même en cas d'erreur, on ajoute la ligne
 
-    def set_precise_time_in_linesMp4_rows(self):
+    @staticmethod
+    def find_clock(times: List[Optional[datetime]]) -> Tuple[int, Optional[MP4Clock]]:
         """
-        Ajoute l'heure à la seconde près sur chaque frame du screencast
+        Cherche la première heure lisible et le passage d'une minute à l'autre dans les heures des frames.
+
+        Returns:
+        - L'index (liste) de la première heure lisible, -1 si aucune.
+        - L'horloge à la seconde près, None si la minute n'avance pas dans les frames.
         """
         first_non_null_mp4_reading_time = None
         first_non_null_mp4_idx = -1
@@ -507,25 +587,21 @@ class Screencast:
         first_minute_change_idx = -1
         
         # 1. On définit les premières valeurs ou l'heure est lisible et le passage d'une minute à l'autre
-        for i in range(len(self.linesMp4)):
+        for i, reading_time in enumerate(times):
             
-            r = self.linesMp4[i]
-
-            if r.reading_time == None: 
+            # DEBUG on filtre lles dates nulle
+            if reading_time == None or reading_time == datetime.min: 
                 continue
 
             # défini l'index de la première heure lisible sur le screencast
-            # BUG self.linesMp4[0] indique l'heure actuelle, ce qui est faux
-            # DEBUG on filtre lles dates nulle
-            if r.reading_time != None and r.reading_time != datetime.min:
-                if (first_non_null_mp4_reading_time == None): 
-                    first_non_null_mp4_reading_time = r.reading_time
-                    first_non_null_mp4_idx = i
-
-                # défini l'index où pour la première fois, l'heure avance d'une minute    
-                if (first_minute_change_dt == None) and (r.reading_time != first_non_null_mp4_reading_time):
-                    first_minute_change_dt = r.reading_time
-                    first_minute_change_idx = i
+            if (first_non_null_mp4_reading_time == None): 
+                first_non_null_mp4_reading_time = reading_time
+                first_non_null_mp4_idx = i
+
+            # défini l'index où pour la première fois, l'heure avance d'une minute    
+            if (first_minute_change_dt == None) and (reading_time != first_non_null_mp4_reading_time):
+                first_minute_change_dt = reading_time
+                first_minute_change_idx = i
         
         print(f'first_non_null_mp4_reading_time {first_non_null_mp4_reading_time}')
         print(f'first_non_null_idx {first_non_null_mp4_idx}')
@@ -533,32 +609,111 @@ class Screencast:
         print(f'first_minute_change_idx {first_minute_change_idx}')
         print(f'-----------------')
 
-        # 2. Ajoute la précision en seconde des mesures
-        if first_minute_change_dt != None:
-            
-            dd = self.linesMp4[first_non_null_mp4_idx].reading_time
+        if first_minute_change_dt == None:
+            return first_non_null_mp4_idx, None
 
-            # Il peut arriver que la detection de la minute qui avance prenne du temps
-            # ...
+        # 2. La précision en seconde de la première heure lisible
+        # Il peut arriver que la detection de la minute qui avance prenne du temps
+        second = 60 - first_minute_change_idx + first_non_null_mp4_idx
+        dd = first_non_null_mp4_reading_time.replace(second = second)
+        return first_non_null_mp4_idx, MP4Clock(first_non_null_mp4_idx + 1, dd)
 
-            second = 60 - first_minute_change_idx + first_non_null_mp4_idx
-            dd = dd.replace(second = second)
-            
-            for i in range(first_non_null_mp4_idx, len(self.linesMp4)):    
-                r = self.linesMp4[i]
-                r.reading_time = dd
-                dd += timedelta(seconds=1)
+    def set_precise_time_in_linesMp4_rows(self):
+        """
+        Ajoute l'heure à la seconde près sur chaque frame du screencast
+        """
+        first_non_null_mp4_idx, self.clock = self.find_clock([r.reading_time for r in self.linesMp4])
 
-        # 3. Ajuste à la seconde l'heure de la première mesure
-        first_non_null_mp4_reading_time = self.linesMp4[first_non_null_mp4_idx].reading_time
+        # Ajoute la précision en seconde des mesures
+        if self.clock is not None:
+            for i in range(first_non_null_mp4_idx, len(self.linesMp4)):    
+                self.linesMp4[i].reading_time = self.clock.time(i + 1)
 
-        # 4. Index de la première mesure exploitable
+        # Index de la première mesure exploitable
         self.cursor.first_non_null_idx = first_non_null_mp4_idx
 
-        # 5. Heure précise de la première mesure exploitable
-        self.cursor.first_non_null_reading_time = first_non_null_mp4_reading_time
-        
-        # BUG first_non_null_mp4_reading_time est faux, il affiche la date du jour...
-        print(f'first_non_null_mp4_reading_time {first_non_null_mp4_reading_time}')
+        # Heure précise de la première mesure exploitable
+        self.cursor.first_non_null_reading_time = self.linesMp4[first_non_null_mp4_idx].reading_time
+        print(f'first_non_null_mp4_reading_time {self.cursor.first_non_null_reading_time}')
+
+    def set_precise_time_in_intervalsMp4(self):
+        """
+        Synchronise l'horloge du screencast sur les heures des premières frames.
+        Les heures des frames sont ensuite dérivées de l'horloge (time_of_frame), sans mesure par frame.
+        """
+        first_non_null_mp4_idx, self.clock = self.find_clock(self.frame_times)
+
+        self.cursor.first_non_null_idx = first_non_null_mp4_idx
+        self.cursor.first_non_null_reading_time = \
+            self.time_of_frame(first_non_null_mp4_idx + 1) if first_non_null_mp4_idx >= 0 else None
+        print(f'first_non_null_mp4_reading_time {self.cursor.first_non_null_reading_time}')
 
+    def cache_params(self) -> dict:
+        """
+        Paramètres dont dépendent les mesures synchronisées du screencast (voir corelte.cache).
+        Les fichiers .txt de l'OCR (un par frame) comptent aussi : un OCR refait invalide le cache.
+        """
+        a = self.argument
+        return {'step': 'mp4', 'survey_id': a.survey_id, 'ocr_mode': a.ocr_mode.name,
+                'scale_factor': a.scale_factor, 'time_scan_probe': a.time_scan_probe,
+                'mp4_create_date': encode_time(self.mp4CreateDate),
+                'sources': file_signature(a.mp4_filename, a.tmp_frames_to_ocr_filename_json, a.tmp_times_to_ocr_filename_json),
+                'ocr_txt': files_signature(a.survey_img_dir, '.txt')}
+
+    def save_cache(self):
+        """
+        Sauve les mesures synchronisées (intervalles et horloge, ou linesMp4 hors MYOCR_PLUS) dans tmp_mp4_cache_filename.
+        """
+        extra = {'first_non_null_idx': self.cursor.first_non_null_idx,
+                 'first_non_null_reading_time': encode_time(self.cursor.first_non_null_reading_time),
+                 'clock': None if self.clock is None else [self.clock.first_idx, encode_time(self.clock.first_time)]}
+        if self.intervalsMp4:
+            columns = {
+                'start_idx': np.array([i.start_idx for i in self.intervalsMp4], dtype=np.int64),
+                'end_idx': np.array([i.end_idx for i in self.intervalsMp4], dtype=np.int64),
+                'band': encode_optional_ints(i.band for i in self.intervalsMp4),
+                'cellid': encode_optional_ints(i.cellid for i in self.intervalsMp4),
+                'pci': encode_optional_ints(i.pci for i in self.intervalsMp4),
+                'tac': encode_optional_ints(i.tac for i in self.intervalsMp4),
+                'carrier': np.array([i.carrier for i in self.intervalsMp4], dtype='U16'),
+                'frame_times': np.array(['NaT' if t is None else t for t in self.frame_times], dtype='datetime64[us]'),
+            }
+            extra['kind'] = 'intervals'
+        else:
+            columns = encode_readings(self.linesMp4)
+            extra['kind'] = 'lines'
+        save_npz(self.argument.tmp_mp4_cache_filename, columns, self.cache_params(), extra)
 
+    def load_cache(self, expand: bool = True) -> bool:
+        """
+        Recharge les mesures synchronisées si le screencast et les listes OCR n'ont pas changé.
+        Retourne False si l'OCR doit être refait (cache absent, périmé, ou effacement demandé).
+        expand=False garde seulement les intervalles, sans linesMp4 (lecture en flux, corelte.pipeline).
+        """
+        a = self.argument
+        if not a.use_cache or a.erase_png or a.erase_txt:
+            return False
+        cached = load_npz(a.tmp_mp4_cache_filename, self.cache_params())
+        if cached is None:
+            return False
+        columns, extra = cached
+
+        if extra['kind'] == 'intervals':
+            self.intervalsMp4 = [
+                ReadingInterval(int(start), int(end), decode_optional_int(band), decode_optional_int(cellid),
+                                decode_optional_int(pci), decode_optional_int(tac), str(carrier))
+                for start, end, band, cellid, pci, tac, carrier in zip(
+                    columns['start_idx'], columns['end_idx'], columns['band'], columns['cellid'],
+                    columns['pci'], columns['tac'], columns['carrier'])]
+            self.frame_times = columns['frame_times'].tolist()
+        self.clock = None if extra['clock'] is None else MP4Clock(extra['clock'][0], decode_time(extra['clock'][1]))
+        # une mesure par frame, comme après l'OCR (les heures des frames viennent de l'horloge)
+        if extra['kind'] != 'intervals':
+            self.linesMp4 = decode_readings(columns, a.survey_id)
+        elif expand:
+            self.linesMp4 = list(self.iter_linesMp4())
+
+        self.cursor.first_non_null_idx = extra['first_non_null_idx']
+        self.cursor.first_non_null_reading_time = decode_time(extra['first_non_null_reading_time'])
+        print(f"Screencast chargé depuis le cache: {len(self.intervalsMp4)} intervalles, {len(self.linesMp4)} lignes")
+        return True
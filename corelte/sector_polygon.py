@@ -0,0 +1,209 @@
+"""Generation of the coverage polygon of each sector (Sector.geom) from its readings."""
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from geoalchemy2.shape import from_shape
+import numpy as np
+import shapely
+from sqlalchemy import and_, bindparam, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from corelte.cell_location import CellLocator, CellReadings, TO_LV95, TO_WGS84
+from corelte.orm.models import Reading_orm, Sector, Station, Survey
+
+
+@dataclass
+class PolygonParams:
+    """Parameters of the sector polygons.
+
+    Attributes:
+        concave_ratio: Ratio of shapely.concave_hull, 1.0 gives the convex hull
+        buffer: Buffer in meters around the hull (also turns lines and points into polygons)
+        wedge_angle: Opening in degrees of the wedge from the station, 0 to disable clipping
+        wedge_margin: Factor applied to the farthest reading to get the wedge radius
+    """
+    concave_ratio: float = 0.3
+    buffer: float = 30.0
+    wedge_angle: float = 120.0
+    wedge_margin: float = 1.2
+
+
+def wedge(station: Tuple[float, float], azimuth: float, angle: float, radius: float, nb_arc: int = 16) -> shapely.Polygon:
+    """Build a wedge (circular sector) polygon.
+
+    Args:
+        station: LV95 coordinates of the apex
+        azimuth: Direction of the axis in degrees, clockwise from north
+        angle: Opening of the wedge in degrees
+        radius: Radius in meters
+        nb_arc: Number of points on the arc
+    """
+    az = np.radians(azimuth + np.linspace(-angle / 2, angle / 2, nb_arc))
+    arc = np.column_stack((station[0] + radius * np.sin(az), station[1] + radius * np.cos(az)))
+    return shapely.Polygon(np.vstack(([station], arc, [station])))
+
+
+def _to_wgs84(coords: np.ndarray) -> np.ndarray:
+    lon, lat = TO_WGS84.transform(coords[:, 0], coords[:, 1])
+    return np.column_stack((lon, lat))
+
+
+@dataclass
+class _Job:
+    cells: List[CellReadings]
+    stations: List[Optional[Tuple[float, float]]]
+    params: PolygonParams
+
+
+def _polygons_chunk(job: _Job) -> List[Tuple[int, Optional[bytes]]]:
+    """Compute the polygons of a chunk of cells with vectorised shapely operations.
+
+    Returns:
+        List of (cell_id, WKB of the WGS84 MultiPolygon or None)
+    """
+    params = job.params
+    coords = np.vstack([np.column_stack((x, y)) for _, x, y, _ in job.cells])
+    indices = np.repeat(np.arange(len(job.cells)), [len(x) for _, x, _, _ in job.cells])
+    points = shapely.multipoints(coords, indices=indices)
+
+    if params.concave_ratio < 1.0:
+        hulls = shapely.concave_hull(points, ratio=params.concave_ratio)
+    else:
+        hulls = shapely.convex_hull(points)
+    polygons = shapely.buffer(hulls, params.buffer)
+
+    # Découpe par un secteur angulaire orienté de la station vers les mesures
+    if params.wedge_angle > 0:
+        centroids = shapely.centroid(points)
+        wedges = np.empty(len(job.cells), dtype=object)
+        for i, station in enumerate(job.stations):
+            if station is None:
+                continue
+            cx, cy = shapely.get_x(centroids[i]), shapely.get_y(centroids[i])
+            azimuth = np.degrees(np.arctan2(cx - station[0], cy - station[1]))
+            _, x, y, _ = job.cells[i]
+            radius = params.wedge_margin * float(np.max(np.hypot(x - station[0], y - station[1]))) + params.buffer
+            wedges[i] = wedge(station, azimuth, params.wedge_angle, radius)
+        has_wedge = np.array([w is not None for w in wedges])
+        if has_wedge.any():
+            clipped = shapely.intersection(polygons[has_wedge], wedges[has_wedge])
+            # Si la découpe ne laisse rien (station mal associée), on garde l'enveloppe
+            keep = ~shapely.is_empty(clipped)
+            polygons[np.flatnonzero(has_wedge)[keep]] = clipped[keep]
+
+    polygons = shapely.transform(polygons, _to_wgs84)
+    result = []
+    for (cell_id, _, _, _), polygon in zip(job.cells, polygons):
+        if polygon is None or polygon.is_empty:
+            result.append((cell_id, None))
+            continue
+        if polygon.geom_type == 'Polygon':
+            polygon = shapely.MultiPolygon([polygon])
+        elif polygon.geom_type != 'MultiPolygon':
+            polygon = shapely.MultiPolygon([g for g in polygon.geoms if g.geom_type == 'Polygon'])
+        result.append((cell_id, shapely.to_wkb(polygon)))
+    return result
+
+
+class SectorPolygonGenerator:
+    """Computes Sector.geom for the sectors of a network.
+
+    Only the sectors whose readings changed since their polygon was computed
+    (Survey.uploaded later than Sector.geom_updated) are recomputed.
+
+    Example:
+        generator = SectorPolygonGenerator(network_id=1)
+        with get_db_session() as session:
+            generator.update(session)
+    """
+
+    def __init__(self, network_id: int, params: Optional[PolygonParams] = None,
+                 workers: Optional[int] = None, chunk_size: int = 200) -> None:
+        """Initialize the generator.
+
+        Args:
+            network_id: Network identifier
+            params: Polygon parameters
+            workers: Number of worker processes, None for one per CPU, 0 to compute in-process
+            chunk_size: Number of cells per worker task
+        """
+        self.network_id = network_id
+        self.params = params or PolygonParams()
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.locator = CellLocator(network_id, workers=0)
+
+    def stale_sectors(self, session: Session, force: bool = False) -> Dict[int, Optional[Tuple[float, float]]]:
+        """Return the sectors to recompute with the LV95 position of their station.
+
+        Args:
+            session: Database session
+            force: Return every sector of the network
+
+        Returns:
+            Dictionary cell_id -> station coordinates (None if the station is unknown)
+        """
+        changed = select(Reading_orm.cell_id, func.max(Survey.uploaded).label('changed')) \
+            .join(Survey, and_(Survey.network_id == Reading_orm.network_id, Survey.survey_id == Reading_orm.survey_id)) \
+            .where(Reading_orm.network_id == self.network_id) \
+            .group_by(Reading_orm.cell_id) \
+            .subquery()
+
+        stmt = select(Sector.cell_id, func.ST_X(Station.geom), func.ST_Y(Station.geom)) \
+            .join(changed, changed.c.cell_id == Sector.cell_id) \
+            .outerjoin(Station, and_(Station.network_id == Sector.network_id, Station.name == Sector.station_name)) \
+            .where(Sector.network_id == self.network_id)
+        if not force:
+            stmt = stmt.where(or_(Sector.geom_updated.is_(None), Sector.geom_updated < changed.c.changed))
+
+        result = {}
+        for cell_id, lon, lat in session.execute(stmt):
+            result[cell_id] = None if lon is None else tuple(float(v) for v in TO_LV95.transform(lon, lat))
+        return result
+
+    def compute(self, cells: List[CellReadings], stations: Dict[int, Optional[Tuple[float, float]]]) -> List[Tuple[int, Optional[bytes]]]:
+        """Compute the polygons, in parallel over chunks of cells."""
+        jobs = []
+        for i in range(0, len(cells), self.chunk_size):
+            chunk = cells[i:i + self.chunk_size]
+            jobs.append(_Job(chunk, [stations.get(c[0]) for c in chunk], self.params))
+
+        if self.workers == 0 or len(jobs) <= 1:
+            return [r for job in jobs for r in _polygons_chunk(job)]
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            return [r for chunk in pool.map(_polygons_chunk, jobs) for r in chunk]
+
+    def save(self, session: Session, polygons: Iterable[Tuple[int, Optional[bytes]]]) -> int:
+        """Write the polygons into Sector.geom in one bulk update."""
+        sector = Sector.__table__
+        stmt = update(sector) \
+            .where(sector.c.network_id == bindparam('b_network_id')) \
+            .where(sector.c.cell_id == bindparam('b_cell_id'))
+        now = session.scalar(select(func.now()))
+        rows = [{'b_network_id': self.network_id, 'b_cell_id': cell_id, 'geom_updated': now,
+                 'geom': None if wkb is None else from_shape(shapely.from_wkb(wkb), srid=4326)}
+                for cell_id, wkb in polygons]
+        if rows:
+            session.execute(stmt, rows)
+            session.commit()
+        return len(rows)
+
+    def update(self, session: Session, force: bool = False) -> int:
+        """Recompute the polygons of the sectors whose readings changed.
+
+        Args:
+            session: Database session
+            force: Recompute every sector of the network
+
+        Returns:
+            Number of sectors updated
+        """
+        stations = self.stale_sectors(session, force)
+        if not stations:
+            return 0
+        cells = self.locator.load_readings(session, list(stations.keys()))
+        nb = self.save(session, self.compute(cells, stations))
+        print(f"Polygones recalculés pour {nb} secteurs (réseau {self.network_id})")
+        return nb
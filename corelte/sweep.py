@@ -0,0 +1,210 @@
+"""Parameter sweep of clarify and of the speed compensation.
+
+The fused readings of each survey (lake dataset 'fused', written before
+clarify by Helper.save_fused_cache) are read once per worker process, then
+every combination of a grid of ClarifyParams is run through
+Fusion.clarify_with_minimum_distance2 and apply_speed_compensation_to_linesFusion.
+Each run is reported with its point count and spacing, compared with the
+run of a reference parameter set on the same survey.
+
+Usage:
+    python -m corelte.sweep --network 1 --surveys 202 203 --dist-min 30 50 70 \
+        --dist-per-speed 5 10 --reaction-time 2 3 4 --csv sweep.csv
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import csv
+from dataclasses import asdict, fields, replace
+from functools import lru_cache
+import itertools
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from corelte.cell_location import TO_LV95
+from corelte.fusion import DEFAULT_CLARIFY, ClarifyParams, Fusion
+from corelte.lake import Columns, SurveyLake, columns_to_readings
+
+SWEEP_DATASET = 'fused'
+
+# Colonnes relues pour clarify et la compensation
+COLUMNS = ('cell_id', 'pci', 'band', 'tac', 'file_idx', 'reading_time', 'speed',
+           'fwd_azimuth', 'bwd_azimuth', 'latitude', 'longitude')
+
+SurveyKey = Tuple[int, int] # network_id, survey_id
+Track = Tuple[np.ndarray, np.ndarray, np.ndarray] # file_idx, x, y (LV95)
+
+
+def param_grid(**values: Sequence[float]) -> List[ClarifyParams]:
+    """Every combination of the given values, the other parameters keeping their default.
+
+    Example:
+        param_grid(dist_min=[30, 50, 70], reaction_time=[2, 3, 4])  # 9 parameter sets
+    """
+    names = list(values)
+    return [replace(DEFAULT_CLARIFY, **dict(zip(names, combo))) for combo in itertools.product(*values.values())]
+
+
+def run_params(columns: Columns, params: ClarifyParams) -> Track:
+    """Clarify and compensate the fused readings of a survey with a parameter set.
+
+    Returns:
+        file_idx and LV95 position of the points kept
+    """
+    fusion = Fusion(None, params)
+    fusion.linesFusion = columns_to_readings(columns)
+    fusion.clarify_with_minimum_distance2()
+    fusion.apply_speed_compensation_to_linesFusion()
+
+    lines = fusion.linesFusion
+    file_idx = np.array([r.file_idx for r in lines], dtype=np.int64)
+    lon = np.array([r.longitude for r in lines], dtype=float)
+    lat = np.array([r.latitude for r in lines], dtype=float)
+    x, y = TO_LV95.transform(lon, lat)
+    return file_idx, np.asarray(x), np.asarray(y)
+
+
+def track_metrics(track: Track, reference: Optional[Track] = None) -> Dict[str, float]:
+    """Point count and spacing of a run, and its difference with the reference run.
+
+    Returns:
+        points, spacing_mean, spacing_p95, spacing_max (meters between successive points);
+        with a reference: points_ratio and shift_mean (mean distance, in meters,
+        between the positions of the points kept by both runs)
+    """
+    file_idx, x, y = track
+    spacing = np.hypot(np.diff(x), np.diff(y))
+    metrics = {
+        'points': len(file_idx),
+        'spacing_mean': float(np.nanmean(spacing)) if len(spacing) else 0.0,
+        'spacing_p95': float(np.nanpercentile(spacing, 95)) if len(spacing) else 0.0,
+        'spacing_max': float(np.nanmax(spacing)) if len(spacing) else 0.0,
+    }
+    if reference is not None:
+        ref_idx, ref_x, ref_y = reference
+        metrics['points_ratio'] = len(file_idx) / len(ref_idx) if len(ref_idx) else float('nan')
+        _, mine, theirs = np.intersect1d(file_idx, ref_idx, assume_unique=True, return_indices=True)
+        shift = np.hypot(x[mine] - ref_x[theirs], y[mine] - ref_y[theirs])
+        metrics['shift_mean'] = float(np.nanmean(shift)) if len(shift) else float('nan')
+    return metrics
+
+
+# --- Processus de travail : chaque processus relit une fois les surveys (mmap) ---
+
+_lake: Optional[SurveyLake] = None
+
+
+def _init_worker(root: Path) -> None:
+    global _lake
+    _lake = SurveyLake(root)
+
+
+@lru_cache(maxsize=None)
+def _fused_columns(network_id: int, survey_id: int) -> Columns:
+    directory = _lake.partition_dir(SWEEP_DATASET, network_id, survey_id)
+    return _lake.read_partition(directory, COLUMNS)
+
+
+def _run_task(task: Tuple[SurveyKey, ClarifyParams]) -> Tuple[SurveyKey, ClarifyParams, Track]:
+    (network_id, survey_id), params = task
+    return (network_id, survey_id), params, run_params(_fused_columns(network_id, survey_id), params)
+
+
+class ParameterSweep:
+    """Evaluates a grid of clarify/compensation parameters on cached surveys in a process pool.
+
+    Example:
+        sweep = ParameterSweep(workers=8)
+        results = sweep.run([(1, 202), (1, 203)], param_grid(dist_min=[30, 50, 70], turn_angle=[30, 45]))
+        for row in summarize(results): print(row)
+    """
+
+    def __init__(self, lake: Optional[SurveyLake] = None, workers: Optional[int] = None) -> None:
+        """Initialize the sweep.
+
+        Args:
+            lake: Lake holding the 'fused' partitions, default SurveyLake()
+            workers: Number of processes, default the number of CPUs
+        """
+        self.lake = lake or SurveyLake()
+        self.workers = workers
+
+    def surveys(self, network_id: Optional[int] = None, survey_ids: Optional[Sequence[int]] = None) -> List[SurveyKey]:
+        """Surveys of the lake that can be swept."""
+        return [(net, survey) for net, survey, _ in self.lake.partitions(SWEEP_DATASET, network_id, survey_ids)]
+
+    def run(self, surveys: Sequence[SurveyKey], grid: Sequence[ClarifyParams],
+            reference: ClarifyParams = DEFAULT_CLARIFY) -> List[dict]:
+        """Run every parameter set on every survey.
+
+        Returns:
+            One row per survey and parameter set: network_id, survey_id, the parameters and track_metrics()
+        """
+        grid = list(dict.fromkeys([reference, *grid])) # la référence d'abord, sans doublon
+        tasks = [(key, params) for key in surveys for params in grid]
+
+        tracks: Dict[Tuple[SurveyKey, ClarifyParams], Track] = {}
+        with ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(self.lake.root,)) as pool:
+            # un survey par paquet : chaque processus ne relit que ses surveys
+            for key, params, track in pool.map(_run_task, tasks, chunksize=len(grid)):
+                tracks[key, params] = track
+
+        rows = []
+        for key, params in tasks:
+            metrics = track_metrics(tracks[key, params], tracks[key, reference])
+            rows.append({'network_id': key[0], 'survey_id': key[1], **asdict(params), **metrics})
+        return rows
+
+
+def summarize(rows: Sequence[dict]) -> List[dict]:
+    """Mean of the metrics of each parameter set over the surveys, by increasing number of points."""
+    names = [f.name for f in fields(ClarifyParams)]
+    groups: Dict[tuple, List[dict]] = {}
+    for row in rows:
+        groups.setdefault(tuple(row[name] for name in names), []).append(row)
+
+    summary = []
+    for values, group in groups.items():
+        row = dict(zip(names, values))
+        row['surveys'] = len(group)
+        for metric in ('points', 'points_ratio', 'spacing_mean', 'spacing_p95', 'shift_mean'):
+            row[metric] = float(np.nanmean([r[metric] for r in group]))
+        summary.append(row)
+    return sorted(summary, key=lambda r: r['points'])
+
+
+def save_csv(rows: Sequence[dict], filename) -> None:
+    if not rows:
+        return
+    with open(filename, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Balayage des paramètres de clarify et de la compensation")
+    parser.add_argument('--network', type=int, default=None)
+    parser.add_argument('--surveys', type=int, nargs='*', default=None, help="survey_id, tous par défaut")
+    for f in fields(ClarifyParams):
+        parser.add_argument(f"--{f.name.replace('_', '-')}", type=float, nargs='+', default=[f.default])
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--csv', default=None, help="fichier des résultats par survey")
+    args = parser.parse_args()
+
+    sweep = ParameterSweep(workers=args.workers)
+    surveys = sweep.surveys(args.network, args.surveys)
+    grid = param_grid(**{f.name: getattr(args, f.name) for f in fields(ClarifyParams)})
+    print(f"{len(surveys)} surveys x {len(grid)} jeux de paramètres")
+
+    rows = sweep.run(surveys, grid)
+    if args.csv:
+        save_csv(rows, args.csv)
+    for row in summarize(rows):
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
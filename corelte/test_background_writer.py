@@ -0,0 +1,227 @@
+from datetime import datetime, timedelta
+import sqlite3
+import threading
+import unittest
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from corelte.orm.cells import cell_cache
+from corelte.orm.db import create_database_engine
+from corelte.orm.models import Survey
+from corelte.orm.writer import BackgroundWriter, is_transient_error
+from corelte.reading import Reading
+
+NETWORK_ID = 1
+SURVEY_ID = 202
+
+
+def make_survey() -> Survey:
+    return Survey(network_id=NETWORK_ID, survey_id=SURVEY_ID, survey_date=datetime(2024, 6, 1),
+                  comment='', device='iPhone', os_version='18.1', model='15')
+
+
+def make_lines(nb: int, start: int = 1) -> list[Reading]:
+    t0 = datetime(2024, 6, 1, 12, 0, 0)
+    lines = []
+    for file_idx in range(start, start + nb):
+        r = Reading(SURVEY_ID)
+        r.file_idx = file_idx
+        r.cellid, r.pci, r.band, r.tac = 17063937, 17, 3, 1234
+        r.fwd_azimuth, r.speed = 45.0, 12.5
+        r.reading_time = t0 + timedelta(seconds=file_idx)
+        r.latitude, r.longitude = 46.2 + file_idx * 1e-4, 6.1
+        lines.append(r)
+    return lines
+
+
+def sqlite_error(message: str) -> OperationalError:
+    return OperationalError('INSERT INTO reading ...', {}, sqlite3.OperationalError(message))
+
+
+def reading_engine():
+    """SQLite engine with plain survey, cell and reading tables.
+
+    Sans SpatiaLite, la géométrie est stockée telle quelle (GeomFromEWKT renvoie le texte EWKT).
+    """
+    engine = create_database_engine('sqlite://')
+
+    @event.listens_for(engine, 'connect')
+    def geom_from_ewkt(dbapi_conn, connection_record):
+        dbapi_conn.create_function('GeomFromEWKT', 1, lambda ewkt: ewkt)
+
+    Survey.__table__.create(engine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE cell (network_id INTEGER, cell_id INTEGER, tac INTEGER, geom TEXT, "
+                          "PRIMARY KEY (network_id, cell_id))"))
+        conn.execute(text("CREATE TABLE reading (id INTEGER PRIMARY KEY AUTOINCREMENT, network_id INTEGER, "
+                          "cell_id INTEGER, survey_id INTEGER, pci INTEGER, band INTEGER, tac INTEGER, "
+                          "file_idx INTEGER, fwd_azimuth REAL, speed REAL, reading_time TIMESTAMP, geom TEXT)"))
+    return engine
+
+
+class Hook:
+    """Hook calling a function in before_survey_write."""
+
+    def __init__(self, before=None) -> None:
+        self.before = before
+        self.calls = 0
+
+    def before_survey_write(self, session, network_id, survey_id):
+        self.calls += 1
+        if self.before is not None:
+            self.before(self.calls)
+
+    def after_survey_write(self, session, network_id, survey_id):
+        pass
+
+
+class FailingHook:
+
+    def before_survey_write(self, session, network_id, survey_id):
+        raise ValueError("bug du hook")
+
+    def after_survey_write(self, session, network_id, survey_id):
+        pass
+
+
+class TestBackgroundWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.writer = BackgroundWriter(create_database_engine('sqlite://'), hooks=[FailingHook()])
+        self.writer.start()
+        return super().setUp()
+
+    def tearDown(self):
+        self.writer.close()
+        return super().tearDown()
+
+    def test_error_is_raised_at_flush_and_thread_survives(self):
+        self.writer.begin_survey(make_survey())
+        with self.assertRaises(ValueError):
+            self.writer.flush(1, 202, timeout=10)
+        self.assertTrue(self.writer.is_alive())
+
+    def test_put_and_flush_raise_when_thread_stopped(self):
+        self.writer.close()
+        with self.assertRaises(RuntimeError):
+            self.writer.put(1, 202, [object()])
+        with self.assertRaises(RuntimeError):
+            self.writer.flush(1, 202, timeout=10)
+
+
+class TestWrite(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = reading_engine()
+        # l'id d'un engine libéré peut être repris : pas de cellules connues d'un test précédent
+        cell_cache.clear(bind=self.engine)
+        return super().setUp()
+
+    def start(self, **kwargs) -> BackgroundWriter:
+        writer = BackgroundWriter(self.engine, retry_delay=0.01, **kwargs)
+        writer.start()
+        self.addCleanup(writer.close)
+        return writer
+
+    def test_put_and_flush_write_the_readings(self):
+        writer = self.start(transaction_size=7)
+        writer.begin_survey(make_survey())
+        for start in range(1, 31, 10):
+            writer.put(NETWORK_ID, SURVEY_ID, make_lines(10, start))
+        self.assertEqual(writer.flush(NETWORK_ID, SURVEY_ID, timeout=10), 30)
+
+        with self.engine.connect() as conn:
+            rows = conn.execute(text("SELECT file_idx, cell_id, survey_id, geom FROM reading ORDER BY file_idx")).all()
+            nb_surveys = conn.execute(text("SELECT count(*) FROM survey")).scalar()
+            cells = conn.execute(text("SELECT cell_id, tac FROM cell")).all()
+        self.assertEqual([r.file_idx for r in rows], list(range(1, 31)))
+        self.assertEqual({(r.cell_id, r.survey_id) for r in rows}, {(17063937, SURVEY_ID)})
+        self.assertTrue(rows[0].geom.startswith('SRID=4326;POINT(6.1 46.2001'))
+        self.assertEqual(nb_surveys, 1)
+        self.assertEqual(cells, [(17063937, 1234)])
+
+    def test_begin_replaces_the_survey(self):
+        writer = self.start()
+        for nb in (20, 5):
+            writer.begin_survey(make_survey())
+            writer.put(NETWORK_ID, SURVEY_ID, make_lines(nb))
+            self.assertEqual(writer.flush(NETWORK_ID, SURVEY_ID, timeout=10), nb)
+        with self.engine.connect() as conn:
+            self.assertEqual(conn.execute(text("SELECT count(*) FROM survey")).scalar(), 1)
+
+    def test_full_queue_blocks_the_producer(self):
+        release = threading.Event()
+        writer = self.start(max_batches=1, hooks=[Hook(lambda calls: release.wait(10))])
+        writer.begin_survey(make_survey()) # le thread d'écriture attend dans le hook
+
+        done = threading.Event()
+
+        def produce():
+            for start in range(1, 31, 10):
+                writer.put(NETWORK_ID, SURVEY_ID, make_lines(10, start))
+            done.set()
+
+        producer = threading.Thread(target=produce)
+        producer.start()
+        # un lot dans la file, le suivant attend qu'elle se vide
+        self.assertFalse(done.wait(0.5))
+        self.assertEqual(writer.queue.qsize(), 1)
+        release.set()
+        self.assertTrue(done.wait(10))
+        producer.join()
+        self.assertEqual(writer.flush(NETWORK_ID, SURVEY_ID, timeout=10), 30)
+
+    def test_transient_error_retried(self):
+        def locked(calls):
+            if calls <= 2:
+                raise sqlite_error('database is locked')
+
+        hook = Hook(locked)
+        writer = self.start(hooks=[hook])
+        writer.begin_survey(make_survey())
+        writer.put(NETWORK_ID, SURVEY_ID, make_lines(5))
+        self.assertEqual(writer.flush(NETWORK_ID, SURVEY_ID, timeout=10), 5)
+        self.assertEqual(hook.calls, 3)
+
+    def test_permanent_error_fails_at_once(self):
+        def missing_table(calls):
+            raise sqlite_error('no such table: coverage_bin')
+
+        hook = Hook(missing_table)
+        writer = self.start(hooks=[hook])
+        writer.begin_survey(make_survey())
+        writer.put(NETWORK_ID, SURVEY_ID, make_lines(5))
+        with self.assertRaises(OperationalError):
+            writer.flush(NETWORK_ID, SURVEY_ID, timeout=10)
+        self.assertEqual(hook.calls, 1)
+
+
+class TestIsTransientError(unittest.TestCase):
+
+    def test_sqlite_errors(self):
+        self.assertTrue(is_transient_error(sqlite_error('database is locked')))
+        self.assertTrue(is_transient_error(sqlite_error('database table is locked: reading')))
+        self.assertFalse(is_transient_error(sqlite_error('no such table: reading')))
+        self.assertFalse(is_transient_error(sqlite_error('no such column: enodeb_id')))
+        self.assertFalse(is_transient_error(sqlite_error('unable to open database file')))
+
+    def test_postgresql_codes(self):
+        class PgError(Exception):
+            def __init__(self, pgcode):
+                super().__init__(pgcode)
+                self.pgcode = pgcode
+
+        self.assertTrue(is_transient_error(OperationalError('SELECT 1', {}, PgError('40P01'))))
+        self.assertTrue(is_transient_error(ProgrammingError('SELECT 1', {}, PgError('40001'))))
+        self.assertFalse(is_transient_error(OperationalError('SELECT 1', {}, PgError('3D000')))) # base inconnue
+
+    def test_lost_connection(self):
+        error = OperationalError('SELECT 1', {}, Exception('server closed the connection unexpectedly'),
+                                 connection_invalidated=True)
+        self.assertTrue(is_transient_error(error))
+        self.assertFalse(is_transient_error(ValueError('bug')))
+
+
+if __name__ == '__main__':
+    unittest.main()
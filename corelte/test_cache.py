@@ -0,0 +1,283 @@
+from datetime import datetime, timedelta
+import os
+from pathlib import Path
+import tempfile
+from types import SimpleNamespace
+import unittest
+
+import numpy as np
+
+from corelte.argument import OCRMode
+from corelte.cache import READING_SCHEMA, ReadingsCacheWriter, encode_readings, files_signature, lake_columns, load_npz
+from corelte.fusion import Fusion
+from corelte.lake import readings_to_columns
+from corelte.reading import Reading
+from corelte.reading_interval import MP4Clock, ReadingInterval
+from corelte.test_support import make_screencast, stub_missing_modules
+from corelte.track import Track
+
+stub_missing_modules()
+
+SURVEY_ID = 202
+
+
+def write_gpx(filename: Path, nb: int) -> None:
+    t0 = datetime(2024, 6, 1, 10, 0, 0)
+    points = ''.join(f'<trkpt lat="{46.2 + i * 1e-4:.6f}" lon="6.100000"><ele>400</ele>'
+                     f'<time>{(t0 + timedelta(seconds=2 * i)).isoformat()}Z</time></trkpt>' for i in range(nb))
+    filename.write_text('<?xml version="1.0"?><gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1">'
+                        f'<trk><trkseg>{points}</trkseg></trk></gpx>')
+
+
+def fields_of(lines) -> list:
+    attrs = [attr for attr, _ in READING_SCHEMA.values()]
+    return [tuple(getattr(r, attr) for attr in attrs) for r in lines]
+
+
+class CacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        directory = Path(self.tmp.name)
+        self.argument = SimpleNamespace(network_id=1, survey_id=SURVEY_ID, use_cache=True,
+                                        gps_filename=directory / 'survey.gpx',
+                                        tmp_gps_cache_filename=directory / 'survey_gps.npz',
+                                        tmp_fusion_cache_filename=directory / 'survey_fusion.npz')
+        write_gpx(self.argument.gps_filename, 20)
+        return super().setUp()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        return super().tearDown()
+
+    def processed_track(self) -> Track:
+        track = Track(self.argument)
+        track.read_gpx_file_into_lines_gps()
+        track.extend_gps_records_to_every_second()
+        track.calculate_speed_and_direction()
+        return track
+
+
+class TestTrackCache(CacheTestCase):
+
+    def test_round_trip(self):
+        track = self.processed_track()
+        track.save_cache()
+
+        cached = Track(self.argument)
+        self.assertTrue(cached.load_cache())
+        self.assertEqual(len(cached.lines_gps), 39) # un point par seconde
+        self.assertEqual(fields_of(cached.lines_gps), fields_of(track.lines_gps))
+        self.assertEqual(cached.cursor.first_non_null_idx, track.cursor.first_non_null_idx)
+        self.assertEqual(cached.cursor.first_non_null_reading_time, track.cursor.first_non_null_reading_time)
+
+    def test_stale_when_gpx_changes(self):
+        self.processed_track().save_cache()
+        write_gpx(self.argument.gps_filename, 21)
+        self.assertFalse(Track(self.argument).load_cache())
+
+    def test_disabled(self):
+        self.processed_track().save_cache()
+        self.argument.use_cache = False
+        self.assertFalse(Track(self.argument).load_cache())
+        self.assertIsNone(Track(self.argument).open_cache())
+
+    def test_streamed_cache_matches_list_cache(self):
+        track = self.processed_track()
+        streamed = Track(self.argument)
+        cache = streamed.cache_writer()
+        # le consommateur s'arrête avant la fin : save() lit le reste du flux
+        for i, r in enumerate(cache.tee(streamed.iter_lines_gps())):
+            r.latitude = 0.0 # une étape suivante modifie les mesures
+            if i == 9:
+                break
+        cache.save(streamed.cache_extra())
+
+        cached = Track(self.argument)
+        self.assertTrue(cached.load_cache())
+        self.assertEqual(fields_of(cached.lines_gps), fields_of(track.lines_gps))
+        self.assertEqual(cached.cursor.first_non_null_reading_time, track.cursor.first_non_null_reading_time)
+
+
+class TestFusionCache(CacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.track = self.processed_track()
+        self.track.save_cache()
+        self.screencast = SimpleNamespace(cache_params=lambda: {'step': 'mp4', 'ocr_txt': (10, 1000, 1)})
+        return None
+
+    def fused(self) -> list:
+        lines = []
+        for g in self.track.lines_gps:
+            r = Reading(SURVEY_ID)
+            r.__dict__.update(g.__dict__)
+            r.file_idx = len(lines) + 1
+            r.cellid, r.pci, r.band, r.tac, r.carrier = 17063937, 17, 3, 1234, 'Swisscom'
+            lines.append(r)
+        lines[3].pci = None
+        return lines
+
+    def test_round_trip(self):
+        fusion = Fusion(self.argument)
+        fusion.linesFusion = self.fused()
+        fusion.save_cache(self.track, self.screencast)
+
+        cached = Fusion(self.argument)
+        self.assertTrue(cached.load_cache(self.track, self.screencast))
+        self.assertEqual(fields_of(cached.linesFusion), fields_of(fusion.linesFusion))
+        self.assertIsNone(cached.linesFusion[3].pci)
+
+    def test_stale_when_source_changes(self):
+        fusion = Fusion(self.argument)
+        fusion.linesFusion = self.fused()
+        fusion.save_cache(self.track, self.screencast)
+
+        # OCR refait : la signature des fichiers .txt change
+        screencast = SimpleNamespace(cache_params=lambda: {'step': 'mp4', 'ocr_txt': (10, 1001, 2)})
+        self.assertFalse(Fusion(self.argument).load_cache(self.track, screencast))
+
+    def test_open_cache_streams(self):
+        fusion = Fusion(self.argument)
+        fusion.linesFusion = self.fused()
+        fusion.save_cache(self.track, self.screencast)
+        lines = Fusion(self.argument).open_cache(self.track, self.screencast)
+        self.assertEqual(fields_of(lines), fields_of(fusion.linesFusion))
+
+    def test_lake_columns(self):
+        # partition 'fused' du lac écrite depuis le cache de la fusion (StreamingPipeline.save_fused_to_lake)
+        lines = self.fused()
+        expected = readings_to_columns(lines)
+        columns = lake_columns(encode_readings(lines))
+        self.assertEqual(columns.keys(), expected.keys())
+        for name, values in expected.items():
+            with self.subTest(column=name):
+                self.assertEqual(columns[name].dtype, values.dtype)
+                np.testing.assert_array_equal(columns[name], values)
+
+
+class TestScreencastCache(CacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = Path(self.tmp.name)
+        self.argument.__dict__.update(
+            ocr_mode=OCRMode.MYOCR_PLUS, scale_factor=0.5, time_scan_probe=90, erase_png=False, erase_txt=False,
+            mp4_filename=directory / 'survey.mp4', survey_img_dir=directory / 'img',
+            tmp_frames_to_ocr_filename_json=directory / 'frames.json',
+            tmp_times_to_ocr_filename_json=directory / 'times.json',
+            tmp_mp4_cache_filename=directory / 'survey_mp4.npz')
+        self.argument.mp4_filename.write_bytes(b'mp4')
+        self.argument.survey_img_dir.mkdir()
+        (self.argument.survey_img_dir / 'lte_000001.txt').write_text('Swisscom 4G')
+        return None
+
+    def synced(self):
+        """Screencast after the OCR of the MYOCR_PLUS frames and the clock synchronisation."""
+        screencast = make_screencast(self.argument)
+        screencast.intervalsMp4 = [ReadingInterval(1, 4, 3, 17063937, 17, 1234, 'Swisscom'),
+                                   ReadingInterval(5, 5),
+                                   ReadingInterval(6, 9, 20, 17063938, None, 1234, 'Swisscom')]
+        screencast.frame_times = [None, datetime(2024, 12, 24, 16, 2), datetime(2024, 12, 24, 16, 2), None]
+        screencast.clock = MP4Clock(3, datetime(2024, 12, 24, 16, 2, 6))
+        screencast.cursor.first_non_null_idx = 2
+        screencast.cursor.first_non_null_reading_time = datetime(2024, 12, 24, 16, 2, 6)
+        return screencast
+
+    def test_round_trip_intervals(self):
+        screencast = self.synced()
+        screencast.save_cache()
+
+        cached = make_screencast(self.argument)
+        self.assertTrue(cached.load_cache())
+        self.assertEqual(cached.intervalsMp4, screencast.intervalsMp4)
+        self.assertEqual(cached.frame_times, screencast.frame_times)
+        self.assertEqual(cached.clock, screencast.clock)
+        self.assertEqual(cached.cursor.first_non_null_idx, 2)
+        self.assertEqual(cached.cursor.first_non_null_reading_time, screencast.cursor.first_non_null_reading_time)
+        # une mesure par frame, datée par l'horloge, comme read_filtred_frames_files_into_linesMp4
+        self.assertEqual(len(cached.linesMp4), 9)
+        self.assertEqual(fields_of(cached.linesMp4), fields_of(screencast.iter_linesMp4()))
+        self.assertEqual([r.reading_time for r in cached.linesMp4[:4]],
+                         [None, datetime(2024, 12, 24, 16, 2), datetime(2024, 12, 24, 16, 2, 6),
+                          datetime(2024, 12, 24, 16, 2, 7)])
+        self.assertIsNone(cached.linesMp4[4].cellid)
+
+        streamed = make_screencast(self.argument)
+        self.assertTrue(streamed.load_cache(expand=False))
+        self.assertEqual((streamed.intervalsMp4, streamed.linesMp4), (screencast.intervalsMp4, []))
+
+    def test_round_trip_lines(self):
+        self.argument.ocr_mode = OCRMode.MYOCR
+        screencast = self.synced()
+        screencast.linesMp4 = list(screencast.iter_linesMp4())
+        screencast.intervalsMp4 = []
+        screencast.save_cache()
+
+        cached = make_screencast(self.argument)
+        self.assertTrue(cached.load_cache())
+        self.assertEqual(cached.intervalsMp4, [])
+        self.assertEqual(fields_of(cached.linesMp4), fields_of(screencast.linesMp4))
+
+    def test_stale_when_ocr_redone(self):
+        self.synced().save_cache()
+        (self.argument.survey_img_dir / 'lte_000002.txt').write_text('Salt 4G')
+        self.assertFalse(make_screencast(self.argument).load_cache())
+
+    def test_stale_when_video_replaced(self):
+        self.synced().save_cache()
+        self.assertFalse(make_screencast(self.argument, datetime(2024, 12, 25, 9, 0, 0)).load_cache())
+
+
+class TestReadingsCacheWriter(unittest.TestCase):
+
+    def test_chunks_and_empty(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = Path(directory) / 'c.npz'
+            lines = []
+            for i in range(5):
+                r = Reading(SURVEY_ID)
+                r.file_idx = i + 1
+                r.cellid = 17063937
+                lines.append(r)
+            cache = ReadingsCacheWriter(filename, {'step': 'test'}, chunk_size=2)
+            self.assertEqual(len(list(cache.tee(lines))), 5)
+            cache.save({'n': 5})
+            columns, extra = load_npz(filename, {'step': 'test'})
+            self.assertEqual(extra, {'n': 5})
+            self.assertEqual(columns['file_idx'].tolist(), [1, 2, 3, 4, 5])
+            np.testing.assert_array_equal(columns['cell_id'], encode_readings(lines)['cell_id'])
+
+            cache = ReadingsCacheWriter(filename, {'step': 'test'})
+            list(cache.tee([]))
+            cache.save()
+            columns, _ = load_npz(filename, {'step': 'test'})
+            self.assertEqual(len(columns['cell_id']), 0)
+
+
+class TestFilesSignature(unittest.TestCase):
+
+    def test_ocr_outputs(self):
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            (directory / 'lte_000001.png').write_bytes(b'png')
+            (directory / 'lte_000001.txt').write_text('Swisscom 4G')
+            first = files_signature(directory, '.txt')
+            self.assertEqual(first[:2], (1, 11))
+
+            (directory / 'lte_000002.txt').write_text('Swisscom')
+            second = files_signature(directory, '.txt')
+            self.assertEqual(second[:2], (2, 19))
+
+            os.utime(directory / 'lte_000001.txt', ns=(second[2] + 10**9, second[2] + 10**9))
+            self.assertNotEqual(files_signature(directory, '.txt'), second)
+            self.assertIsNone(files_signature(directory / 'missing', '.txt'))
+
+
+def main():
+    unittest.main(verbosity=2)
+
+
+if __name__ == "__main__":
+    main()
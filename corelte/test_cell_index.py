@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+import tempfile
+import unittest
+
+from corelte.cell_index import CellIndex, enodeb_of, local_cell_of, sector_of
+from corelte.lake import SurveyLake
+from corelte.reading import Reading
+
+ENODEB = 66656 # 17063936 >> 8
+
+
+def make_lines(survey_id: int, cell_ids: list) -> list[Reading]:
+    t0 = datetime(2024, 6, 1, 12, 0, 0)
+    lines = []
+    for i, cell_id in enumerate(cell_ids):
+        r = Reading(survey_id)
+        r.file_idx = i + 1
+        r.cellid = cell_id
+        r.reading_time = t0 + timedelta(seconds=i)
+        r.latitude = 46.2
+        r.longitude = 6.1
+        lines.append(r)
+    return lines
+
+
+class TestCellIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.lake = SurveyLake(Path(self.tmp.name))
+        first, last = ENODEB << 8, (ENODEB << 8) + 255
+        # cellules aux bornes de l'eNodeB, eNodeB voisins et lecture sans cellule
+        self.lake.write(1, 202, 'fusion', make_lines(202, [first + 1, first + 2, first - 1, last, first + 1, None]))
+        self.lake.write(1, 203, 'fusion', make_lines(203, [first + 2, last + 1, first + 4]))
+        # même cellule sur un autre réseau
+        self.lake.write(2, 301, 'fusion', make_lines(301, [first + 1]))
+        self.index = CellIndex(self.lake)
+        self.nb = self.index.build()
+        return super().setUp()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        return super().tearDown()
+
+    def test_build(self):
+        self.assertEqual(self.nb, 9) # la lecture sans cellule n'est pas indexée
+        self.assertFalse(self.index.is_stale())
+
+    def test_cell(self):
+        rows = self.index.cell(1, (ENODEB << 8) + 1, ['survey_id', 'file_idx'])
+        self.assertEqual(sorted(zip(rows['survey_id'].tolist(), rows['file_idx'].tolist())), [(202, 1), (202, 5)])
+        rows = self.index.cell(2, (ENODEB << 8) + 1, ['survey_id'])
+        self.assertEqual(rows['survey_id'].tolist(), [301])
+        self.assertEqual(len(self.index.cell(1, (ENODEB << 8) + 3)['cell_id']), 0)
+
+    def test_enodeb(self):
+        rows = self.index.enodeb(1, ENODEB, ['cell_id'])
+        self.assertEqual(sorted(rows['cell_id'].tolist()),
+                         [(ENODEB << 8) + c for c in (1, 1, 2, 2, 4, 255)])
+        self.assertTrue((enodeb_of(rows['cell_id']) == ENODEB).all())
+        self.assertEqual(self.index.cells_of_enodeb(1, ENODEB), [(ENODEB << 8) + c for c in (1, 2, 4, 255)])
+        # eNodeB voisins : une seule cellule chacun
+        self.assertEqual(self.index.cells_of_enodeb(1, ENODEB - 1), [(ENODEB << 8) - 1])
+        self.assertEqual(self.index.cells_of_enodeb(1, ENODEB + 1), [(ENODEB + 1) << 8])
+        self.assertEqual(self.index.cells_of_enodeb(2, ENODEB), [(ENODEB << 8) + 1])
+
+    def test_sector(self):
+        # secteur = cell_id % 3 (cell_id complet, comme le filtre QGIS) ; ENODEB << 8 vaut 2 modulo 3
+        rows = self.index.sector(1, ENODEB, 0, 3, ['cell_id'])
+        self.assertEqual(sorted(local_cell_of(rows['cell_id']).tolist()), [1, 1, 4])
+        self.assertTrue((sector_of(rows['cell_id'], 3) == 0).all())
+        rows = self.index.sector(1, ENODEB, 1, 3, ['cell_id'])
+        self.assertEqual(local_cell_of(rows['cell_id']).tolist(), [2, 2])
+        rows = self.index.sector(1, ENODEB, 2, 3, ['cell_id'])
+        self.assertEqual(local_cell_of(rows['cell_id']).tolist(), [255])
+        rows = self.index.sector(1, ENODEB + 5, 0, 3, ['cell_id', 'latitude'])
+        self.assertEqual(len(rows['cell_id']), 0)
+        self.assertEqual(rows['latitude'].dtype.kind, 'f')
+
+    def test_stale_after_write(self):
+        self.lake.write(1, 204, 'fusion', make_lines(204, [(ENODEB << 8) + 7]))
+        self.assertTrue(self.index.is_stale())
+        self.index.build()
+        self.assertEqual(self.index.cells_of_enodeb(1, ENODEB)[-2:], [(ENODEB << 8) + 7, (ENODEB << 8) + 255])
+
+
+def main():
+    unittest.main(verbosity=2)
+
+
+if __name__ == "__main__":
+    main()
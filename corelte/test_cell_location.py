@@ -0,0 +1,49 @@
+import unittest
+
+import numpy as np
+
+from corelte.cell_location import CellLocator, LocationMethod, speed_weighted_centroid
+
+# Cellule fictive autour du point LV95 (2500000, 1150000)
+X0, Y0 = 2500000.0, 1150000.0
+
+
+def cell_readings(cell_id, dx, dy, speed):
+    return cell_id, X0 + np.array(dx, dtype=float), Y0 + np.array(dy, dtype=float), np.array(speed, dtype=float)
+
+
+class TestCellLocator(unittest.TestCase):
+
+    def setUp(self):
+        # deux mesures lentes à l'ouest, une rapide à l'est : le barycentre penche à l'ouest
+        self.cells = [cell_readings(101, [-100, -100, 300], [0, 0, 0], [0, 0, 9]),
+                      cell_readings(102, [5000, 5200], [0, 0], [np.nan, 1])]
+        self.stations = (np.array([X0 + 50, X0 + 20000]), np.array([Y0, Y0]), np.array(['ST1', 'ST2'], dtype=object))
+        return super().setUp()
+
+    def test_centroid_weights_slow_readings(self):
+        # poids 1, 1, 0.1 -> x = (-100 - 100 + 30) / 2.1
+        x, y = speed_weighted_centroid(*self.cells[0][1:])
+        self.assertAlmostEqual(x - X0, -170 / 2.1)
+        self.assertAlmostEqual(y, Y0)
+
+    def test_estimate_centroid(self):
+        estimates = CellLocator(1, workers=0).estimate(self.cells)
+        self.assertEqual([(e.cell_id, e.nb_readings, e.station_name) for e in estimates], [(101, 3, None), (102, 2, None)])
+        self.assertAlmostEqual(estimates[0].x - X0, -170 / 2.1)
+        lon, lat = estimates[0].to_wgs84()
+        self.assertTrue(6 < lon < 6.3 and 46.3 < lat < 46.6)
+
+    def test_estimate_wls_pulls_toward_nearest_station(self):
+        centroid = CellLocator(1, workers=0).estimate(self.cells)
+        wls = CellLocator(1, LocationMethod.WLS, workers=0, max_station_distance=1000, prior=1.0).estimate(self.cells, self.stations)
+        self.assertEqual(wls[0].station_name, 'ST1')
+        # prior 1 : à mi-chemin entre le barycentre et la station
+        self.assertAlmostEqual(wls[0].x, (centroid[0].x + X0 + 50) / 2)
+        # aucune station à moins de 1000 m : estimation inchangée
+        self.assertIsNone(wls[1].station_name)
+        self.assertAlmostEqual(wls[1].x, centroid[1].x)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+import multiprocessing
+import unittest
+
+from sqlalchemy import delete
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from corelte.orm.backend import capabilities
+from corelte.orm.cells import CellCache, bind_key, cell_cache
+from corelte.orm.db import create_database_engine, db_engines
+from corelte.orm.models import Base, Cell_orm, Survey
+from corelte.orm.sync import sync_survey_readings
+from corelte.reading import Reading
+
+
+NETWORK_ID = 99 # réseau fictif réservé aux tests
+NB_IMPORTS = 8
+NB_READINGS = 500
+CELL_IDS = [17063936 + i for i in range(40)] # cellules partagées par tous les surveys
+
+
+def import_survey(survey_id: int) -> int:
+    """Importe un survey synthétique dans un processus séparé (cache de cellules vide)."""
+    t0 = datetime(2024, 6, 1, 12, 0, 0)
+    lines = []
+    for i in range(NB_READINGS):
+        r = Reading(survey_id)
+        r.file_idx = i + 1
+        r.cellid = CELL_IDS[(i + survey_id) % len(CELL_IDS)]
+        r.tac = 1234
+        r.band = 3
+        r.pci = i % 504
+        r.fwd_azimuth = 90.0
+        r.speed = 10.0
+        r.reading_time = t0 + timedelta(seconds=i)
+        r.latitude = 46.2 + i * 1e-4
+        r.longitude = 6.1 + survey_id * 1e-3
+        lines.append(r)
+
+    survey = Survey(network_id=NETWORK_ID, survey_id=survey_id, survey_date=t0,
+                    comment='stress test', device='test', os_version='', model='')
+    with Session(db_engines.test) as session:
+        report = sync_survey_readings(session, survey, lines)
+    return report.inserted
+
+
+class TestCellCache(unittest.TestCase):
+
+    def test_cache_is_per_database(self):
+        main = bind_key(create_database_engine('postgresql://gis:secret@db/gis'))
+        test = bind_key(create_database_engine('postgresql://gis:secret@db/gis_test'))
+        self.assertNotIn('secret', main)
+        cache = CellCache()
+        cache.add(main, NETWORK_ID, CELL_IDS[:2])
+        self.assertEqual(cache.missing(main, NETWORK_ID, CELL_IDS[:3]), {CELL_IDS[2]})
+        self.assertEqual(cache.missing(test, NETWORK_ID, CELL_IDS[:2]), set(CELL_IDS[:2]))
+
+    def test_in_memory_engines_are_distinct_databases(self):
+        self.assertNotEqual(bind_key(create_database_engine('sqlite://')), bind_key(create_database_engine('sqlite://')))
+
+    def test_clear_one_database(self):
+        cache = CellCache()
+        cache.add('a', NETWORK_ID, CELL_IDS[:1])
+        cache.add('b', NETWORK_ID, CELL_IDS[:1])
+        cache.clear(bind='a')
+        self.assertEqual(cache.missing('a', NETWORK_ID, CELL_IDS[:1]), {CELL_IDS[0]})
+        self.assertEqual(cache.missing('b', NETWORK_ID, CELL_IDS[:1]), set())
+
+
+def _database_available() -> bool:
+    try:
+        return capabilities(db_engines.test).is_postgis
+    except SQLAlchemyError:
+        return False
+
+
+@unittest.skipUnless(_database_available(), "Base PostGIS de test indisponible")
+class TestConcurrentCellRegistration(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        Base.metadata.create_all(db_engines.test)
+        cls._cleanup()
+        return super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._cleanup()
+        return super().tearDownClass()
+
+    @classmethod
+    def _cleanup(cls):
+        with Session(db_engines.test) as session:
+            session.execute(delete(Survey).where(Survey.network_id == NETWORK_ID))
+            session.execute(delete(Cell_orm).where(Cell_orm.network_id == NETWORK_ID))
+            session.commit()
+        cell_cache.clear(NETWORK_ID)
+        db_engines.dispose()
+
+    def test_concurrent_imports_do_not_fail(self):
+        ctx = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=NB_IMPORTS, mp_context=ctx) as pool:
+            results = list(pool.map(import_survey, range(1, NB_IMPORTS + 1)))
+
+        self.assertEqual(results, [NB_READINGS] * NB_IMPORTS)
+
+        with Session(db_engines.test) as session:
+            nb_cells = session.query(Cell_orm).filter(Cell_orm.network_id == NETWORK_ID).count()
+        self.assertEqual(nb_cells, len(CELL_IDS))
+
+    def test_registration_is_idempotent(self):
+        self.assertEqual(import_survey(NB_IMPORTS + 1), NB_READINGS)
+        self.assertEqual(import_survey(NB_IMPORTS + 1), 0)
+
+
+def main():
+    unittest.main(verbosity=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+from datetime import datetime
+import json
+import os
+import tempfile
+import unittest
+
+from corelte.convert_bakom_file_to_csv import (POWER_RE, TECHNO_2G, TECHNO_4G, TECHNO_5G, attributes_hash,
+                                               diff_stations, iter_features, parse_properties)
+
+
+def feature(station, techno='4G', power='faible', date='2021-03-15', east=2600000.0, north=1200000.0):
+    return {'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [east, north, 0.0]},
+            'properties': {'station': station, 'techno_fr': techno, 'power_fr': power,
+                           'bewilligung_fr': f"Autorisée le {date}"}}
+
+
+class TestIterFeatures(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.features = [feature('Swisscom ABCD01'),
+                         # caractères de structure JSON dans les chaînes
+                         feature('Salt "X]Y, {Z}"', techno='2G, 4G, 5G'),
+                         feature('Sunrise ÉÈÀ', power='très faible')]
+        return super().setUp()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        return super().tearDown()
+
+    def write(self, text: str) -> str:
+        filename = os.path.join(self.tmp.name, 'bakom.json')
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return filename
+
+    def test_chunk_boundaries(self):
+        text = json.dumps({'type': 'FeatureCollection', 'name': 'standorte', 'features': self.features}, indent=1)
+        filename = self.write(text)
+        # toutes les positions de coupure possibles dans un jeton, une chaîne ou entre deux features
+        for chunk_size in list(range(1, 40)) + [len(text) // 2, len(text), 1 << 20]:
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(list(iter_features(filename, chunk_size)), self.features)
+
+    def test_trailing_keys(self):
+        text = json.dumps({'type': 'FeatureCollection', 'features': self.features,
+                           'crs': {'type': 'name', 'properties': {'name': 'EPSG:2056'}}})
+        filename = self.write(text)
+        for chunk_size in (3, 64, 1 << 20):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(list(iter_features(filename, chunk_size)), self.features)
+
+    def test_empty_and_missing(self):
+        self.assertEqual(list(iter_features(self.write('{"type": "FeatureCollection", "features": []}'), 4)), [])
+        self.assertEqual(list(iter_features(self.write('{"type": "FeatureCollection"}'), 4)), [])
+
+    def test_truncated_file(self):
+        text = json.dumps({'type': 'FeatureCollection', 'features': self.features})
+        filename = self.write(text[:-30])
+        with self.assertRaises(json.JSONDecodeError):
+            list(iter_features(filename, 16))
+
+
+class TestParseProperties(unittest.TestCase):
+
+    def test_station(self):
+        properties = feature('Swisscom ABCD01', techno='2G, 4G, 5G', power='moyenne')['properties']
+        self.assertEqual(parse_properties(properties),
+                         (1, 'ABCD01', TECHNO_2G | TECHNO_4G | TECHNO_5G, 3, datetime(2021, 3, 15)))
+
+    def test_power_categories(self):
+        self.assertEqual(parse_properties(feature('Salt X', power='très faible')['properties'])[3], 1)
+        self.assertEqual(parse_properties(feature('Salt X', power='forte')['properties'])[3], 4)
+        self.assertIsNone(POWER_RE.search('puissance inconnue'))
+
+    def test_unknown_and_malformed(self):
+        properties = {'station': 'Inconnu', 'techno_fr': '4Gx LTE', 'power_fr': None, 'bewilligung_fr': 'en cours'}
+        self.assertEqual(parse_properties(properties), (0, 'unknown', 0, 0, None))
+        self.assertEqual(parse_properties({'station': ''}), (0, 'unknown', 0, 0, None))
+
+    def test_date_without_padding(self):
+        properties = feature('SBB B1', date='2019-1-5')['properties']
+        self.assertEqual(parse_properties(properties)[0], 8)
+        self.assertEqual(parse_properties(properties)[4], datetime(2019, 1, 5))
+
+
+def station(technos=TECHNO_4G, power_id=2, date_fiche=datetime(2021, 3, 15), east=2600000.0, north=1200000.0):
+    return {'network_id': 1, 'name': 'ABCD01', 'technos': technos, 'power_id': power_id, 'date_fiche': date_fiche,
+            'lat_lv95': east, 'lon_lv95': north, 'latitude': 46.95, 'longitude': 7.44}
+
+
+NOW = datetime(2024, 6, 1, 12, 0, 0)
+KEY = (1, 'ABCD01')
+
+
+class TestAttributesHash(unittest.TestCase):
+
+    def test_bakom_attributes_only(self):
+        h = attributes_hash(station())
+        self.assertEqual(len(h), 32)
+        # les coordonnées WGS84 converties ne comptent pas
+        self.assertEqual(attributes_hash(dict(station(), latitude=0.0, longitude=0.0)), h)
+        # seul le jour de la date compte
+        self.assertEqual(attributes_hash(station(date_fiche=datetime(2021, 3, 15, 8, 30))), h)
+
+    def test_each_attribute_changes_hash(self):
+        h = attributes_hash(station())
+        for changed in (station(technos=TECHNO_4G | TECHNO_5G), station(power_id=3), station(date_fiche=None),
+                        station(date_fiche=datetime(2021, 3, 16)), station(east=2600001.0), station(north=1200001.0)):
+            with self.subTest(changed=changed):
+                self.assertNotEqual(attributes_hash(changed), h)
+
+
+class TestDiffStations(unittest.TestCase):
+
+    def test_insert(self):
+        diff = diff_stations({}, {KEY: station()}, NOW)
+        self.assertEqual(diff.counts['insert'], 1)
+        self.assertEqual(len(diff.inserts), 1)
+        self.assertEqual(diff.inserts[0]['first_seen'], NOW)
+        self.assertEqual(diff.inserts[0]['attr_hash'], attributes_hash(station()))
+        self.assertEqual(diff.changes[0]['change'], 'insert')
+        self.assertEqual((diff.changes[0]['old_technos'], diff.changes[0]['new_technos']), (None, TECHNO_4G))
+
+    def test_unchanged(self):
+        current = {KEY: (attributes_hash(station()), TECHNO_4G, 2, None)}
+        diff = diff_stations(current, {KEY: station()}, NOW)
+        self.assertEqual(diff.counts['unchanged'], 1)
+        self.assertEqual((diff.inserts, diff.updates, diff.deletes, diff.changes), ([], [], [], []))
+
+    def test_update(self):
+        current = {KEY: (attributes_hash(station()), TECHNO_4G, 2, None)}
+        diff = diff_stations(current, {KEY: station(technos=TECHNO_4G | TECHNO_5G)}, NOW)
+        self.assertEqual(diff.counts['update'], 1)
+        self.assertEqual(diff.updates[0]['b_network_id'], 1)
+        self.assertEqual(diff.updates[0]['b_name'], 'ABCD01')
+        self.assertNotIn('first_seen', diff.updates[0])
+        change = diff.changes[0]
+        self.assertEqual((change['change'], change['old_technos'], change['new_technos']),
+                         ('update', TECHNO_4G, TECHNO_4G | TECHNO_5G))
+
+    def test_missing_hash_filled_without_log(self):
+        # table créée par une version précédente : pas d'empreinte
+        diff = diff_stations({KEY: (None, TECHNO_4G, 2, None)}, {KEY: station()}, NOW)
+        self.assertEqual(len(diff.updates), 1)
+        self.assertEqual(diff.changes, [])
+        self.assertEqual(sum(diff.counts.values()), 0)
+
+    def test_delete(self):
+        diff = diff_stations({KEY: (attributes_hash(station()), TECHNO_4G, 2, None)}, {}, NOW)
+        self.assertEqual(diff.counts['delete'], 1)
+        self.assertEqual(diff.deletes, [{'b_network_id': 1, 'b_name': 'ABCD01'}])
+        change = diff.changes[0]
+        self.assertEqual((change['change'], change['old_power_id'], change['new_power_id']), ('delete', 2, None))
+
+    def test_already_deleted_is_not_deleted_again(self):
+        diff = diff_stations({KEY: (attributes_hash(station()), TECHNO_4G, 2, NOW)}, {}, NOW)
+        self.assertEqual((diff.deletes, diff.changes, diff.counts['delete']), ([], [], 0))
+
+    def test_restore(self):
+        # même empreinte, mais la station avait disparu du fichier
+        diff = diff_stations({KEY: (attributes_hash(station()), TECHNO_4G, 2, datetime(2024, 1, 1))}, {KEY: station()}, NOW)
+        self.assertEqual(diff.counts['restore'], 1)
+        self.assertIsNone(diff.updates[0]['deleted'])
+        self.assertEqual(diff.changes[0]['change'], 'restore')
+
+
+def main():
+    unittest.main(verbosity=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+from corelte.convert_wgs84_to_ch1903 import GPSConverter
+import numpy as np
+import unittest
+
+
+# Points de contrôle répartis sur la Suisse, en LV95 (E, N)
+EAST = np.array([2600000.0, 2485000.0, 2834000.0, 2683000.0, 2755000.0, 2500000.0])
+NORTH = np.array([1200000.0, 1075000.0, 1296000.0, 1248000.0, 1120000.0, 1116000.0])
+
+
+class TestGPSConverter(unittest.TestCase):
+
+    def setUp(self):
+        self.converter = GPSConverter()
+        return super().setUp()
+
+    def test_lv03_to_wgs84_array_matches_scalar(self):
+        lat, lng = self.converter.LV03toWGS84_array(EAST - 2000000, NORTH - 1000000)
+        for i, (e, n) in enumerate(zip(EAST, NORTH)):
+            s_lat, s_lng = self.converter.LV03toWGS84_2(e - 2000000, n - 1000000)
+            self.assertAlmostEqual(lat[i], s_lat, places=12)
+            self.assertAlmostEqual(lng[i], s_lng, places=12)
+
+    def test_lv95_to_wgs84_array_matches_lv03(self):
+        lat95, lng95 = self.converter.LV95toWGS84_array(EAST, NORTH)
+        lat03, lng03 = self.converter.LV03toWGS84_array(EAST - 2000000, NORTH - 1000000)
+        np.testing.assert_array_equal(lat95, lat03)
+        np.testing.assert_array_equal(lng95, lng03)
+
+    def test_wgs84_to_lv03_array_matches_scalar(self):
+        lat, lng = self.converter.LV95toWGS84_array(EAST, NORTH)
+        east, north = self.converter.WGS84toLV03_array(lat, lng)
+        for i in range(len(lat)):
+            s_east, s_north, _ = self.converter.WGS84toLV03(lat[i], lng[i], 0)
+            self.assertAlmostEqual(east[i], s_east, places=6)
+            self.assertAlmostEqual(north[i], s_north, places=6)
+
+    def test_round_trip_lv95(self):
+        lat, lng = self.converter.LV95toWGS84_array(EAST, NORTH)
+        east, north = self.converter.WGS84toLV95_array(lat, lng)
+        # formules approchées swisstopo : ~1 m, quelques mètres aux bords du territoire
+        np.testing.assert_allclose(east, EAST, atol=3.0)
+        np.testing.assert_allclose(north, NORTH, atol=3.0)
+
+    def test_exact_mode_close_to_approximation(self):
+        lat, lng = self.converter.LV95toWGS84_array(EAST, NORTH)
+        lat_x, lng_x = self.converter.LV95toWGS84_array(EAST, NORTH, exact=True)
+        # 1e-4 degré ~ 10 m
+        np.testing.assert_allclose(lat_x, lat, atol=1e-4)
+        np.testing.assert_allclose(lng_x, lng, atol=1e-4)
+        east, north = self.converter.WGS84toLV95_array(lat_x, lng_x, exact=True)
+        np.testing.assert_allclose(east, EAST, atol=1e-3)
+        np.testing.assert_allclose(north, NORTH, atol=1e-3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+from datetime import datetime
+import unittest
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from corelte.coverage import NO_PCI, CoverageAggregator, bin_readings
+from corelte.orm.db import create_database_engine
+from corelte.orm.models import CoverageBin
+
+CELL_A, CELL_B = 17063937, 17063938
+
+
+def readings(points):
+    """Colonnes de bin_readings depuis des (x, y, cell_id, pci, heure)."""
+    x, y, cell_id, pci, hour = (np.array(values) for values in zip(*points))
+    band = np.full(len(points), 3, dtype=np.int64)
+    reading_time = np.array([np.datetime64('2024-06-01T00:00:00') + np.timedelta64(int(h), 'h') for h in hour],
+                            dtype='datetime64[s]')
+    return x.astype(float), y.astype(float), cell_id.astype(np.int64), band, pci.astype(np.int64), reading_time
+
+
+def as_dict(rows) -> dict:
+    return {row[:6]: (row[6], row[7]) for row in rows}
+
+
+class TestBinReadings(unittest.TestCase):
+
+    def test_bin_edges(self):
+        x, y, cell_id, band, pci, t = readings([(2500000.0, 1100000.0, CELL_A, 17, 0),
+                                                (2500049.9, 1100049.9, CELL_A, 17, 1),
+                                                (2500050.0, 1100000.0, CELL_A, 17, 2),
+                                                (2499999.9, 1099999.9, CELL_A, 17, 3)])
+        bins = as_dict(bin_readings(x, y, cell_id, band, pci, t, [50]))
+        self.assertEqual(sorted(k[1:3] for k in bins), [(49999, 21999), (50000, 22000), (50001, 22000)])
+        self.assertEqual(bins[(50, 50000, 22000, CELL_A, 3, 17)][0], 2)
+
+    def test_count_and_last_seen_per_cell(self):
+        x, y, cell_id, band, pci, t = readings([(2500010.0, 1100010.0, CELL_A, 17, 5),
+                                                (2500020.0, 1100020.0, CELL_A, 17, 2),
+                                                (2500030.0, 1100030.0, CELL_B, 17, 1),
+                                                (2500040.0, 1100040.0, CELL_A, NO_PCI, 9),
+                                                (2500090.0, 1100040.0, CELL_A, 17, 7)])
+        bins = as_dict(bin_readings(x, y, cell_id, band, pci, t, [50, 100]))
+        self.assertEqual(bins[(50, 50000, 22000, CELL_A, 3, 17)], (2, np.datetime64('2024-06-01T05:00:00')))
+        self.assertEqual(bins[(50, 50000, 22000, CELL_B, 3, 17)][0], 1)
+        self.assertEqual(bins[(50, 50000, 22000, CELL_A, 3, NO_PCI)][0], 1)
+        self.assertEqual(bins[(50, 50001, 22000, CELL_A, 3, 17)][0], 1)
+        # maille de 100 m : les deux mailles de 50 m de CELL_A, PCI 17 réunies
+        self.assertEqual(bins[(100, 25000, 11000, CELL_A, 3, 17)], (3, np.datetime64('2024-06-01T07:00:00')))
+        self.assertEqual(sum(n for key, (n, _) in bins.items() if key[0] == 100), 5)
+
+    def test_nan_positions_dropped(self):
+        x, y, cell_id, band, pci, t = readings([(2500010.0, 1100010.0, CELL_A, 17, 0),
+                                                (np.nan, 1100010.0, CELL_A, 17, 1),
+                                                (2500010.0, np.inf, CELL_B, 17, 2)])
+        rows = bin_readings(x, y, cell_id, band, pci, t, [50])
+        self.assertEqual([row[:7] for row in rows], [(50, 50000, 22000, CELL_A, 3, 17, 1)])
+        self.assertEqual(bin_readings(x[1:2], y[1:2], cell_id[1:2], band[1:2], pci[1:2], t[1:2], [50]), [])
+
+
+class TestApplyBins(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_database_engine('sqlite://')
+        CoverageBin.__table__.create(self.engine)
+        self.coverage = CoverageAggregator(network_id=1, levels=[50])
+        return super().setUp()
+
+    def stored(self) -> dict:
+        with Session(self.engine) as session:
+            return {(b.ix, b.iy, b.cell_id): (b.count, b.last_seen) for b in session.scalars(select(CoverageBin))}
+
+    def apply(self, points, sign: int) -> None:
+        with Session(self.engine) as session:
+            self.coverage.apply_bins(session, bin_readings(*readings(points), [50]), sign)
+            session.commit()
+
+    def test_add_then_remove(self):
+        first = [(2500010.0, 1100010.0, CELL_A, 17, 5), (2500020.0, 1100020.0, CELL_A, 17, 2)]
+        second = [(2500030.0, 1100030.0, CELL_A, 17, 8), (2500060.0, 1100030.0, CELL_B, 17, 1)]
+        self.apply(first, +1)
+        self.apply(second, +1)
+        self.assertEqual(self.stored(), {(50000, 22000, CELL_A): (3, datetime(2024, 6, 1, 8)),
+                                         (50001, 22000, CELL_B): (1, datetime(2024, 6, 1, 1))})
+
+        # retrait du second survey : la maille vidée est effacée, last_seen ne recule pas
+        self.apply(second, -1)
+        self.assertEqual(self.stored(), {(50000, 22000, CELL_A): (2, datetime(2024, 6, 1, 8))})
+        self.apply(first, -1)
+        self.assertEqual(self.stored(), {})
+
+    def test_nothing_to_apply(self):
+        self.apply([(np.nan, np.nan, CELL_A, 17, 0)], -1)
+        self.assertEqual(self.stored(), {})
+
+
+def main():
+    unittest.main(verbosity=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+from datetime import datetime, timedelta
+import random
+from types import SimpleNamespace
+import unittest
+
+from corelte.cursor import Cursor
+from corelte.fusion import ClarifyParams, Fusion, StreamingClarify
+from corelte.reading import Reading
+from corelte.reading_interval import MP4Clock, encode_intervals
+
+SURVEY_ID = 202
+CELLS = (17063937, 17063938, 17064193)
+INVALID = 0 # cellid d'une frame illisible
+
+
+def random_lines(rng: random.Random, nb: int) -> list[Reading]:
+    """Fused readings of a drive: cells held a few seconds, some unreadable frames, speed and heading changing."""
+    t0 = datetime(2024, 6, 1, 12, 0, 0)
+    lat, lon, azimuth = 46.2, 6.1, 0.0
+    cell_id = CELLS[0]
+    lines = []
+    for i in range(nb):
+        if rng.random() < 0.1:
+            cell_id = rng.choice(CELLS)
+        if rng.random() < 0.1:
+            azimuth = (azimuth + rng.choice((30, 60, 90, 180))) % 360
+        r = Reading(SURVEY_ID)
+        r.file_idx = i + 1
+        r.cellid = INVALID if rng.random() < 0.05 else cell_id
+        r.pci, r.band, r.tac = 17, 3, 1234
+        r.speed = rng.choice((0.0, 2.0, 8.0, 25.0))
+        r.fwd_azimuth = azimuth
+        r.reading_time = t0 + timedelta(seconds=i)
+        lat += r.speed * 9e-6
+        lon += r.speed * 4e-6
+        r.latitude, r.longitude = lat, lon
+        lines.append(r)
+    return lines
+
+
+class TestStreamingClarify(unittest.TestCase):
+
+    def batch(self, lines: list[Reading], params: ClarifyParams) -> list[int]:
+        fusion = Fusion(SimpleNamespace(network_id=1, survey_id=SURVEY_ID), params)
+        fusion.linesFusion = list(lines)
+        fusion.clarify_with_minimum_distance2()
+        return [r.file_idx for r in fusion.linesFusion]
+
+    def streamed(self, lines: list[Reading], params: ClarifyParams) -> list[int]:
+        clarify = StreamingClarify(params)
+        kept = []
+        for r in lines:
+            kept.extend(clarify.push(r))
+        kept.extend(clarify.flush())
+        return [r.file_idx for r in kept]
+
+    def test_same_readings_as_batch(self):
+        rng = random.Random(49)
+        for params in (ClarifyParams(), ClarifyParams(dist_min=0, dist_per_speed=0), ClarifyParams(dist_min=400)):
+            for nb in (2, 3, 10, 200):
+                for _ in range(5):
+                    lines = random_lines(rng, nb)
+                    with self.subTest(params=params, nb=nb):
+                        self.assertEqual(self.streamed(lines, params), self.batch(lines, params))
+
+    def test_both_sides_of_each_handover(self):
+        lines = random_lines(random.Random(0), 6)
+        for r, cell_id in zip(lines, (CELLS[0], CELLS[0], CELLS[0], CELLS[1], CELLS[1], CELLS[1])):
+            r.cellid, r.speed = cell_id, 0.0
+        self.assertEqual(self.streamed(lines, ClarifyParams()), [1, 3, 4, 6])
+
+    def test_point_waits_one_reading_at_most(self):
+        lines = random_lines(random.Random(0), 3)
+        for r in lines:
+            r.cellid, r.speed = CELLS[0], 0.0
+        clarify = StreamingClarify()
+        self.assertEqual(clarify.push(lines[0]), [lines[0]])
+        self.assertEqual(clarify.push(lines[1]), [])
+        lines[2].cellid = CELLS[1]
+        self.assertEqual(clarify.push(lines[2]), [lines[1], lines[2]])
+        self.assertEqual(clarify.flush(), [])
+
+    def test_invalid_readings_dropped(self):
+        lines = random_lines(random.Random(0), 3)
+        for r in lines:
+            r.cellid = INVALID
+        self.assertEqual(self.streamed(lines, ClarifyParams()), [])
+
+
+def gps_track(rng: random.Random, nb: int, t0: datetime) -> tuple[Cursor, list[Reading]]:
+    """Processed GPS track, one point per second from t0, with its cursor (as Track gives)."""
+    lines = []
+    lat, lon = 46.5, 6.6
+    for i in range(nb):
+        r = Reading(SURVEY_ID)
+        r.reading_time = t0 + timedelta(seconds=i)
+        r.latitude, r.longitude = lat, lon
+        r.speed = rng.choice((0.0, 3.0, 12.0, 30.0))
+        r.fwd_azimuth = r.bwd_azimuth = rng.choice((0.0, 90.0))
+        r.fwd_distance = r.speed
+        r.calculated = bool(i % 3)
+        lat += r.speed * 9e-6
+        lon += r.speed * 4e-6
+        lines.append(r)
+    cursor = Cursor()
+    cursor.first_non_null_idx = 0
+    cursor.first_non_null_reading_time = t0
+    return cursor, lines
+
+
+def screencast_frames(rng: random.Random, nb: int, clock: MP4Clock) -> tuple[Cursor, list[Reading]]:
+    """Frames of a synchronised screencast (linesMp4), with their cursor."""
+    lines = []
+    cell_id = CELLS[0]
+    for i in range(nb):
+        if rng.random() < 0.05:
+            cell_id = rng.choice(CELLS + (INVALID, None))
+        r = Reading(SURVEY_ID)
+        r.file_idx = i + 1
+        r.reading_time = clock.time(r.file_idx)
+        r.cellid, r.band, r.tac = cell_id, 3, 1234
+        r.pci = cell_id % 500 if cell_id and rng.random() < 0.9 else 7
+        lines.append(r)
+    cursor = Cursor()
+    cursor.first_non_null_idx = clock.first_idx - 1
+    cursor.first_non_null_reading_time = clock.first_time
+    return cursor, lines
+
+
+def fused_fields(lines) -> list[tuple]:
+    return [(r.file_idx, r.reading_time, r.cellid, r.pci, r.band, r.tac, r.latitude, r.longitude, r.speed,
+             r.fwd_azimuth, r.bwd_azimuth, r.fwd_distance, r.calculated) for r in lines]
+
+
+class TestStreamingFusion(unittest.TestCase):
+    """iter_fusion + iter_clarified (corelte.pipeline) against fusion_data + clarify_with_minimum_distance2."""
+
+    # (début du screencast par rapport au GPS en secondes, frame synchronisée, nb de points GPS)
+    CASES = ((30, 4, 600), (-20, 4, 600), (10, 1, 200), (5000, 4, 600))
+
+    def fusions(self, start: int, first_idx: int, nb_gps: int):
+        rng = random.Random(start)
+        t0 = datetime(2024, 5, 1, 8, 0, 0)
+        cursor_gps, gps = gps_track(rng, nb_gps, t0)
+        clock = MP4Clock(first_idx, t0 + timedelta(seconds=start))
+        cursor_mp4, frames = screencast_frames(rng, 500, clock)
+        argument = SimpleNamespace(network_id=1, survey_id=SURVEY_ID, exclusions=[(100, 120)])
+
+        batch = Fusion(argument)
+        batch.fusion_data(cursor_gps, gps, cursor_mp4, frames)
+        streamed = Fusion(argument)
+        lines = streamed.iter_fusion(cursor_gps, iter(gps), cursor_mp4, iter(encode_intervals(frames)), clock.time)
+        return batch, streamed, lines
+
+    def test_same_fusion_as_fusion_data(self):
+        for start, first_idx, nb_gps in self.CASES:
+            with self.subTest(start=start):
+                batch, _, lines = self.fusions(start, first_idx, nb_gps)
+                self.assertEqual(fused_fields(lines), fused_fields(batch.linesFusion))
+
+    def test_same_readings_as_batch_import(self):
+        for start, first_idx, nb_gps in self.CASES:
+            with self.subTest(start=start):
+                batch, streamed, lines = self.fusions(start, first_idx, nb_gps)
+                batch.apply_exclusions()
+                batch.clarify_with_minimum_distance2()
+                batch.apply_speed_compensation_to_linesFusion()
+                lines = streamed.iter_speed_compensation(streamed.iter_clarified(streamed.iter_exclusions(lines)))
+                self.assertEqual(fused_fields(lines), fused_fields(batch.linesFusion))
+
+
+def main():
+    unittest.main(verbosity=2)
+
+
+if __name__ == "__main__":
+    main()
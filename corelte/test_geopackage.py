@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+import sqlite3
+import struct
+import tempfile
+import unittest
+
+from corelte.helpers.geopackage import GPKG_APPLICATION_ID, GPKG_USER_VERSION, SRS_ID, GeoPackageWriter
+from corelte.helpers.helper import Helper
+from corelte.reading import Reading
+
+SURVEY_ID = 202
+
+
+def iter_readings(nb: int):
+    """Mesures en flux ; la dernière n'a pas de position."""
+    t0 = datetime(2024, 6, 1, 12, 0, 0)
+    for i in range(nb):
+        r = Reading(SURVEY_ID)
+        r.file_idx = i + 1
+        r.cellid, r.pci, r.band, r.tac, r.carrier = 17063937, 17, 3, 1234, 'Swisscom'
+        r.reading_time = t0 + timedelta(seconds=i)
+        r.speed, r.fwd_azimuth = 12.5, 45.0
+        if i < nb - 1:
+            r.latitude, r.longitude = 46.2 + i * 1e-3, 6.1 - i * 2e-3
+        yield r
+
+
+class GeoPackageTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.filename = Path(self.tmp.name) / 'survey.gpkg'
+        return super().setUp()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        return super().tearDown()
+
+    def query(self, sql: str, *params):
+        conn = sqlite3.connect(str(self.filename))
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+
+class TestGeoPackageWriter(GeoPackageTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # 21 mesures par lots de 5, en deux appels à write()
+        with GeoPackageWriter(self.filename, 'readings', batch_size=5) as gpkg:
+            lines = iter_readings(21)
+            self.assertEqual(gpkg.write(r for _, r in zip(range(8), lines)), 8)
+            self.assertEqual(gpkg.write(lines), 13)
+        return None
+
+    def test_rows(self):
+        self.assertEqual(self.query('SELECT count(*) FROM readings'), [(21,)])
+        self.assertEqual(self.query('SELECT fid, file_idx, cell_id, carrier, reading_timestamp FROM readings WHERE fid = 9'),
+                         [(9, 9, 17063937, 'Swisscom', '2024-06-01T12:00:08')])
+        self.assertEqual(self.query('SELECT count(*) FROM readings WHERE geom IS NULL'), [(1,)])
+
+    def test_file_header(self):
+        self.assertEqual(self.query('PRAGMA application_id'), [(GPKG_APPLICATION_ID,)])
+        self.assertEqual(self.query('PRAGMA user_version'), [(GPKG_USER_VERSION,)])
+
+    def test_contents_extent(self):
+        (data_type, srs_id, min_x, min_y, max_x, max_y, last_change), = self.query(
+            'SELECT data_type, srs_id, min_x, min_y, max_x, max_y, last_change FROM gpkg_contents '
+            "WHERE table_name = 'readings'")
+        self.assertEqual((data_type, srs_id), ('features', SRS_ID))
+        self.assertAlmostEqual(min_x, 6.1 - 19 * 2e-3)
+        self.assertAlmostEqual(max_x, 6.1)
+        self.assertAlmostEqual(min_y, 46.2)
+        self.assertAlmostEqual(max_y, 46.2 + 19 * 1e-3)
+        self.assertRegex(last_change, r'^\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d\.\d{3}Z$')
+
+    def test_geometry_columns(self):
+        self.assertEqual(self.query('SELECT * FROM gpkg_geometry_columns'), [('readings', 'geom', 'POINT', SRS_ID, 0, 0)])
+
+    def test_geometry_blob(self):
+        (blob,), = self.query('SELECT geom FROM readings WHERE fid = 3')
+        magic, version, flags, srs_id = struct.unpack_from('<2sBBi', blob)
+        self.assertEqual((magic, version, flags, srs_id), (b'GP', 0, 0x01, SRS_ID))
+        byte_order, geometry_type, x, y = struct.unpack_from('<BIdd', blob, 8)
+        self.assertEqual((byte_order, geometry_type), (1, 1)) # little-endian, Point
+        self.assertAlmostEqual(x, 6.1 - 2 * 2e-3)
+        self.assertAlmostEqual(y, 46.2 + 2 * 1e-3)
+        self.assertEqual(len(blob), 8 + 21)
+
+    def test_rtree(self):
+        self.assertEqual(self.query('SELECT count(*) FROM rtree_readings_geom'), [(20,)])
+        (minx, maxx, miny, maxy), = self.query('SELECT minx, maxx, miny, maxy FROM rtree_readings_geom WHERE id = 3')
+        # l'R-tree stocke des float32 arrondis vers l'extérieur
+        x, y = 6.1 - 2 * 2e-3, 46.2 + 2 * 1e-3
+        self.assertTrue(minx <= x <= maxx and maxx - minx < 1e-5)
+        self.assertTrue(miny <= y <= maxy and maxy - miny < 1e-5)
+        names = {name for name, in self.query("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+        self.assertEqual(names, {f'rtree_readings_geom_{t}' for t in
+                                 ('insert', 'update1', 'update2', 'update3', 'update4', 'delete')})
+        self.assertEqual(self.query('SELECT extension_name FROM gpkg_extensions'), [('gpkg_rtree_index',)])
+
+
+class TestSaveGpkgFile(GeoPackageTestCase):
+
+    def test_generator(self):
+        Helper().save_gpkg_file(iter_readings(12), self.filename, 'gps', batch_size=5)
+        self.assertEqual(self.query('SELECT count(*) FROM gps'), [(12,)])
+        self.assertEqual(self.query('SELECT count(*) FROM rtree_gps_geom'), [(11,)])
+
+    def test_none_writes_nothing(self):
+        Helper().save_gpkg_file(None, self.filename)
+        self.assertFalse(self.filename.exists())
+
+    def test_existing_file_replaced(self):
+        Helper().save_gpkg_file(iter_readings(12), self.filename)
+        Helper().save_gpkg_file(iter_readings(3), self.filename)
+        self.assertEqual(self.query('SELECT count(*) FROM readings'), [(3,)])
+
+
+def main():
+    unittest.main(verbosity=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import unittest
+
+from geoalchemy2.shape import to_shape
+import numpy as np
+
+from corelte.fusion import Fusion
+from corelte.handover import (CHANGE_BITS, HANDOVER_BAND, HANDOVER_CELL, HANDOVER_PCI, HANDOVER_TAC,
+                              find_handovers, handover_rows, handovers_of_readings)
+from corelte.lake import MISSING_INT, readings_to_columns
+from corelte.reading import Reading
+
+CELL_A, CELL_B, CELL_C = 17063937, 17063938, 17064193
+INVALID = 0 # cellid d'une frame illisible
+
+
+def make_lines(cells, pcis=None, bands=None, tacs=None, speed=0.0) -> list[Reading]:
+    t0 = datetime(2024, 6, 1, 12, 0, 0)
+    lines = []
+    for i, cell_id in enumerate(cells):
+        r = Reading(202)
+        r.file_idx = i + 1
+        r.cellid = cell_id
+        r.pci = 17 if pcis is None else pcis[i]
+        r.band = 3 if bands is None else bands[i]
+        r.tac = 1234 if tacs is None else tacs[i]
+        r.speed = speed
+        r.fwd_azimuth = 0.0
+        r.reading_time = t0 + timedelta(seconds=i)
+        r.latitude = 46.2 + i * 1e-4
+        r.longitude = 6.1
+        lines.append(r)
+    return lines
+
+
+def reference_handovers(lines: list[Reading]) -> list[tuple]:
+    """Boucle de référence : (prev_file_idx, file_idx, changed) entre mesures valides successives."""
+    valid = [r for r in lines if r.is_valid()]
+    events = []
+    for prev, r in zip(valid, valid[1:]):
+        changed = 0
+        for attr, bit in (('cellid', HANDOVER_CELL), ('pci', HANDOVER_PCI), ('band', HANDOVER_BAND), ('tac', HANDOVER_TAC)):
+            if getattr(r, attr) != getattr(prev, attr):
+                changed |= bit
+        if changed:
+            events.append((prev.file_idx, r.file_idx, changed))
+    return events
+
+
+class TestFindHandovers(unittest.TestCase):
+
+    def test_matches_reference_loop(self):
+        rng = np.random.default_rng(46)
+        n = 500
+        cells = rng.choice([CELL_A, CELL_B, CELL_C, INVALID], size=n, p=[0.4, 0.3, 0.2, 0.1]).tolist()
+        lines = make_lines(cells, pcis=rng.choice([17, 18], size=n).tolist(),
+                           bands=rng.choice([3, 7, 20], size=n).tolist(), tacs=rng.choice([1234, 1235], size=n).tolist())
+        events = handovers_of_readings(lines)
+        found = list(zip(events['prev_file_idx'].tolist(), events['file_idx'].tolist(), events['changed'].tolist()))
+        self.assertEqual(found, reference_handovers(lines))
+
+    def test_invalid_frames_are_not_handovers(self):
+        # A, illisible, A : pas de handover ; A, illisible x2, B : un handover par-dessus le trou
+        lines = make_lines([CELL_A, INVALID, CELL_A, INVALID, INVALID, CELL_B])
+        events = handovers_of_readings(lines)
+        self.assertEqual(events['prev_file_idx'].tolist(), [3])
+        self.assertEqual(events['file_idx'].tolist(), [6])
+        self.assertEqual(events['from_cell_id'].tolist(), [CELL_A])
+        self.assertEqual(events['to_cell_id'].tolist(), [CELL_B])
+        # milieu des deux mesures valides
+        self.assertAlmostEqual(float(events['latitude'][0]), 46.2 + 3.5e-4)
+
+    def test_changed_bitmask(self):
+        lines = make_lines([CELL_A, CELL_B, CELL_B, CELL_B, CELL_B, CELL_B],
+                           pcis=[17, 18, 18, 18, 18, 18], bands=[3, 3, 3, 7, 7, 7], tacs=[1234, 1234, 1234, 1234, 1235, 1235])
+        events = handovers_of_readings(lines)
+        self.assertEqual(events['changed'].tolist(), [HANDOVER_CELL | HANDOVER_PCI, HANDOVER_BAND, HANDOVER_TAC])
+        self.assertEqual(events['file_idx'].tolist(), [2, 4, 5])
+        self.assertEqual(events['from_band'].tolist(), [3, 3, 7])
+        self.assertEqual(events['to_band'].tolist(), [3, 7, 7])
+
+    def test_no_event(self):
+        self.assertEqual(len(handovers_of_readings(make_lines([CELL_A] * 5))['file_idx']), 0)
+        self.assertEqual(len(handovers_of_readings(make_lines([CELL_A]))['file_idx']), 0)
+        self.assertEqual(len(handovers_of_readings([])['file_idx']), 0)
+
+
+class TestHandoverRows(unittest.TestCase):
+
+    def test_missing_int_to_null(self):
+        # PCI illisible (texte OCR) et vitesse inconnue
+        lines = make_lines([CELL_A, CELL_B], pcis=[17, 'X'])
+        lines[1].speed = None
+        columns = readings_to_columns(lines)
+        self.assertEqual(columns['pci'].tolist(), [17, MISSING_INT])
+
+        rows = handover_rows(1, 202, find_handovers(columns))
+        self.assertEqual(len(rows), 1)
+        row = rows[0]
+        self.assertEqual((row['network_id'], row['survey_id'], row['prev_file_idx'], row['file_idx']), (1, 202, 1, 2))
+        self.assertEqual((row['from_pci'], row['to_pci']), (17, None))
+        self.assertEqual((row['from_cell_id'], row['to_cell_id']), (CELL_A, CELL_B))
+        self.assertEqual(row['changed'], HANDOVER_CELL | HANDOVER_PCI)
+        self.assertIsNone(row['speed'])
+        self.assertEqual(row['reading_time'], datetime(2024, 6, 1, 12, 0, 1))
+        for name in CHANGE_BITS:
+            self.assertIsInstance(row[f'from_{name}'], int)
+        point = to_shape(row['geom'])
+        self.assertAlmostEqual(point.y, 46.20005)
+        self.assertAlmostEqual(point.x, 6.1)
+
+
+class TestClarifyKeepSet(unittest.TestCase):
+
+    def clarify(self, cells) -> list[int]:
+        fusion = Fusion(SimpleNamespace(network_id=1, survey_id=202))
+        # vitesse nulle : is_far_enough est faux, seuls les points 'keep' restent
+        fusion.linesFusion = make_lines(cells)
+        fusion.clarify_with_minimum_distance2()
+        return [r.file_idx for r in fusion.linesFusion]
+
+    def test_both_sides_of_each_handover(self):
+        self.assertEqual(self.clarify([CELL_A, CELL_A, CELL_A, CELL_B, CELL_B, CELL_B, CELL_A]), [1, 3, 4, 6, 7])
+
+    def test_no_duplicated_rows(self):
+        # l'ancienne boucle gardait l'index dans rows[1:] et donnait [1, 1, 2] et [1, 1, 2, 3]
+        self.assertEqual(self.clarify([CELL_A, CELL_B]), [1, 2])
+        self.assertEqual(self.clarify([CELL_A, CELL_B, CELL_B]), [1, 2, 3])
+        self.assertEqual(self.clarify([CELL_A, CELL_A, CELL_B, CELL_C, CELL_C]), [1, 2, 3, 4, 5])
+
+    def test_invalid_readings_dropped(self):
+        self.assertEqual(self.clarify([CELL_A, INVALID, CELL_A, CELL_A, INVALID, CELL_B]), [1, 4, 6])
+        self.assertEqual(self.clarify([INVALID, INVALID]), [])
+
+
+def main():
+    unittest.main(verbosity=2)
+
+
+if __name__ == "__main__":
+    main()
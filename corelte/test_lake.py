@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+import tempfile
+import unittest
+
+import numpy as np
+
+from corelte.lake import MISSING_INT, Filter, SurveyLake, column_stats, columns_to_readings, readings_to_columns
+from corelte.reading import Reading
+
+NETWORK_ID = 1
+
+
+def make_lines(survey_id: int, nb: int, cell_id: int, t0: datetime, lat0: float) -> list[Reading]:
+    lines = []
+    for i in range(nb):
+        r = Reading(survey_id)
+        r.file_idx = i + 1
+        r.cellid = cell_id
+        r.tac = 1234
+        r.band = 3
+        r.pci = 17
+        r.speed = 12.5
+        r.reading_time = t0 + timedelta(seconds=i)
+        r.latitude = lat0 + i * 1e-4
+        r.longitude = 6.1
+        lines.append(r)
+    return lines
+
+
+class CountingLake(SurveyLake):
+    """Lake counting the partitions actually read."""
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.read = []
+
+    def read_partition(self, directory, columns=None):
+        self.read.append(directory.name)
+        return super().read_partition(directory, columns)
+
+
+class TestLake(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.lake = CountingLake(Path(self.tmp.name))
+        # deux surveys éloignés dans le temps, l'espace et les cellules
+        self.lake.write(NETWORK_ID, 202, 'fusion', make_lines(202, 10, 17063937, datetime(2024, 6, 1, 12), 46.2))
+        self.lake.write(NETWORK_ID, 203, 'fusion', make_lines(203, 5, 228001001, datetime(2024, 7, 1, 12), 47.3))
+        return super().setUp()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        return super().tearDown()
+
+    def test_write_read_round_trip(self):
+        lines = make_lines(202, 3, 17063937, datetime(2024, 6, 1, 12), 46.2)
+        lines[1].pci = 'X' # texte OCR non numérique
+        lines[2].speed = None
+        columns = readings_to_columns(lines)
+        self.assertEqual(columns['pci'].tolist(), [17, MISSING_INT, 17])
+
+        back = columns_to_readings(columns)
+        self.assertEqual([r.cellid for r in back], [17063937] * 3)
+        self.assertIsNone(back[1].pci)
+        self.assertIsNone(back[2].speed)
+        self.assertEqual(back[2].reading_time, datetime(2024, 6, 1, 12, 0, 2))
+        self.assertAlmostEqual(back[2].latitude, 46.2002)
+
+    def test_partition_layout_and_stats(self):
+        directory = self.lake.partition_dir('fusion', NETWORK_ID, 202)
+        self.assertEqual(directory.relative_to(self.lake.root), Path('fusion/network=01/survey=0202'))
+        data = self.lake.read_partition(directory, ['cell_id', 'file_idx'])
+        self.assertIsInstance(data['cell_id'], np.memmap)
+        self.assertEqual(data['file_idx'].tolist(), list(range(1, 11)))
+
+        stats = column_stats(readings_to_columns(make_lines(202, 10, 17063937, datetime(2024, 6, 1, 12), 46.2)))
+        self.assertEqual(stats['rows'], 10)
+        self.assertEqual(stats['cell_id'], [17063937, 17063937])
+        self.assertEqual(stats['reading_time'], ['2024-06-01T12:00:00.000', '2024-06-01T12:00:09.000'])
+
+    def test_scan_all(self):
+        data = self.lake.scan('fusion')
+        self.assertEqual(len(data['cell_id']), 15)
+        self.assertEqual(data['network_id'].tolist(), [NETWORK_ID] * 15)
+        self.assertEqual(sorted(self.lake.read), ['survey=0202', 'survey=0203'])
+
+    def test_stats_prune_cell_range(self):
+        data = self.lake.scan('fusion', Filter(cell_range=(228001000, 228001999)), columns=['survey_id'])
+        self.assertEqual(data['survey_id'].tolist(), [203] * 5)
+        self.assertEqual(self.lake.read, ['survey=0203'])
+
+    def test_stats_prune_time_range(self):
+        data = self.lake.scan('fusion', Filter(time_range=(datetime(2024, 6, 1, 12, 0, 2), datetime(2024, 6, 1, 12, 0, 4))),
+                              columns=['file_idx'])
+        self.assertEqual(data['file_idx'].tolist(), [3, 4, 5])
+        self.assertEqual(self.lake.read, ['survey=0202'])
+
+    def test_stats_prune_bbox(self):
+        data = self.lake.scan('fusion', Filter(bbox=(6.0, 47.0, 6.2, 48.0)), columns=['survey_id'])
+        self.assertEqual(len(data['survey_id']), 5)
+        self.assertEqual(self.lake.read, ['survey=0203'])
+
+    def test_no_match(self):
+        data = self.lake.scan('fusion', Filter(cell_range=(1, 2)))
+        self.assertEqual(len(data['cell_id']), 0)
+        self.assertEqual(data['reading_time'].dtype, np.dtype('datetime64[ms]'))
+        self.assertEqual(self.lake.read, [])
+
+    def test_replace_and_drop(self):
+        self.lake.write(NETWORK_ID, 202, 'fusion', make_lines(202, 4, 17063937, datetime(2024, 6, 1, 12), 46.2))
+        self.assertEqual(len(self.lake.scan('fusion', Filter(survey_ids=[202]))['cell_id']), 4)
+        # ni .tmp ni .old laissés par le remplacement
+        network_dir = self.lake.partition_dir('fusion', NETWORK_ID, 202).parent
+        self.assertEqual(sorted(d.name for d in network_dir.iterdir()), ['survey=0202', 'survey=0203'])
+
+        self.lake.drop(NETWORK_ID, 202)
+        self.assertEqual([s for _, s, _ in self.lake.partitions('fusion')], [203])
+
+    def test_unknown_dataset(self):
+        with self.assertRaises(ValueError):
+            self.lake.write(NETWORK_ID, 202, 'unknown', [])
+
+
+def main():
+    unittest.main(verbosity=2)
+
+
+if __name__ == "__main__":
+    main()
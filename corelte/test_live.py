@@ -0,0 +1,183 @@
+import csv
+from datetime import datetime, timedelta
+import io
+from pathlib import Path
+import tempfile
+from types import SimpleNamespace
+import unittest
+
+import numpy as np
+
+from corelte.reading import Reading
+from corelte.reading_interval import MP4Clock, append_frame
+from corelte.test_support import stub_missing_modules
+
+# corelte.live importe cv2 et skimage, inutiles ici
+stub_missing_modules()
+from corelte.live import _END, FrameStream, LiveSession
+
+SURVEY_ID = 250
+CELL_ID = 17063937
+T0 = datetime(2024, 6, 1, 10, 0, 0)
+
+
+class TestFrameStream(unittest.TestCase):
+
+    WIDTH, HEIGHT = 4, 3
+
+    def frames_of(self, pipe) -> list:
+        stream = FrameStream(pipe=pipe, width=self.WIDTH, height=self.HEIGHT)
+        stream.run()
+        return [stream.frames.get_nowait() for _ in range(stream.frames.qsize())]
+
+    def test_frames_negated_until_short_read(self):
+        size = self.WIDTH * self.HEIGHT
+        data = bytes(range(size)) + bytes(range(100, 100 + size)) + b'\x00' * (size - 1)
+        frames = self.frames_of(io.BytesIO(data))
+        self.assertEqual(len(frames), 3)
+        self.assertIs(frames[-1], _END)
+        self.assertEqual(frames[0].shape, (self.HEIGHT, self.WIDTH))
+        np.testing.assert_array_equal(frames[0].ravel(), 255 - np.arange(size))
+        np.testing.assert_array_equal(frames[1].ravel(), 155 - np.arange(size))
+
+    def test_end_on_empty_pipe(self):
+        self.assertEqual(self.frames_of(io.BytesIO(b'')), [_END])
+
+    def test_end_when_the_read_fails(self):
+        class BrokenPipe:
+            def read(self, size):
+                raise OSError("pipe fermé")
+
+        stream = FrameStream(pipe=BrokenPipe(), width=self.WIDTH, height=self.HEIGHT)
+        with self.assertRaises(OSError):
+            stream.run()
+        self.assertIs(stream.frames.get_nowait(), _END)
+
+
+class Clarify:
+    """Keeps every fused reading, in the order of push."""
+
+    def __init__(self) -> None:
+        self.pushed = []
+
+    def push(self, r: Reading) -> list:
+        self.pushed.append(r.file_idx)
+        return [r]
+
+    def flush(self) -> list:
+        return []
+
+
+def gps_point(seconds: int) -> Reading:
+    r = Reading(SURVEY_ID)
+    r.reading_time = T0 + timedelta(seconds=seconds)
+    r.latitude, r.longitude = 46.2 + seconds * 1e-4, 6.1
+    return r
+
+
+class LiveTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        directory = Path(self.tmp.name)
+        self.argument = SimpleNamespace(network_id=1, survey_id=SURVEY_ID, mp4_create_date=T0,
+                                        survey_tmp_dir=directory, csv_filename=directory / 'survey.csv')
+        return super().setUp()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        return super().tearDown()
+
+    def session(self, nb_frames: int, first_time: datetime) -> LiveSession:
+        """Session whose screencast has read nb_frames frames of one cell, the first at first_time."""
+        session = LiveSession(self.argument, frames=None, gps=None)
+        screencast = session.screencast
+        screencast.clock = MP4Clock(1, first_time)
+        for file_idx in range(1, nb_frames + 1):
+            append_frame(screencast.intervalsMp4, file_idx, 3, CELL_ID, 17, 1234)
+        screencast.nb_frames = nb_frames
+        session.clarify = Clarify()
+        return session
+
+
+class TestFuseReady(LiveTestCase):
+
+    def test_frames_wait_for_gps_then_are_skipped(self):
+        # screencast démarré 3 s avant le GPS : frames 1-3 sans point, frame 4 à T0
+        session = self.session(12, T0 - timedelta(seconds=3))
+        session.fuse_ready()
+        self.assertEqual((session.next_frame, session.clarify.pushed), (1, []))
+
+        # points de T0 à T0+5 s : disponibles jusqu'à T0+4 s
+        session.track.extend([gps_point(s) for s in range(6)])
+        session.fuse_ready()
+        self.assertEqual(session.clarify.pushed, [4, 5, 6, 7, 8])
+        self.assertEqual(session.next_frame, 9) # T0+5 s attend le point suivant
+        self.assertEqual([(r.file_idx, r.cellid) for r in session.pending[:2]], [(4, CELL_ID), (5, CELL_ID)])
+
+        # fin de session : le dernier point est fusionné, les frames après la trace sont abandonnées
+        session.track.close()
+        session.fuse_ready(final=True)
+        self.assertEqual(session.clarify.pushed, [4, 5, 6, 7, 8, 9])
+        self.assertEqual(session.next_frame, 13)
+
+    def test_no_clock_no_fusion(self):
+        session = self.session(5, T0)
+        session.screencast.clock = None
+        session.track.extend([gps_point(s) for s in range(6)])
+        session.fuse_ready(final=True)
+        self.assertIsNone(session.next_frame)
+        self.assertEqual(session.pending, [])
+
+
+class TestFlushOutput(LiveTestCase):
+
+    def fused_session(self, first_time: datetime, nb: int) -> LiveSession:
+        session = self.session(nb, first_time)
+        seconds = int((first_time - T0).total_seconds())
+        session.track.extend([gps_point(s) for s in range(seconds, seconds + nb + 1)])
+        session.fuse_ready()
+        self.assertEqual(len(session.pending), nb)
+        return session
+
+    def test_restarted_session_appends_to_the_csv(self):
+        first = self.fused_session(T0, 4)
+        first.flush_output()
+        first.flush_output() # rien en attente
+        first._csv_file.close()
+        self.assertEqual(first.nb_written, 4)
+
+        second = self.fused_session(T0 + timedelta(seconds=60), 3)
+        second.flush_output()
+        second._csv_file.close()
+
+        with open(self.argument.csv_filename, newline='') as f:
+            rows = list(csv.reader(f))
+        header = Reading(SURVEY_ID).fields()
+        self.assertEqual(rows[0], header)
+        self.assertEqual(len(rows), 1 + 4 + 3)
+        self.assertNotIn(header, rows[1:])
+        self.assertEqual([row[header.index('file_idx')] for row in rows[1:]], ['1', '2', '3', '4', '1', '2', '3'])
+
+    def test_writer_receives_the_readings(self):
+        class Writer:
+            def __init__(self) -> None:
+                self.puts = []
+
+            def put(self, network_id, survey_id, lines):
+                self.puts.append((network_id, survey_id, [r.file_idx for r in lines]))
+
+        session = self.fused_session(T0, 3)
+        session.writer = Writer()
+        session.flush_output()
+        session._csv_file.close()
+        self.assertEqual(session.writer.puts, [(1, SURVEY_ID, [1, 2, 3])])
+        self.assertEqual(session.pending, [])
+
+
+def main():
+    unittest.main(verbosity=2)
+
+
+if __name__ == "__main__":
+    main()
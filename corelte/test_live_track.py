@@ -0,0 +1,178 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+import tempfile
+from types import SimpleNamespace
+import unittest
+
+from corelte.live_track import GpxFeed, LiveTrack, NmeaFeed, parse_rmc
+from corelte.reading import Reading
+from corelte.track import Track
+
+SURVEY_ID = 250
+
+RMC = '$GPRMC,123519.00,A,4807.038,N,01131.000,E,022.4,084.4,230394,003.1,W*6A'
+
+
+def gpx_points(nb: int, gaps=(1, 3, 1, 2)) -> list[str]:
+    t = datetime(2024, 6, 1, 10, 0, 0)
+    points = []
+    for i in range(nb):
+        points.append(f'<trkpt lat="{46.2 + i * 2e-4:.6f}" lon="{6.1 + i * 1e-4:.6f}"><ele>400</ele>'
+                      f'<time>{t.isoformat()}Z</time></trkpt>')
+        t += timedelta(seconds=gaps[i % len(gaps)])
+    return points
+
+
+def gpx_text(points: list[str]) -> str:
+    return ('<?xml version="1.0"?><gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1">'
+            '<trk><trkseg>' + '\n'.join(points) + '</trkseg></trk></gpx>\n')
+
+
+def fields_of(lines) -> list[tuple]:
+    return [(r.reading_time, round(r.latitude, 9), round(r.longitude, 9), r.speed, r.fwd_azimuth) for r in lines]
+
+
+class FileTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.filename = Path(self.tmp.name) / 'survey.gpx'
+        return super().setUp()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        return super().tearDown()
+
+    def append(self, text: str) -> None:
+        with open(self.filename, 'a', encoding='utf-8') as f:
+            f.write(text)
+
+
+class TestParseRmc(unittest.TestCase):
+
+    def test_valid_sentence(self):
+        r = parse_rmc(RMC, SURVEY_ID)
+        self.assertEqual(r.survey_id, SURVEY_ID)
+        self.assertAlmostEqual(r.latitude, 48 + 7.038 / 60)
+        self.assertAlmostEqual(r.longitude, 11 + 31 / 60)
+        # 12:35:19 UTC, heure d'hiver à Zurich
+        self.assertEqual(r.reading_time, datetime(1994, 3, 23, 13, 35, 19))
+
+    def test_southern_and_western_hemispheres(self):
+        r = parse_rmc(RMC.replace(',N,', ',S,').replace(',E,', ',W,'), SURVEY_ID)
+        self.assertAlmostEqual(r.latitude, -(48 + 7.038 / 60))
+        self.assertAlmostEqual(r.longitude, -(11 + 31 / 60))
+
+    def test_other_talkers(self):
+        self.assertIsNotNone(parse_rmc(RMC.replace('$GPRMC', '$GNRMC'), SURVEY_ID))
+
+    def test_ignored_lines(self):
+        self.assertIsNone(parse_rmc(RMC.replace(',A,', ',V,'), SURVEY_ID)) # pas de fix
+        self.assertIsNone(parse_rmc('$GPGGA,123519,4807.038,N,01131.000,E,1,08,0.9,545.4,M,46.9,M,,*47', SURVEY_ID))
+        self.assertIsNone(parse_rmc('$GPRMC,123519.00,A,4807.038,N', SURVEY_ID))
+        self.assertIsNone(parse_rmc(RMC.replace('230394', '999999'), SURVEY_ID))
+        self.assertIsNone(parse_rmc(RMC.replace('4807.038', ''), SURVEY_ID))
+        self.assertIsNone(parse_rmc('', SURVEY_ID))
+
+
+class TestNmeaFeed(FileTestCase):
+
+    def test_incomplete_line_waits(self):
+        feed = NmeaFeed(self.filename, SURVEY_ID)
+        self.assertEqual(feed.poll(), []) # fichier pas encore créé
+        self.append(RMC[:30])
+        self.assertEqual(feed.poll(), [])
+        self.append(RMC[30:] + '\r\n$GPGSV,garbage\n')
+        points = feed.poll()
+        self.assertEqual(len(points), 1)
+        self.assertAlmostEqual(points[0].latitude, 48 + 7.038 / 60)
+        self.assertEqual(feed.poll(), [])
+
+
+class TestGpxFeed(FileTestCase):
+
+    def test_points_of_a_growing_file(self):
+        text = gpx_text(gpx_points(12))
+        feed = GpxFeed(self.filename, SURVEY_ID)
+        points = []
+        # écrit le fichier par morceaux, coupés au milieu des points
+        for start in range(0, len(text), 97):
+            self.append(text[start:start + 97])
+            points.extend(feed.poll())
+        self.assertEqual(len(points), 12)
+        self.assertEqual([r.reading_time for r in points], sorted(r.reading_time for r in points))
+        self.assertAlmostEqual(points[-1].latitude, 46.2 + 11 * 2e-4)
+
+    def test_same_points_as_track(self):
+        self.append(gpx_text(gpx_points(12)))
+        track = Track(SimpleNamespace(survey_id=SURVEY_ID, gps_filename=self.filename))
+        track.read_gpx_file_into_lines_gps()
+        self.assertEqual(fields_of(GpxFeed(self.filename, SURVEY_ID).poll()), fields_of(track.lines_gps))
+
+    def test_incomplete_point_waits(self):
+        points = gpx_points(2)
+        self.append(gpx_text([])[:-len('</trkseg></trk></gpx>\n')] + points[0] + points[1][:40])
+        feed = GpxFeed(self.filename, SURVEY_ID)
+        self.assertEqual(len(feed.poll()), 1)
+        self.append(points[1][40:])
+        self.assertEqual(len(feed.poll()), 1)
+
+    def test_point_without_time_skipped(self):
+        self.append(gpx_text(['<trkpt lat="46.2" lon="6.1"><ele>400</ele></trkpt>'] + gpx_points(1)))
+        self.assertEqual(len(GpxFeed(self.filename, SURVEY_ID).poll()), 1)
+
+
+class TestLiveTrack(FileTestCase):
+
+    def test_same_track_as_batch(self):
+        self.append(gpx_text(gpx_points(15)))
+        track = Track(SimpleNamespace(survey_id=SURVEY_ID, gps_filename=self.filename))
+        track.read_gpx_file_into_lines_gps()
+        track.extend_gps_records_to_every_second()
+        track.calculate_speed_and_direction()
+
+        live = LiveTrack(SURVEY_ID)
+        for r in GpxFeed(self.filename, SURVEY_ID).poll():
+            live.add(r)
+        live.close()
+        self.assertEqual(fields_of(live.points.values()), fields_of(track.lines_gps))
+
+    def test_point_available_once_the_next_arrives(self):
+        self.append(gpx_text(gpx_points(3)))
+        first, second, _ = GpxFeed(self.filename, SURVEY_ID).poll()
+        live = LiveTrack(SURVEY_ID)
+        live.add(first)
+        self.assertIsNone(live.latest_time)
+        live.add(second)
+        # gap de 1 s : seul le premier point, avec sa vitesse
+        self.assertEqual(live.latest_time, first.reading_time)
+        self.assertIsNotNone(live.at(first.reading_time).speed)
+        self.assertIsNone(live.at(second.reading_time))
+
+    def test_duplicate_and_backward_points_ignored(self):
+        self.append(gpx_text(gpx_points(4)))
+        readings = GpxFeed(self.filename, SURVEY_ID).poll()
+        live = LiveTrack(SURVEY_ID)
+        live.extend([readings[0], readings[1], readings[1], readings[0], readings[2]])
+        self.assertEqual(list(live.points), [readings[0].reading_time, readings[1].reading_time,
+                                             readings[1].reading_time + timedelta(seconds=1),
+                                             readings[1].reading_time + timedelta(seconds=2)])
+
+    def test_window_bounded(self):
+        live = LiveTrack(SURVEY_ID, keep_seconds=5)
+        t0 = datetime(2024, 6, 1, 12, 0, 0)
+        for i in range(0, 40, 4):
+            r = Reading(SURVEY_ID)
+            r.reading_time = t0 + timedelta(seconds=i)
+            r.latitude, r.longitude = 46.2 + i * 1e-4, 6.1
+            live.add(r)
+        self.assertEqual(len(live.points), 5)
+        self.assertEqual(live.latest_time, t0 + timedelta(seconds=35))
+
+
+def main():
+    unittest.main(verbosity=2)
+
+
+if __name__ == "__main__":
+    main()
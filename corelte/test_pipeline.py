@@ -0,0 +1,120 @@
+import csv
+from datetime import datetime, timedelta
+import os
+from pathlib import Path
+import tempfile
+from types import SimpleNamespace
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from corelte.argument import OCRMode
+from corelte.lake import SurveyLake
+from corelte.reading_interval import MP4Clock, ReadingInterval
+from corelte.test_support import exiftool, make_screencast, stub_missing_modules
+
+# corelte.pipeline importe corelte.screencast (cv2, OCR)
+stub_missing_modules()
+from corelte.pipeline import StreamingPipeline
+
+NETWORK_ID = 1
+SURVEY_ID = 202
+T0 = datetime(2024, 6, 1, 10, 0, 0) # UTC
+LOCAL_T0 = T0 + timedelta(hours=2) # heure d'été à Zurich, celle de la trace et de l'horloge du screencast
+CELL_A, CELL_B = 17063937, 17063938
+
+
+def write_gpx(filename: Path, nb: int) -> None:
+    """GPX track going north, one point every 2 s from T0 (UTC)."""
+    points = ''.join(f'<trkpt lat="{46.2 + i * 3e-4:.6f}" lon="6.100000"><ele>400</ele>'
+                     f'<time>{(T0 + timedelta(seconds=2 * i)).isoformat()}Z</time></trkpt>' for i in range(nb))
+    filename.write_text('<?xml version="1.0"?><gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1">'
+                        f'<trk><trkseg>{points}</trkseg></trk></gpx>')
+
+
+class TestStreamingPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        directory = Path(self.tmp.name)
+        self.argument = SimpleNamespace(
+            network_id=NETWORK_ID, survey_id=SURVEY_ID, use_cache=True, save_to_lake=True, exclusions=[],
+            ocr_mode=OCRMode.MYOCR_PLUS, scale_factor=0.5, time_scan_probe=90, erase_png=False, erase_txt=False,
+            gps_filename=directory / 'survey.gpx', mp4_filename=directory / 'survey.mp4',
+            survey_img_dir=directory / 'img', tmp_frames_to_ocr_filename_json=directory / 'frames.json',
+            tmp_times_to_ocr_filename_json=directory / 'times.json',
+            tmp_gps_cache_filename=directory / 'survey_gps.npz', tmp_mp4_cache_filename=directory / 'survey_mp4.npz',
+            tmp_fusion_cache_filename=directory / 'survey_fusion.npz',
+            csv_filename=directory / 'survey.csv', gpkg_filename=directory / 'survey.gpkg')
+        write_gpx(self.argument.gps_filename, 60)
+        self.argument.mp4_filename.write_bytes(b'mp4')
+        self.argument.survey_img_dir.mkdir()
+        (self.argument.survey_img_dir / 'lte_000001.txt').write_text('Swisscom 4G')
+        self.save_ocr_cache()
+
+        lake = mock.patch.dict(os.environ, {'LTE_LAKE_DIR': str(directory / 'lake')})
+        lake.start()
+        self.addCleanup(lake.stop)
+        return super().setUp()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        return super().tearDown()
+
+    def save_ocr_cache(self) -> None:
+        """Synchronised intervals of 80 frames from T0 + 10 s, as after the OCR (no frame to read here)."""
+        screencast = make_screencast(self.argument)
+        screencast.intervalsMp4 = [ReadingInterval(1, 30, 3, CELL_A, 17, 1234, 'Swisscom'),
+                                   ReadingInterval(31, 80, 3, CELL_B, 18, 1234, 'Swisscom')]
+        screencast.clock = MP4Clock(1, LOCAL_T0 + timedelta(seconds=10))
+        screencast.cursor.first_non_null_idx = 0
+        screencast.cursor.first_non_null_reading_time = screencast.clock.first_time
+        screencast.save_cache()
+
+    def run_pipeline(self) -> StreamingPipeline:
+        with exiftool():
+            pipeline = StreamingPipeline(self.argument, chunk_size=7)
+        pipeline.run(gpkg=False)
+        return pipeline
+
+    def test_lake_partitions(self):
+        pipeline = self.run_pipeline()
+        lake = SurveyLake()
+        fused = lake.read_partition(lake.partition_dir('fused', NETWORK_ID, SURVEY_ID))
+        fusion = lake.read_partition(lake.partition_dir('fusion', NETWORK_ID, SURVEY_ID))
+
+        # 'fused' : une mesure par frame (toutes dans la trace) ; 'fusion' : les mesures écrites, après clarify
+        self.assertEqual(fused['file_idx'].tolist(), list(range(1, 81)))
+        self.assertGreater(pipeline.nb_written, 2)
+        self.assertLess(pipeline.nb_written, 80)
+        with open(self.argument.csv_filename, newline='') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(fusion['file_idx'].tolist(), [int(row['file_idx']) for row in rows])
+        self.assertEqual(set(fusion['cell_id'].tolist()), {CELL_A, CELL_B})
+        np.testing.assert_allclose(fusion['latitude'], [float(row['latitude']) for row in rows], rtol=1e-7)
+
+    def test_second_run_from_the_caches(self):
+        first = self.run_pipeline()
+        lake = SurveyLake()
+        fusion = lake.read_partition(lake.partition_dir('fusion', NETWORK_ID, SURVEY_ID))
+        file_idx = fusion['file_idx'].tolist()
+
+        second = self.run_pipeline()
+        self.assertEqual(second.nb_written, first.nb_written)
+        fusion = lake.read_partition(lake.partition_dir('fusion', NETWORK_ID, SURVEY_ID))
+        self.assertEqual(fusion['file_idx'].tolist(), file_idx)
+
+    def test_no_lake(self):
+        self.argument.save_to_lake = False
+        self.run_pipeline()
+        self.assertEqual(list(SurveyLake().partitions('fusion')), [])
+        self.assertEqual(list(SurveyLake().partitions('fused')), [])
+
+
+def main():
+    unittest.main(verbosity=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+from corelte.reading import Reading
+from corelte.reading_interval import MP4Clock, clip_intervals, encode_intervals, expand_intervals, nb_frames
+from datetime import datetime, timedelta
+import unittest
+
+
+def frame(file_idx, cellid, pci=1):
+    r = Reading(1)
+    r.file_idx, r.band, r.cellid, r.pci, r.tac = file_idx, 3, cellid, pci, 7
+    return r
+
+
+class TestReadingInterval(unittest.TestCase):
+
+    def setUp(self):
+        # 3 frames sur la cellule A, 1 frame invalide, 2 frames sur la cellule B
+        self.lines = [frame(1, 100001), frame(2, 100001), frame(3, 100001), frame(4, None),
+                      frame(5, 100002), frame(6, 100002)]
+        return super().setUp()
+
+    def test_encode_groups_identical_frames(self):
+        intervals = encode_intervals(self.lines)
+        self.assertEqual([(i.start_idx, i.end_idx) for i in intervals], [(1, 3), (4, 4), (5, 6)])
+        self.assertEqual([i.is_valid() for i in intervals], [True, False, True])
+        self.assertEqual(nb_frames(intervals), len(self.lines))
+
+    def test_encode_splits_on_pci_change(self):
+        intervals = encode_intervals([frame(1, 100001, 1), frame(2, 100001, 2)])
+        self.assertEqual(len(intervals), 2)
+
+    def test_expand_round_trip(self):
+        clock = MP4Clock(2, datetime(2024, 5, 1, 10, 0, 30))
+        lines = list(expand_intervals(encode_intervals(self.lines), 1, clock.time))
+        self.assertEqual([(r.file_idx, r.cellid, r.pci) for r in lines],
+                         [(r.file_idx, r.cellid, r.pci) for r in self.lines])
+        self.assertEqual(lines[0].reading_time, datetime(2024, 5, 1, 10, 0, 29))
+        self.assertEqual(lines[-1].reading_time - lines[0].reading_time, timedelta(seconds=5))
+
+    def test_clip(self):
+        clipped = clip_intervals(encode_intervals(self.lines), 2, 5)
+        self.assertEqual([(i.start_idx, i.end_idx) for i in clipped], [(2, 3), (4, 4), (5, 5)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+import numpy as np
+import shapely
+
+from corelte.cell_location import TO_LV95
+from corelte.sector_polygon import PolygonParams, SectorPolygonGenerator, wedge
+
+# Station fictive en LV95
+SX, SY = 2600000.0, 1200000.0
+
+
+def cell(cell_id, dx, dy):
+    dx, dy = np.array(dx, dtype=float), np.array(dy, dtype=float)
+    return cell_id, SX + dx, SY + dy, np.zeros(len(dx))
+
+
+def to_lv95(wkb: bytes):
+    return shapely.transform(shapely.from_wkb(wkb), lambda c: np.column_stack(TO_LV95.transform(c[:, 0], c[:, 1])))
+
+
+class TestSectorPolygon(unittest.TestCase):
+
+    def setUp(self):
+        # enveloppe convexe sans marge : le polygone est exactement celui des mesures
+        params = PolygonParams(concave_ratio=1.0, buffer=0.0, wedge_angle=120.0)
+        self.generator = SectorPolygonGenerator(1, params, workers=0)
+        return super().setUp()
+
+    def test_wedge(self):
+        w = wedge((SX, SY), azimuth=90.0, angle=120.0, radius=100.0, nb_arc=64)
+        self.assertEqual(w.exterior.coords[0], (SX, SY))
+        self.assertTrue(w.contains(shapely.Point(SX + 90, SY)))      # à l'est, dans l'axe
+        self.assertFalse(w.contains(shapely.Point(SX + 10, SY + 50)))  # à plus de 60° de l'axe
+        self.assertAlmostEqual(w.area, np.pi * 100 ** 2 / 3, delta=20)
+
+    def test_hull_inside_wedge_is_kept(self):
+        # carré de 100 m à l'est de la station, entièrement dans le secteur de 120°
+        (cell_id, wkb), = self.generator.compute([cell(101, [100, 200, 200, 100], [-50, -50, 50, 50])], {101: (SX, SY)})
+        polygon = to_lv95(wkb)
+        self.assertEqual((cell_id, polygon.geom_type), (101, 'MultiPolygon'))
+        self.assertAlmostEqual(polygon.area, 100 * 100, delta=1)
+
+    def test_hull_is_clipped_by_wedge(self):
+        # mesures trop larges : les coins hors des ±60° autour de l'axe sont coupés
+        readings = cell(102, [100, 200, 200, 100], [-300, -300, 300, 300])
+        ((_, clipped),) = self.generator.compute([readings], {102: (SX, SY)})
+        ((_, hull),) = self.generator.compute([readings], {102: None})
+        clipped, hull = to_lv95(clipped), to_lv95(hull)
+        self.assertAlmostEqual(hull.area, 100 * 600, delta=1)
+        self.assertLess(clipped.area, hull.area)
+        x, y = shapely.get_coordinates(clipped).T
+        angles = np.degrees(np.arctan2(np.abs(y - SY), x - SX))
+        self.assertTrue(np.all(angles <= 60 + 1e-3))
+
+
+if __name__ == '__main__':
+    unittest.main()
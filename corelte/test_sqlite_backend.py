@@ -0,0 +1,161 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import unittest
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from corelte.coverage import CoverageAggregator
+from corelte.fusion import Fusion
+from corelte.orm.backend import capabilities
+from corelte.orm.db import DatabaseConfig, create_database_engine, db_engines, get_db_session
+from corelte.orm.models import Base, Cell_orm, CoverageBin, Reading_orm, Survey
+from corelte.orm.sync import sync_survey_readings
+from corelte.reading import Reading
+
+
+NETWORK_ID = 1
+SURVEY_ID = 202
+
+
+def make_lines(nb: int, cell_ids: list[int]) -> list[Reading]:
+    t0 = datetime(2024, 6, 1, 12, 0, 0)
+    lines = []
+    for i in range(nb):
+        r = Reading(SURVEY_ID)
+        r.file_idx = i + 1
+        r.cellid = cell_ids[i * len(cell_ids) // nb]
+        r.tac = 1234
+        r.band = 3
+        r.pci = 17
+        r.fwd_azimuth = 45.0
+        r.speed = 12.5
+        r.reading_time = t0 + timedelta(seconds=i)
+        r.latitude = 46.2 + i * 1e-4
+        r.longitude = 6.1
+        lines.append(r)
+    return lines
+
+
+def make_survey(comment: str = '') -> Survey:
+    return Survey(network_id=NETWORK_ID, survey_id=SURVEY_ID, survey_date=datetime(2024, 6, 1),
+                  comment=comment, device='iPhone', os_version='18.1', model='15')
+
+
+class TestSqliteCapabilities(unittest.TestCase):
+
+    def test_postgis_features_are_not_detected(self):
+        caps = capabilities(create_database_engine('sqlite://'))
+        self.assertEqual(caps.dialect, 'sqlite')
+        self.assertFalse(caps.is_postgis)
+        self.assertFalse(caps.partitioning)
+        self.assertFalse(caps.mvt)
+
+
+class TestEngineReconfiguration(unittest.TestCase):
+
+    def setUp(self):
+        self.saved_url = DatabaseConfig.MAIN_URL
+        return super().setUp()
+
+    def tearDown(self):
+        DatabaseConfig.configure(MAIN_URL=self.saved_url)
+        db_engines.dispose()
+        return super().tearDown()
+
+    def test_dispose_rebinds_sessions_to_new_configuration(self):
+        DatabaseConfig.configure(MAIN_URL='sqlite:///:memory:')
+        db_engines.dispose()
+        with get_db_session() as session:
+            self.assertEqual(session.get_bind().url.database, ':memory:')
+
+        DatabaseConfig.configure(MAIN_URL='sqlite://')
+        db_engines.dispose()
+        with get_db_session() as session:
+            self.assertIsNone(session.get_bind().url.database)
+
+
+_engine = create_database_engine('sqlite://')
+
+
+@unittest.skipUnless(capabilities(_engine).is_spatialite, "SpatiaLite indisponible")
+class TestSpatialiteImport(unittest.TestCase):
+
+    def setUp(self):
+        Base.metadata.create_all(_engine)
+        return super().setUp()
+
+    def tearDown(self):
+        Base.metadata.drop_all(_engine)
+        return super().tearDown()
+
+    def test_import_and_incremental_reimport(self):
+        lines = make_lines(100, [17063937, 17063938])
+
+        with Session(_engine) as session:
+            report = sync_survey_readings(session, make_survey(), lines)
+        self.assertTrue(report.survey_created)
+        self.assertEqual(report.inserted, 100)
+
+        with Session(_engine) as session:
+            self.assertEqual(session.scalar(select(func.count()).select_from(Cell_orm)), 2)
+            lat = session.scalar(select(func.ST_Y(Reading_orm.geom)).where(Reading_orm.file_idx == 11))
+        self.assertAlmostEqual(lat, 46.201, places=6)
+
+        # Même survey, une exclusion en plus et un commentaire modifié
+        with Session(_engine) as session:
+            report = sync_survey_readings(session, make_survey('corrigé'), lines[:90])
+        self.assertEqual((report.inserted, report.updated, report.deleted, report.unchanged), (0, 0, 10, 90))
+        self.assertTrue(report.survey_updated)
+
+        with Session(_engine) as session:
+            report = sync_survey_readings(session, make_survey('corrigé'), lines[:90])
+        self.assertFalse(report.has_changes)
+
+
+@unittest.skipUnless(capabilities(_engine).is_spatialite, "SpatiaLite indisponible")
+class TestFullReimportCoverage(unittest.TestCase):
+
+    def setUp(self):
+        self.saved_url = DatabaseConfig.MAIN_URL
+        DatabaseConfig.configure(MAIN_URL='sqlite://')
+        db_engines.dispose()
+        Base.metadata.create_all(db_engines.main)
+        return super().setUp()
+
+    def tearDown(self):
+        Base.metadata.drop_all(db_engines.main)
+        DatabaseConfig.configure(MAIN_URL=self.saved_url)
+        db_engines.dispose()
+        return super().tearDown()
+
+    def coverage_bins(self) -> list:
+        with get_db_session() as session:
+            return session.execute(select(CoverageBin.level, CoverageBin.ix, CoverageBin.iy,
+                                          CoverageBin.cell_id, CoverageBin.count)
+                                   .order_by(CoverageBin.level, CoverageBin.ix, CoverageBin.iy,
+                                             CoverageBin.cell_id)).all()
+
+    def test_full_reimport_does_not_double_bins(self):
+        argument = SimpleNamespace(network_id=NETWORK_ID, survey_id=SURVEY_ID, survey_comment='',
+                                   device='iPhone', model='15', os_version='18.1',
+                                   save_to_db_incremental=False)
+        fusion = Fusion(argument)
+        fusion.linesFusion = make_lines(100, [17063937, 17063938])
+        coverage = CoverageAggregator(NETWORK_ID)
+
+        fusion.save_linesFusion_to_database(datetime(2024, 6, 1), hooks=[coverage])
+        first = self.coverage_bins()
+        self.assertEqual(sum(row.count for row in first if row.level == coverage.levels[0]), 100)
+
+        # Réimport complet du même survey : les compteurs ne doivent pas doubler
+        fusion.save_linesFusion_to_database(datetime(2024, 6, 1), hooks=[coverage])
+        self.assertEqual(self.coverage_bins(), first)
+
+
+def main():
+    unittest.main(verbosity=2)
+
+
+if __name__ == "__main__":
+    main()
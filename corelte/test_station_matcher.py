@@ -0,0 +1,41 @@
+import unittest
+
+import numpy as np
+import shapely
+
+from corelte.station_matcher import StationMatcher
+
+X0, Y0 = 2600000.0, 1200000.0
+
+
+class TestStationMatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.matcher = StationMatcher(network_id=1, search_radius=100.0)
+        # A au centre, B à 500 m, C à 5 km (hors du rayon initial), D à 50 m de A
+        self.matcher.build(np.array([X0, X0 + 500, X0 + 5000, X0 + 50]), np.array([Y0, Y0, Y0, Y0]),
+                           np.array(['A', 'B', 'C', 'D'], dtype=object))
+        return super().setUp()
+
+    def test_nearest_station_first(self):
+        candidates = self.matcher.nearest(shapely.Point(X0 + 480, Y0 + 10), k=2)
+        self.assertEqual([c.station_name for c in candidates], ['B', 'D'])
+        self.assertAlmostEqual(candidates[0].distance, np.hypot(20, 10))
+
+    def test_radius_grows_until_k_stations(self):
+        candidates = self.matcher.nearest(shapely.Point(X0 + 4000, Y0), k=1)
+        self.assertEqual(candidates[0].station_name, 'C')
+        self.assertEqual(len(self.matcher.nearest(shapely.Point(X0, Y0), k=10)), 4)
+
+    def test_stations_inside_footprint_ranked_by_centroid(self):
+        # A et D sont dans l'enveloppe des mesures (distance 0), le barycentre est plus près de D
+        x = X0 + np.array([-20.0, 80, 80, -20])
+        y = Y0 + np.array([-20.0, -20, 20, 20])
+        speed = np.array([9.0, 0, 0, 9])
+        hull, centroid = self.matcher.footprint((101, x, y, speed))
+        candidates = self.matcher.nearest(hull, k=2, centroid=centroid)
+        self.assertEqual([(c.station_name, c.distance) for c in candidates], [('D', 0.0), ('A', 0.0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+"""Test helpers for the modules importing the OCR and video dependencies (screencast, live, pipeline)."""
+from datetime import datetime
+import importlib.util
+import io
+import sys
+import types
+from unittest import mock
+
+
+def stub_missing_modules() -> None:
+    """Install empty cv2, PIL, pytesseract, skimage and tqdm modules when they are not installed.
+
+    Les tests n'appellent ni l'OCR ni OpenCV : seuls les imports doivent réussir.
+    """
+    stubs = {'cv2': {}, 'pytesseract': {}, 'PIL': {'Image': None, 'ImageEnhance': None},
+             'skimage': {}, 'skimage.metrics': {'structural_similarity': None}, 'tqdm': {'tqdm': lambda x, **kwargs: x}}
+    missing = [name for name in stubs
+               if name not in sys.modules and importlib.util.find_spec(name.split('.')[0]) is None]
+    for name in missing:
+        attrs = stubs[name]
+        module = types.ModuleType(name)
+        module.__dict__.update(attrs)
+        sys.modules[name] = module
+
+
+def exiftool(create_date: datetime = datetime(2024, 12, 24, 16, 1, 0)):
+    """Patch of the exiftool call of Screencast, giving create_date as the creation date of the video."""
+    output = f"Media Create Date               : {create_date:%Y:%m:%d %H:%M:%S}\n"
+    return mock.patch('corelte.screencast.os.popen', side_effect=lambda cmd: io.StringIO(output))
+
+
+def make_screencast(argument, create_date: datetime = datetime(2024, 12, 24, 16, 1, 0)):
+    """Screencast of argument, with the creation date exiftool would give."""
+    from corelte.screencast import Screencast
+    with exiftool(create_date):
+        return Screencast(argument)
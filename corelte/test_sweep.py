@@ -0,0 +1,136 @@
+from dataclasses import replace
+from datetime import datetime, timedelta
+import os
+from pathlib import Path
+import tempfile
+from types import SimpleNamespace
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from corelte.fusion import DEFAULT_CLARIFY
+from corelte.helpers.helper import Helper
+from corelte.lake import SurveyLake, readings_to_columns
+from corelte.reading import Reading
+from corelte.sweep import SWEEP_DATASET, ParameterSweep, param_grid, run_params, summarize, track_metrics
+
+CELL_A, CELL_B = 17063937, 17063938
+SPEED = 10.0 # m/s, une mesure par seconde
+LAT_STEP = SPEED / 111195.0 # ~10 m vers le nord
+
+
+def make_lines(nb: int = 100) -> list[Reading]:
+    t0 = datetime(2024, 6, 1, 12, 0, 0)
+    lines = []
+    for i in range(nb):
+        r = Reading(202)
+        r.file_idx = i + 1
+        r.cellid = CELL_A if i < nb // 2 else CELL_B
+        r.pci, r.band, r.tac = 17, 3, 1234
+        r.speed = SPEED
+        r.fwd_azimuth, r.bwd_azimuth = 0.0, 180.0
+        r.reading_time = t0 + timedelta(seconds=i)
+        r.latitude = 46.2 + i * LAT_STEP
+        r.longitude = 6.1
+        lines.append(r)
+    return lines
+
+
+class TestParamGrid(unittest.TestCase):
+
+    def test_combinations(self):
+        grid = param_grid(dist_min=[30, 50, 70], reaction_time=[2, 3])
+        self.assertEqual(len(grid), 6)
+        self.assertEqual([(p.dist_min, p.reaction_time) for p in grid],
+                         [(30, 2), (30, 3), (50, 2), (50, 3), (70, 2), (70, 3)])
+        # les autres paramètres gardent leur valeur par défaut
+        self.assertTrue(all(p.turn_angle == DEFAULT_CLARIFY.turn_angle for p in grid))
+        self.assertIn(DEFAULT_CLARIFY, grid)
+
+    def test_empty(self):
+        self.assertEqual(param_grid(), [DEFAULT_CLARIFY])
+        self.assertEqual(param_grid(dist_min=[]), [])
+
+
+class TestTrackMetrics(unittest.TestCase):
+
+    def test_spacing(self):
+        track = (np.array([1, 2, 4]), np.array([0.0, 30.0, 30.0]), np.array([0.0, 0.0, 40.0]))
+        metrics = track_metrics(track)
+        self.assertEqual(metrics['points'], 3)
+        self.assertAlmostEqual(metrics['spacing_mean'], 35.0)
+        self.assertAlmostEqual(metrics['spacing_max'], 40.0)
+        self.assertAlmostEqual(metrics['spacing_p95'], 39.5)
+        self.assertNotIn('points_ratio', metrics)
+
+    def test_reference(self):
+        track = (np.array([1, 3, 5]), np.array([0.0, 10.0, 20.0]), np.array([0.0, 0.0, 0.0]))
+        reference = (np.array([1, 2, 3, 4]), np.array([0.0, 5.0, 13.0, 15.0]), np.array([4.0, 0.0, 4.0, 0.0]))
+        metrics = track_metrics(track, reference)
+        self.assertAlmostEqual(metrics['points_ratio'], 0.75)
+        # points communs : file_idx 1 (décalé de 4 m) et 3 (décalé de 5 m)
+        self.assertAlmostEqual(metrics['shift_mean'], 4.5)
+
+    def test_single_point(self):
+        metrics = track_metrics((np.array([1]), np.array([0.0]), np.array([0.0])))
+        self.assertEqual((metrics['points'], metrics['spacing_mean'], metrics['spacing_max']), (1, 0.0, 0.0))
+
+
+class TestRunParams(unittest.TestCase):
+
+    def setUp(self):
+        self.columns = readings_to_columns(make_lines())
+        return super().setUp()
+
+    def test_keep_points_and_spacing(self):
+        file_idx, x, y = run_params(self.columns, DEFAULT_CLARIFY)
+        # premier, dernier et les deux côtés du handover
+        self.assertTrue({1, 50, 51, 100} <= set(file_idx.tolist()))
+        self.assertTrue((np.diff(file_idx) > 0).all())
+        # dist_min + vitesse * dist_per_speed = 150 m entre deux points hors handover
+        spacing = np.hypot(np.diff(x), np.diff(y))[:3]
+        self.assertTrue((spacing >= 150).all() and (spacing < 170).all())
+
+    def test_larger_distance_keeps_fewer_points(self):
+        points = [len(run_params(self.columns, p)[0]) for p in param_grid(dist_min=[0, 100, 400])]
+        self.assertGreater(points[0], points[1])
+        self.assertGreater(points[1], points[2])
+
+    def test_reaction_time_moves_points_back(self):
+        without = run_params(self.columns, replace(DEFAULT_CLARIFY, reaction_time=0))
+        with_3s = run_params(self.columns, replace(DEFAULT_CLARIFY, reaction_time=3))
+        np.testing.assert_array_equal(without[0], with_3s[0])
+        # recul de vitesse * temps de réaction vers le sud
+        self.assertAlmostEqual(track_metrics(with_3s, without)['shift_mean'], SPEED * 3, places=1)
+        self.assertTrue((with_3s[2] < without[2]).all())
+
+
+class TestParameterSweep(unittest.TestCase):
+
+    def test_sweep_reads_fused_cache(self):
+        with tempfile.TemporaryDirectory() as root, mock.patch.dict(os.environ, {'LTE_LAKE_DIR': root}):
+            # l'import écrit la fusion avant clarify
+            argument = SimpleNamespace(network_id=1, survey_id=202, save_to_lake=True)
+            Helper().save_fused_cache(make_lines(), argument)
+
+            sweep = ParameterSweep(SurveyLake(Path(root)), workers=1)
+            self.assertEqual(sweep.surveys(), [(1, 202)])
+            grid = param_grid(dist_min=[30, 100])
+            rows = sweep.run(sweep.surveys(), grid)
+
+        self.assertEqual(len(rows), 3) # la référence et les deux jeux de paramètres
+        reference = rows[0]
+        self.assertEqual((reference['dist_min'], reference['points_ratio'], reference['shift_mean']), (50, 1.0, 0.0))
+        self.assertEqual(reference['points'], len(run_params(readings_to_columns(make_lines()), DEFAULT_CLARIFY)[0]))
+        summary = summarize(rows)
+        self.assertEqual([r['dist_min'] for r in summary], [100, 50, 30])
+        self.assertEqual(SWEEP_DATASET, 'fused')
+
+
+def main():
+    unittest.main(verbosity=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+from datetime import datetime
+import unittest
+
+from sqlalchemy import create_engine, inspect, text
+
+from corelte.orm.sync import READING_KEY_INDEX, diff_readings, reading_values, same_reading, upgrade_reading_key
+from corelte.reading import Reading
+
+
+def values(file_idx: int, **changes) -> dict:
+    r = Reading(202)
+    r.file_idx = file_idx
+    r.cellid, r.pci, r.band, r.tac = 17063937, 17, 3, 1234
+    r.fwd_azimuth, r.speed = 45.0, 12.5
+    r.reading_time = datetime(2024, 6, 1, 12, 0, file_idx)
+    r.latitude, r.longitude = 46.2 + file_idx * 1e-4, 6.1
+    return {**reading_values(r), **changes}
+
+
+class TestDiffReadings(unittest.TestCase):
+
+    def test_insert_update_delete_unchanged(self):
+        stored = {1: (101, values(1)), 2: (102, values(2)), 3: (103, values(3))}
+        new = {1: values(1), 2: values(2, cell_id=17063938), 4: values(4)}
+        diff = diff_readings(stored, new)
+        self.assertEqual(diff.unchanged, 1)
+        self.assertEqual(diff.inserts, [{'file_idx': 4, **values(4)}])
+        self.assertEqual(diff.updates, [{'id': 102, 'file_idx': 2, **values(2, cell_id=17063938)}])
+        self.assertEqual(diff.deletes, [103])
+
+    def test_empty(self):
+        diff = diff_readings({}, {1: values(1)})
+        self.assertEqual((len(diff.inserts), diff.updates, diff.deletes, diff.unchanged), (1, [], [], 0))
+        diff = diff_readings({1: (101, values(1))}, {})
+        self.assertEqual((diff.inserts, diff.updates, diff.deletes, diff.unchanged), ([], [], [101], 0))
+
+    def test_float_tolerance(self):
+        # REAL (float4) : la valeur relue diffère de la valeur écrite
+        stored = values(1, speed=12.500000476837158, fwd_azimuth=45.00000190734863, latitude=46.20010000001)
+        self.assertTrue(same_reading(stored, values(1)))
+        self.assertFalse(same_reading(values(1, speed=12.6), values(1)))
+        self.assertFalse(same_reading(values(1, latitude=46.2002), values(1)))
+        self.assertEqual(diff_readings({1: (101, stored)}, {1: values(1)}).unchanged, 1)
+
+    def test_exact_fields(self):
+        self.assertFalse(same_reading(values(1, pci=18), values(1)))
+        self.assertFalse(same_reading(values(1, reading_time=datetime(2024, 6, 1, 12, 0, 2)), values(1)))
+
+    def test_none_fields(self):
+        self.assertTrue(same_reading(values(1, pci=None), values(1, pci=None)))
+        self.assertFalse(same_reading(values(1, pci=None), values(1)))
+        self.assertFalse(same_reading(values(1), values(1, speed=None)))
+        diff = diff_readings({1: (101, values(1, pci=None))}, {1: values(1)})
+        self.assertEqual([u['id'] for u in diff.updates], [101])
+
+
+class TestUpgradeReadingKey(unittest.TestCase):
+
+    def setUp(self):
+        # table reading d'une base créée avant l'import incrémental (sans l'index unique)
+        self.engine = create_engine('sqlite://')
+        with self.engine.begin() as conn:
+            conn.execute(text("CREATE TABLE reading (id INTEGER PRIMARY KEY, network_id INTEGER, "
+                              "survey_id INTEGER, file_idx INTEGER)"))
+        return super().setUp()
+
+    def insert(self, *keys) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(text("INSERT INTO reading (network_id, survey_id, file_idx) VALUES (:n, :s, :f)"),
+                         [{'n': n, 's': s, 'f': f} for n, s, f in keys])
+
+    def indexes(self) -> list:
+        return [ix['name'] for ix in inspect(self.engine).get_indexes('reading')]
+
+    def test_index_created_once(self):
+        self.insert((1, 202, 1), (1, 202, 2), (1, 203, 1))
+        self.assertTrue(upgrade_reading_key(self.engine))
+        self.assertIn(READING_KEY_INDEX, self.indexes())
+        self.assertFalse(upgrade_reading_key(self.engine))
+
+    def test_duplicates_reported(self):
+        self.insert((1, 202, 1), (1, 202, 1), (1, 203, 1), (2, 7, 5), (2, 7, 5))
+        with self.assertRaisesRegex(ValueError, '1/202, 2/7'):
+            upgrade_reading_key(self.engine)
+        self.assertNotIn(READING_KEY_INDEX, self.indexes())
+
+    def test_missing_table(self):
+        self.assertFalse(upgrade_reading_key(create_engine('sqlite://')))
+
+
+def main():
+    unittest.main(verbosity=2)
+
+
+if __name__ == "__main__":
+    main()
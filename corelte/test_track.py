@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+import random
+import tempfile
+from types import SimpleNamespace
+import unittest
+
+from corelte.track import Track
+
+SURVEY_ID = 202
+
+
+def write_gpx(filename: Path, nb: int, seed: int = 50) -> None:
+    """GPX of a drive with gaps of 1 to 5 seconds and an invalid point."""
+    rng = random.Random(seed)
+    t = datetime(2024, 5, 1, 8, 0, 0)
+    lat, lon = 46.5, 6.6
+    points = []
+    for _ in range(nb):
+        t += timedelta(seconds=rng.choice((1, 1, 2, 5)))
+        lat += 3e-4 * rng.random()
+        lon += 3e-4 * rng.random()
+        points.append(f'<trkpt lat="{lat:.6f}" lon="{lon:.6f}"><ele>400</ele><time>{t.isoformat()}Z</time></trkpt>')
+    points.insert(10, '<trkpt lat="1" lon="2"></trkpt>')
+    filename.write_text('<?xml version="1.0"?><gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1">'
+                        '<trk><trkseg>' + ''.join(points) + '</trkseg></trk></gpx>')
+
+
+def fields_of(lines) -> list[tuple]:
+    return [(r.reading_time, r.latitude, r.longitude, r.speed, r.fwd_azimuth, r.bwd_azimuth, r.fwd_distance,
+             r.calculated) for r in lines]
+
+
+class TestIterLinesGps(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.argument = SimpleNamespace(survey_id=SURVEY_ID, gps_filename=Path(self.tmp.name) / 'survey.gpx')
+        return super().setUp()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        return super().tearDown()
+
+    def batch(self) -> Track:
+        track = Track(self.argument)
+        track.read_gpx_file_into_lines_gps()
+        track.extend_gps_records_to_every_second()
+        track.calculate_speed_and_direction()
+        return track
+
+    def test_same_track_as_list_methods(self):
+        for nb in (1, 2, 300):
+            with self.subTest(nb=nb):
+                write_gpx(self.argument.gps_filename, nb)
+                batch = self.batch()
+                track = Track(self.argument)
+                self.assertEqual(fields_of(track.iter_lines_gps()), fields_of(batch.lines_gps))
+                self.assertEqual(track.cursor.__dict__, batch.cursor.__dict__)
+
+    def test_cursor_set_after_first_point(self):
+        write_gpx(self.argument.gps_filename, 20)
+        track = Track(self.argument)
+        lines = track.iter_lines_gps()
+        first = next(lines)
+        self.assertEqual(track.cursor.first_non_null_idx, 0)
+        self.assertEqual(track.cursor.first_non_null_reading_time, first.reading_time)
+
+    def test_errors_raised_when_read(self):
+        self.argument.gps_filename.write_text('<gpx><trk><trkseg></trkseg></trk></gpx>')
+        lines = Track(self.argument).iter_lines_gps()
+        with self.assertRaises(ValueError):
+            list(lines)
+
+
+def main():
+    unittest.main(verbosity=2)
+
+
+if __name__ == "__main__":
+    main()
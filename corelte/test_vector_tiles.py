@@ -0,0 +1,32 @@
+import unittest
+
+from corelte.vector_tiles import pyramid, tile_bounds_3857
+
+
+class TestTilePyramid(unittest.TestCase):
+
+    def test_parents_of_data_tiles_only(self):
+        # deux tuiles voisines au zoom 16 et une tuile isolée
+        tiles = list(pyramid([(34000, 23000), (34001, 23000), (34100, 23100)], maxzoom=16, minzoom=14))
+        self.assertEqual([t for t in tiles if t[0] == 16], [(16, 34000, 23000), (16, 34001, 23000), (16, 34100, 23100)])
+        self.assertEqual([t for t in tiles if t[0] == 15], [(15, 17000, 11500), (15, 17050, 11550)])
+        self.assertEqual([t for t in tiles if t[0] == 14], [(14, 8500, 5750), (14, 8525, 5775)])
+
+    def test_parent_contains_child(self):
+        # centre de la tuile de données
+        bx0, by0, bx1, by1 = tile_bounds_3857(16, 34001, 23001)
+        cx, cy = (bx0 + bx1) / 2, (by0 + by1) / 2
+        for z, x, y in pyramid([(34001, 23001)], maxzoom=16, minzoom=8):
+            xmin, ymin, xmax, ymax = tile_bounds_3857(z, x, y)
+            self.assertTrue(xmin <= cx < xmax and ymin <= cy < ymax)
+
+    def test_empty(self):
+        self.assertEqual(list(pyramid([], maxzoom=16, minzoom=8)), [])
+
+
+def main():
+    unittest.main(verbosity=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,12 @@
 """Module for handling GPS track data and processing."""
 
 from datetime import datetime
-from typing import List, Optional
-from xml.dom import minidom
-from xml.dom.minidom import Element
+from typing import Iterable, Iterator, List, Optional
+from xml.etree import ElementTree
 
 from .argument import Argument
+from .cache import ReadingsCacheWriter, decode_time, encode_readings, encode_time, file_signature, iter_decode_readings, \
+    load_npz, save_npz
 from .cursor import Cursor
 from .datetime_local import convert_utc_to_local
 from .reading import Reading
@@ -31,60 +32,81 @@ class Track:
             xml.parsers.expat.ExpatError: If GPX file is malformed
             ValueError: If required GPS data is missing or invalid
         """
+        self.lines_gps = list(self.iter_gpx_points())
+        print(f"Successfully processed {len(self.lines_gps)} GPS points")
+
+    def iter_gpx_points(self) -> Iterator[Reading]:
+        """Stream the GPS readings of the GPX file, one track point at a time.
+
+        The file is parsed incrementally and each point is released once read,
+        so memory does not grow with the length of the track. The cursor is set
+        on the first valid reading.
+
+        Raises:
+            FileNotFoundError: If GPX file doesn't exist
+            ValueError: If the file is malformed or has no valid track point
+        """
+        nb_points = 0
+        nb_valid = 0
         try:
             # Parse GPX file
-            gpx_doc = minidom.parse(str(self.argument.gps_filename))
-            track_points = gpx_doc.getElementsByTagName('trkpt')
-            
-            if not track_points:
-                raise ValueError("No track points found in GPX file")
-            
-            # Process each track point
-            for point in track_points:
+            parents = []
+            for event, point in ElementTree.iterparse(str(self.argument.gps_filename), events=('start', 'end')):
+                if event == 'start':
+                    parents.append(point)
+                    continue
+                parents.pop()
+                if _local_name(point.tag) != 'trkpt':
+                    continue
+                nb_points += 1
                 reading = self._process_track_point(point)
+                # libère le point lu : l'arbre XML ne grandit pas avec la trace
+                parents[-1].remove(point)
                 if reading:
-                    self.lines_gps.append(reading)
-            
-            if not self.lines_gps:
-                raise ValueError("No valid GPS readings could be extracted")
-            
-            # Set cursor to first valid reading
-            self._initialize_cursor()
-            
-            print(f"Successfully processed {len(self.lines_gps)} GPS points")
-            
+                    if nb_valid == 0:
+                        # Set cursor to first valid reading
+                        self._initialize_cursor(reading)
+                    nb_valid += 1
+                    yield reading
+
         except FileNotFoundError:
             raise FileNotFoundError(f"GPX file not found: {self.argument.gps_filename}")
-        except Exception as e:
+        except ElementTree.ParseError as e:
             raise ValueError(f"Failed to process GPX file: {str(e)}") from e
 
+        if nb_points == 0:
+            raise ValueError("Failed to process GPX file: No track points found in GPX file")
+        if nb_valid == 0:
+            raise ValueError("Failed to process GPX file: No valid GPS readings could be extracted")
+
     def extend_gps_records_to_every_second(self) -> None:
         """Interpolate GPS points to ensure one reading per second.
         
         This method fills gaps between GPS readings by linear interpolation.
         """
-        if not self.lines_gps:
-            return
-            
-        new_lines: List[Reading] = []
-        
-        for idx in range(len(self.lines_gps) - 1):
-            r1 = self.lines_gps[idx]
-            r2 = self.lines_gps[idx + 1]
-            
-            # Add original point
-            new_lines.append(r1)
-            
-            # Calculate time difference and interpolate if needed
-            time_diff = (r2.reading_time - r1.reading_time).seconds
-            if time_diff > 1:
-                new_lines.extend(self._interpolate_points(r1, r2, time_diff))
-        
+        self.lines_gps = list(self.iter_every_second(self.lines_gps))
+
+    def iter_every_second(self, points: Iterable[Reading]) -> Iterator[Reading]:
+        """Stream version of extend_gps_records_to_every_second.
+
+        Args:
+            points: GPS readings in time order (can be a generator)
+        """
+        r1 = None
+        for r2 in points:
+            if r1 is not None:
+                # Add original point
+                yield r1
+
+                # Calculate time difference and interpolate if needed
+                time_diff = (r2.reading_time - r1.reading_time).seconds
+                if time_diff > 1:
+                    yield from self._interpolate_points(r1, r2, time_diff)
+            r1 = r2
+
         # Add last point
-        if self.lines_gps:
-            new_lines.append(self.lines_gps[-1])
-            
-        self.lines_gps = new_lines
+        if r1 is not None:
+            yield r1
 
     def calculate_speed_and_direction(self) -> None:
         """Calculate speed and direction for each GPS point.
@@ -92,15 +114,79 @@ class Track:
         This method updates each reading with calculated speed and azimuth
         based on the next point in the sequence.
         """
-        if len(self.lines_gps) < 2:
-            return
-            
-        for idx in range(len(self.lines_gps) - 1):
-            r1 = self.lines_gps[idx]
-            r2 = self.lines_gps[idx + 1]
-            r1.calculate_azimuth_and_speed(r2)
+        for _ in self.iter_speed_and_direction(self.lines_gps):
+            pass
+
+    def iter_speed_and_direction(self, points: Iterable[Reading]) -> Iterator[Reading]:
+        """Stream version of calculate_speed_and_direction: each point is yielded once the next one is known.
+
+        Args:
+            points: GPS readings in time order (can be a generator)
+        """
+        r1 = None
+        for r2 in points:
+            if r1 is not None:
+                r1.calculate_azimuth_and_speed(r2)
+                yield r1
+            r1 = r2
+        if r1 is not None:
+            yield r1
+
+    def iter_lines_gps(self) -> Iterator[Reading]:
+        """Processed track as a stream: GPX points, resampled to every second, with speed and direction."""
+        return self.iter_speed_and_direction(self.iter_every_second(self.iter_gpx_points()))
+
+    def cache_params(self) -> dict:
+        """Parameters the processed track depends on (see corelte.cache)."""
+        return {'step': 'track', 'survey_id': self.argument.survey_id,
+                'sources': file_signature(self.argument.gps_filename)}
+
+    def cache_extra(self) -> dict:
+        """Cursor of the track, stored with its cache."""
+        return {'first_non_null_idx': self.cursor.first_non_null_idx,
+                'first_non_null_reading_time': encode_time(self.cursor.first_non_null_reading_time)}
+
+    def save_cache(self) -> None:
+        """Save the processed track (resampled, with speed and azimuth) to tmp_gps_cache_filename."""
+        save_npz(self.argument.tmp_gps_cache_filename, encode_readings(self.lines_gps), self.cache_params(),
+                 self.cache_extra())
+
+    def cache_writer(self) -> ReadingsCacheWriter:
+        """Cache of the streamed track (see iter_lines_gps), saved with save(track.cache_extra())."""
+        return ReadingsCacheWriter(self.argument.tmp_gps_cache_filename, self.cache_params())
 
-    def _process_track_point(self, point: Element) -> Optional[Reading]:
+    def open_cache(self) -> Optional[Iterator[Reading]]:
+        """Stream the processed track from tmp_gps_cache_filename if the GPX file has not changed.
+
+        The cursor is set from the cache.
+
+        Returns:
+            The track points, None if the track has to be processed again
+        """
+        if not self.argument.use_cache:
+            return None
+        cached = load_npz(self.argument.tmp_gps_cache_filename, self.cache_params())
+        if cached is None:
+            return None
+        columns, extra = cached
+        self.cursor.first_non_null_idx = extra['first_non_null_idx']
+        self.cursor.first_non_null_reading_time = decode_time(extra['first_non_null_reading_time'])
+        print(f"Track chargée depuis le cache: {len(columns['cell_id'])} points")
+        return iter_decode_readings(columns, self.argument.survey_id)
+
+    def load_cache(self) -> bool:
+        """Load the processed track from tmp_gps_cache_filename if the GPX file has not changed.
+
+        Returns:
+            True if the track was loaded, False if it has to be processed again
+        """
+        lines = self.open_cache()
+        if lines is None:
+            return False
+        self.lines_gps = list(lines)
+        return True
+
+    def _process_track_point(self, point: ElementTree.Element) -> Optional[Reading]:
         """Process a single track point from GPX data.
         
         Args:
@@ -113,17 +199,17 @@ class Track:
             reading = Reading(self.argument.survey_id)
             
             # Extract and convert time
-            time_elements = point.getElementsByTagName('time')
-            if not time_elements:
+            time_elements = [e for e in point if _local_name(e.tag) == 'time']
+            if not time_elements or not time_elements[0].text:
                 return None
                 
-            time_str = time_elements[0].firstChild.data
+            time_str = time_elements[0].text
             reading.set_datetime_naive_from_str(time_str)
             reading.reading_time = convert_utc_to_local(reading.reading_time).replace(tzinfo=None)
             
             # Extract coordinates
-            reading.set_latitude_from_str(point.attributes['lat'].value)
-            reading.set_longitude_from_str(point.attributes['lon'].value)
+            reading.set_latitude_from_str(point.attrib['lat'])
+            reading.set_longitude_from_str(point.attrib['lon'])
             
             return reading if reading.latitude and reading.longitude else None
             
@@ -150,9 +236,12 @@ class Track:
             
         return interpolated
 
-    def _initialize_cursor(self) -> None:
+    def _initialize_cursor(self, first: Reading) -> None:
         """Initialize cursor with first valid GPS reading."""
-        if self.lines_gps:
-            self.cursor.first_non_null_idx = 0
-            self.cursor.first_non_null_reading_time = self.lines_gps[0].reading_time
+        self.cursor.first_non_null_idx = 0
+        self.cursor.first_non_null_reading_time = first.reading_time
+
 
+def _local_name(tag: str) -> str:
+    # balise sans l'espace de noms GPX ('{http://www.topografix.com/GPX/1/1}trkpt' -> 'trkpt')
+    return tag.rsplit('}', 1)[-1]
@@ -0,0 +1,242 @@
+"""Mapbox Vector Tile pyramid of readings, cells and sectors in an MBTiles file."""
+
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+import json
+from pathlib import Path
+import sqlite3
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import func, select, text
+from sqlalchemy.engine import Engine
+
+from corelte.orm.backend import capabilities
+from corelte.orm.models import Reading_orm
+
+# Demi-circonférence de la projection Web Mercator (EPSG:3857)
+MERCATOR_HALF = 20037508.342789244
+EXTENT = 4096
+BUFFER = 64
+
+Tile = Tuple[int, int, int] # z, x, y (schéma XYZ)
+Bounds = Tuple[float, float, float, float] # lon_min, lat_min, lon_max, lat_max
+
+TILE_SQL = """
+WITH bounds AS (
+    SELECT ST_MakeEnvelope(:xmin, :ymin, :xmax, :ymax, 3857) AS geom,
+           ST_Transform(ST_MakeEnvelope(:xmin, :ymin, :xmax, :ymax, 3857), 4326) AS geom4326
+),
+readings AS (
+    SELECT DISTINCT ON (ST_SnapToGrid(ST_Transform(r.geom, 3857), :grid), r.cell_id)
+           ST_AsMVTGeom(ST_Transform(r.geom, 3857), bounds.geom, {extent}, {buffer}, true) AS geom,
+           r.cell_id, r.band, r.pci, r.tac, r.survey_id, r.speed,
+           to_char(r.reading_time, 'YYYY-MM-DD"T"HH24:MI:SS') AS reading_time
+    FROM reading r, bounds
+    WHERE r.network_id = :network_id AND r.geom && bounds.geom4326
+),
+cells AS (
+    SELECT ST_AsMVTGeom(ST_Transform(c.geom, 3857), bounds.geom, {extent}, {buffer}, true) AS geom,
+           c.cell_id, c.tac
+    FROM cell c, bounds
+    WHERE c.network_id = :network_id AND c.geom && bounds.geom4326
+),
+sectors AS (
+    SELECT ST_AsMVTGeom(ST_Transform(s.geom, 3857), bounds.geom, {extent}, {buffer}, true) AS geom,
+           s.cell_id, s.station_name
+    FROM sector s, bounds
+    WHERE s.network_id = :network_id AND s.geom && bounds.geom4326
+)
+SELECT coalesce((SELECT ST_AsMVT(readings, 'readings', {extent}, 'geom') FROM readings WHERE geom IS NOT NULL), '')
+    || coalesce((SELECT ST_AsMVT(cells, 'cells', {extent}, 'geom') FROM cells WHERE geom IS NOT NULL), '')
+    || coalesce((SELECT ST_AsMVT(sectors, 'sectors', {extent}, 'geom') FROM sectors WHERE geom IS NOT NULL), '')
+""".format(extent=EXTENT, buffer=BUFFER)
+
+VECTOR_LAYERS = [
+    {'id': 'readings', 'fields': {'cell_id': 'Number', 'band': 'Number', 'pci': 'Number', 'tac': 'Number',
+                                  'survey_id': 'Number', 'speed': 'Number', 'reading_time': 'String'}},
+    {'id': 'cells', 'fields': {'cell_id': 'Number', 'tac': 'Number'}},
+    {'id': 'sectors', 'fields': {'cell_id': 'Number', 'station_name': 'String'}},
+]
+
+
+def tile_bounds_3857(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """Return the Web Mercator bounds (xmin, ymin, xmax, ymax) of a tile."""
+    size = 2 * MERCATOR_HALF / 2 ** z
+    xmin = -MERCATOR_HALF + x * size
+    ymax = MERCATOR_HALF - y * size
+    return xmin, ymax - size, xmin + size, ymax
+
+
+def pyramid(tiles: Iterable[Tuple[int, int]], maxzoom: int, minzoom: int) -> Iterator[Tile]:
+    """Expand the tiles (x, y) of maxzoom to their parents down to minzoom."""
+    level = set(tiles)
+    for z in range(maxzoom, minzoom - 1, -1):
+        for x, y in sorted(level):
+            yield z, x, y
+        # la tuile parente couvre les 2x2 tuiles du niveau suivant
+        level = {(x >> 1, y >> 1) for x, y in level}
+
+
+class MBTilesWriter:
+    """Minimal MBTiles 1.3 writer (gzip-compressed pbf tiles)."""
+
+    def __init__(self, filename: Path) -> None:
+        self.conn = sqlite3.connect(str(filename))
+        self.conn.execute("CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS tiles (zoom_level INTEGER, tile_column INTEGER, "
+                          "tile_row INTEGER, tile_data BLOB)")
+        self.conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS tile_index ON tiles (zoom_level, tile_column, tile_row)")
+
+    def set_metadata(self, name: str, minzoom: int, maxzoom: int, bounds: Bounds) -> None:
+        values = {
+            'name': name, 'format': 'pbf', 'type': 'overlay', 'version': '1',
+            'minzoom': str(minzoom), 'maxzoom': str(maxzoom),
+            'bounds': ','.join(f'{v:.6f}' for v in bounds),
+            'json': json.dumps({'vector_layers': VECTOR_LAYERS}),
+        }
+        self.conn.executemany("INSERT OR REPLACE INTO metadata (name, value) VALUES (?, ?)", values.items())
+
+    def put(self, z: int, x: int, y: int, data: Optional[bytes]) -> None:
+        """Store a tile (MBTiles rows follow the TMS scheme); an empty tile is deleted."""
+        tms_y = 2 ** z - 1 - y
+        if not data:
+            self.conn.execute("DELETE FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?", (z, x, tms_y))
+            return
+        self.conn.execute("INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?)", (z, x, tms_y, gzip.compress(data)))
+
+    def commit(self) -> None:
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.commit()
+        self.conn.close()
+
+
+class VectorTileExporter:
+    """Builds the MVT pyramid of a network with PostGIS ST_AsMVT.
+
+    At low zooms the readings are thinned to one per cell and grid square of
+    thin_pixels pixels; from full_detail_zoom on every reading is kept. Tiles
+    are rendered in parallel by the database, the MBTiles file is written by
+    the calling thread.
+
+    Example:
+        exporter = VectorTileExporter(db_engines.main, network_id=1, filename='lte_net_01.mbtiles')
+        exporter.export_all()
+        exporter.update_surveys([202, 203])  # only the tiles touched by new surveys
+    """
+
+    def __init__(self, engine: Engine, network_id: int, filename: Path, minzoom: int = 8, maxzoom: int = 16,
+                 full_detail_zoom: int = 15, thin_pixels: int = 16, workers: int = 4) -> None:
+        """Initialize the exporter.
+
+        Args:
+            engine: Engine of a PostGIS database
+            network_id: Network identifier
+            filename: MBTiles file to create or update
+            minzoom, maxzoom: Zoom levels of the pyramid
+            full_detail_zoom: First zoom level without thinning
+            thin_pixels: Size in pixels of the thinning grid
+            workers: Number of tiles rendered concurrently
+        """
+        if not capabilities(engine).mvt:
+            raise RuntimeError("Vector tile export requires PostGIS >= 2.4 (ST_AsMVT)")
+        self.engine = engine
+        self.network_id = network_id
+        self.filename = Path(filename)
+        self.minzoom = minzoom
+        self.maxzoom = maxzoom
+        self.full_detail_zoom = full_detail_zoom
+        self.thin_pixels = thin_pixels
+        self.workers = workers
+
+    def _grid(self, z: int) -> float:
+        if z >= self.full_detail_zoom:
+            return 0.01 # pas d'éclaircissement (1 cm)
+        # taille en mètres de thin_pixels pixels écran (tuiles de 256 px)
+        return 2 * MERCATOR_HALF / 2 ** z / 256 * self.thin_pixels
+
+    def render_tile(self, tile: Tile) -> Tuple[Tile, bytes]:
+        """Render one tile with the database."""
+        z, x, y = tile
+        xmin, ymin, xmax, ymax = tile_bounds_3857(z, x, y)
+        params = {'xmin': xmin, 'ymin': ymin, 'xmax': xmax, 'ymax': ymax,
+                  'grid': self._grid(z), 'network_id': self.network_id}
+        with self.engine.connect() as conn:
+            data = conn.execute(text(TILE_SQL), params).scalar()
+        return tile, bytes(data) if data else b''
+
+    def bounds(self, survey_ids: Optional[List[int]] = None) -> Optional[Bounds]:
+        """WGS84 bounding box of the readings of the network, or of some surveys."""
+        stmt = select(func.ST_XMin(func.ST_Extent(Reading_orm.geom)), func.ST_YMin(func.ST_Extent(Reading_orm.geom)),
+                      func.ST_XMax(func.ST_Extent(Reading_orm.geom)), func.ST_YMax(func.ST_Extent(Reading_orm.geom))) \
+            .where(Reading_orm.network_id == self.network_id)
+        if survey_ids is not None:
+            stmt = stmt.where(Reading_orm.survey_id.in_(survey_ids))
+        with self.engine.connect() as conn:
+            row = conn.execute(stmt).one()
+        return None if row[0] is None else tuple(float(v) for v in row)
+
+    def tiles(self, survey_ids: Optional[List[int]] = None) -> List[Tile]:
+        """Tiles containing readings of the network, or of some surveys, at every zoom.
+
+        The tiles of maxzoom are computed by the database from the reading
+        positions; those of the lower zooms are their parents. Tiles with cells
+        or sectors only are not rendered.
+        """
+        n = 2 ** self.maxzoom
+        size = 2 * MERCATOR_HALF / n
+        merc = func.ST_Transform(Reading_orm.geom, 3857)
+        x = func.least(func.greatest(func.floor((func.ST_X(merc) + MERCATOR_HALF) / size), 0), n - 1)
+        y = func.least(func.greatest(func.floor((MERCATOR_HALF - func.ST_Y(merc)) / size), 0), n - 1)
+        stmt = select(x, y).distinct().where(Reading_orm.network_id == self.network_id)
+        if survey_ids is not None:
+            stmt = stmt.where(Reading_orm.survey_id.in_(survey_ids))
+        with self.engine.connect() as conn:
+            rows = conn.execute(stmt).all()
+        return list(pyramid(((int(x), int(y)) for x, y in rows), self.maxzoom, self.minzoom))
+
+    def export(self, tiles: Iterable[Tile], writer: MBTilesWriter, commit_every: int = 500) -> int:
+        """Render tiles in parallel and store them."""
+        nb = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for (z, x, y), data in pool.map(self.render_tile, tiles):
+                writer.put(z, x, y, data)
+                nb += 1
+                if nb % commit_every == 0:
+                    writer.commit()
+        writer.commit()
+        return nb
+
+    def export_all(self) -> int:
+        """Build the whole pyramid of the network.
+
+        Returns:
+            Number of tiles rendered
+        """
+        bounds = self.bounds()
+        if bounds is None:
+            return 0
+        writer = MBTilesWriter(self.filename)
+        try:
+            writer.set_metadata(f'LTE network {self.network_id}', self.minzoom, self.maxzoom, bounds)
+            return self.export(self.tiles(), writer)
+        finally:
+            writer.close()
+
+    def update_surveys(self, survey_ids: List[int]) -> int:
+        """Regenerate only the tiles containing readings of the given (newly imported) surveys.
+
+        Returns:
+            Number of tiles rendered
+        """
+        bounds = self.bounds(survey_ids)
+        if bounds is None:
+            return 0
+        writer = MBTilesWriter(self.filename)
+        try:
+            full = self.bounds()
+            writer.set_metadata(f'LTE network {self.network_id}', self.minzoom, self.maxzoom, full)
+            return self.export(self.tiles(survey_ids), writer)
+        finally:
+            writer.close()
@@ -1,9 +1,9 @@
 from qgis.core import QgsExpression, QgsFeatureRequest
 from qgis.gui import QgsMapToolIdentifyFeature
 
-from sqlalchemy import select
-from corelte.orm.db import get_db_session
-from corelte.orm.models import Sector
+from corelte.orm.backend import capabilities
+from corelte.orm.db import db_engines, get_db_session
+from corelte.orm.sectors import ENODEB_SHIFT, NB_SECTORS_DEFAULT, sector_splits
 
 
 
@@ -12,13 +12,12 @@ layer = iface.activeLayer()
 
 
 
-NB_SECTORS_DEFAULT = 3
-
+# Sites observés sur le terrain sans Sector.sector_split en base : eNodeB id -> nombre de secteurs
 sectors_exceptions = {
-    17063938 : 2,
-    18756609 : 2,
-    18941698 : 4,
-    18354947 : 2
+    17063938 >> ENODEB_SHIFT : 2,
+    18756609 >> ENODEB_SHIFT : 2,
+    18941698 >> ENODEB_SHIFT : 4,
+    18354947 >> ENODEB_SHIFT : 2
 }
 
 
@@ -35,26 +34,21 @@ class FilterTool(QgsMapToolIdentifyFeature):
         super().__init__(iface.mapCanvas())
     
 
-    def identify_nbSectors(self, cell_id : int):
-        """L'identification des secteurs s'observe sur le terrain et un des cell_id est ajouté aux exceptions"""
-        result = NB_SECTORS_DEFAULT
-        for key, value in sectors_exceptions.items():
-            if abs(cell_id - key) < 100: 
-                result = value
-        return result
-
-    def identify_nbSectors_in_table_sector(self, net_id: int, cell_id: int):
-        """La gestion du nombre de secteur se fait à l'aide du champ Sector.sector_split """
-        stmt = select(Sector) \
-            .where(Sector.network_id == net_id) \
-            .where(cell_id - 100 <= Sector.cell_id <= cell_id + 100)
-        
-        with get_db_session as session:
-            sector: Sector = session.execute(stmt).scalars.one()
-            if sector: 
-                return sector.sector_split
-            return NB_SECTORS_DEFAULT
+    def identify_nbSectors(self, net_id: int, cell_id: int):
+        """La gestion du nombre de secteurs se fait à l'aide du champ Sector.sector_split (lu une fois par réseau)"""
+        if not sector_splits.loaded(net_id):
+            self.refresh_sectors(net_id)
+        enodeb_id = cell_id >> ENODEB_SHIFT
+        return sector_splits.get(None, net_id, enodeb_id, sectors_exceptions.get(enodeb_id, NB_SECTORS_DEFAULT))
+
+    def refresh_sectors(self, net_id: int):
+        """Recharge le cache des secteurs du réseau (à appeler après une modification hors base notifiée)"""
+        with get_db_session() as session:
+            sector_splits.load(session, net_id)
 
+    def enodeb_expression(self) -> str:
+        """Filtre d'égalité sur la colonne indexée enodeb_id"""
+        return f'"network_id" = {self.network_id} AND "enodeb_id" = {self.cell_id >> ENODEB_SHIFT}'
 
     def canvasReleaseEvent(self, event):
         # Identify the feature clicked on
@@ -68,7 +62,7 @@ class FilterTool(QgsMapToolIdentifyFeature):
             self.network_id = int(feature['network_id'])
             #self.nb_sectors = self.identify_nbSectors(self.cell_id)
             
-            self.sector_split = self.identify_nbSectors(self.cell_id)
+            self.sector_split = self.identify_nbSectors(self.network_id, self.cell_id)
 
             """ if feature['sector_split'] != None :
                 sector_split = int(feature['sector_split'])
@@ -82,20 +76,24 @@ class FilterTool(QgsMapToolIdentifyFeature):
                 self.filter_cycle += 1
                 # Apply filter on station
                 #expression = f'"cell_id" = \'{attribute_value}\''
-                expression = f'"network_id" = 1 AND abs("cell_id" - {self.cell_id}) < 100'
+                expression = self.enodeb_expression()
                 self.layer.setSubsetString(expression)
             elif self.filter_cycle == 1:
                 # Apply filter on sections
                 self.filter_cycle += 1
                 #mod_value = self.cell_id % self.nb_sectors
                 mod_value = self.cell_id % self.sector_split
-                expression = f'"network_id" = 1 AND abs("cell_id" - {self.cell_id}) < 100 AND MOD("cell_id",{self.sector_split}) = {mod_value}'
+                expression = f'{self.enodeb_expression()} AND MOD("cell_id",{self.sector_split}) = {mod_value}'
                 self.layer.setSubsetString(expression)
             elif self.filter_cycle == 2:
                 # Remove filter
                 self.filter_cycle = 0
                 self.layer.setSubsetString("")
 
+# Le cache des secteurs est rechargé à chaque modification de la table sector (LISTEN/NOTIFY)
+if capabilities(db_engines.main).notify:
+    sector_splits.listen(db_engines.main)
+
 # Set the custom tool as the active tool
 filter_tool = FilterTool(layer)
 iface.mapCanvas().setMapTool(filter_tool)